@@ -0,0 +1,10 @@
+"""
+Performance benchmarks for wa_crypt_tools.
+
+    python -m benchmarks                 # run everything, compare to baseline
+    python -m benchmarks decrypt convert --scale 4
+    python -m benchmarks --save-baseline # record this machine's numbers
+
+Inputs come from the deterministic generators in benchmarks.generators,
+so runs on the same machine are comparable.
+"""
@@ -0,0 +1,179 @@
+"""
+Deterministic synthetic inputs: crypt15 backups, contacts.vcf files and
+WhatsApp Media trees. The same arguments always produce the same
+plaintext, contacts and file sizes.
+"""
+import os
+import zlib
+import base64
+import hashlib
+import random
+from typing import List
+
+from wa_crypt_tools.crypto import (
+    SQLITE_MAGIC, _aes, derive_crypt15_key, encrypt_file, parse_hex_key
+)
+
+BENCH_KEY = "0123456789abcdef" * 4
+DEFAULT_SEED = 1
+
+WORDS = (
+    "hola que tal vale nos vemos mañana bien gracias jaja ok "
+    "where are you running late see you at the crag tonight "
+    "photo sent voice note meeting tomorrow at nine thanks"
+).split()
+
+MEDIA_FOLDERS = (
+    ("WhatsApp Images", "IMG", ".jpg"),
+    ("WhatsApp Video", "VID", ".mp4"),
+    ("WhatsApp Voice Notes", "PTT", ".opus"),
+    ("WhatsApp Documents", "DOC", ".pdf"),
+    ("WhatsApp Stickers", "STK", ".webp"),
+)
+
+
+def _random_bytes(rng: random.Random, size: int) -> bytes:
+    return rng.getrandbits(size * 8).to_bytes(size, "little")
+
+
+def write_reference_crypt15(path: str, key_hex: str = BENCH_KEY) -> None:
+    """
+    A minimal crypt15 backup laid out like WhatsApp's (length-prefixed
+    protobuf header with the IV, GCM body, tag and MD5 trailer), used as
+    the header template for encrypt_file.
+    """
+    iv = bytes(range(16))
+    c15_iv = b"\x0a\x10" + iv
+    proto = b"\x08\x01" + b"\x1a" + bytes([len(c15_iv)]) + c15_iv
+    header = bytes([len(proto)]) + b"\x01" + proto
+
+    aes = _aes()
+    cipher = aes.new(
+        derive_crypt15_key(parse_hex_key(key_hex)), aes.MODE_GCM, nonce=iv
+    )
+    body = cipher.encrypt(zlib.compress(SQLITE_MAGIC + bytes(4080)))
+    data = header + body + cipher.digest()
+    with open(path, 'wb') as f:
+        f.write(data + hashlib.md5(data).digest())
+
+
+def write_plain_database(
+    path: str, size: int, seed: int = DEFAULT_SEED
+) -> None:
+    """
+    size bytes starting with the SQLite magic. The rest alternates
+    message-like text and random bytes, so it compresses roughly like a
+    real msgstore.db (about 3:2).
+    """
+    rng = random.Random(seed)
+    with open(path, 'wb') as f:
+        f.write(SQLITE_MAGIC)
+        written = len(SQLITE_MAGIC)
+        while written < size:
+            text = " ".join(rng.choice(WORDS) for _ in range(600)).encode()
+            block = text[:2048] + _random_bytes(rng, 2048)
+            block = block[:size - written]
+            f.write(block)
+            written += len(block)
+
+
+def make_crypt15(
+    path: str,
+    size: int,
+    key_hex: str = BENCH_KEY,
+    seed: int = DEFAULT_SEED
+) -> str:
+    """
+    Writes a crypt15 backup of a size-byte synthetic database to path and
+    returns the plaintext's path (path without .crypt15), kept for
+    round-trip checks. The ciphertext differs per run (fresh IV); the
+    plaintext does not.
+    """
+    plain = path[:-len(".crypt15")] if path.endswith(".crypt15") else (
+        path + ".plain"
+    )
+    reference = path + ".reference"
+    write_plain_database(plain, size, seed)
+    write_reference_crypt15(reference, key_hex)
+    try:
+        encrypt_file(plain, path, key_hex, reference)
+    finally:
+        os.remove(reference)
+    return plain
+
+
+def _qp_fold(value: str) -> List[str]:
+    """Quoted-printable encodes value, folded with soft '=' breaks."""
+    encoded = "".join(
+        f"={byte:02X}" if byte > 126 or byte in (61,) else chr(byte)
+        for byte in value.encode("utf-8")
+    )
+    return [encoded[i:i + 60] + "=" for i in range(0, len(encoded), 60)]
+
+
+def make_vcf(
+    path: str,
+    contacts: int,
+    photo_every: int = 4,
+    photo_size: int = 6000,
+    seed: int = DEFAULT_SEED
+) -> None:
+    """
+    A vCard 2.1 export of `contacts` contacts like Android writes them:
+    UTF-8 names as folded quoted-printable, several TEL/EMAIL lines, and
+    every photo_every-th contact with a base64 PHOTO folded over many
+    continuation lines.
+    """
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as f:
+        for i in range(contacts):
+            name = f"{rng.choice(WORDS).title()} Núñez-{i} "
+            name += " ".join(rng.choice(WORDS) for _ in range(6))
+            f.write("BEGIN:VCARD\nVERSION:2.1\n")
+            lines = _qp_fold(name)
+            lines[-1] = lines[-1][:-1]
+            f.write("FN;CHARSET=UTF-8;ENCODING=QUOTED-PRINTABLE:")
+            f.write("\n".join(lines) + "\n")
+            f.write(f"TEL;CELL:+34 6{rng.randrange(10 ** 8):08d}\n")
+            if i % 3 == 0:
+                f.write(f"TEL;HOME:+34 9{rng.randrange(10 ** 8):08d}\n")
+            if i % 2 == 0:
+                f.write(f"EMAIL;HOME:contact{i}@example.com\n")
+            if photo_every and i % photo_every == 0:
+                photo = base64.b64encode(
+                    _random_bytes(rng, photo_size)
+                ).decode()
+                f.write("PHOTO;ENCODING=BASE64;JPEG:" + photo[:60] + "\n")
+                for j in range(60, len(photo), 76):
+                    f.write(" " + photo[j:j + 76] + "\n")
+                f.write("\n")
+            f.write("END:VCARD\n")
+
+
+def make_media_tree(
+    root: str,
+    files: int,
+    max_size: int = 64 * 1024,
+    seed: int = DEFAULT_SEED
+) -> int:
+    """
+    `files` files spread over the WhatsApp/Media folders with
+    WhatsApp-style names (IMG-YYYYMMDD-WA0001.jpg, ...), a Sent/
+    subfolder and a .nomedia marker each. Returns the total bytes.
+    """
+    rng = random.Random(seed)
+    total = 0
+    for folder, _, _ in MEDIA_FOLDERS:
+        os.makedirs(os.path.join(root, folder, "Sent"), exist_ok=True)
+        open(os.path.join(root, folder, ".nomedia"), 'wb').close()
+    for i in range(files):
+        folder, prefix, ext = MEDIA_FOLDERS[i % len(MEDIA_FOLDERS)]
+        date = (f"20{rng.randrange(18, 25)}{rng.randrange(1, 13):02d}"
+                f"{rng.randrange(1, 29):02d}")
+        name = f"{prefix}-{date}-WA{i:04d}{ext}"
+        sub = "Sent" if i % 4 == 0 else ""
+        size = rng.randrange(1, max_size)
+        with open(os.path.join(root, folder, sub, name), 'wb') as f:
+            f.write(bytes(size))
+        total += size
+    return total
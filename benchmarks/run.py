@@ -0,0 +1,341 @@
+"""
+Benchmark runner. Inputs are generated in this process (untimed); each
+benchmark's measured step then runs `repeat` times in a fresh spawned
+process, so the reported peak RSS covers the measured step and not the
+input generation. The fastest wall time is kept.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from queue import Empty
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from benchmarks import generators
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_REPEAT = 3
+
+
+class Benchmark(NamedTuple):
+    description: str
+    # (workdir, scale) -> context for run; untimed
+    setup: Callable[[str, int], Any]
+    # context -> (bytes processed, items processed); timed
+    run: Callable[[Any], Tuple[int, int]]
+    # None if the benchmark can run here, else the reason it cannot
+    unavailable: Callable[[], Optional[str]]
+
+
+def _needs_crypto() -> Optional[str]:
+    from wa_crypt_tools.crypto import crypto_available
+    return None if crypto_available() else "pycryptodome not installed"
+
+
+def _needs_vobject() -> Optional[str]:
+    try:
+        import vobject  # noqa: F401
+    except ImportError:
+        return "vobject not installed"
+    return None
+
+
+def _always() -> Optional[str]:
+    return None
+
+
+def _setup_decrypt(workdir: str, scale: int) -> Dict[str, str]:
+    crypt = os.path.join(workdir, "msgstore.db.crypt15")
+    generators.make_crypt15(crypt, scale * 32 * 1024 * 1024)
+    return {"crypt": crypt, "out": os.path.join(workdir, "out.db")}
+
+
+def _run_decrypt(ctx: Dict[str, str]) -> Tuple[int, int]:
+    from wa_crypt_tools.crypto import decrypt_file
+    decrypt_file(ctx["crypt"], ctx["out"], generators.BENCH_KEY)
+    return os.path.getsize(ctx["crypt"]), 1
+
+
+def _setup_encrypt(workdir: str, scale: int) -> Dict[str, str]:
+    plain = os.path.join(workdir, "msgstore.db")
+    reference = os.path.join(workdir, "reference.crypt15")
+    generators.write_plain_database(plain, scale * 32 * 1024 * 1024)
+    generators.write_reference_crypt15(reference)
+    return {"plain": plain, "reference": reference,
+            "out": os.path.join(workdir, "out.crypt15")}
+
+
+def _run_encrypt(ctx: Dict[str, str]) -> Tuple[int, int]:
+    from wa_crypt_tools.crypto import encrypt_file
+    encrypt_file(ctx["plain"], ctx["out"], generators.BENCH_KEY,
+                 ctx["reference"])
+    return os.path.getsize(ctx["plain"]), 1
+
+
+def _setup_convert(workdir: str, scale: int) -> Dict[str, Any]:
+    vcf = os.path.join(workdir, "contacts.vcf")
+    contacts = scale * 5000
+    generators.make_vcf(vcf, contacts)
+    return {"vcf": vcf, "json": os.path.join(workdir, "contacts.json"),
+            "contacts": contacts}
+
+
+def _run_convert(ctx: Dict[str, Any]) -> Tuple[int, int]:
+    from wa_crypt_tools.commands.convert import _internal_convert_logic
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        _internal_convert_logic(ctx["vcf"], ctx["json"])
+    return os.path.getsize(ctx["vcf"]), ctx["contacts"]
+
+
+def _setup_media(workdir: str, scale: int) -> Dict[str, Any]:
+    root = os.path.join(workdir, "Media")
+    files = scale * 5000
+    size = generators.make_media_tree(root, files, max_size=8 * 1024)
+    return {"root": root, "files": files, "bytes": size,
+            "catalog": os.path.join(workdir, "media_index.db")}
+
+
+def _run_media_scan(ctx: Dict[str, Any]) -> Tuple[int, int]:
+    from wa_crypt_tools.media import scan_tree
+    files = scan_tree(ctx["root"])
+    return sum(f.size for f in files), len(files)
+
+
+def _run_media_index(ctx: Dict[str, Any]) -> Tuple[int, int]:
+    from wa_crypt_tools.media import update_catalog
+    if os.path.exists(ctx["catalog"]):
+        os.remove(ctx["catalog"])
+    result = update_catalog(ctx["catalog"], ctx["root"])
+    return ctx["bytes"], result.total
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    "decrypt": Benchmark(
+        "crypt15 -> msgstore.db, 32 MiB per scale unit",
+        _setup_decrypt, _run_decrypt, _needs_crypto
+    ),
+    "encrypt": Benchmark(
+        "msgstore.db -> crypt15, 32 MiB per scale unit",
+        _setup_encrypt, _run_encrypt, _needs_crypto
+    ),
+    "convert": Benchmark(
+        "contacts.vcf -> contacts.json, 5000 contacts per scale unit",
+        _setup_convert, _run_convert, _needs_vobject
+    ),
+    "media_scan": Benchmark(
+        "parallel scan of a Media tree, 5000 files per scale unit",
+        _setup_media, _run_media_scan, _always
+    ),
+    "media_index": Benchmark(
+        "fresh media catalog with hashing, 5000 files per scale unit",
+        _setup_media, _run_media_index, _always
+    ),
+}
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Peak resident set size of this process in KiB, if known."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _measure(name: str, ctx: Any, repeat: int) -> Dict[str, Any]:
+    """Times one benchmark on prepared inputs; see run_benchmark."""
+    bench = BENCHMARKS[name]
+    times: List[float] = []
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        started = time.perf_counter()
+        size, items = bench.run(ctx)
+        times.append(time.perf_counter() - started)
+
+    wall = min(times)
+    return {
+        "name": name,
+        "wall_s": round(wall, 4),
+        "bytes": size,
+        "items": items,
+        "mb_per_s": round(size / wall / 1e6, 2) if wall else None,
+        "items_per_s": round(items / wall, 1) if wall else None,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def _child(name: str, ctx: Any, repeat: int, queue: Any) -> None:
+    try:
+        queue.put(_measure(name, ctx, repeat))
+    except Exception as e:
+        queue.put({"name": name, "error": f"{type(e).__name__}: {e}"})
+
+
+def run_benchmark(name: str, scale: int = 1,
+                  repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """
+    Generates the inputs for one benchmark here, then times it in a
+    fresh process and returns its record.
+    """
+    bench = BENCHMARKS[name]
+    reason = bench.unavailable()
+    if reason:
+        return {"name": name, "skipped": reason}
+
+    workdir = tempfile.mkdtemp(prefix=f"wa-bench-{name}-")
+    try:
+        try:
+            ctx = bench.setup(workdir, scale)
+        except Exception as e:
+            return {"name": name,
+                    "error": f"setup: {type(e).__name__}: {e}"}
+
+        mp = multiprocessing.get_context("spawn")
+        queue = mp.Queue()
+        process = mp.Process(target=_child, args=(name, ctx, repeat, queue))
+        process.start()
+        while True:
+            try:
+                result = queue.get(timeout=1)
+                break
+            except Empty:
+                if not process.is_alive():
+                    result = {"name": name, "error":
+                              f"process exited with code {process.exitcode}"}
+                    break
+        process.join()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return dict(result)
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return dict(json.load(f))
+
+
+def save_baseline(
+    path: str, scale: int, results: List[Dict[str, Any]]
+) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            "scale": scale,
+            "results": {r["name"]: r for r in results if "wall_s" in r},
+        }, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def compare(
+    results: List[Dict[str, Any]],
+    baseline: Dict[str, Any],
+    tolerance: float = DEFAULT_TOLERANCE
+) -> List[str]:
+    """
+    Regressions against the baseline: wall time or peak RSS more than
+    `tolerance` (a fraction) above the stored value.
+    """
+    stored = baseline.get("results", {})
+    regressions = []
+    for result in results:
+        old = stored.get(result["name"])
+        if not old or "wall_s" not in result:
+            continue
+        for metric in ("wall_s", "peak_rss_kb"):
+            new_value, old_value = result.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            if new_value > old_value * (1 + tolerance):
+                regressions.append(
+                    f"{result['name']}: {metric} {new_value} vs baseline "
+                    f"{old_value} (+{(new_value / old_value - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def _print_result(result: Dict[str, Any]) -> None:
+    if "skipped" in result:
+        print(f"  {result['name']:12} skipped: {result['skipped']}")
+    elif "error" in result:
+        print(f"  {result['name']:12} FAILED: {result['error']}")
+    else:
+        rss = result["peak_rss_kb"]
+        print(f"  {result['name']:12} {result['wall_s']:8.3f}s  "
+              f"{result['mb_per_s'] or 0:8.1f} MB/s  "
+              f"{result['items_per_s'] or 0:10.1f} items/s  "
+              f"peak {rss // 1024 if rss else '?'} MiB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Run wa_crypt_tools performance benchmarks"
+    )
+    parser.add_argument(
+        "names", nargs="*", help="Benchmarks to run (default: all)"
+    )
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Input size multiplier")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="Timed runs per benchmark; the fastest counts")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="Baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store these results as the new baseline")
+    parser.add_argument("--json", action="store_true",
+                        help="Print results as JSON")
+    parser.add_argument("--list", action="store_true",
+                        help="List the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, bench in BENCHMARKS.items():
+            print(f"{name:12} {bench.description}")
+        return 0
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    names = args.names or list(BENCHMARKS)
+    results = []
+    if not args.json:
+        print(f"--- Benchmarks (scale {args.scale}) ---")
+    for name in names:
+        result = run_benchmark(name, args.scale, args.repeat)
+        results.append(result)
+        if not args.json:
+            _print_result(result)
+
+    failed = any("error" in r for r in results)
+    if args.save_baseline:
+        save_baseline(args.baseline, args.scale, results)
+        regressions: List[str] = []
+    else:
+        baseline = load_baseline(args.baseline)
+        if baseline and baseline.get("scale") != args.scale:
+            print(f"Warning: Baseline was recorded at scale "
+                  f"{baseline.get('scale')}; not comparing.")
+            baseline = {}
+        regressions = compare(results, baseline, args.tolerance)
+
+    if args.json:
+        print(json.dumps({"scale": args.scale, "results": results,
+                          "regressions": regressions}))
+    elif args.save_baseline:
+        print(f"Baseline saved to {args.baseline}")
+    for line in regressions:
+        print(f"Regression: {line}")
+    return 1 if failed or regressions else 0
@@ -0,0 +1,110 @@
+"""Builds small msgstore.db / wa.db files with WhatsApp's modern schema."""
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE jid (_id INTEGER PRIMARY KEY, user TEXT, server TEXT,
+                  raw_string TEXT);
+CREATE TABLE chat (_id INTEGER PRIMARY KEY, jid_row_id INTEGER,
+                   subject TEXT, sort_timestamp INTEGER);
+CREATE TABLE message (_id INTEGER PRIMARY KEY, chat_row_id INTEGER,
+                      from_me INTEGER, key_id TEXT,
+                      sender_jid_row_id INTEGER, timestamp INTEGER,
+                      message_type INTEGER, text_data TEXT);
+CREATE TABLE message_media (message_row_id INTEGER PRIMARY KEY,
+                            chat_row_id INTEGER, file_path TEXT,
+                            file_size INTEGER, mime_type TEXT,
+                            media_name TEXT, file_hash TEXT);
+"""
+
+ALICE = "34600000001@s.whatsapp.net"
+BOB = "34600000002@s.whatsapp.net"
+GROUP = "120363000000000001@g.us"
+
+
+def build_msgstore(path):
+    """
+    Two chats: a 1:1 chat with Alice (three messages, one image) and a
+    group where Bob writes. Returns the connection, left open so tests
+    can add rows.
+    """
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO jid VALUES (?, ?, ?, ?)", [
+        (1, "34600000001", "s.whatsapp.net", ALICE),
+        (2, "34600000002", "s.whatsapp.net", BOB),
+        (3, "120363000000000001", "g.us", GROUP),
+    ])
+    conn.executemany("INSERT INTO chat VALUES (?, ?, ?, ?)", [
+        (1, 1, None, 1700000300000),
+        (2, 3, "Climbing <club>", 1700000400000),
+    ])
+    for row in [
+        (1, 1, 0, "A1", 0, 1700000000000, 0, "Hi there"),
+        (2, 1, 1, "A2", 0, 1700000100000, 0, "Hello Alice"),
+        (3, 1, 0, "A3", 0, 1700000300000, 1, "Look at this"),
+        (4, 2, 0, "G1", 2, 1700000400000, 0, "Saturday at the wall?"),
+    ]:
+        add_message(conn, *row)
+    conn.execute(
+        "INSERT INTO message_media VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (3, 1, "Media/WhatsApp Images/IMG-20231114-WA0001.jpg", 1234,
+         "image/jpeg", "IMG-20231114-WA0001.jpg", "aGFzaA==")
+    )
+    conn.commit()
+    return conn
+
+
+def add_message(conn, _id, chat_id, from_me, key_id, sender, timestamp,
+                message_type, text):
+    conn.execute(
+        "INSERT INTO message VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (_id, chat_id, from_me, key_id, sender, timestamp, message_type,
+         text)
+    )
+
+
+def build_wa_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE wa_contacts (_id INTEGER PRIMARY KEY, jid TEXT, "
+        "display_name TEXT, wa_name TEXT)"
+    )
+    conn.executemany("INSERT INTO wa_contacts VALUES (?, ?, ?, ?)", [
+        (1, ALICE, "Alice", None),
+        (2, BOB, None, "Bob W."),
+    ])
+    conn.commit()
+    conn.close()
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE chat_list (_id INTEGER PRIMARY KEY, key_remote_jid TEXT,
+                        subject TEXT, sort_timestamp INTEGER);
+CREATE TABLE messages (_id INTEGER PRIMARY KEY, key_remote_jid TEXT,
+                       key_from_me INTEGER, key_id TEXT, data TEXT,
+                       timestamp INTEGER, remote_resource TEXT,
+                       media_mime_type TEXT, media_size INTEGER,
+                       media_name TEXT, media_hash TEXT);
+"""
+
+
+def build_legacy_msgstore(path):
+    """The pre-2022 layout: one messages table keyed by jid."""
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany("INSERT INTO chat_list VALUES (?, ?, ?, ?)", [
+        (1, ALICE, None, 1500000100000),
+        (2, GROUP, "Climbing", 1500000200000),
+    ])
+    conn.executemany(
+        "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+            (1, ALICE, 0, "L1", "Old hello", 1500000000000, "",
+             None, None, None, None),
+            (2, GROUP, 0, "L2", None, 1500000200000, BOB,
+             "image/jpeg", 2048, "IMG-20170714-WA0000.jpg", "aGFzaA=="),
+            (3, ALICE, 1, "L3", "Old reply", 1500000100000, "",
+             None, None, None, None),
+        ]
+    )
+    conn.commit()
+    conn.close()
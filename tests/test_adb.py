@@ -1,6 +1,6 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from wa_crypt_tools.adb import get_adb_base, list_devices, get_product_model, check_connection, AdbError
+from wa_crypt_tools.adb import get_adb_base, list_devices, get_product_model, check_connection, list_remote_files, run_adb_command, RemoteFile, AdbError
 
 class TestAdb(unittest.TestCase):
     
@@ -55,5 +55,27 @@ device2\tunauthorized
         devices = list_devices()
         self.assertEqual(len(devices), 0)
 
+    @patch("wa_crypt_tools.adb.run_adb_command")
+    def test_list_remote_files(self, mock_run):
+        mock_run.return_value = (
+            "1024 1700000000 /sdcard/Media/WhatsApp Images/IMG-1.jpg\n"
+            "garbage line\n"
+            "10 1600000000 /sdcard/Media/a.opus\n"
+        )
+        files = list_remote_files("/sdcard/Media", "123")
+        self.assertEqual(files, [
+            RemoteFile("/sdcard/Media/WhatsApp Images/IMG-1.jpg", 1024, 1700000000),
+            RemoteFile("/sdcard/Media/a.opus", 10, 1600000000),
+        ])
+        cmd = mock_run.call_args[0][0]
+        self.assertEqual(cmd[:4], ["adb", "-s", "123", "shell"])
+        self.assertIn("find '/sdcard/Media' -type f", cmd[4])
+
+    @patch("wa_crypt_tools.adb.subprocess.run")
+    def test_run_adb_command_missing_binary(self, mock_run):
+        mock_run.side_effect = FileNotFoundError("adb")
+        with self.assertRaises(AdbError):
+            run_adb_command(["adb", "devices"])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import shutil
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from wa_crypt_tools import aio, tracing
+from wa_crypt_tools.adb import ADB_ENV, AdbError, get_adb_base
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WA = "Android/media/com.whatsapp/WhatsApp"
+REMOTE_WA = "/sdcard/" + WA
+
+
+class TestAio(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.phone = os.path.join(self.tmp, "phone")
+        self.files = {
+            f"{WA}/Databases/msgstore.db.crypt15": b"m" * 5000,
+            f"{WA}/Media/WhatsApp Images/IMG-1.jpg": b"i" * 10,
+            f"{WA}/Media/WhatsApp Images/IMG-2.jpg": b"j" * 20,
+            f"{WA}/Media/WhatsApp Voice Notes/202401/PTT-1.opus": b"v" * 7,
+        }
+        for rel, content in self.files.items():
+            path = os.path.join(self.phone, *rel.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+        patcher = patch.dict(os.environ, {
+            ADB_ENV: f"{sys.executable} -m wa_crypt_tools.testing.fake_adb",
+            "FAKE_ADB_ROOT": self.phone,
+            "FAKE_ADB_SERIAL": "FAKE42",
+            "FAKE_ADB_MODEL": "Pixel_8",
+            "PYTHONPATH": PACKAGE_ROOT,
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_probes(self):
+        async def probe():
+            return await asyncio.gather(
+                aio.list_devices(), aio.check_connection("FAKE42"),
+                aio.check_connection("OTHER")
+            )
+
+        devices, known, other = asyncio.run(probe())
+        # The model comes from getprop, not the devices -l listing
+        self.assertEqual(devices, [
+            {"id": "FAKE42", "state": "device", "model": "Pixel_8"}
+        ])
+        self.assertTrue(known)
+        self.assertFalse(other)
+
+    def test_streams_lines_and_raises(self):
+        seen = []
+        output = asyncio.run(aio.run_adb_command(
+            get_adb_base() + ["shell", f"ls /sdcard/{WA}"],
+            on_line=seen.append
+        ))
+        self.assertEqual(seen, ["Databases", "Media"])
+        self.assertEqual(output, "Databases\nMedia")
+
+        tracing.enable()
+        self.addCleanup(tracing.disable)
+        with self.assertRaises(AdbError):
+            asyncio.run(aio.run_adb_command(
+                get_adb_base() + ["shell", "cat /sdcard/missing"]
+            ))
+        self.assertEqual(tracing.errors(), {("adb shell cat", "AdbError"): 1})
+
+    def test_pull_and_push(self):
+        files = asyncio.run(aio.list_remote_files(
+            [f"{REMOTE_WA}/Media", f"{REMOTE_WA}/Missing"], missing_ok=True
+        ))
+        self.assertEqual(len(files), 3)
+
+        local = os.path.join(self.tmp, "out", "Media")
+        failed = asyncio.run(aio.pull_files(
+            files, f"{REMOTE_WA}/Media", local, transfers=2
+        ))
+        self.assertEqual(failed, 0)
+        with open(os.path.join(local, "WhatsApp Voice Notes", "202401",
+                               "PTT-1.opus"), 'rb') as f:
+            self.assertEqual(f.read(), b"v" * 7)
+
+        shutil.rmtree(os.path.join(self.phone, *WA.split("/"), "Media"))
+        failed = asyncio.run(aio.push_tree(os.path.dirname(local)))
+        self.assertEqual(failed, 0)
+        self.assertTrue(os.path.isfile(os.path.join(
+            self.phone, *WA.split("/"), "Media", "WhatsApp Images",
+            "IMG-2.jpg"
+        )))
+
+    def test_cancel_kills_command(self):
+        async def cancel():
+            task = asyncio.ensure_future(aio.run_adb_command(
+                [sys.executable, "-c", "import time; time.sleep(30)"]
+            ))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        started = time.monotonic()
+        asyncio.run(cancel())
+        self.assertLess(time.monotonic() - started, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from wa_crypt_tools.archive import merge_into_archive
+from msgstore_fixture import (
+    ALICE, add_message, build_legacy_msgstore, build_msgstore
+)
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmp, "msgstore.db")
+        self.archive = os.path.join(self.tmp, "archive.db")
+        build_msgstore(self.db).close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def archived(self):
+        conn = sqlite3.connect(self.archive)
+        rows = conn.execute(
+            "SELECT key_id, text FROM messages ORDER BY key_id"
+        ).fetchall()
+        conn.close()
+        return rows
+
+    def test_keeps_deleted_messages_and_scans_only_new_rows(self):
+        first = merge_into_archive(self.archive, self.db)
+        self.assertEqual(first.added, 4)
+        self.assertTrue(first.full_scan)
+
+        # Next snapshot: message 2 deleted on the phone, one new message
+        conn = sqlite3.connect(self.db)
+        conn.execute("DELETE FROM message WHERE _id = 2")
+        add_message(conn, 5, 1, 0, "A5", 0, 1700000500000, 0, "New one")
+        conn.commit()
+        conn.close()
+
+        second = merge_into_archive(self.archive, self.db, batch_size=1)
+        self.assertEqual(second.added, 1)
+        self.assertFalse(second.full_scan)
+        self.assertEqual(second.scanned_from, 4)
+        keys = [k for k, _ in self.archived()]
+        self.assertEqual(keys, ["A1", "A2", "A3", "A5", "G1"])
+
+        self.assertEqual(merge_into_archive(self.archive, self.db).added, 0)
+
+    def test_rescans_when_history_changed(self):
+        merge_into_archive(self.archive, self.db)
+        # Restored on another phone: same messages, different _ids
+        os.remove(self.db)
+        conn = build_msgstore(self.db)
+        conn.execute("UPDATE message SET _id = _id + 100")
+        conn.commit()
+        conn.close()
+
+        result = merge_into_archive(self.archive, self.db)
+        self.assertTrue(result.full_scan)
+        self.assertEqual(result.added, 0)
+        self.assertEqual(len(self.archived()), 4)
+
+    def test_legacy_snapshot_dedupes_with_modern(self):
+        merge_into_archive(self.archive, self.db)
+        legacy = os.path.join(self.tmp, "old.db")
+        build_legacy_msgstore(legacy)
+
+        result = merge_into_archive(self.archive, legacy, source="old")
+        self.assertEqual(result.added, 3)
+        self.assertIn(("L3", "Old reply"), self.archived())
+
+        conn = sqlite3.connect(self.archive)
+        jids = [r[0] for r in conn.execute("SELECT jid FROM chats")]
+        conn.close()
+        self.assertIn(ALICE, jids)
+        self.assertEqual(len(jids), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
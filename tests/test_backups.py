@@ -0,0 +1,54 @@
+import unittest
+
+from wa_crypt_tools.adb import RemoteFile
+from wa_crypt_tools.backups import parse_backup_name, select_backups
+
+
+class TestBackups(unittest.TestCase):
+
+    def test_parse_backup_name(self):
+        self.assertEqual(
+            parse_backup_name("/x/msgstore-2024-01-31.1.db.crypt15"),
+            ("msgstore", "2024-01-31")
+        )
+        self.assertEqual(
+            parse_backup_name("/x/wa.db.crypt14"), ("wa", None)
+        )
+        self.assertEqual(
+            parse_backup_name("/x/backup_settings.json"), (None, None)
+        )
+
+    def test_select_backups(self):
+        files = [
+            RemoteFile("/D/msgstore.db.crypt15", 1, 9),
+            RemoteFile("/D/msgstore-2024-01-01.1.db.crypt15", 1, 1),
+            RemoteFile("/D/msgstore-2024-03-01.1.db.crypt15", 1, 3),
+            RemoteFile("/D/msgstore-2024-02-01.1.db.crypt15", 1, 2),
+            RemoteFile("/B/wa.db.crypt15", 1, 9),
+            RemoteFile("/B/settings.db.crypt15", 1, 9),
+            RemoteFile("/B/settings-2024-03-01.1.db.crypt15", 1, 3),
+        ]
+        primary, secondary = select_backups(files, keep_rotated=2)
+        self.assertEqual(
+            [f.path for f in primary],
+            ["/D/msgstore.db.crypt15", "/B/wa.db.crypt15"]
+        )
+        self.assertEqual([f.path for f in secondary], [
+            "/B/settings.db.crypt15",
+            "/D/msgstore-2024-03-01.1.db.crypt15",
+            "/D/msgstore-2024-02-01.1.db.crypt15",
+            "/B/settings-2024-03-01.1.db.crypt15",
+        ])
+
+    def test_select_backups_current_only(self):
+        files = [
+            RemoteFile("/D/msgstore.db.crypt15", 1, 9),
+            RemoteFile("/D/msgstore-2024-01-01.1.db.crypt15", 1, 1),
+        ]
+        primary, secondary = select_backups(files, keep_rotated=0)
+        self.assertEqual(len(primary), 1)
+        self.assertEqual(secondary, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks import generators
+from benchmarks.run import compare
+from wa_crypt_tools.crypto import crypto_available, decrypt_file
+from wa_crypt_tools.media import scan_tree
+
+
+class TestGenerators(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    @unittest.skipUnless(crypto_available(), "pycryptodome not installed")
+    def test_crypt15_round_trip(self):
+        crypt = os.path.join(self.tmp, "msgstore.db.crypt15")
+        plain = generators.make_crypt15(crypt, 200000)
+        self.assertEqual(os.path.getsize(plain), 200000)
+        out = os.path.join(self.tmp, "out.db")
+        decrypt_file(crypt, out, generators.BENCH_KEY)
+        with open(out, 'rb') as a, open(plain, 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_deterministic_vcf(self):
+        first = os.path.join(self.tmp, "a.vcf")
+        second = os.path.join(self.tmp, "b.vcf")
+        generators.make_vcf(first, 20)
+        generators.make_vcf(second, 20)
+        with open(first, 'rb') as a, open(second, 'rb') as b:
+            content = a.read()
+            self.assertEqual(content, b.read())
+        self.assertEqual(content.count(b"BEGIN:VCARD"), 20)
+        self.assertIn(b"PHOTO;ENCODING=BASE64", content)
+        self.assertIn(b"=\r\n", content)  # QP soft line break
+
+    def test_media_tree(self):
+        root = os.path.join(self.tmp, "Media")
+        total = generators.make_media_tree(root, 12, max_size=100)
+        files = [f for f in scan_tree(root) if not f.path.endswith("nomedia")]
+        self.assertEqual(len(files), 12)
+        self.assertEqual(sum(f.size for f in files), total)
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_flags_regressions_beyond_tolerance(self):
+        baseline = {"scale": 1, "results": {
+            "decrypt": {"wall_s": 1.0, "peak_rss_kb": 1000},
+            "convert": {"wall_s": 2.0, "peak_rss_kb": 1000},
+        }}
+        results = [
+            {"name": "decrypt", "wall_s": 1.2, "peak_rss_kb": 1500},
+            {"name": "convert", "wall_s": 3.0, "peak_rss_kb": 900},
+            {"name": "encrypt", "wall_s": 9.0, "peak_rss_kb": 9000},
+            {"name": "media_scan", "skipped": "n/a"},
+        ]
+        regressions = compare(results, baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("decrypt: peak_rss_kb"))
+        self.assertTrue(regressions[1].startswith("convert: wall_s"))
+
+
+if __name__ == '__main__':
+    unittest.main()
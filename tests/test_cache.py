@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from wa_crypt_tools.cache import DecryptCache, key_fingerprint
+
+KEY = "ab" * 32
+
+
+class TestDecryptCache(unittest.TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.crypt = os.path.join(self.base, "msgstore.db.crypt15")
+        self.out = os.path.join(self.base, "msgstore.db")
+        with open(self.crypt, 'wb') as f:
+            f.write(b"ciphertext")
+        with open(self.out, 'wb') as f:
+            f.write(b"SQLite format 3\x00plaintext")
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def test_miss_then_hit(self):
+        cache = DecryptCache(self.base)
+        self.assertFalse(cache.lookup(self.crypt, KEY, self.out))
+        cache.store(self.crypt, KEY, self.out)
+
+        # A fresh instance reads the persisted index
+        self.assertTrue(DecryptCache(self.base).lookup(self.crypt, KEY, self.out))
+
+    def test_other_key_or_ciphertext_misses(self):
+        DecryptCache(self.base).store(self.crypt, KEY, self.out)
+        self.assertFalse(DecryptCache(self.base).lookup(self.crypt, "cd" * 32, self.out))
+
+        with open(self.crypt, 'wb') as f:
+            f.write(b"new ciphertext")
+        self.assertFalse(DecryptCache(self.base).lookup(self.crypt, KEY, self.out))
+
+    def test_engines_do_not_mix(self):
+        DecryptCache(self.base).store(self.crypt, KEY, self.out, "crypto")
+        cache = DecryptCache(self.base)
+        self.assertFalse(cache.lookup(self.crypt, KEY, self.out))
+        self.assertTrue(
+            cache.lookup(self.crypt, KEY, self.out, engine="crypto")
+        )
+        self.assertTrue(
+            DecryptCache(self.base, "crypto").lookup(self.crypt, KEY, self.out)
+        )
+
+    def test_restores_deleted_output_from_hardlink(self):
+        DecryptCache(self.base).store(self.crypt, KEY, self.out)
+        os.remove(self.out)
+
+        cache = DecryptCache(self.base)
+        self.assertTrue(cache.lookup(self.crypt, KEY, self.out, restore=False))
+        self.assertFalse(os.path.exists(self.out))
+        self.assertTrue(cache.lookup(self.crypt, KEY, self.out))
+        with open(self.out, 'rb') as f:
+            self.assertEqual(f.read(), b"SQLite format 3\x00plaintext")
+
+    def test_modified_output_misses(self):
+        cache = DecryptCache(self.base)
+        cache.store(self.crypt, KEY, self.out)
+        cache.detach(self.out)
+        with open(self.out, 'wb') as f:
+            f.write(b"edited")
+        # The cached plaintext survives and is restored
+        self.assertTrue(DecryptCache(self.base).lookup(self.crypt, KEY, self.out))
+        with open(self.out, 'rb') as f:
+            self.assertEqual(f.read(), b"SQLite format 3\x00plaintext")
+
+    def test_key_fingerprint_does_not_leak_key(self):
+        fp = key_fingerprint(KEY)
+        self.assertEqual(len(fp), 16)
+        self.assertNotIn(fp, KEY)
+        self.assertEqual(fp, key_fingerprint(KEY.upper()))
+
+    def test_likely_hit_by_name_and_size(self):
+        DecryptCache(self.base).store(self.crypt, KEY, self.out)
+        cache = DecryptCache(self.base)
+        size = os.path.getsize(self.crypt)
+        self.assertTrue(cache.likely_hit("msgstore.db.crypt15", size, KEY))
+        self.assertFalse(cache.likely_hit("msgstore.db.crypt15", 1, KEY))
+        self.assertFalse(cache.likely_hit("msgstore.db.crypt15", size, "cd" * 32))
+        self.assertEqual(cache.plaintext_size(self.out), os.path.getsize(self.out))
+        self.assertIsNone(cache.plaintext_size(self.crypt))
+
+
+if __name__ == '__main__':
+    unittest.main()
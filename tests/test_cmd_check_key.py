@@ -0,0 +1,83 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+import subprocess
+from unittest.mock import patch, MagicMock
+
+from wa_crypt_tools.commands import check_key as ck
+from wa_crypt_tools.crypto import CryptoError
+
+
+class TestCmdCheckKey(unittest.TestCase):
+
+    def test_candidate_keys_with_ring(self):
+        with tempfile.NamedTemporaryFile('w', suffix=".txt", delete=False) as f:
+            f.write("# old phone\n" + "b" * 64 + "\n\n" + "a" * 64 + "\n")
+        try:
+            keys = ck.candidate_keys({'key': "a" * 64, 'key_ring': f.name})
+        finally:
+            os.remove(f.name)
+        self.assertEqual(keys, ["a" * 64, "b" * 64])
+
+    @patch('wa_crypt_tools.commands.check_key.crypto_available')
+    @patch('wa_crypt_tools.commands.check_key.find_key')
+    def test_in_process(self, mock_find, mock_available):
+        mock_available.return_value = True
+        mock_find.return_value = 1
+        self.assertEqual(ck.find_matching_key("x.crypt15", ["a", "b"]), 1)
+
+    @patch('wa_crypt_tools.commands.check_key.crypto_available')
+    @patch('wa_crypt_tools.commands.check_key.get_venv_python_path')
+    @patch('wa_crypt_tools.commands.check_key.subprocess.run')
+    def test_runs_in_venv_without_pycryptodome(self, mock_run, mock_py, mock_available):
+        mock_available.return_value = False
+        mock_py.return_value = "/venv/bin/python"
+        mock_run.return_value = MagicMock(stdout=json.dumps({"match": 0}))
+
+        self.assertEqual(ck.find_matching_key("x.crypt15", ["k1"]), 0)
+
+        cmd = mock_run.call_args[0][0]
+        self.assertEqual(cmd[0], "/venv/bin/python")
+        self.assertIn("--internal", cmd)
+        # Key is passed on stdin, not argv
+        self.assertNotIn("k1", cmd)
+        self.assertEqual(mock_run.call_args[1]['input'], "k1")
+
+    @patch('wa_crypt_tools.commands.check_key._internal_check_key_logic')
+    def test_internal_reads_one_key_per_line(self, mock_logic):
+        stdin = "a" * 64 + "\n\n/keys/old phone/key\n"
+        argv = ["check_key", "--internal", "--file", "x.crypt15"]
+        with patch('sys.argv', argv), \
+                patch('sys.stdin', io.StringIO(stdin)), \
+                self.assertRaises(SystemExit) as cm:
+            ck.main()
+        self.assertEqual(cm.exception.code, 0)
+        mock_logic.assert_called_once_with(
+            "x.crypt15", ["a" * 64, "/keys/old phone/key"]
+        )
+
+    @patch('wa_crypt_tools.commands.check_key.crypto_available')
+    @patch('wa_crypt_tools.commands.check_key.subprocess.run')
+    def test_venv_failure_raises(self, mock_run, mock_available):
+        mock_available.return_value = False
+        mock_run.side_effect = subprocess.CalledProcessError(1, "python")
+        with self.assertRaises(CryptoError):
+            ck.find_matching_key("x.crypt15", ["k1"])
+
+    @patch('wa_crypt_tools.commands.check_key.find_matching_key')
+    @patch('os.path.exists')
+    def test_check_key_command(self, mock_exists, mock_find):
+        mock_exists.return_value = True
+        mock_find.return_value = None
+        self.assertEqual(ck.check_backup_key({'key': "a" * 64}, "x.crypt15"), 1)
+        mock_find.return_value = 0
+        self.assertEqual(ck.check_backup_key({'key': "a" * 64}, "x.crypt15"), 0)
+
+    def test_check_key_missing_file(self):
+        self.assertEqual(ck.check_backup_key({'key': "a" * 64}, "/nonexistent.crypt15"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
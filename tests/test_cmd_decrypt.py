@@ -2,6 +2,7 @@
 import unittest
 import os
 from unittest.mock import patch, MagicMock, call
+from io import StringIO
 from pathlib import Path
 
 # Import the module to test
@@ -85,5 +86,238 @@ class TestCmdDecrypt(unittest.TestCase):
          
          mock_subprocess.assert_not_called()
 
+    @patch('wa_crypt_tools.commands.decrypt.DecryptCache')
+    @patch('wa_crypt_tools.commands.decrypt.ensure_venv')
+    @patch('wa_crypt_tools.commands.decrypt.get_venv_path')
+    @patch('subprocess.check_call')
+    @patch('os.path.exists')
+    def test_decrypt_skips_cached_files(
+        self, mock_exists, mock_subprocess, mock_get_venv_path,
+        mock_ensure_venv, mock_cache_cls
+    ):
+        mock_get_venv_path.return_value = "/mock/venv"
+        mock_exists.side_effect = lambda p: "msgstore.db.crypt15" in str(p)
+        mock_cache_cls.return_value.lookup.return_value = True
+
+        result = decrypt.decrypt_database(self.mock_config, input_dir=self.output_dir, key="a"*64)
+
+        self.assertEqual(result, 0)
+        mock_subprocess.assert_not_called()
+        mock_cache_cls.return_value.store.assert_not_called()
+
+    @patch('wa_crypt_tools.commands.decrypt.DecryptCache')
+    @patch('wa_crypt_tools.commands.decrypt.ensure_venv')
+    @patch('wa_crypt_tools.commands.decrypt.get_venv_path')
+    @patch('subprocess.check_call')
+    @patch('os.path.exists')
+    def test_decrypt_cache_disabled(
+        self, mock_exists, mock_subprocess, mock_get_venv_path,
+        mock_ensure_venv, mock_cache_cls
+    ):
+        mock_get_venv_path.return_value = "/mock/venv"
+        mock_exists.side_effect = lambda p: "msgstore.db.crypt15" in str(p)
+
+        decrypt.decrypt_database({'decrypt_cache': False}, input_dir=self.output_dir, key="a"*64)
+
+        mock_cache_cls.assert_not_called()
+        mock_subprocess.assert_called_once()
+
+    @patch('wa_crypt_tools.commands.decrypt.find_matching_key')
+    @patch('wa_crypt_tools.commands.decrypt.DecryptCache')
+    @patch('wa_crypt_tools.commands.decrypt.ensure_venv')
+    @patch('wa_crypt_tools.commands.decrypt.get_venv_path')
+    @patch('subprocess.check_call')
+    @patch('os.path.exists')
+    def test_decrypt_wrong_key_fails_fast(
+        self, mock_exists, mock_subprocess, mock_get_venv_path,
+        mock_ensure_venv, mock_cache_cls, mock_find
+    ):
+        mock_get_venv_path.return_value = "/mock/venv"
+        mock_exists.side_effect = lambda p: "msgstore.db.crypt15" in str(p)
+        mock_cache_cls.return_value.lookup.return_value = False
+        mock_find.return_value = None
+
+        result = decrypt.decrypt_database(self.mock_config, input_dir=self.output_dir, key="a"*64)
+
+        self.assertEqual(result, 1)
+        mock_subprocess.assert_not_called()
+
+    @patch('wa_crypt_tools.commands.decrypt.find_matching_key')
+    @patch('wa_crypt_tools.commands.decrypt.decrypt_in_process')
+    @patch('wa_crypt_tools.commands.decrypt.sniff_crypt_file')
+    @patch('wa_crypt_tools.commands.decrypt.DecryptCache')
+    @patch('wa_crypt_tools.commands.decrypt.ensure_venv')
+    @patch('wa_crypt_tools.commands.decrypt.get_venv_path')
+    @patch('subprocess.check_call')
+    @patch('os.path.exists')
+    def test_decrypt_crypt15_in_process(
+        self, mock_exists, mock_subprocess, mock_get_venv_path,
+        mock_ensure_venv, mock_cache_cls, mock_sniff, mock_in_process,
+        mock_find
+    ):
+        mock_get_venv_path.return_value = "/mock/venv"
+        mock_exists.side_effect = lambda p: "msgstore.db.crypt15" in str(p)
+        mock_cache_cls.return_value.lookup.return_value = False
+        mock_sniff.return_value = MagicMock(version=15, error=None)
+        mock_in_process.return_value = True
+        mock_find.return_value = 0
+
+        result = decrypt.decrypt_database(
+            self.mock_config, input_dir=self.output_dir, key="a"*64
+        )
+
+        self.assertEqual(result, 0)
+        mock_subprocess.assert_not_called()
+        mock_in_process.assert_called_once_with(
+            os.path.join(self.output_dir, "WhatsApp", "Databases",
+                         "msgstore.db.crypt15"),
+            os.path.join(self.output_dir, "msgstore.db"),
+            "a"*64
+        )
+        cache = mock_cache_cls.return_value
+        self.assertEqual(cache.store.call_args[0][3], "crypto")
+
+    @patch('wa_crypt_tools.commands.decrypt.find_matching_key')
+    @patch('wa_crypt_tools.commands.decrypt.decrypt_in_process')
+    @patch('wa_crypt_tools.commands.decrypt.sniff_crypt_file')
+    @patch('wa_crypt_tools.commands.decrypt.DecryptCache')
+    @patch('wa_crypt_tools.commands.decrypt.ensure_venv')
+    @patch('wa_crypt_tools.commands.decrypt.get_venv_path')
+    @patch('os.path.exists')
+    def test_decrypt_failure_returns_error(
+        self, mock_exists, mock_get_venv_path, mock_ensure_venv,
+        mock_cache_cls, mock_sniff, mock_in_process, mock_find
+    ):
+        mock_get_venv_path.return_value = "/mock/venv"
+        mock_exists.side_effect = lambda p: "msgstore.db.crypt15" in str(p)
+        mock_cache_cls.return_value.lookup.return_value = False
+        mock_sniff.return_value = MagicMock(version=15, error=None)
+        mock_in_process.return_value = False
+        mock_find.return_value = 0
+
+        with patch('builtins.print') as mock_print:
+            result = decrypt.decrypt_database(
+                self.mock_config, input_dir=self.output_dir, key="a"*64
+            )
+
+        self.assertEqual(result, 1)
+        mock_print.assert_any_call("Error: Not decrypted: msgstore.db")
+        mock_cache_cls.return_value.store.assert_not_called()
+
+    @patch('wa_crypt_tools.commands.decrypt.find_matching_key')
+    @patch('wa_crypt_tools.commands.decrypt.decrypt_in_process')
+    @patch('wa_crypt_tools.commands.decrypt.sniff_crypt_file')
+    @patch('wa_crypt_tools.commands.decrypt.DecryptCache')
+    @patch('wa_crypt_tools.commands.decrypt.ensure_venv')
+    @patch('wa_crypt_tools.commands.decrypt.get_venv_path')
+    @patch('subprocess.check_call')
+    @patch('os.path.exists')
+    def test_decrypt_unsupported_header_uses_wadecrypt(
+        self, mock_exists, mock_subprocess, mock_get_venv_path,
+        mock_ensure_venv, mock_cache_cls, mock_sniff, mock_in_process,
+        mock_find
+    ):
+        mock_get_venv_path.return_value = "/mock/venv"
+        mock_exists.side_effect = lambda p: "msgstore.db.crypt15" in str(p)
+        mock_cache_cls.return_value.lookup.return_value = False
+        mock_sniff.return_value = MagicMock(
+            version=None, error="Unsupported header"
+        )
+        mock_find.return_value = 0
+
+        result = decrypt.decrypt_database(
+            self.mock_config, input_dir=self.output_dir, key="a"*64
+        )
+
+        self.assertEqual(result, 0)
+        mock_in_process.assert_not_called()
+        self.assertEqual(mock_subprocess.call_args[0][0][0],
+                         os.path.join("/mock/venv", "bin", "wadecrypt"))
+        cache = mock_cache_cls.return_value
+        self.assertEqual(cache.store.call_args[0][3], "wadecrypt")
+
+    @patch('wa_crypt_tools.commands.decrypt.decrypt_in_process')
+    @patch('wa_crypt_tools.commands.decrypt.sniff_crypt_file')
+    @patch('wa_crypt_tools.commands.decrypt.DecryptCache')
+    @patch('wa_crypt_tools.commands.decrypt.file_sha256')
+    @patch('wa_crypt_tools.commands.decrypt.ensure_venv')
+    @patch('wa_crypt_tools.commands.decrypt.get_venv_path')
+    @patch('subprocess.check_call')
+    @patch('os.path.exists')
+    def test_decrypt_legacy_crypt14(self, mock_exists, mock_subprocess, mock_get_venv_path, mock_ensure_venv,
+                                    mock_sha, mock_cache_cls, mock_sniff, mock_in_process):
+        mock_get_venv_path.return_value = "/mock/venv"
+        mock_exists.side_effect = lambda p: str(p).endswith("msgstore.db.crypt14")
+        mock_cache_cls.return_value.lookup.return_value = False
+        mock_sniff.return_value = MagicMock(version=14, error=None)
+        mock_in_process.return_value = True
+
+        config = {'key_file': '/keys/key'}
+        result = decrypt.decrypt_database(config, input_dir=self.output_dir, key="a"*64)
+
+        self.assertEqual(result, 0)
+        # wadecrypt is only used for crypt15
+        mock_subprocess.assert_not_called()
+        # In-process results are cached apart from wadecrypt's
+        cache = mock_cache_cls.return_value
+        self.assertEqual(cache.lookup.call_args[1]['engine'], "crypto")
+        self.assertEqual(cache.store.call_args[0][3], "crypto")
+        mock_in_process.assert_called_once_with(
+            os.path.join(self.output_dir, "WhatsApp", "Databases", "msgstore.db.crypt14"),
+            os.path.join(self.output_dir, "msgstore.db"),
+            '/keys/key'
+        )
+
+    @patch('wa_crypt_tools.commands.decrypt.sniff_crypt_file')
+    @patch('wa_crypt_tools.commands.decrypt.DecryptCache')
+    @patch('wa_crypt_tools.commands.decrypt.ensure_venv')
+    @patch('wa_crypt_tools.commands.decrypt.get_venv_path')
+    @patch('os.path.exists')
+    def test_decrypt_legacy_without_key_file(
+        self, mock_exists, mock_get_venv_path, mock_ensure_venv,
+        mock_cache_cls, mock_sniff
+    ):
+        mock_get_venv_path.return_value = "/mock/venv"
+        mock_exists.side_effect = lambda p: str(p).endswith("msgstore.db.crypt12")
+        mock_sniff.return_value = MagicMock(version=12, error=None)
+
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            result = decrypt.decrypt_database({}, input_dir=self.output_dir, key="a"*64)
+        self.assertEqual(result, 1)
+        # A missing key file is not a wrong key
+        self.assertIn("Not decrypted: msgstore.db", out.getvalue())
+        self.assertNotIn("Wrong key", out.getvalue())
+
+    @patch('wa_crypt_tools.commands.decrypt.decrypt_in_process')
+    @patch('wa_crypt_tools.commands.decrypt.ensure_venv')
+    @patch('wa_crypt_tools.commands.decrypt.get_venv_path')
+    def test_decrypt_all_files(self, mock_get_venv_path, mock_ensure_venv, mock_in_process):
+        import tempfile
+        import shutil
+        mock_get_venv_path.return_value = "/mock/venv"
+        mock_in_process.return_value = True
+        base = tempfile.mkdtemp()
+        try:
+            c15_iv = b"\x0a\x10" + bytes(16)
+            proto = b"\x1a" + bytes([len(c15_iv)]) + c15_iv
+            os.makedirs(os.path.join(base, "2020"))
+            with open(os.path.join(base, "2020", "msgstore.db.crypt12"), 'wb') as f:
+                f.write(bytes(200))
+            with open(os.path.join(base, "msgstore.db.crypt15"), 'wb') as f:
+                f.write(bytes([len(proto)]) + proto + bytes(64))
+
+            # No legacy key: the crypt12 file is reported, crypt15 decrypted
+            config = {'decrypt_all_files': True}
+            result = decrypt.decrypt_database(config, input_dir=base, key="a"*64)
+
+            self.assertEqual(result, 1)
+            mock_in_process.assert_called_once_with(
+                os.path.join(base, "msgstore.db.crypt15"),
+                os.path.join(base, "decrypted", "msgstore.db"),
+                "a"*64
+            )
+        finally:
+            shutil.rmtree(base)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,56 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from wa_crypt_tools.commands.diff import diff_snapshots
+from msgstore_fixture import add_message, build_msgstore
+
+
+class TestCmdDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.old = os.path.join(self.tmp, "old")
+        self.new = os.path.join(self.tmp, "new")
+        for snap in (self.old, self.new):
+            os.makedirs(snap)
+        build_msgstore(os.path.join(self.old, "msgstore.db")).close()
+        conn = build_msgstore(os.path.join(self.new, "msgstore.db"))
+        add_message(conn, 5, 1, 0, "A5", 0, 1700000500000, 0, "Newer")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_json_report_and_manifest(self):
+        manifest = os.path.join(self.tmp, "media.json")
+        out = io.StringIO()
+        with redirect_stdout(out):
+            result = diff_snapshots(
+                {}, self.old, self.new, write_manifest=manifest,
+                as_json=True
+            )
+
+        self.assertEqual(result, 0)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["messages"]["new"]["count"], 1)
+        self.assertEqual(report["media"]["added"]["count"], 0)
+        self.assertTrue(os.path.exists(manifest))
+
+    def test_text_report(self):
+        self.assertEqual(
+            diff_snapshots({'input': self.new}, self.old, media=False), 0
+        )
+
+    def test_missing_database(self):
+        os.remove(os.path.join(self.old, "msgstore.db"))
+        self.assertEqual(diff_snapshots({}, self.old, self.new), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
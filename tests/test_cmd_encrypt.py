@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+import subprocess
+from unittest.mock import patch
+
+from wa_crypt_tools.commands.encrypt import encrypt_database
+
+KEY = "a" * 64
+
+
+class TestCmdEncrypt(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_dir = os.path.join(self.tmp, "WhatsApp", "Databases")
+        os.makedirs(self.db_dir)
+        self.crypt = os.path.join(self.db_dir, "msgstore.db.crypt15")
+        with open(self.crypt, 'wb') as f:
+            f.write(b"pulled backup")
+        self.plain = os.path.join(self.tmp, "msgstore.db")
+        with open(self.plain, 'wb') as f:
+            f.write(b"SQLite format 3\x00" + bytes(100))
+        self.config = {'input': self.tmp, 'key': KEY}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    @patch('wa_crypt_tools.commands.encrypt.crypto_available')
+    @patch('wa_crypt_tools.commands.encrypt.encrypt_file')
+    def test_replaces_backup_and_keeps_original(self, mock_encrypt,
+                                                mock_available):
+        mock_available.return_value = True
+
+        self.assertEqual(encrypt_database(self.config), 0)
+
+        # Kept outside WhatsApp/, so push does not send it to the phone
+        original = os.path.join(self.tmp, ".wa_cache", "originals",
+                                "WhatsApp", "Databases",
+                                "msgstore.db.crypt15")
+        with open(original, 'rb') as f:
+            self.assertEqual(f.read(), b"pulled backup")
+        self.assertEqual(os.listdir(self.db_dir), ["msgstore.db.crypt15"])
+        mock_encrypt.assert_called_once_with(
+            self.plain, self.crypt, KEY, original
+        )
+
+    @patch('wa_crypt_tools.commands.encrypt.crypto_available')
+    @patch('wa_crypt_tools.commands.encrypt.encrypt_file')
+    def test_refreshes_original_after_new_pull(self, mock_encrypt,
+                                               mock_available):
+        mock_available.return_value = True
+
+        def encrypt(plain, output, key, reference):
+            with open(output, 'wb') as f:
+                f.write(b"re-encrypted")
+        mock_encrypt.side_effect = encrypt
+
+        def kept():
+            with open(mock_encrypt.call_args[0][3], 'rb') as f:
+                return f.read()
+
+        self.assertEqual(encrypt_database(self.config), 0)
+        # Encrypting again replaces our own output: the copy stays
+        self.assertEqual(encrypt_database(self.config), 0)
+        self.assertEqual(kept(), b"pulled backup")
+
+        # A newer backup is pulled over the encrypted one
+        with open(self.crypt, 'wb') as f:
+            f.write(b"newer pulled backup")
+        self.assertEqual(encrypt_database(self.config), 0)
+        self.assertEqual(kept(), b"newer pulled backup")
+
+    @patch('wa_crypt_tools.commands.encrypt.encrypt_file')
+    def test_rejects_non_sqlite_input(self, mock_encrypt):
+        with open(self.plain, 'wb') as f:
+            f.write(b"not a database")
+
+        self.assertEqual(encrypt_database(self.config), 1)
+        mock_encrypt.assert_not_called()
+
+    def test_requires_key(self):
+        self.assertEqual(encrypt_database({'input': self.tmp}), 1)
+
+    @patch('wa_crypt_tools.commands.encrypt.encrypt_file')
+    def test_dry_run(self, mock_encrypt):
+        self.config['dry_run'] = True
+        self.assertEqual(encrypt_database(self.config), 0)
+        mock_encrypt.assert_not_called()
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, ".wa_cache")))
+
+    @patch('wa_crypt_tools.commands.encrypt.crypto_available')
+    @patch('wa_crypt_tools.commands.encrypt.get_venv_python_path')
+    @patch('wa_crypt_tools.commands.encrypt.subprocess.run')
+    def test_runs_in_venv_without_pycryptodome(self, mock_run, mock_py,
+                                               mock_available):
+        mock_available.return_value = False
+        mock_py.return_value = "/venv/bin/python"
+        mock_run.side_effect = subprocess.CalledProcessError(1, 'python')
+
+        self.assertEqual(encrypt_database(self.config), 1)
+
+        cmd = mock_run.call_args[0][0]
+        self.assertIn("--internal", cmd)
+        self.assertNotIn(KEY, cmd)
+        self.assertEqual(mock_run.call_args[1]['input'], KEY)
+
+
+if __name__ == '__main__':
+    unittest.main()
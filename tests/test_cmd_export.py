@@ -0,0 +1,139 @@
+import os
+import json
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from wa_crypt_tools.commands.export import export_chats, media_href
+from msgstore_fixture import (
+    ALICE, GROUP, add_message, build_legacy_msgstore, build_msgstore,
+    build_wa_db
+)
+
+
+class TestCmdExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        build_msgstore(os.path.join(self.tmp, "msgstore.db")).close()
+        build_wa_db(os.path.join(self.tmp, "wa.db"))
+        self.config = {'input': self.tmp}
+        self.chats = os.path.join(self.tmp, "export", "chats")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def read(self, name):
+        with open(os.path.join(self.chats, name), encoding='utf-8') as f:
+            return f.read()
+
+    def test_exports_html_and_json(self):
+        self.assertEqual(export_chats(self.config, workers=1), 0)
+
+        page = self.read(ALICE + ".html")
+        self.assertIn("<title>Alice</title>", page)
+        self.assertIn("Hello Alice", page)
+        self.assertIn(
+            'src="../../WhatsApp/Media/WhatsApp%20Images/'
+            'IMG-20231114-WA0001.jpg"', page
+        )
+        self.assertTrue(page.endswith("</body></html>\n"))
+
+        records = [json.loads(line) for line in
+                   self.read(ALICE + ".jsonl").splitlines()]
+        self.assertEqual([r["id"] for r in records], [1, 2, 3])
+        self.assertEqual(records[1]["sender"], "Me")
+
+        group = self.read(GROUP + ".html")
+        self.assertIn("Climbing &lt;club&gt;", group)
+        self.assertIn("Bob W.", group)
+
+        with open(os.path.join(self.tmp, "export", "index.html")) as f:
+            index = f.read()
+        self.assertLess(index.index("Climbing"), index.index("Alice"))
+
+    def test_parallel_matches_serial(self):
+        export_chats(self.config, workers=1)
+        serial = self.read(ALICE + ".html")
+        shutil.rmtree(os.path.join(self.tmp, "export"))
+
+        self.assertEqual(export_chats(self.config, workers=2), 0)
+        self.assertEqual(self.read(ALICE + ".html"), serial)
+
+    def test_json_only(self):
+        export_chats(self.config, formats=["json"], workers=1)
+        self.assertFalse(os.path.exists(os.path.join(self.chats, ALICE + ".html")))
+        self.assertTrue(os.path.exists(os.path.join(self.chats, ALICE + ".jsonl")))
+
+    def test_missing_database(self):
+        os.remove(os.path.join(self.tmp, "msgstore.db"))
+        self.assertEqual(export_chats(self.config), 1)
+
+    def add_alice_message(self, _id, key_id, text):
+        conn = sqlite3.connect(os.path.join(self.tmp, "msgstore.db"))
+        add_message(conn, _id, 1, 0, key_id, 0, 1700000500000 + _id, 0, text)
+        conn.commit()
+        conn.close()
+
+    def test_incremental_appends_only_new_messages(self):
+        export_chats(self.config, workers=1)
+        group_path = os.path.join(self.chats, GROUP + ".html")
+        group_mtime = os.stat(group_path).st_mtime_ns
+
+        self.add_alice_message(5, "A5", "Back from holidays")
+        self.assertEqual(export_chats(self.config, workers=1), 0)
+
+        page = self.read(ALICE + ".html")
+        self.assertEqual(page.count("<html>"), 1)
+        self.assertEqual(page.count("</body></html>"), 1)
+        self.assertLess(page.index("Look at this"),
+                        page.index("Back from holidays"))
+        ids = [json.loads(line)["id"] for line in
+               self.read(ALICE + ".jsonl").splitlines()]
+        self.assertEqual(ids, [1, 2, 3, 5])
+        # Chats without new messages are not rewritten
+        self.assertEqual(os.stat(group_path).st_mtime_ns, group_mtime)
+
+        # Same result as a full export of the same database
+        incremental = page
+        self.assertEqual(export_chats(self.config, workers=1, full=True), 0)
+        self.assertEqual(self.read(ALICE + ".html"), incremental)
+
+    def test_rebuilds_chat_when_history_changed(self):
+        export_chats(self.config, workers=1)
+        conn = sqlite3.connect(os.path.join(self.tmp, "msgstore.db"))
+        conn.execute(
+            "UPDATE message SET key_id = 'OTHER', text_data = 'Restored' "
+            "WHERE _id = 3"
+        )
+        conn.commit()
+        conn.close()
+        self.add_alice_message(5, "A5", "New phone")
+
+        export_chats(self.config, workers=1)
+
+        records = [json.loads(line) for line in
+                   self.read(ALICE + ".jsonl").splitlines()]
+        self.assertEqual([r["id"] for r in records], [1, 2, 3, 5])
+        self.assertEqual(records[2]["text"], "Restored")
+
+    def test_legacy_database(self):
+        db = os.path.join(self.tmp, "msgstore.db")
+        os.remove(db)
+        build_legacy_msgstore(db)
+
+        self.assertEqual(export_chats(self.config, workers=1), 0)
+        self.assertIn("Old reply", self.read(ALICE + ".html"))
+
+    def test_media_href_for_device_paths(self):
+        href = media_href(
+            "/storage/emulated/0/WhatsApp/Media/WhatsApp Audio/AUD-1.opus",
+            "/out/WhatsApp", "/out/export/chats"
+        )
+        self.assertEqual(href, "../../WhatsApp/Media/WhatsApp%20Audio/AUD-1.opus")
+        self.assertIsNone(media_href("", "/out/WhatsApp", "/out"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+from wa_crypt_tools.commands.media import (
+    audit_media_files, index_media, query_media
+)
+from msgstore_fixture import build_msgstore
+
+
+class TestCmdMedia(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.config = {'input': self.tmp}
+        folder = os.path.join(self.tmp, "WhatsApp", "Media", "WhatsApp Images")
+        os.makedirs(folder)
+        with open(os.path.join(folder, "IMG-20231114-WA0001.jpg"), 'wb') as f:
+            f.write(b"x" * 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_index_then_query(self):
+        self.assertEqual(query_media(self.config), 1)
+        self.assertEqual(index_media(self.config), 0)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.tmp, "media_index.db"))
+        )
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            self.assertEqual(
+                query_media(self.config, kind="image", min_size="50b",
+                            as_json=True), 0
+            )
+        rows = json.loads(out.getvalue())
+        self.assertEqual(rows[0]["date"], "2023-11-14")
+        self.assertEqual(query_media(self.config, min_size="lots"), 1)
+
+    def test_dry_run(self):
+        self.config['dry_run'] = True
+        self.assertEqual(index_media(self.config), 0)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.tmp, "media_index.db"))
+        )
+
+    def test_audit_prune(self):
+        self.assertEqual(audit_media_files(self.config), 1)
+        build_msgstore(os.path.join(self.tmp, "msgstore.db")).close()
+        orphan = os.path.join(self.tmp, "WhatsApp", "Media",
+                              "WhatsApp Images", "IMG-20200101-WA0009.jpg")
+        with open(orphan, 'wb') as f:
+            f.write(b"o")
+
+        self.config['dry_run'] = True
+        self.assertEqual(audit_media_files(self.config, prune=True), 0)
+        self.assertTrue(os.path.exists(orphan))
+
+        self.config['dry_run'] = False
+        self.assertEqual(audit_media_files(self.config, prune=True), 0)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(os.path.join(
+            self.tmp, "WhatsApp", "Media", "WhatsApp Images",
+            "IMG-20231114-WA0001.jpg"
+        )))
+
+
+    @patch('wa_crypt_tools.commands.media.update_catalog')
+    def test_audit_hashes_catalog_error(self, mock_update):
+        build_msgstore(os.path.join(self.tmp, "msgstore.db")).close()
+        mock_update.side_effect = OSError("Permission denied")
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            self.assertEqual(
+                audit_media_files(self.config, use_hashes=True), 1
+            )
+        self.assertIn("Error: Audit failed: Permission denied",
+                      out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from wa_crypt_tools.commands.merge import merge_snapshot
+from msgstore_fixture import build_msgstore
+
+
+class TestCmdMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.config = {'input': self.tmp, 'output': self.tmp}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_merge_creates_archive(self):
+        build_msgstore(os.path.join(self.tmp, "msgstore.db")).close()
+        self.assertEqual(merge_snapshot(self.config), 0)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, "archive.db")))
+
+    def test_dry_run_and_missing_database(self):
+        self.assertEqual(merge_snapshot(self.config), 1)
+        build_msgstore(os.path.join(self.tmp, "msgstore.db")).close()
+        self.config['dry_run'] = True
+        self.assertEqual(merge_snapshot(self.config), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "archive.db")))
+
+
+if __name__ == '__main__':
+    unittest.main()
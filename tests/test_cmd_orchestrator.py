@@ -8,8 +8,9 @@ class TestOrchestrator(unittest.TestCase):
     @patch('wa_crypt_tools.commands.orchestrator.pull_data')
     @patch('wa_crypt_tools.commands.orchestrator.decrypt_database')
     @patch('wa_crypt_tools.commands.orchestrator.convert_vcf')
+    @patch('wa_crypt_tools.commands.orchestrator.push_whatsapp')
     @patch('os.path.exists')
-    def test_workflow_success(self, mock_exists, mock_convert, mock_decrypt, mock_pull):
+    def test_workflow_success(self, mock_exists, mock_push, mock_convert, mock_decrypt, mock_pull):
         # Setup
         mock_pull.return_value = 0
         mock_decrypt.return_value = 0
@@ -24,7 +25,9 @@ class TestOrchestrator(unittest.TestCase):
         
         # Verify
         self.assertEqual(ret, 0)
-        mock_pull.assert_called_once_with(config)
+        mock_pull.assert_called_once()
+        self.assertEqual(mock_pull.call_args[0][0], config)
+        self.assertIn('on_tier_complete', mock_pull.call_args[1])
         # decrypt called with adjusted input dir
         # decrypt input_dir should be absolute path of config output
         # checks args valid
@@ -55,3 +58,78 @@ class TestOrchestrator(unittest.TestCase):
         # Convert could still run if contacts exist (mock default exists behavior?)
         # os.path.exists not mocked here, so it will check real FS. 
         # /tmp/contacts.vcf probably doesn't exist.
+
+    @patch('wa_crypt_tools.commands.orchestrator.pull_data')
+    @patch('wa_crypt_tools.commands.orchestrator.decrypt_database')
+    @patch('wa_crypt_tools.commands.orchestrator.convert_vcf')
+    @patch('wa_crypt_tools.commands.orchestrator.push_whatsapp')
+    def test_decrypt_starts_after_databases_tier(self, mock_push, mock_convert, mock_decrypt, mock_pull):
+        order = []
+
+        def fake_pull(config, on_tier_complete=None):
+            order.append("databases")
+            on_tier_complete("databases")
+            order.append("media")
+            on_tier_complete("media")
+            return 0
+
+        mock_pull.side_effect = fake_pull
+        mock_decrypt.side_effect = lambda *a, **kw: order.append("decrypt") or 0
+
+        ret = run_orchestrator({'output': '/tmp/out', 'key': 'abc'})
+
+        self.assertEqual(ret, 0)
+        # Decrypt ran exactly once, kicked off by the databases tier
+        mock_decrypt.assert_called_once()
+        self.assertLess(order.index("databases"), order.index("decrypt"))
+
+    @patch('wa_crypt_tools.commands.orchestrator.profiling.directory')
+    @patch('wa_crypt_tools.commands.orchestrator.pull_data')
+    @patch('wa_crypt_tools.commands.orchestrator.decrypt_database')
+    @patch('wa_crypt_tools.commands.orchestrator.convert_vcf')
+    @patch('wa_crypt_tools.commands.orchestrator.push_whatsapp')
+    def test_profiled_run_decrypts_after_pull(
+        self, mock_push, mock_convert, mock_decrypt, mock_pull, mock_dir
+    ):
+        mock_dir.return_value = "/tmp/out/profile/1"
+        order = []
+
+        def fake_pull(config, on_tier_complete=None):
+            for tier in ("databases", "media"):
+                order.append(tier)
+                on_tier_complete(tier)
+            return 0
+
+        mock_pull.side_effect = fake_pull
+        mock_decrypt.side_effect = (
+            lambda *a, **kw: order.append("decrypt") or 0
+        )
+
+        ret = run_orchestrator({'output': '/tmp/out', 'key': 'abc'})
+
+        self.assertEqual(ret, 0)
+        self.assertEqual(order, ["databases", "media", "decrypt"])
+
+    @patch('wa_crypt_tools.commands.orchestrator.pull_data')
+    @patch('wa_crypt_tools.commands.orchestrator.decrypt_database')
+    @patch('wa_crypt_tools.commands.orchestrator.find_matching_key')
+    @patch('wa_crypt_tools.commands.orchestrator.os.path.exists')
+    def test_wrong_key_aborts_before_media(self, mock_exists, mock_find, mock_decrypt, mock_pull):
+        mock_exists.return_value = True
+        mock_find.return_value = None
+        tiers = []
+
+        def fake_pull(config, on_tier_complete=None):
+            for tier in ("databases", "backups", "media"):
+                tiers.append(tier)
+                if not on_tier_complete(tier):
+                    return 1
+            return 0
+
+        mock_pull.side_effect = fake_pull
+
+        ret = run_orchestrator({'output': '/tmp/out', 'key': 'a' * 64})
+
+        self.assertEqual(ret, 1)
+        self.assertEqual(tiers, ["databases"])
+        mock_decrypt.assert_not_called()
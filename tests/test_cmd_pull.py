@@ -4,7 +4,7 @@ import os
 import argparse
 from unittest.mock import patch, MagicMock, call
 from wa_crypt_tools.commands import pull
-from wa_crypt_tools.adb import AdbError
+from wa_crypt_tools.adb import RemoteFile
 
 class TestCmdPull(unittest.TestCase):
 
@@ -73,5 +73,163 @@ class TestCmdPull(unittest.TestCase):
         ret = pull.pull_data(self.config, "device123")
         self.assertEqual(ret, 1)
 
+    @patch("wa_crypt_tools.commands.pull.check_connection")
+    @patch("wa_crypt_tools.commands.pull.os.makedirs")
+    @patch("wa_crypt_tools.commands.pull.os.path.isdir")
+    @patch("wa_crypt_tools.commands.pull.run_adb_command")
+    @patch("wa_crypt_tools.commands.pull.list_remote_files")
+    @patch("wa_crypt_tools.commands.pull.subprocess.check_call")
+    @patch("wa_crypt_tools.scheduler.time.time", return_value=1000)
+    def test_pull_media_newest_first(
+        self, mock_time, mock_subprocess, mock_list, mock_adb_run,
+        mock_isdir, mock_makedirs, mock_check
+    ):
+        mock_check.return_value = True
+        mock_isdir.return_value = False
+        mock_adb_run.return_value = None
+        media = "/sdcard/Android/media/com.whatsapp/WhatsApp/Media"
+        media_files = [
+            RemoteFile(f"{media}/WhatsApp Images/old.jpg", 1, 100),
+            RemoteFile(f"{media}/WhatsApp Video/new.mp4", 1, 300),
+            RemoteFile(f"{media}/WhatsApp Images/mid.jpg", 1, 200),
+        ]
+        mock_list.side_effect = lambda dirs, device: media_files if dirs == media else []
+        tiers = []
+
+        ret = pull.pull_data(self.config, "device123", on_tier_complete=lambda t: tiers.append(t) or True)
+
+        self.assertEqual(ret, 0)
+        self.assertEqual(tiers, ["databases", "backups", "media"])
+        pulled = [
+            c[0][0][4] for c in mock_subprocess.call_args_list
+            if c[0][0][4].startswith(media)
+        ]
+        self.assertEqual(pulled, [
+            f"{media}/WhatsApp Video/new.mp4",
+            f"{media}/WhatsApp Images/mid.jpg",
+        ])
+        # mid.jpg and old.jpg share a directory and are pulled together
+        last = mock_subprocess.call_args_list[-1][0][0]
+        self.assertEqual(last[4:6], [f"{media}/WhatsApp Images/mid.jpg", f"{media}/WhatsApp Images/old.jpg"])
+
+    @patch("wa_crypt_tools.commands.pull.check_connection")
+    @patch("wa_crypt_tools.commands.pull.os.makedirs")
+    @patch("wa_crypt_tools.commands.pull.os.path.isdir")
+    @patch("wa_crypt_tools.commands.pull.run_adb_command")
+    @patch("wa_crypt_tools.commands.pull.list_remote_files")
+    @patch("wa_crypt_tools.commands.pull.subprocess.check_call")
+    def test_pull_stops_when_tier_callback_declines(
+        self, mock_subprocess, mock_list, mock_adb_run, mock_isdir,
+        mock_makedirs, mock_check
+    ):
+        mock_check.return_value = True
+        mock_isdir.return_value = False
+        mock_adb_run.return_value = None
+
+        ret = pull.pull_data(self.config, "device123", on_tier_complete=lambda t: t != "databases")
+
+        self.assertEqual(ret, 1)
+        # Only the Databases/Backups listing ran, media was never listed
+        mock_list.assert_called_once()
+
+    @patch("wa_crypt_tools.commands.pull.check_connection")
+    @patch("wa_crypt_tools.commands.pull.os.makedirs")
+    @patch("wa_crypt_tools.commands.pull.os.path.isdir")
+    @patch("wa_crypt_tools.commands.pull.run_adb_command")
+    @patch("wa_crypt_tools.commands.pull.list_remote_files")
+    @patch("wa_crypt_tools.commands.pull.subprocess.check_call")
+    def test_pull_selected_backups_only(
+        self, mock_subprocess, mock_list, mock_adb_run, mock_isdir,
+        mock_makedirs, mock_check
+    ):
+        mock_check.return_value = True
+        mock_isdir.return_value = False
+        mock_adb_run.return_value = None
+        base = "/sdcard/Android/media/com.whatsapp/WhatsApp"
+        listing = [
+            RemoteFile(f"{base}/Databases/msgstore.db.crypt15", 10, 500),
+            RemoteFile(f"{base}/Databases/msgstore-2024-01-01.1.db.crypt15", 10, 100),
+            RemoteFile(f"{base}/Databases/msgstore-2024-01-03.1.db.crypt15", 10, 300),
+            RemoteFile(f"{base}/Backups/wa.db.crypt15", 10, 500),
+            RemoteFile(f"{base}/Backups/settings.db.crypt15", 10, 500),
+        ]
+        mock_list.side_effect = lambda dirs, device: listing if isinstance(dirs, list) else []
+
+        ret = pull.pull_data(dict(self.config, keep_rotated_backups=1), "device123")
+
+        self.assertEqual(ret, 0)
+        # First call is contacts.vcf
+        pulled = [
+            arg for c in mock_subprocess.call_args_list[1:]
+            for arg in c[0][0][4:-1]
+        ]
+        self.assertEqual(pulled, [
+            f"{base}/Databases/msgstore.db.crypt15",
+            f"{base}/Backups/wa.db.crypt15",
+            f"{base}/Backups/settings.db.crypt15",
+            f"{base}/Databases/msgstore-2024-01-03.1.db.crypt15",
+        ])
+        # Files keep their folder below the local WhatsApp directory
+        self.assertEqual(
+            mock_subprocess.call_args_list[2][0][0][-1],
+            os.path.join("/tmp/output", "WhatsApp", "Backups")
+        )
+
+    @patch("wa_crypt_tools.commands.pull.check_connection")
+    @patch("wa_crypt_tools.commands.pull.os.listdir")
+    @patch("wa_crypt_tools.commands.pull.os.path.isdir")
+    @patch("wa_crypt_tools.commands.pull.os.makedirs")
+    @patch("wa_crypt_tools.commands.pull.run_adb_command")
+    @patch("wa_crypt_tools.commands.pull.list_remote_files")
+    @patch("wa_crypt_tools.commands.pull.subprocess.check_call")
+    def test_pull_incremental_into_existing_dir(
+        self, mock_subprocess, mock_list, mock_adb_run, mock_makedirs,
+        mock_isdir, mock_listdir, mock_check
+    ):
+        mock_check.return_value = True
+        mock_isdir.side_effect = lambda p: p.endswith("WhatsApp")
+        mock_listdir.return_value = ["Databases"]
+        mock_list.return_value = []
+
+        ret = pull.pull_data(dict(self.config, pull_incremental=True),
+                             "device123")
+        self.assertEqual(ret, 0)
+
+    @patch("wa_crypt_tools.commands.pull.os.makedirs")
+    @patch("wa_crypt_tools.commands.pull.subprocess.check_call")
+    def test_pull_files_checks_cancel_per_batch(self, mock_subprocess, _):
+        media = "/sdcard/WhatsApp/Media"
+        files = [RemoteFile(f"{media}/dir{i}/f.jpg", 1, 0) for i in range(5)]
+
+        def cancelled():
+            # Unplugged while the first batch was transferring
+            return mock_subprocess.call_count > 0
+
+        pull._pull_files(["adb"], files, media, "/out", cancel=cancelled)
+
+        self.assertEqual(mock_subprocess.call_count, 1)
+
+    def test_missing_locally(self):
+        import shutil
+        import tempfile
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.makedirs(os.path.join(root, "WhatsApp Images"))
+        for name, size in (("same.jpg", 3), ("partial.jpg", 1)):
+            with open(os.path.join(root, "WhatsApp Images", name),
+                      'wb') as f:
+                f.write(b"x" * size)
+        media = "/sdcard/WhatsApp/Media"
+        files = [
+            RemoteFile(f"{media}/WhatsApp Images/same.jpg", 3, 0),
+            RemoteFile(f"{media}/WhatsApp Images/partial.jpg", 3, 0),
+            RemoteFile(f"{media}/WhatsApp Images/new.jpg", 3, 0),
+        ]
+        self.assertEqual(
+            [f.path for f in pull._missing_locally(files, media, root)],
+            [files[1].path, files[2].path]
+        )
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -74,3 +74,18 @@ class TestCmdPush(unittest.TestCase):
         result = push_whatsapp(self.mock_input)
 
         self.assertFalse(result)
+
+    @patch('wa_crypt_tools.commands.push.os.path.exists')
+    @patch('wa_crypt_tools.commands.push.encrypt_database')
+    @patch('wa_crypt_tools.commands.push.subprocess.check_call')
+    def test_push_aborts_when_reencrypt_fails(
+        self, mock_check_call, mock_encrypt, mock_exists
+    ):
+        mock_exists.return_value = True
+        mock_encrypt.return_value = 1
+
+        result = push_whatsapp(self.mock_input, encrypt_key="a" * 64)
+
+        self.assertFalse(result)
+        mock_encrypt.assert_called_once()
+        mock_check_call.assert_not_called()
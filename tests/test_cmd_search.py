@@ -0,0 +1,47 @@
+import os
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from wa_crypt_tools.commands.search import search_messages
+from wa_crypt_tools.search_index import fts5_available
+from msgstore_fixture import build_msgstore
+
+
+@unittest.skipUnless(fts5_available(), "SQLite built without FTS5")
+class TestCmdSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        build_msgstore(os.path.join(self.tmp, "msgstore.db")).close()
+        self.config = {'input': self.tmp}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_json_output_builds_index(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            result = search_messages(self.config, "hello", as_json=True)
+
+        self.assertEqual(result, 0)
+        hits = json.loads(out.getvalue())
+        self.assertEqual(hits[0]["id"], 2)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, "search.db")))
+
+    def test_no_match_and_bad_date(self):
+        self.assertEqual(search_messages(self.config, "nothing"), 1)
+        self.assertEqual(
+            search_messages(self.config, "hello", since="31/12/2023"), 1
+        )
+
+    def test_missing_database(self):
+        os.remove(os.path.join(self.tmp, "msgstore.db"))
+        self.assertEqual(search_messages(self.config, "hello"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from wa_crypt_tools.commands import thumbnails
+from wa_crypt_tools.commands.thumbnails import (
+    THUMBNAILS_STATE_FILENAME, blob_chunks, extract_thumbnails
+)
+from wa_crypt_tools.msgstore import connect
+from msgstore_fixture import ALICE, GROUP, build_msgstore
+
+JPEG = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 600
+PNG = b"\x89PNG\r\n" + b"p" * 100
+
+
+class TestCmdThumbnails(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.config = {'input': self.tmp}
+        self.db = os.path.join(self.tmp, "msgstore.db")
+        self.out = os.path.join(self.tmp, "export", "thumbnails")
+        conn = build_msgstore(self.db)
+        conn.execute("CREATE TABLE message_thumbnail "
+                     "(message_row_id INTEGER PRIMARY KEY, thumbnail BLOB)")
+        conn.executemany("INSERT INTO message_thumbnail VALUES (?, ?)",
+                         [(1, None), (3, JPEG), (4, PNG)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_blob_chunks_both_paths(self):
+        conn = connect(self.db)
+        try:
+            for use_blobopen in (thumbnails.HAVE_BLOBOPEN, False):
+                chunks = list(blob_chunks(conn, "message_thumbnail",
+                                          "thumbnail", 3, use_blobopen))
+                self.assertGreater(len(chunks), 1)
+                self.assertEqual(b"".join(chunks), JPEG)
+        finally:
+            conn.close()
+
+    def test_extract_and_resume(self):
+        self.assertEqual(extract_thumbnails(self.config, workers=2), 0)
+        alice = os.path.join(self.out, ALICE, "3.jpg")
+        group = os.path.join(self.out, GROUP, "4.png")
+        with open(alice, 'rb') as f:
+            self.assertEqual(f.read(), JPEG)
+        with open(group, 'rb') as f:
+            self.assertEqual(f.read(), PNG)
+        with open(os.path.join(self.out, THUMBNAILS_STATE_FILENAME)) as f:
+            self.assertEqual(json.load(f)["last_id"], 4)
+
+        # A second run resumes after row 4 and writes nothing again
+        os.remove(alice)
+        self.assertEqual(extract_thumbnails(self.config), 0)
+        self.assertFalse(os.path.exists(alice))
+        # --full (or a different database) starts over
+        self.assertEqual(extract_thumbnails(self.config, full=True), 0)
+        self.assertTrue(os.path.exists(alice))
+
+    def test_dry_run_and_missing_table(self):
+        self.config['dry_run'] = True
+        self.assertEqual(extract_thumbnails(self.config), 0)
+        self.assertFalse(os.path.exists(self.out))
+
+        other = os.path.join(self.tmp, "other")
+        os.makedirs(other)
+        build_msgstore(os.path.join(other, "msgstore.db")).close()
+        self.assertEqual(extract_thumbnails({'input': other}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,326 @@
+import os
+import zlib
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+from wa_crypt_tools.crypto import (
+    CryptoError, crypto_available, derive_crypt15_key, parse_hex_key,
+    parse_protobuf, read_crypt15_header, check_key, find_key,
+    sniff_crypt_file, scan_crypt_tree, decrypt_file, load_backup_key,
+    encrypt_file, KEY_HEX, KEY_FILE
+)
+
+KEY = "0123456789abcdef" * 4
+IV = bytes(range(16))
+SQLITE = b"SQLite format 3\x00" + bytes(4080)
+
+
+LEGACY_KEY = bytes(range(100, 132))
+
+
+def _gcm_body(aes_key, plaintext):
+    from Cryptodome.Cipher import AES
+    cipher = AES.new(aes_key, AES.MODE_GCM, nonce=IV)
+    return cipher.encrypt(zlib.compress(plaintext)) + cipher.digest()
+
+
+def build_crypt15(path, key_hex, plaintext, features=True, checksum=True):
+    """Writes a crypt15 file the way WhatsApp lays it out."""
+    c15_iv = b"\x0a\x10" + IV
+    proto = b"\x08\x01" + b"\x1a" + bytes([len(c15_iv)]) + c15_iv
+    header = bytes([len(proto)]) + (b"\x01" if features else b"") + proto
+    data = header + _gcm_body(
+        derive_crypt15_key(bytes.fromhex(key_hex)), plaintext
+    )
+    with open(path, 'wb') as f:
+        f.write(data + (hashlib.md5(data).digest() if checksum else b""))
+
+
+def build_crypt14(path, plaintext):
+    c14 = b"\x12\x04salt" + b"\x2a\x10" + IV
+    proto = b"\x08\x00" + b"\x12" + bytes([len(c14)]) + c14
+    data = (bytes([len(proto)]) + b"\x01" + proto
+            + _gcm_body(LEGACY_KEY, plaintext))
+    with open(path, 'wb') as f:
+        f.write(data + hashlib.md5(data).digest())
+
+
+def build_crypt12(path, plaintext):
+    header = b"\x00\x01\x02" + bytes(48) + IV
+    with open(path, 'wb') as f:
+        f.write(header + _gcm_body(LEGACY_KEY, plaintext) + b"1234")
+
+
+def build_legacy_key_file(path):
+    with open(path, 'wb') as f:
+        f.write(bytes(126) + LEGACY_KEY)
+
+
+class TestCryptoPrimitives(unittest.TestCase):
+
+    def test_parse_hex_key(self):
+        self.assertEqual(parse_hex_key(KEY), bytes.fromhex(KEY))
+        with self.assertRaises(CryptoError):
+            parse_hex_key("abc")
+        with self.assertRaises(CryptoError):
+            parse_hex_key("z" * 64)
+
+    def test_derive_key_is_hkdf(self):
+        # HKDF-SHA256(salt=0*32, info="backup encryption"), 32 bytes,
+        # computed with a reference RFC 5869 implementation
+        self.assertEqual(
+            derive_crypt15_key(bytes(32)).hex(),
+            "000cd53075979ccd61531727d933d4c1"
+            "aa747ff468f65b8bdf89ffa174e7e757"
+        )
+        self.assertNotEqual(
+            derive_crypt15_key(bytes(32)), derive_crypt15_key(b"\x01" * 32)
+        )
+
+    def test_parse_protobuf(self):
+        fields = parse_protobuf(b"\x08\x96\x01\x12\x03abc")
+        self.assertEqual(fields, {1: [150], 2: [b"abc"]})
+        with self.assertRaises(CryptoError):
+            parse_protobuf(b"\x12\x05ab")
+
+    def test_read_header(self):
+        c15_iv = b"\x0a\x10" + IV
+        proto = b"\x08\x01\x1a" + bytes([len(c15_iv)]) + c15_iv
+        for flag in (b"\x01", b""):
+            header = read_crypt15_header(
+                bytes([len(proto)]) + flag + proto + b"body"
+            )
+            self.assertEqual(header.iv, IV)
+            self.assertEqual(header.key_type, 1)
+            self.assertEqual(header.has_features, bool(flag))
+            self.assertEqual(header.size, 1 + len(flag) + len(proto))
+
+    def test_read_header_rejects_garbage(self):
+        with self.assertRaises(CryptoError):
+            read_crypt15_header(b"\x40" + os.urandom(10))
+
+
+@unittest.skipUnless(crypto_available(), "pycryptodome is not installed")
+class TestKeyCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "msgstore.db.crypt15")
+        build_crypt15(self.path, KEY, SQLITE)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_check_key(self):
+        self.assertTrue(check_key(self.path, KEY))
+        self.assertFalse(check_key(self.path, "f" * 64))
+
+    def test_check_key_file(self):
+        key_file = os.path.join(self.tmp, "encrypted_backup.key")
+        with open(key_file, 'wb') as f:
+            f.write(b"\xac\xed\x00\x05ur\x00\x02[B" + bytes.fromhex(KEY))
+        self.assertTrue(check_key(self.path, key_file))
+        self.assertEqual(find_key(self.path, ["f" * 64, key_file]), 1)
+
+    def test_find_key_in_ring(self):
+        ring = ["f" * 64, "not-a-key", KEY]
+        self.assertEqual(find_key(self.path, ring), 2)
+        self.assertIsNone(find_key(self.path, ["f" * 64, "e" * 64]))
+        # A key that cannot be checked is not reported as wrong
+        with self.assertRaises(CryptoError):
+            find_key(self.path, ring[:2])
+
+    def test_find_key_not_crypt15(self):
+        with open(self.path, 'wb') as f:
+            f.write(b"\x00")
+        with self.assertRaises(CryptoError):
+            find_key(self.path, [KEY])
+
+
+class TestSniff(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, rel, data):
+        path = os.path.join(self.tmp, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_sniff_versions_from_header(self):
+        c15_iv = b"\x0a\x10" + IV
+        proto15 = b"\x1a" + bytes([len(c15_iv)]) + c15_iv
+        c14 = b"\x2a\x10" + IV
+        proto14 = b"\x12" + bytes([len(c14)]) + c14
+        p15 = self.write("Databases/msgstore.db.crypt15",
+                         bytes([len(proto15)]) + proto15 + bytes(64))
+        p14 = self.write("Backups/wa-2021-01-01.1.db.crypt14",
+                         bytes([len(proto14)]) + b"\x01" + proto14
+                         + bytes(64))
+        p12 = self.write("old/msgstore.db.crypt12", bytes(200))
+
+        info = sniff_crypt_file(p15)
+        self.assertEqual(
+            (info.version, info.backup_type, info.key_requirement),
+            (15, "msgstore", KEY_HEX)
+        )
+        self.assertEqual(info.iv, IV)
+        self.assertIsNone(info.error)
+
+        info = sniff_crypt_file(p14)
+        self.assertEqual(
+            (info.version, info.backup_type, info.key_requirement),
+            (14, "wa", KEY_FILE)
+        )
+
+        info = sniff_crypt_file(p12)
+        self.assertEqual((info.version, info.key_requirement), (12, KEY_FILE))
+
+    def test_sniff_reports_problems(self):
+        empty = self.write("a.db.crypt15", b"")
+        garbage = self.write("b.db.crypt15", b"\x05garbage")
+        self.assertIsNotNone(sniff_crypt_file(empty).error)
+        self.assertIsNotNone(sniff_crypt_file(garbage).error)
+        # Extension says 14, header says 15
+        c15_iv = b"\x0a\x10" + IV
+        proto = b"\x1a" + bytes([len(c15_iv)]) + c15_iv
+        info = sniff_crypt_file(self.write(
+            "c.db.crypt14", bytes([len(proto)]) + proto + bytes(8)
+        ))
+        self.assertEqual(info.version, 15)
+        self.assertIn("crypt14", info.error)
+
+    def test_scan_tree(self):
+        self.write("x/one.db.crypt12", bytes(100))
+        self.write("x/y/two.db.crypt15", b"")
+        self.write("x/notes.txt", b"hello")
+        infos = scan_crypt_tree(self.tmp)
+        self.assertEqual(
+            [os.path.basename(i.path) for i in infos],
+            ["one.db.crypt12", "two.db.crypt15"]
+        )
+
+    def test_load_backup_key(self):
+        legacy = os.path.join(self.tmp, "key")
+        build_legacy_key_file(legacy)
+        self.assertEqual(load_backup_key(legacy), ("legacy", LEGACY_KEY))
+        self.assertEqual(load_backup_key(KEY), ("root", bytes.fromhex(KEY)))
+        e2e = self.write("encrypted_backup.key",
+                         b"\xac\xed" + bytes(97) + b"\x11" * 32)
+        self.assertEqual(load_backup_key(e2e), ("root", b"\x11" * 32))
+        with self.assertRaises(CryptoError):
+            load_backup_key("/nonexistent/key")
+
+
+@unittest.skipUnless(crypto_available(), "pycryptodome is not installed")
+class TestDecryptFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.key_file = os.path.join(self.tmp, "key")
+        build_legacy_key_file(self.key_file)
+        self.out = os.path.join(self.tmp, "out.db")
+        self.plain = SQLITE + os.urandom(50000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def read_out(self):
+        with open(self.out, 'rb') as f:
+            return f.read()
+
+    def test_crypt15_with_and_without_checksum(self):
+        for checksum in (True, False):
+            path = os.path.join(self.tmp, f"m{checksum}.db.crypt15")
+            build_crypt15(path, KEY, self.plain, checksum=checksum)
+            info = decrypt_file(path, self.out, KEY)
+            self.assertEqual(info.version, 15)
+            self.assertEqual(self.read_out(), self.plain)
+
+    def test_crypt14(self):
+        path = os.path.join(self.tmp, "msgstore.db.crypt14")
+        build_crypt14(path, self.plain)
+        decrypt_file(path, self.out, self.key_file)
+        self.assertEqual(self.read_out(), self.plain)
+
+    def test_crypt12(self):
+        path = os.path.join(self.tmp, "msgstore.db.crypt12")
+        build_crypt12(path, self.plain)
+        decrypt_file(path, self.out, self.key_file)
+        self.assertEqual(self.read_out(), self.plain)
+
+    def test_wrong_key_leaves_no_output(self):
+        path = os.path.join(self.tmp, "msgstore.db.crypt15")
+        build_crypt15(path, KEY, self.plain)
+        with self.assertRaises(CryptoError):
+            decrypt_file(path, self.out, "f" * 64)
+        self.assertFalse(os.path.exists(self.out))
+        self.assertFalse(os.path.exists(self.out + ".part"))
+
+    def test_key_kind_mismatch(self):
+        path = os.path.join(self.tmp, "msgstore.db.crypt12")
+        build_crypt12(path, self.plain)
+        with self.assertRaises(CryptoError):
+            decrypt_file(path, self.out, KEY)
+
+    def test_tampered_body_fails_authentication(self):
+        path = os.path.join(self.tmp, "msgstore.db.crypt15")
+        build_crypt15(path, KEY, self.plain, checksum=False)
+        with open(path, 'r+b') as f:
+            f.seek(-20, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-20, os.SEEK_END)
+            f.write(bytes([byte[0] ^ 1]))
+        with self.assertRaises(CryptoError):
+            decrypt_file(path, self.out, KEY)
+
+
+@unittest.skipUnless(crypto_available(), "pycryptodome not installed")
+class TestEncryptFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.reference = os.path.join(self.tmp, "msgstore.db.crypt15")
+        build_crypt15(self.reference, KEY, SQLITE)
+        self.plain = os.path.join(self.tmp, "msgstore.db")
+        with open(self.plain, 'wb') as f:
+            f.write(SQLITE + os.urandom(300000))
+        self.out = os.path.join(self.tmp, "new.db.crypt15")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_round_trip_with_fresh_iv(self):
+        encrypt_file(self.plain, self.out, KEY, self.reference,
+                     chunk_size=4096)
+
+        info = sniff_crypt_file(self.out)
+        self.assertEqual(info.version, 15)
+        self.assertNotEqual(info.iv, IV)
+        self.assertEqual(
+            info.header_size, sniff_crypt_file(self.reference).header_size
+        )
+        self.assertTrue(check_key(self.out, KEY))
+
+        decrypted = os.path.join(self.tmp, "check.db")
+        decrypt_file(self.out, decrypted, KEY)
+        with open(decrypted, 'rb') as a, open(self.plain, 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_reference_must_be_crypt15(self):
+        legacy = os.path.join(self.tmp, "msgstore.db.crypt12")
+        build_crypt12(legacy, SQLITE)
+        with self.assertRaises(CryptoError):
+            encrypt_file(self.plain, self.out, KEY, legacy)
+        self.assertFalse(os.path.exists(self.out))
+
+
+if __name__ == '__main__':
+    unittest.main()
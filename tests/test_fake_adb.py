@@ -0,0 +1,109 @@
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from wa_crypt_tools.adb import (
+    ADB_ENV, check_connection, get_product_model, list_devices,
+    list_remote_files
+)
+from wa_crypt_tools.commands.pull import pull_data
+from wa_crypt_tools.commands.push import push_whatsapp
+from wa_crypt_tools.testing.fake_adb import FakeDevice
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WA = "Android/media/com.whatsapp/WhatsApp"
+
+
+class TestFakeAdb(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.phone = os.path.join(self.tmp, "phone")
+        self.files = {
+            "Download/contacts.vcf": b"BEGIN:VCARD\r\nEND:VCARD\r\n",
+            f"{WA}/Databases/msgstore.db.crypt15": b"m" * 5000,
+            f"{WA}/Databases/wa.db.crypt15": b"w" * 100,
+            f"{WA}/Backups/backup_settings.json.crypt15": b"s" * 30,
+            f"{WA}/Media/WhatsApp Images/IMG-20240101-WA0001.jpg": b"i" * 10,
+            f"{WA}/Media/WhatsApp Voice Notes/202401/PTT-1.opus": b"v" * 7,
+        }
+        for rel, content in self.files.items():
+            path = os.path.join(self.phone, *rel.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+        self.env = {
+            ADB_ENV: f"{sys.executable} -m wa_crypt_tools.testing.fake_adb",
+            "FAKE_ADB_ROOT": self.phone,
+            "FAKE_ADB_SERIAL": "FAKE42",
+            "FAKE_ADB_MODEL": "Pixel_8",
+            "PYTHONPATH": PACKAGE_ROOT,
+        }
+        patcher = patch.dict(os.environ, self.env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_probes(self):
+        self.assertEqual(
+            list_devices(),
+            [{"id": "FAKE42", "state": "device", "model": "Pixel 8"}]
+        )
+        self.assertTrue(check_connection("FAKE42"))
+        self.assertFalse(check_connection("OTHER"))
+        self.assertEqual(get_product_model("FAKE42"), "Pixel_8")
+        listing = list_remote_files(f"/sdcard/{WA}/Databases", "FAKE42")
+        self.assertEqual(
+            sorted((f.path.rsplit("/", 1)[1], f.size) for f in listing),
+            [("msgstore.db.crypt15", 5000), ("wa.db.crypt15", 100)]
+        )
+        with patch.dict(os.environ, {"FAKE_ADB_OFFLINE": "1"}):
+            self.assertEqual(list_devices(), [])
+            self.assertFalse(check_connection())
+
+    def test_pull_then_push(self):
+        out = os.path.join(self.tmp, "out")
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(pull_data({'output': out}), 0)
+        for rel, content in self.files.items():
+            local = (os.path.join(out, "contacts.vcf")
+                     if rel.startswith("Download/")
+                     else os.path.join(out, "WhatsApp",
+                                       *rel[len(WA) + 1:].split("/")))
+            with open(local, 'rb') as f:
+                self.assertEqual(f.read(), content, rel)
+
+        shutil.rmtree(os.path.join(self.phone, "Android"))
+        with redirect_stdout(io.StringIO()):
+            self.assertTrue(push_whatsapp(Path(out)))
+        pushed = os.path.join(self.phone, *WA.split("/"), "Databases",
+                              "msgstore.db.crypt15")
+        with open(pushed, 'rb') as f:
+            self.assertEqual(f.read(), b"m" * 5000)
+
+    def test_bandwidth_and_paths(self):
+        device = FakeDevice({"FAKE_ADB_ROOT": self.phone,
+                             "FAKE_ADB_BANDWIDTH": "100KB"})
+        self.assertEqual(
+            device.local("/storage/emulated/0/Download/contacts.vcf"),
+            os.path.join(self.phone, "Download", "contacts.vcf")
+        )
+        with self.assertRaises(Exception):
+            device.local("/data/data/com.whatsapp")
+        started = time.monotonic()
+        copied = device.copy(io.BytesIO(b"x" * 20 * 1024), io.BytesIO())
+        self.assertEqual(copied, 20 * 1024)
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+from wa_crypt_tools import history
+from wa_crypt_tools.commands.stats import show_stats
+
+
+def _row(stage, wall, size=0, files=0):
+    return {"stage": stage, "depth": 0, "wall_s": wall,
+            "subprocess_s": wall / 2, "python_s": wall / 2, "cpu_s": 0,
+            "files": files, "bytes": size}
+
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = history.history_path(self.tmp)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_percentile(self):
+        values = list(range(1, 11))
+        self.assertEqual(history.percentile(values, 50), 5)
+        self.assertEqual(history.percentile(values, 90), 9)
+        self.assertEqual(history.percentile(values, 100), 10)
+        self.assertEqual(history.percentile([3.0], 95), 3.0)
+
+    def test_stage_stats_per_device(self):
+        for i in range(10):
+            # The last five runs take twice as long
+            wall = 10.0 if i < 5 else 20.0
+            history.record_run(
+                self.path, "pull", 1000.0 + i, 0,
+                [_row("pull", wall, size=100 * 1000 * 1000, files=50)],
+                "SERIAL1", "Pixel 6"
+            )
+        history.record_run(self.path, "pull", 2000.0, 1,
+                           [_row("pull", 1.0)], "SERIAL1", "Pixel 6")
+        history.record_run(self.path, "pull", 3000.0, 0,
+                           [_row("pull", 5.0, size=100)], "SERIAL2", "A52")
+        history.record_run(self.path, "pull", 4000.0, 0,
+                           [_row("pull", 99.0)], "SERIAL2", "A52",
+                           dry_run=True)
+
+        stats = {s.device: s for s in history.stage_stats(self.path)}
+        first = stats["SERIAL1"]
+        self.assertEqual((first.runs, first.failed), (10, 1))
+        self.assertEqual(first.model, "Pixel 6")
+        self.assertEqual(first.wall_p50, 10.0)
+        self.assertEqual(first.wall_p95, 20.0)
+        self.assertAlmostEqual(first.trend, 1.0)
+        self.assertEqual(first.rate_p10, 5e6)
+        # Dry runs are not measurements
+        self.assertEqual(stats["SERIAL2"].runs, 1)
+        self.assertIsNone(stats["SERIAL2"].trend)
+
+        self.assertEqual(
+            history.estimated_rate(self.path, "pull", "SERIAL1"), 5e6
+        )
+        self.assertEqual(history.estimated_rate(self.path, "push"), None)
+
+    @patch('wa_crypt_tools.history.get_product_model',
+           return_value="Pixel 6")
+    @patch('wa_crypt_tools.history.list_devices')
+    def test_device_identity(self, mock_devices, _):
+        mock_devices.return_value = [
+            {"id": "SERIAL1", "state": "device", "model": "Pixel 6"}
+        ]
+        self.assertEqual(history.device_identity(), ("SERIAL1", "Pixel 6"))
+        mock_devices.return_value.append(
+            {"id": "SERIAL2", "state": "device", "model": "A52"}
+        )
+        self.assertEqual(history.device_identity(), (None, None))
+        self.assertEqual(history.device_identity("SERIAL2"),
+                         ("SERIAL2", "Pixel 6"))
+
+
+class TestStatsCommand(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.config = {'output': self.tmp}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_missing_history(self):
+        with patch('sys.stdout', new_callable=StringIO):
+            self.assertEqual(show_stats(self.config), 1)
+
+    def test_json_output(self):
+        path = history.history_path(self.tmp)
+        history.record_run(path, "all", 1000.0, 0,
+                           [_row("all", 30.0), _row("pull", 20.0, 10)],
+                           "SERIAL1", "Pixel 6")
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            self.assertEqual(show_stats(self.config, as_json=True), 0)
+        data = json.loads(out.getvalue())
+        self.assertEqual(data["runs"], 1)
+        self.assertEqual([s["stage"] for s in data["stages"]],
+                         ["all", "pull"])
+        self.assertIn("SERIAL1", data["last_success"])
+
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            self.assertEqual(show_stats(self.config, device="OTHER"), 0)
+        self.assertIn("No matching", out.getvalue())
+        self.assertTrue(os.path.exists(path))
+
+    def test_header_applies_filters(self):
+        path = history.history_path(self.tmp)
+        history.record_run(path, "all", 1000.0, 0, [_row("all", 30.0)],
+                           "SERIAL1", "Pixel 6")
+        history.record_run(path, "pull", 2000.0, 1, [_row("pull", 5.0)],
+                           "SERIAL2", "Pixel 8")
+        history.record_run(path, "pull", 3000.0, 0, [_row("pull", 5.0)],
+                           "SERIAL2", "Pixel 8")
+
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            self.assertEqual(
+                show_stats(self.config, device="SERIAL1", as_json=True), 0
+            )
+        data = json.loads(out.getvalue())
+        self.assertEqual((data["runs"], data["failed"]), (1, 0))
+        self.assertEqual(list(data["last_success"]), ["SERIAL1"])
+
+        totals = history.run_totals(path, command="pull", since=1500.0)
+        self.assertEqual((totals.runs, totals.failed), (2, 1))
+        self.assertEqual(totals.last_success, {"SERIAL2": 3000.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
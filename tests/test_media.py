@@ -0,0 +1,226 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from wa_crypt_tools.media import (
+    audit_media, parse_media_path, query_catalog, scan_tree, update_catalog
+)
+from msgstore_fixture import build_legacy_msgstore, build_msgstore
+
+
+class TestMediaScan(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_scan_tree(self):
+        for rel in ("WhatsApp Images/IMG-1.jpg",
+                    "WhatsApp Images/Sent/IMG-2.jpg",
+                    "WhatsApp Voice Notes/202401/PTT-1.opus"):
+            path = os.path.join(self.tmp, *rel.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b"x" * 3)
+
+        files = sorted(scan_tree(self.tmp, workers=2))
+        self.assertEqual(
+            [f.path for f in files],
+            ["WhatsApp Images/IMG-1.jpg", "WhatsApp Images/Sent/IMG-2.jpg",
+             "WhatsApp Voice Notes/202401/PTT-1.opus"]
+        )
+        self.assertEqual(files[0].size, 3)
+        self.assertEqual(scan_tree(os.path.join(self.tmp, "missing")), [])
+
+
+class TestMediaCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, "Media")
+        self.catalog = os.path.join(self.tmp, "media_index.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, rel, size):
+        path = os.path.join(self.root, *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b"x" * size)
+        return path
+
+    def test_parse_media_path(self):
+        info = parse_media_path("WhatsApp Video/Sent/VID-20231114-WA0012.mp4")
+        self.assertEqual(info.folder, "WhatsApp Video")
+        self.assertEqual(info.kind, "video")
+        self.assertEqual(info.date, "2023-11-14")
+        self.assertEqual(info.seq, 12)
+        self.assertEqual(info.ext, "mp4")
+
+        # No date in the name: kind from the folder, date from the mtime
+        info = parse_media_path("WhatsApp Documents/report.PDF",
+                                mtime_ns=1700000000 * 10 ** 9)
+        self.assertEqual(info.kind, "document")
+        self.assertEqual(info.date, "2023-11-14")
+        self.assertIsNone(info.seq)
+        self.assertEqual(info.ext, "pdf")
+
+    def test_incremental_update(self):
+        self.write("WhatsApp Images/IMG-20231114-WA0001.jpg", 10)
+        kept = self.write("WhatsApp Images/IMG-20231115-WA0002.jpg", 20)
+        gone = self.write("WhatsApp Voice Notes/PTT-20240101-WA0001.opus", 5)
+
+        result = update_catalog(self.catalog, self.root, workers=2)
+        self.assertEqual(tuple(result), (3, 3, 0, 0))
+
+        os.remove(gone)
+        with open(kept, 'ab') as f:
+            f.write(b"y")
+        self.write("WhatsApp Video/VID-20240202-WA0003.mp4", 30)
+        with patch("wa_crypt_tools.media.file_sha256",
+                   return_value="f" * 64) as sha:
+            result = update_catalog(self.catalog, self.root, workers=2)
+        self.assertEqual(tuple(result), (3, 1, 1, 1))
+        self.assertEqual(sha.call_count, 2)
+
+        rows = query_catalog(self.catalog)
+        self.assertEqual(
+            [(r["kind"], r["date"], r["size"]) for r in rows],
+            [("video", "2024-02-02", 30), ("image", "2023-11-15", 21),
+             ("image", "2023-11-14", 10)]
+        )
+        self.assertEqual(len(rows[2]["sha256"]), 64)
+
+        # Nothing changed: nothing is hashed again
+        with patch("wa_crypt_tools.media.file_sha256") as sha:
+            result = update_catalog(self.catalog, self.root)
+        self.assertEqual(tuple(result), (3, 0, 0, 0))
+        sha.assert_not_called()
+
+    def test_query_filters(self):
+        self.write("WhatsApp Images/IMG-20231114-WA0001.jpg", 10)
+        self.write("WhatsApp Images/IMG-20231201-WA0002.png", 2000)
+        self.write("WhatsApp Video/VID-20240105-WA0001.mp4", 5000)
+        update_catalog(self.catalog, self.root, hash_files=False)
+
+        def paths(**filters):
+            return [r["path"].rsplit("/", 1)[-1]
+                    for r in query_catalog(self.catalog, **filters)]
+
+        self.assertEqual(paths(kind="image", until="2023-11"),
+                         ["IMG-20231114-WA0001.jpg"])
+        self.assertEqual(paths(since="2023-12-01"),
+                         ["VID-20240105-WA0001.mp4",
+                          "IMG-20231201-WA0002.png"])
+        self.assertEqual(paths(min_size=1000, max_size=3000),
+                         ["IMG-20231201-WA0002.png"])
+        self.assertEqual(paths(ext=".MP4"),
+                         ["VID-20240105-WA0001.mp4"])
+        self.assertEqual(paths(name="WA0001", limit=1),
+                         ["VID-20240105-WA0001.mp4"])
+
+
+class TestMediaAudit(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, "Media")
+        self.db = os.path.join(self.tmp, "msgstore.db")
+        self.catalog = os.path.join(self.tmp, "media_index.db")
+        conn = build_msgstore(self.db)
+        # A second reference with a full device path, and one never pulled
+        conn.executemany(
+            "INSERT INTO message_media VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(1, 1, "/storage/emulated/0/Android/media/com.whatsapp/"
+              "WhatsApp/Media/WhatsApp Video/VID-20231114-WA0002.mp4",
+              50, "video/mp4", None, None),
+             (2, 1, "Media/WhatsApp Audio/AUD-20231114-WA0003.opus",
+              70, "audio/ogg", None, "bWlzc2luZw==")]
+        )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, rel, content):
+        path = os.path.join(self.root, *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def test_missing_and_orphans(self):
+        self.write("WhatsApp Images/IMG-20231114-WA0001.jpg", b"i" * 10)
+        self.write("WhatsApp Video/VID-20231114-WA0002.mp4", b"v" * 50)
+        self.write("WhatsApp Images/IMG-20200101-WA0009.jpg", b"o" * 30)
+        self.write("WhatsApp Images/.nomedia", b"")
+        self.write("WhatsApp Profile Photos/p.jpg", b"p" * 5)
+
+        report = audit_media(self.db, self.root)
+        self.assertEqual(report["referenced"], 3)
+        self.assertEqual(report["on_disk"], 3)
+        self.assertEqual(report["missing"]["count"], 1)
+        self.assertEqual(report["missing"]["bytes"], 70)
+        self.assertEqual(report["missing"]["items"][0]["path"],
+                         "WhatsApp Audio/AUD-20231114-WA0003.opus")
+        self.assertEqual(report["orphans"]["count"], 1)
+        self.assertEqual(report["orphans"]["bytes"], 30)
+        self.assertEqual(report["matched_by_hash"], 0)
+
+    def test_hash_match_with_catalog(self):
+        self.write("WhatsApp Images/IMG-20231114-WA0001.jpg", b"i" * 10)
+        self.write("WhatsApp Video/VID-20231114-WA0002.mp4", b"v" * 50)
+        # The missing audio, saved under another name
+        self.write("WhatsApp Audio/renamed.opus", b"missing")
+        with patch("wa_crypt_tools.media.file_sha256",
+                   side_effect=lambda p: (b"missing".hex() if "renamed" in p
+                                          else "ab" * 32)):
+            update_catalog(self.catalog, self.root)
+
+        report = audit_media(self.db, self.root, self.catalog)
+        self.assertEqual(report["matched_by_hash"], 1)
+        self.assertEqual(report["missing"]["count"], 0)
+        self.assertEqual(report["orphans"]["count"], 0)
+
+    def test_legacy_needs_catalog(self):
+        legacy = os.path.join(self.tmp, "legacy.db")
+        build_legacy_msgstore(legacy)
+        with self.assertRaises(ValueError):
+            audit_media(legacy, self.root)
+
+    def test_legacy_hash_only_refs(self):
+        legacy = os.path.join(self.tmp, "legacy.db")
+        build_legacy_msgstore(legacy)
+        self.write("WhatsApp Images/IMG-20170714-WA0000.jpg", b"x" * 2048)
+        digest = {"value": "ab" * 32}
+        with patch("wa_crypt_tools.media.file_sha256",
+                   side_effect=lambda p: digest["value"]):
+            update_catalog(self.catalog, self.root)
+
+            # Nothing on disk has the referenced hash
+            report = audit_media(legacy, self.root, self.catalog)
+            self.assertEqual(report["referenced"], 1)
+            self.assertEqual(report["matched_by_hash"], 0)
+            self.assertEqual(report["missing"]["count"], 1)
+            self.assertEqual(report["missing"]["bytes"], 2048)
+            self.assertEqual(report["missing"]["items"][0]["path"],
+                             "sha256:aGFzaA==")
+            self.assertEqual(report["orphans"]["count"], 1)
+
+            digest["value"] = b"hash".hex()
+            os.utime(os.path.join(self.root, "WhatsApp Images",
+                                  "IMG-20170714-WA0000.jpg"), (1, 1))
+            update_catalog(self.catalog, self.root)
+            report = audit_media(legacy, self.root, self.catalog)
+        self.assertEqual(report["matched_by_hash"], 1)
+        self.assertEqual(report["missing"]["count"], 0)
+        self.assertEqual(report["orphans"]["count"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from wa_crypt_tools import history, metrics, tracing
+
+
+def _row(stage, wall, size=0, files=0):
+    return {"stage": stage, "depth": 0, "wall_s": wall,
+            "subprocess_s": 0.0, "python_s": wall, "cpu_s": 0,
+            "files": files, "bytes": size}
+
+
+def _samples(text):
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines() if line and not line.startswith("#")
+    }
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.history = history.history_path(self.tmp)
+        tracing.enable()
+
+    def tearDown(self):
+        tracing.disable()
+        shutil.rmtree(self.tmp)
+
+    def test_history_metrics(self):
+        history.record_run(self.history, "all", 1000.0, 0,
+                           [_row("pull", 4.0, 8000, 4)], "SERIAL1")
+        history.record_run(self.history, "all", 2000.0, 0,
+                           [_row("pull", 40.0, 2000, 1)], "SERIAL1",
+                           errors={("adb pull", "CalledProcessError"): 2})
+        history.record_run(self.history, "all", 3000.0, 1, [], "SERIAL1")
+
+        text = metrics.render(self.history, "all", 4000.0)
+        samples = _samples(text)
+        self.assertIn("# TYPE wa_backup_stage_duration_seconds histogram",
+                      text)
+        bucket = ('wa_backup_stage_duration_seconds_bucket'
+                  '{stage="pull",device="SERIAL1",le="%s"}')
+        self.assertEqual(samples[bucket % "5"], 1)
+        self.assertEqual(samples[bucket % "60"], 2)
+        self.assertEqual(samples[bucket % "+Inf"], 2)
+        self.assertEqual(samples[
+            'wa_backup_runs_total'
+            '{command="all",device="SERIAL1",result="failure"}'], 1)
+        self.assertEqual(samples[
+            'wa_backup_stage_bytes_total{stage="pull",device="SERIAL1"}'
+        ], 10000)
+        # The latest successful run: 2000 bytes in 40 s
+        self.assertEqual(samples[
+            'wa_backup_stage_throughput_bytes_per_second'
+            '{stage="pull",device="SERIAL1"}'], 50)
+        self.assertEqual(samples[
+            'wa_backup_errors_total'
+            '{call="adb pull",error="CalledProcessError"}'], 2)
+        self.assertEqual(
+            samples['wa_backup_run_in_progress{command="all"}'], 1
+        )
+
+    def test_current_run_and_atomic_write(self):
+        with tracing.span("adb pull", tracing.SUBPROCESS, files=3,
+                          bytes=300):
+            pass
+        path = os.path.join(self.tmp, "wa_backup.prom")
+        reporter = metrics.MetricsReporter(path, None, "pull", 10.0)
+        reporter.start()
+        reporter.stop(0)
+        with open(path) as f:
+            samples = _samples(f.read())
+        self.assertEqual(
+            samples['wa_backup_run_in_progress{command="pull"}'], 0
+        )
+        self.assertEqual(
+            samples['wa_backup_run_exit_status{command="pull"}'], 0
+        )
+        self.assertEqual(samples[
+            'wa_backup_run_bytes{command="pull",call="adb pull"}'], 300)
+        self.assertEqual(os.listdir(self.tmp), ["wa_backup.prom"])
+
+    def test_label_escaping(self):
+        out = metrics.MetricsText()
+        out.add("x", "gauge", "Test.", {"device": 'a"b\\c'}, 1.5)
+        self.assertIn('wa_backup_x{device="a\\"b\\\\c"} 1.5', out.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from wa_crypt_tools.msgstore import (
+    Chat, MsgStore, SCHEMA_LEGACY, SCHEMA_MODERN, connect, load_contact_names
+)
+from msgstore_fixture import (
+    ALICE, BOB, GROUP, add_message, build_legacy_msgstore, build_msgstore,
+    build_wa_db
+)
+
+
+class TestMsgStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmp, "msgstore.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_modern_schema(self):
+        conn = build_msgstore(self.db)
+        for i in range(10, 25):
+            add_message(conn, i, 1, 1, f"K{i}", 0, 1700001000000 + i, 0, "x")
+        conn.commit()
+        conn.close()
+
+        with MsgStore(self.db, page_size=4) as store:
+            self.assertEqual(store.schema, SCHEMA_MODERN)
+            chats = list(store.chats())
+            self.assertEqual(
+                chats[1], Chat(1, ALICE, None, 1700000300000)
+            )
+            ids = [m.id for m in store.messages(1)]
+            self.assertEqual(ids, [1, 2, 3] + list(range(10, 25)))
+            self.assertEqual(
+                [m.id for m in store.messages(1, after_id=20)],
+                [21, 22, 23, 24]
+            )
+            self.assertEqual(len(list(store.messages())), 19)
+
+            message = next(store.messages(2))
+            self.assertEqual(message.sender_jid, BOB)
+            self.assertFalse(message.from_me)
+            self.assertFalse(hasattr(message, "__dict__"))
+
+            media = list(store.media())
+            self.assertEqual(len(media), 1)
+            self.assertEqual(media[0].message_id, 3)
+            self.assertEqual(media[0].mime_type, "image/jpeg")
+            self.assertEqual(store.message_key_id(1, 3), "A3")
+            self.assertIsNone(store.message_key_id(2, 3))
+
+    def test_legacy_schema(self):
+        build_legacy_msgstore(self.db)
+
+        with MsgStore(self.db) as store:
+            self.assertEqual(store.schema, SCHEMA_LEGACY)
+            self.assertEqual([c.jid for c in store.chats()], [GROUP, ALICE])
+            messages = list(store.messages(1))
+            self.assertEqual([m.text for m in messages],
+                             ["Old hello", "Old reply"])
+            self.assertIsNone(messages[0].sender_jid)
+            self.assertTrue(messages[1].from_me)
+            media = list(store.media())
+            self.assertEqual(media[0].media_name, "IMG-20170714-WA0000.jpg")
+            self.assertEqual(store.message_key_id(2, 2), "L2")
+
+    def test_rejects_unknown_database(self):
+        conn = sqlite3.connect(self.db)
+        conn.execute("CREATE TABLE t (x)")
+        conn.close()
+        with self.assertRaises(sqlite3.DatabaseError):
+            MsgStore(self.db)
+
+    def test_connection_is_read_only(self):
+        build_msgstore(self.db).close()
+        conn = connect(self.db)
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM message")
+        conn.close()
+
+    def test_contacts(self):
+        wa = os.path.join(self.tmp, "wa.db")
+        build_wa_db(wa)
+        self.assertEqual(
+            load_contact_names(wa), {ALICE: "Alice", BOB: "Bob W."}
+        )
+        self.assertEqual(load_contact_names(self.db), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
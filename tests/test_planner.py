@@ -0,0 +1,163 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+from wa_crypt_tools import history, planner
+from wa_crypt_tools.adb import RemoteFile
+from wa_crypt_tools.commands.plan import check_plan, plan_run
+
+ROOT = planner.REMOTE_WHATSAPP_DIR
+NOW = 1700000000
+
+PHONE = [
+    RemoteFile("/sdcard/Download/contacts.vcf", 1000, NOW),
+    RemoteFile(f"{ROOT}/Databases/msgstore.db.crypt15", 40000, NOW),
+    RemoteFile(f"{ROOT}/Databases/msgstore-2024-01-02.1.db.crypt15",
+               39000, NOW),
+    RemoteFile(f"{ROOT}/Databases/msgstore-2024-01-01.1.db.crypt15",
+               38000, NOW),
+    RemoteFile(f"{ROOT}/Backups/wa.db.crypt15", 5000, NOW),
+    RemoteFile(f"{ROOT}/Media/WhatsApp Images/IMG-1.jpg", 300000, NOW),
+    RemoteFile(f"{ROOT}/Media/WhatsApp Video/VID-1.mp4", 9000000, NOW - 50),
+]
+
+
+def _listing(phone, target=None):
+    """list_remote_files stand-in: phone for the pull roots, target else."""
+    def fake(remote_dirs, device_id=None, missing_ok=False):
+        files = phone if len(remote_dirs) > 1 else (target or [])
+        return [f for f in files
+                if any(f.path == d or f.path.startswith(d + "/")
+                       for d in remote_dirs)]
+    return fake
+
+
+class TestBuildPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.config = {"output": self.tmp, "key": "ab" * 32}
+        patches = [
+            patch("wa_crypt_tools.planner.check_connection",
+                  return_value=True),
+            patch("wa_crypt_tools.planner.device_identity",
+                  return_value=("SERIAL1", "Pixel 6")),
+            patch("wa_crypt_tools.planner.free_space",
+                  return_value=10 ** 9),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _plan(self, command="all", target=None):
+        with patch("wa_crypt_tools.planner.list_remote_files",
+                   side_effect=_listing(PHONE, target)):
+            return planner.build_plan(self.config, command)
+
+    def test_pull_follows_selection_policy(self):
+        plan = self._plan("pull")
+        pull = plan["stages"][0]
+        self.assertEqual(pull["tiers"]["databases"],
+                         {"files": 2, "bytes": 45000})
+        # Only the newest rotated copy is kept
+        self.assertEqual(pull["tiers"]["backups"],
+                         {"files": 1, "bytes": 39000})
+        self.assertEqual(pull["skipped_backups"], 1)
+        self.assertEqual(pull["contacts"], 1000)
+        self.assertEqual(pull["bytes"], 45000 + 39000 + 9300000 + 1000)
+        self.assertEqual(pull["rate_source"], "default")
+        self.assertAlmostEqual(
+            pull["seconds"], round(pull["bytes"] / 20e6, 1)
+        )
+
+        decrypt = plan["stages"][1]
+        self.assertEqual((decrypt["files"], decrypt["bytes"]), (2, 45000))
+        # Pulled bytes plus the estimated plaintext
+        self.assertEqual(plan["disk_needed"], pull["bytes"] + 2 * 45000)
+        self.assertTrue(plan["fits"])
+        self.assertEqual((plan["device"], plan["model"]),
+                         ("SERIAL1", "Pixel 6"))
+
+    def test_time_budget_limits_media(self):
+        self.config["pull_time_budget"] = 0.1
+        pull = self._plan("pull")["stages"][0]
+        # 2 MB of budget: the image fits, the video does not
+        self.assertEqual(pull["budget_media_files"], 1)
+        self.assertEqual(pull["budget_media_left"], 1)
+
+    def test_uses_measured_rates(self):
+        history.record_run(
+            history.history_path(self.tmp), "pull", 1000.0, 0,
+            [{"stage": "pull", "wall_s": 10.0, "subprocess_s": 9.0,
+              "files": 10, "bytes": 50 * 1000 * 1000}]
+        )
+        pull = self._plan("pull")["stages"][0]
+        self.assertEqual((pull["rate"], pull["rate_source"]),
+                         (5e6, "history"))
+
+    def test_does_not_fit(self):
+        with patch("wa_crypt_tools.planner.free_space", return_value=1000):
+            plan = self._plan("pull")
+        self.assertFalse(plan["fits"])
+
+    def test_cached_decrypt_is_skipped(self):
+        with patch("wa_crypt_tools.planner.DecryptCache") as cache:
+            cache.return_value.likely_hit.side_effect = (
+                lambda name, size, key: name == "msgstore.db.crypt15"
+            )
+            cache.return_value.plaintext_size.return_value = 123
+            decrypt = self._plan("pull")["stages"][1]
+        self.assertEqual(decrypt["likely_cached"], ["msgstore.db.crypt15"])
+        self.assertEqual((decrypt["files"], decrypt["bytes"]), (1, 5000))
+
+    def test_push_counts_differences_on_target(self):
+        target = [
+            RemoteFile(f"{ROOT}/Databases/msgstore.db.crypt15", 40000, NOW),
+            RemoteFile(f"{ROOT}/Media/WhatsApp Images/IMG-1.jpg", 1, NOW),
+        ]
+        push = self._plan("all", target)["stages"][2]
+        self.assertEqual(push["files"], 5)
+        # All but the unchanged msgstore
+        self.assertEqual(push["changed_files"], 4)
+        self.assertEqual(push["changed_bytes"], 39000 + 5000 + 9300000)
+
+    def test_push_plans_from_local_tree(self):
+        databases = os.path.join(self.tmp, "WhatsApp", "Databases")
+        os.makedirs(databases)
+        with open(os.path.join(databases, "msgstore.db.crypt15"), 'wb') as f:
+            f.write(b"x" * 100)
+        push = self._plan("push")["stages"][0]
+        self.assertEqual((push["files"], push["bytes"]), (1, 100))
+        self.assertEqual(push["changed_files"], 1)
+
+    def test_no_device(self):
+        with patch("wa_crypt_tools.planner.check_connection",
+                   return_value=False):
+            plan = self._plan("pull")
+        self.assertIn("error", plan)
+
+    def test_plan_run_output(self):
+        with patch("wa_crypt_tools.planner.list_remote_files",
+                   side_effect=_listing(PHONE)), \
+                patch("sys.stdout", new_callable=StringIO) as out:
+            self.assertEqual(plan_run(self.config, "pull", as_json=True), 0)
+        self.assertEqual(json.loads(out.getvalue())["command"], "pull")
+
+        with patch("wa_crypt_tools.planner.list_remote_files",
+                   side_effect=_listing(PHONE)), \
+                patch("wa_crypt_tools.planner.free_space",
+                      return_value=1000), \
+                patch("sys.stdout", new_callable=StringIO) as out:
+            self.assertFalse(check_plan(self.config, "pull"))
+        self.assertIn("Not enough free space", out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
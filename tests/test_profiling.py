@@ -0,0 +1,79 @@
+import os
+import shutil
+import pstats
+import tempfile
+import unittest
+
+from wa_crypt_tools import profiling
+
+
+def _work():
+    return sorted(str(i) for i in range(20000))
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        profiling.disable()
+        shutil.rmtree(self.tmp)
+
+    def test_disabled_is_a_no_op(self):
+        with profiling.stage("decrypt"):
+            _work()
+        self.assertIsNone(profiling.directory())
+        self.assertEqual(os.listdir(self.tmp), [])
+
+    def test_stage_writes_stats_and_summary(self):
+        directory = profiling.enable(self.tmp, memory=True, top=5)
+        self.assertTrue(directory.startswith(
+            os.path.join(self.tmp, profiling.PROFILE_DIRNAME)
+        ))
+
+        @profiling.profiled("convert")
+        def convert():
+            return len(_work())
+
+        self.assertEqual(convert(), 20000)
+        prof = os.path.join(directory, "convert.prof")
+        stats = pstats.Stats(prof)
+        self.assertTrue(any(
+            func[2] == "_work" for func in stats.stats
+        ))
+        with open(os.path.join(directory, "convert.txt")) as f:
+            summary = f.read()
+        self.assertIn("Stage: convert", summary)
+        self.assertIn("Peak traced memory", summary)
+        self.assertIn("_work", summary)
+
+    def test_repeated_stage_gets_new_files(self):
+        directory = profiling.enable(self.tmp)
+        for _ in range(2):
+            with profiling.stage("decrypt-child"):
+                _work()
+        self.assertEqual(sorted(os.listdir(directory)), [
+            "decrypt-child-2.prof", "decrypt-child-2.txt",
+            "decrypt-child.prof", "decrypt-child.txt",
+        ])
+
+    def test_child_inherits_settings(self):
+        directory = profiling.enable(self.tmp, memory=True, top=7)
+        profiling._directory = None
+        profiling.enable_from_env()
+        self.assertEqual(profiling.directory(), directory)
+        self.assertTrue(profiling._memory)
+        self.assertEqual(profiling._top, 7)
+
+    def test_nested_stage_is_not_profiled(self):
+        directory = profiling.enable(self.tmp)
+        with profiling.stage("all"):
+            with profiling.stage("pull"):
+                _work()
+        self.assertEqual(sorted(os.listdir(directory)),
+                         ["all.prof", "all.txt"])
+
+
+if __name__ == '__main__':
+    unittest.main()
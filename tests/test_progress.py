@@ -0,0 +1,98 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from wa_crypt_tools import progress
+from wa_crypt_tools.adb import RemoteFile
+from wa_crypt_tools.commands.pull import _pull_files
+from wa_crypt_tools.progress import Transfer, format_line
+
+
+class TestTransfer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_watched_files_count_as_done(self):
+        bar = Transfer("media", 2, 1000, mode="json", stream=io.StringIO())
+        path = os.path.join(self.tmp, "IMG-1.jpg")
+        with open(path, 'wb') as f:
+            f.write(bytes(300))
+        bar.begin("adb", "WhatsApp Images (2 files)", [path])
+        snap = bar.snapshot()
+        self.assertEqual((snap["files"], snap["bytes"]), (0, 300))
+        self.assertEqual(snap["workers"]["adb"], "WhatsApp Images (2 files)")
+
+        bar.advance(2, 1000, "adb")
+        snap = bar.snapshot()
+        self.assertEqual((snap["files"], snap["bytes"]), (2, 1000))
+        self.assertEqual(snap["workers"]["adb"], "idle")
+
+    def test_json_events(self):
+        stream = io.StringIO()
+        with Transfer("push", 1, 10, mode="json", stream=stream) as bar:
+            bar.advance(1, 10)
+        events = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(events[0]["event"], "start")
+        self.assertEqual(events[-1]["event"], "finish")
+        self.assertEqual(events[-1]["bytes"], 10)
+        self.assertEqual(events[-1]["total_files"], 1)
+
+    def test_off_writes_nothing(self):
+        stream = io.StringIO()
+        with Transfer("push", 1, 10, mode="off", stream=stream) as bar:
+            bar.advance(1, 10)
+        self.assertEqual(stream.getvalue(), "")
+
+    def test_format_line(self):
+        line = format_line({
+            "label": "media", "files": 3, "total_files": 10,
+            "bytes": 512, "total_bytes": 1024, "failed": 1, "rate": 256,
+            "eta_s": 2.0, "stalled_s": 20.0,
+            "workers": {"adb": "WhatsApp Video (4 files)"},
+        })
+        self.assertIn("3/10 files", line)
+        self.assertIn("(50%)", line)
+        self.assertIn("ETA 0m02s", line)
+        self.assertIn("1 failed", line)
+        self.assertIn("STALLED 20s", line)
+        self.assertIn("WhatsApp Video", line)
+
+    def test_set_mode(self):
+        self.addCleanup(progress.set_mode, "off")
+        progress.set_mode("json")
+        self.assertEqual(progress.transfer("x", 0, 0).mode, "json")
+        with self.assertRaises(ValueError):
+            progress.set_mode("fancy")
+
+
+class TestPullProgress(unittest.TestCase):
+
+    @patch('wa_crypt_tools.commands.pull.os.makedirs')
+    @patch('wa_crypt_tools.commands.pull.subprocess.check_call')
+    def test_batches_advance_the_bar(self, mock_check_call, _):
+        root = "/sdcard/WhatsApp/Media"
+        files = [
+            RemoteFile(f"{root}/WhatsApp Images/a.jpg", 100, 2),
+            RemoteFile(f"{root}/WhatsApp Images/b.jpg", 50, 1),
+            RemoteFile(f"{root}/WhatsApp Video/c.mp4", 400, 1),
+        ]
+        bar = Transfer("media", 3, 550, mode="json", stream=io.StringIO())
+        failed = _pull_files(["adb"], files, root, "/out", bar=bar)
+
+        self.assertEqual(failed, 0)
+        self.assertEqual((bar.done_files, bar.done_bytes), (3, 550))
+        # adb's own transfer lines would break the display
+        for call in mock_check_call.call_args_list:
+            self.assertIn("stdout", call.kwargs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import posixpath
+
+from wa_crypt_tools.adb import RemoteFile
+from wa_crypt_tools.scheduler import (
+    media_folder, prioritize_media, batch_by_directory
+)
+
+MEDIA = "/sdcard/WhatsApp/Media"
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_media_folder(self):
+        self.assertEqual(
+            media_folder(f"{MEDIA}/WhatsApp Images/Sent/IMG.jpg", MEDIA),
+            "WhatsApp Images"
+        )
+
+    def test_prioritize_newest_first(self):
+        files = [
+            RemoteFile(f"{MEDIA}/A/old", 1, 100),
+            RemoteFile(f"{MEDIA}/A/new", 1, 900),
+            RemoteFile(f"{MEDIA}/B/mid", 1, 500),
+        ]
+        ordered = prioritize_media(files, MEDIA, now=1000, window=1)
+        self.assertEqual([f.path for f in ordered], [
+            f"{MEDIA}/A/new", f"{MEDIA}/B/mid", f"{MEDIA}/A/old"
+        ])
+
+    def test_prioritize_groups_directories_per_window(self):
+        # Windows of 500s: [900, 700] and [400, 100] seconds old
+        files = [
+            RemoteFile(f"{MEDIA}/A/a1", 1, 9900),
+            RemoteFile(f"{MEDIA}/B/b1", 1, 9800),
+            RemoteFile(f"{MEDIA}/A/a2", 1, 9700),
+            RemoteFile(f"{MEDIA}/B/b2", 1, 9400),
+            RemoteFile(f"{MEDIA}/A/a3", 1, 9100),
+        ]
+        ordered = prioritize_media(files, MEDIA, now=10000, window=500)
+        self.assertEqual([posixpath.basename(f.path) for f in ordered],
+                         ["a1", "a2", "b1", "b2", "a3"])
+
+    def test_interleaved_folders_pull_in_few_batches(self):
+        files = [
+            RemoteFile(f"{MEDIA}/{folder}/{i}", 1, 10000 - i)
+            for i in range(300) for folder in ("A", "B", "C")
+        ]
+        ordered = prioritize_media(files, MEDIA, now=10000)
+        self.assertEqual(len(batch_by_directory(ordered)), 6)
+
+    def test_prioritize_weights(self):
+        files = [
+            RemoteFile(f"{MEDIA}/Images/a", 1, 800),  # age 200
+            RemoteFile(f"{MEDIA}/Video/b", 1, 700),   # age 300, weight 3
+            RemoteFile(f"{MEDIA}/Stickers/c", 1, 999),
+        ]
+        ordered = prioritize_media(
+            files, MEDIA, weights={"Video": 3, "Stickers": 0}, now=1000
+        )
+        self.assertEqual([f.path for f in ordered], [
+            f"{MEDIA}/Video/b", f"{MEDIA}/Images/a"
+        ])
+
+    def test_batch_by_directory_keeps_order(self):
+        files = [
+            RemoteFile("/d1/a", 1, 0),
+            RemoteFile("/d1/b", 1, 0),
+            RemoteFile("/d2/c", 1, 0),
+            RemoteFile("/d1/d", 1, 0),
+            RemoteFile("/d1/e", 1, 0),
+        ]
+        batches = batch_by_directory(files, max_files=1000)
+        self.assertEqual(
+            [(d, [f.path for f in b]) for d, b in batches],
+            [
+                ("/d1", ["/d1/a", "/d1/b"]),
+                ("/d2", ["/d2/c"]),
+                ("/d1", ["/d1/d", "/d1/e"]),
+            ]
+        )
+        self.assertEqual(len(batch_by_directory(files, max_files=1)), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
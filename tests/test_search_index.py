@@ -0,0 +1,104 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from wa_crypt_tools.search_index import (
+    fts5_available, quote_query, search, update_index
+)
+from msgstore_fixture import (
+    ALICE, GROUP, add_message, build_legacy_msgstore, build_msgstore,
+    build_wa_db
+)
+
+
+@unittest.skipUnless(fts5_available(), "SQLite built without FTS5")
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmp, "msgstore.db")
+        self.wa = os.path.join(self.tmp, "wa.db")
+        self.index = os.path.join(self.tmp, "search.db")
+        build_msgstore(self.db).close()
+        build_wa_db(self.wa)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def add(self, _id, key_id, text, chat_id=1, timestamp=1700000500000):
+        conn = sqlite3.connect(self.db)
+        add_message(conn, _id, chat_id, 0, key_id, 0, timestamp, 0, text)
+        conn.commit()
+        conn.close()
+
+    def test_incremental_update(self):
+        self.assertEqual(update_index(self.index, self.db, self.wa), 4)
+        self.assertEqual(update_index(self.index, self.db, self.wa), 0)
+
+        self.add(5, "A5", "Climbing again on Saturday")
+        self.assertEqual(update_index(self.index, self.db, self.wa), 1)
+        ids = [h.id for h in search(self.index, "saturday")]
+        self.assertEqual(sorted(ids), [4, 5])
+
+    def test_rebuilds_when_database_replaced(self):
+        update_index(self.index, self.db, self.wa)
+        conn = sqlite3.connect(self.db)
+        conn.execute("UPDATE message SET key_id = 'X' WHERE _id = 4")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(update_index(self.index, self.db, self.wa), 4)
+        self.assertEqual(len(search(self.index, "saturday")), 1)
+
+    def test_filters_and_snippets(self):
+        self.add(5, "A5", "See you saturday", timestamp=1800000000000)
+        update_index(self.index, self.db, self.wa)
+
+        hits = search(self.index, "saturday", chat="Alice")
+        self.assertEqual([h.id for h in hits], [5])
+        self.assertEqual(hits[0].chat_title, "Alice")
+        self.assertEqual(hits[0].snippet, "See you [saturday]")
+
+        hits = search(self.index, "saturday", sender="Bob")
+        self.assertEqual([h.id for h in hits], [4])
+        self.assertEqual(hits[0].chat_title, "Climbing <club>")
+
+        self.assertEqual(
+            [h.id for h in search(self.index, "saturday", until="2024-01-01")],
+            [4]
+        )
+        self.assertEqual(
+            [h.id for h in search(self.index, "alice", sender="me")], [2]
+        )
+        self.assertEqual(
+            [h.id for h in search(self.index, "hi", chat=ALICE[:6])], [1]
+        )
+
+    def test_quote_query_escapes_syntax(self):
+        update_index(self.index, self.db)
+        self.assertEqual(quote_query('at "the" wall?'),
+                         '"at" """the""" "wall?"')
+        self.assertEqual(len(search(self.index, "wall?")), 1)
+
+    def test_legacy_schema(self):
+        legacy = os.path.join(self.tmp, "legacy.db")
+        build_legacy_msgstore(legacy)
+        self.assertEqual(update_index(self.index, legacy), 2)
+        self.assertEqual(update_index(self.index, legacy), 0)
+
+        hits = search(self.index, "old")
+        self.assertEqual(sorted(h.id for h in hits), [1, 3])
+        self.assertEqual([h.id for h in search(self.index, "hello")], [1])
+        self.assertEqual(
+            [h.id for h in search(self.index, "old", sender="me")], [3]
+        )
+        conn = sqlite3.connect(self.index)
+        chats = dict(conn.execute("SELECT jid, title FROM chats"))
+        conn.close()
+        self.assertEqual(chats[GROUP], "Climbing")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from wa_crypt_tools.snapshot import (
+    diff_media, diff_messages, load_media, save_manifest
+)
+from msgstore_fixture import add_message, build_msgstore
+
+
+class TestSnapshotDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.old = os.path.join(self.tmp, "old.db")
+        self.new = os.path.join(self.tmp, "new.db")
+        build_msgstore(self.old).close()
+        conn = build_msgstore(self.new)
+        conn.execute("DELETE FROM message WHERE _id = 2")
+        conn.execute("UPDATE message SET text_data = 'Edited' WHERE _id = 1")
+        add_message(conn, 5, 1, 0, "A5", 0, 1700000500000, 0, "Newer")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def check(self, result):
+        self.assertEqual(
+            [i["key_id"] for i in result["new"]["items"]], ["A5"]
+        )
+        self.assertEqual(
+            [i["key_id"] for i in result["deleted"]["items"]], ["A2"]
+        )
+        edited = result["edited"]["items"]
+        self.assertEqual(
+            (edited[0]["text"], edited[0]["new_text"]), ("Hi there", "Edited")
+        )
+
+    def test_same_history(self):
+        result = diff_messages(self.old, self.new)
+        self.assertTrue(result["same_history"])
+        self.check(result)
+
+    def test_renumbered_history(self):
+        conn = sqlite3.connect(self.new)
+        conn.execute("UPDATE message SET _id = _id + 100")
+        conn.commit()
+        conn.close()
+
+        result = diff_messages(self.old, self.new, limit=10)
+        self.assertFalse(result["same_history"])
+        self.check(result)
+        self.assertEqual(result["new"]["count"], 1)
+
+    def test_media_diff_with_manifest(self):
+        media = os.path.join(self.tmp, "snap", "WhatsApp", "Media", "Images")
+        os.makedirs(media)
+        for name, size in (("a.jpg", 10), ("b.jpg", 20)):
+            with open(os.path.join(media, name), 'wb') as f:
+                f.write(bytes(size))
+        manifest = os.path.join(self.tmp, "manifest.json")
+        save_manifest(manifest, {"Images/a.jpg": 10, "Images/c.jpg": 5,
+                                 "Images/b.jpg": 1})
+
+        result = diff_media(
+            load_media(manifest), load_media(os.path.join(self.tmp, "snap"))
+        )
+        self.assertEqual(result["removed"]["items"],
+                         [{"path": "Images/c.jpg", "size": 5}])
+        self.assertEqual(result["added"]["count"], 0)
+        self.assertEqual(result["changed"]["bytes"], 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from wa_crypt_tools import tracing
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        tracing.enable()
+
+    def tearDown(self):
+        tracing.disable()
+        shutil.rmtree(self.tmp)
+
+    def test_disabled_records_nothing(self):
+        tracing.disable()
+        with tracing.span("pull") as s:
+            s.add(bytes=10)
+        tracing.instant("tier databases")
+        self.assertEqual(tracing.events(), [])
+
+    def test_nested_spans_and_counters(self):
+        @tracing.traced("pull")
+        def pull():
+            with tracing.span("adb pull", tracing.SUBPROCESS,
+                              files=2) as s:
+                s.add(bytes=100)
+                s.add(bytes=50)
+            return 7
+
+        self.assertEqual(pull(), 7)
+        events = tracing.events()
+        self.assertEqual([e["name"] for e in events], ["adb pull", "pull"])
+        self.assertEqual(events[0]["depth"], 1)
+        self.assertEqual(events[0]["args"]["bytes"], 150)
+
+        rows = tracing.summary()
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual(row["stage"], "pull")
+        self.assertEqual((row["files"], row["bytes"]), (2, 150))
+        self.assertAlmostEqual(
+            row["subprocess_s"] + row["python_s"], row["wall_s"]
+        )
+        self.assertIn("pull", tracing.format_summary(rows))
+
+    @patch("subprocess.check_call", return_value=0)
+    def test_check_call_span(self, mock_call):
+        tracing.check_call(["adb", "pull", "a", "b"], "adb pull", files=1)
+        mock_call.assert_called_with(["adb", "pull", "a", "b"])
+        event = tracing.events()[0]
+        self.assertEqual(event["cat"], tracing.SUBPROCESS)
+        self.assertEqual(event["args"]["files"], 1)
+
+    def test_span_recorded_on_exception(self):
+        with self.assertRaises(ValueError):
+            with tracing.span("decrypt"):
+                raise ValueError("bad key")
+        self.assertEqual(tracing.events()[0]["name"], "decrypt")
+
+    def test_write_chrome_trace(self):
+        with tracing.span("convert", files=1):
+            pass
+        tracing.instant("tier media")
+        path = os.path.join(self.tmp, "trace.json")
+        tracing.write_trace(path)
+        with open(path) as f:
+            trace = json.load(f)
+        phases = [e["ph"] for e in trace["traceEvents"]]
+        self.assertEqual(phases, ["X", "i", "M"])
+        complete = trace["traceEvents"][0]
+        for key in ("name", "cat", "ts", "dur", "pid", "tid", "args"):
+            self.assertIn(key, complete)
+        self.assertNotIn("depth", complete)
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+    def test_summary_threads_and_nested_subprocesses(self):
+        def background():
+            with tracing.span("adb pull", tracing.SUBPROCESS, bytes=5):
+                pass
+
+        with tracing.span("pull"):
+            with tracing.span("venv", tracing.SUBPROCESS):
+                with tracing.span("pip", tracing.SUBPROCESS, files=1):
+                    pass
+            thread = threading.Thread(target=background)
+            thread.start()
+            thread.join()
+        venv, pull = (next(e for e in tracing.events() if e["name"] == n)
+                      for n in ("venv", "pull"))
+
+        row = tracing.summary()[0]
+        # Nested subprocess time counts once; the other thread's adb
+        # call adds its bytes but not its time
+        self.assertAlmostEqual(row["subprocess_s"], venv["dur"] / 1e6)
+        self.assertAlmostEqual(row["wall_s"], pull["dur"] / 1e6)
+        self.assertEqual((row["files"], row["bytes"]), (1, 5))
+
+    def test_summary_scales_linearly(self):
+        start = time.perf_counter_ns()
+        tracing.record("pull", tracing.STAGE, start, start + 200000)
+        for i in range(20000):
+            tracing.record("adb pull", tracing.SUBPROCESS,
+                           start + i * 10, start + i * 10 + 5, files=1)
+        started = time.monotonic()
+        row = tracing.summary()[0]
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(row["files"], 20000)
+        self.assertAlmostEqual(row["subprocess_s"], 20000 * 5 / 1e9)
+
+
+if __name__ == '__main__':
+    unittest.main()
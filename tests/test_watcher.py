@@ -0,0 +1,211 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from wa_crypt_tools.adb import AdbError
+from wa_crypt_tools.watcher import DeviceWatcher, read_device_lists
+
+
+def _message(text):
+    payload = text.encode()
+    return b"%04x" % len(payload) + payload
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReadDeviceLists(unittest.TestCase):
+
+    def test_parses_length_prefixed_messages(self):
+        stream = BytesIO(
+            _message("A1\tdevice\n")
+            + _message("A1\tdevice\nB2\tunauthorized\n")
+            + _message("")
+            + b"00"  # truncated header: end of stream
+        )
+        self.assertEqual(list(read_device_lists(stream)), [
+            {"A1": "device"},
+            {"A1": "device", "B2": "unauthorized"},
+            {},
+        ])
+
+    def test_garbage_raises(self):
+        with self.assertRaises(AdbError):
+            list(read_device_lists(BytesIO(b"List of devices")))
+
+
+class TestDeviceWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.ran = []
+        self.release = threading.Event()
+        self.release.set()
+        self.stdout = patch("sys.stdout", new_callable=StringIO)
+        self.stdout.start()
+        self.addCleanup(self.stdout.stop)
+
+    def _job(self, serial, cancel):
+        self.ran.append(serial)
+        self.release.wait(5)
+        return 1 if cancel.is_set() else 0
+
+    def _watcher(self, **kwargs):
+        watcher = DeviceWatcher(self._job, clock=self.clock, **kwargs)
+        self.addCleanup(watcher.stop)
+        return watcher
+
+    def _drain(self, watcher):
+        # The worker is not started: run the queued jobs inline
+        while not watcher.queue.empty():
+            watcher._run(watcher.queue.get_nowait())
+
+    def test_queues_configured_devices_once(self):
+        watcher = self._watcher(serials=["A1"])
+        watcher.update({"A1": "device", "B2": "device"})
+        watcher.update({"A1": "device", "B2": "device"})
+        self.assertEqual(list(watcher.jobs), ["A1"])
+        self._drain(watcher)
+        self.assertEqual(self.ran, ["A1"])
+
+    def test_unauthorized_then_authorized(self):
+        watcher = self._watcher()
+        watcher.update({"A1": "unauthorized"})
+        self.assertFalse(watcher.jobs)
+        watcher.update({"A1": "device"})
+        self.assertIn("A1", watcher.jobs)
+
+    def test_cooldown(self):
+        watcher = self._watcher(cooldown=60)
+        watcher.update({"A1": "device"})
+        self._drain(watcher)
+        watcher.update({})
+        self.clock.now += 30
+        watcher.update({"A1": "device"})
+        self.assertFalse(watcher.jobs)
+        watcher.update({})
+        self.clock.now += 31
+        watcher.update({"A1": "device"})
+        self._drain(watcher)
+        self.assertEqual(self.ran, ["A1", "A1"])
+
+    def test_bounded_queue(self):
+        watcher = self._watcher(queue_size=2)
+        watcher.update({"A1": "device", "B2": "device", "C3": "device"})
+        self.assertEqual(sorted(watcher.jobs), ["A1", "B2"])
+        self.assertIn("queue full", sys.stdout.getvalue())
+
+    def test_disconnect_cancels_and_skips_cooldown(self):
+        watcher = self._watcher(cooldown=60)
+        watcher.update({"A1": "device"})
+        job = watcher.jobs["A1"]
+        watcher.update({})
+        self.assertTrue(job.cancel.is_set())
+        self._drain(watcher)
+        # Never started, and retried as soon as it is back
+        self.assertEqual(self.ran, [])
+        watcher.update({"A1": "device"})
+        self._drain(watcher)
+        self.assertEqual(self.ran, ["A1"])
+
+    def test_worker_cancels_running_job_on_stop(self):
+        self.release.clear()
+        watcher = self._watcher()
+        watcher.start()
+        watcher.update({"A1": "device"})
+        job = watcher.jobs["A1"]
+        threading.Timer(0.05, self.release.set).start()
+        watcher.stop()
+        self.assertTrue(job.cancel.is_set())
+        self.assertEqual(self.ran, ["A1"])
+        self.assertFalse(watcher.jobs)
+
+
+class TestWatchFakeAdb(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.phone = os.path.join(self.tmp, "phone")
+        os.makedirs(self.phone)
+        env = {"FAKE_ADB_ROOT": self.phone,
+               "WA_ADB": f"{sys.executable} -m wa_crypt_tools.testing."
+                         "fake_adb"}
+        patcher = patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_plug_and_unplug(self):
+        from wa_crypt_tools.adb import get_adb_base
+
+        seen = []
+        done = threading.Event()
+        watcher = DeviceWatcher(lambda serial, cancel: 0)
+
+        def update(devices):
+            seen.append(devices)
+            if len(seen) == 1:
+                os.rename(self.phone, self.phone + ".away")
+            else:
+                done.set()
+                threading.Thread(target=watcher.stop).start()
+
+        watcher.update = update  # type: ignore[assignment]
+        with patch("sys.stdout", new_callable=StringIO):
+            thread = threading.Thread(
+                target=watcher.watch, args=(get_adb_base(),)
+            )
+            thread.start()
+            self.assertTrue(done.wait(10))
+            thread.join(10)
+        self.assertEqual(seen[:2], [{"FAKE0001": "device"}, {}])
+
+
+class TestBackupDevice(unittest.TestCase):
+
+    @patch("wa_crypt_tools.commands.watch.decrypt_database", return_value=0)
+    @patch("wa_crypt_tools.commands.watch.pull_data", return_value=0)
+    def test_jobs_reuse_the_serial_folder(self, mock_pull, mock_decrypt):
+        from wa_crypt_tools.commands.watch import backup_device
+
+        config = {"output": "/srv/backups", "key": "a" * 64}
+        for _ in range(2):
+            self.assertEqual(backup_device(
+                config, "A1", threading.Event(), record_history=False
+            ), 0)
+        outputs = {c[0][0]["output"] for c in mock_pull.call_args_list}
+        self.assertEqual(outputs, {os.path.join("/srv/backups", "A1")})
+        self.assertTrue(mock_pull.call_args[0][0]["pull_incremental"])
+        self.assertEqual(mock_decrypt.call_args[1]["input_dir"],
+                         os.path.join("/srv/backups", "A1"))
+        self.assertNotIn("pull_incremental", config)
+
+    @patch("wa_crypt_tools.commands.watch.decrypt_database")
+    @patch("wa_crypt_tools.commands.watch.pull_data", return_value=1)
+    def test_cancel_reaches_the_pull(self, mock_pull, mock_decrypt):
+        from wa_crypt_tools.commands.watch import backup_device
+
+        cancel = threading.Event()
+        backup_device({"output": "/srv/backups", "key": "a" * 64}, "A1",
+                      cancel, record_history=False)
+        check = mock_pull.call_args[1]["cancel"]
+        self.assertFalse(check())
+        cancel.set()
+        self.assertTrue(check())
+        mock_decrypt.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
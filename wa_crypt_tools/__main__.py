@@ -1,15 +1,41 @@
+import os
 import sys
+import time
+import atexit
+import sqlite3
 import argparse
 from pathlib import Path
-from wa_crypt_tools.config import load_config, merge_args_with_config
+from wa_crypt_tools import history, profiling, progress, tracing
+from wa_crypt_tools.config import (
+    Config, load_config, merge_args_with_config
+)
+from wa_crypt_tools.metrics import MetricsReporter
+from wa_crypt_tools.planner import PLAN_COMMANDS
+from wa_crypt_tools.commands.plan import check_plan
 from wa_crypt_tools.commands import (
     pull_data,
     push_whatsapp,
     decrypt_database,
     convert_vcf,
-    run_orchestrator
+    run_orchestrator,
+    check_backup_key,
+    encrypt_database,
+    export_chats,
+    search_messages,
+    merge_snapshot,
+    diff_snapshots,
+    index_media,
+    query_media,
+    audit_media_files,
+    extract_thumbnails,
+    show_stats,
+    plan_run,
+    watch_devices
 )
 
+# Commands that are not recorded in the run history
+UNRECORDED_COMMANDS = ("stats", "plan", "watch")
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(
@@ -28,9 +54,41 @@ def main() -> None:
     parser.add_argument(
         "--key", "-k", help="Decryption key (64 hex)"
     )
+    parser.add_argument(
+        "--key-ring", help="File with extra candidate keys, one per line"
+    )
+    parser.add_argument(
+        "--key-file", help="Legacy 'key' file for crypt12/14 backups"
+    )
     parser.add_argument(
         "--dry-run", action="store_true", help="Simulate actions without executing them"
     )
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help="Time each stage; write a Chrome trace (JSON) to FILE"
+    )
+    parser.add_argument(
+        "--no-history", action="store_true",
+        help="Do not record this run in <output>/.wa_history.db"
+    )
+    parser.add_argument(
+        "--metrics-file", metavar="FILE",
+        help="Write Prometheus textfile metrics to FILE (*.prom) during "
+             "and after the run"
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Profile each stage (cProfile) into <output>/profile"
+    )
+    parser.add_argument(
+        "--profile-memory", action="store_true",
+        help="With --profile, also trace allocations (tracemalloc)"
+    )
+    parser.add_argument(
+        "--progress", choices=progress.MODES,
+        help="Transfer progress on stderr: text (default on a terminal), "
+             "json (one event per line) or off"
+    )
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
@@ -46,10 +104,22 @@ def main() -> None:
         "--push-device", help="Device ID specifically for pushing"
     )
     p_push.add_argument("--input", "-i", help="Input directory to push from")
+    p_push.add_argument(
+        "--encrypt", action="store_true",
+        help="Re-encrypt <input>/msgstore.db into crypt15 before pushing"
+    )
 
     # Decrypt
     p_decrypt = subparsers.add_parser("decrypt", help="Decrypt databases")
     p_decrypt.add_argument("--input", "-i", help="Input directory")
+    p_decrypt.add_argument(
+        "--no-cache", action="store_true",
+        help="Always decrypt, ignoring cached results"
+    )
+    p_decrypt.add_argument(
+        "--all-files", action="store_true",
+        help="Decrypt every crypt12/14/15 file under the input directory"
+    )
 
     # Convert
     p_convert = subparsers.add_parser("convert", help="Convert VCF to JSON")
@@ -60,6 +130,263 @@ def main() -> None:
         "--output", "-o", required=True, help="Output JSON file"
     )
 
+    # Encrypt
+    p_encrypt = subparsers.add_parser(
+        "encrypt", help="Re-encrypt an edited msgstore.db into crypt15"
+    )
+    p_encrypt.add_argument("--input", "-i", help="Input directory")
+    p_encrypt.add_argument(
+        "--file", "-f",
+        help="Plaintext database (default: <input>/msgstore.db)"
+    )
+    p_encrypt.add_argument(
+        "--reference", "-r",
+        help="crypt15 backup to copy the header from "
+             "(default: pulled msgstore)"
+    )
+    p_encrypt.add_argument(
+        "--out-file", help="Encrypted output (default: replaces the reference)"
+    )
+
+    # Export
+    p_export = subparsers.add_parser(
+        "export", help="Export decrypted chats to HTML/JSON"
+    )
+    p_export.add_argument("--input", "-i", help="Input directory")
+    p_export.add_argument(
+        "--db", help="Decrypted msgstore.db (default: <input>/msgstore.db)"
+    )
+    p_export.add_argument(
+        "--out-dir", help="Export directory (default: <input>/export)"
+    )
+    p_export.add_argument(
+        "--format", default="html,json",
+        help="Comma separated output formats: html,json"
+    )
+    p_export.add_argument(
+        "--workers", type=int, help="Parallel processes (default: all cores)"
+    )
+    p_export.add_argument(
+        "--full", action="store_true",
+        help="Re-export every chat instead of appending new messages"
+    )
+
+    # Search
+    p_search = subparsers.add_parser(
+        "search", help="Full-text search over decrypted messages"
+    )
+    p_search.add_argument("query", help="Words to search for")
+    p_search.add_argument("--input", "-i", help="Input directory")
+    p_search.add_argument("--chat", help="Chat jid, number or name")
+    p_search.add_argument(
+        "--sender", help="Sender jid, number or name ('me' for own messages)"
+    )
+    p_search.add_argument("--since", help="First day (YYYY-MM-DD)")
+    p_search.add_argument("--until", help="Last day (YYYY-MM-DD)")
+    p_search.add_argument("--limit", type=int, default=20)
+    p_search.add_argument(
+        "--json", action="store_true", help="Print results as JSON"
+    )
+    p_search.add_argument(
+        "--raw", action="store_true",
+        help="Pass the query as FTS5 syntax (AND/OR/NEAR, prefix*)"
+    )
+    p_search.add_argument(
+        "--rebuild", action="store_true", help="Rebuild the index first"
+    )
+
+    # Merge
+    p_merge = subparsers.add_parser(
+        "merge", help="Merge the decrypted msgstore.db into an archive"
+    )
+    p_merge.add_argument("--input", "-i", help="Input directory")
+    p_merge.add_argument(
+        "--db", help="Decrypted msgstore.db (default: <input>/msgstore.db)"
+    )
+    p_merge.add_argument(
+        "--archive", help="Archive database (default: <output>/archive.db)"
+    )
+    p_merge.add_argument(
+        "--source", help="Snapshot lineage name, e.g. one per phone"
+    )
+
+    # Diff
+    p_diff = subparsers.add_parser(
+        "diff", help="Show what changed between two snapshots"
+    )
+    p_diff.add_argument("old", help="Older snapshot directory")
+    p_diff.add_argument(
+        "new", nargs="?", help="Newer snapshot directory (default: input)"
+    )
+    p_diff.add_argument("--input", "-i", help="Input directory")
+    p_diff.add_argument(
+        "--old-manifest", help="Media manifest to use for the old snapshot"
+    )
+    p_diff.add_argument(
+        "--write-manifest", help="Save the new snapshot's media manifest"
+    )
+    p_diff.add_argument(
+        "--json", action="store_true", help="Print the report as JSON"
+    )
+    p_diff.add_argument(
+        "--limit", type=int, help="List at most this many items per change"
+    )
+    p_diff.add_argument(
+        "--no-messages", action="store_true", help="Skip the message diff"
+    )
+    p_diff.add_argument(
+        "--no-media", action="store_true", help="Skip the media diff"
+    )
+
+    # Media catalog
+    p_media = subparsers.add_parser(
+        "media", help="Index and query the pulled media"
+    )
+    media_sub = p_media.add_subparsers(dest="media_command", required=True)
+    p_media_index = media_sub.add_parser(
+        "index", help="Build or refresh <input>/media_index.db"
+    )
+    p_media_index.add_argument("--input", "-i", help="Input directory")
+    p_media_index.add_argument("--catalog", help="Catalog database path")
+    p_media_index.add_argument(
+        "--no-hash", action="store_true",
+        help="Skip SHA-256 hashing of new and modified files"
+    )
+    p_media_query = media_sub.add_parser(
+        "query", help="List catalogued media matching filters"
+    )
+    p_media_query.add_argument("--input", "-i", help="Input directory")
+    p_media_query.add_argument("--catalog", help="Catalog database path")
+    p_media_query.add_argument(
+        "--kind",
+        choices=["image", "video", "audio", "voice", "document", "sticker",
+                 "other"]
+    )
+    p_media_query.add_argument(
+        "--folder", help="Media folder, e.g. 'WhatsApp Images'"
+    )
+    p_media_query.add_argument(
+        "--since", help="First date, YYYY-MM-DD (or YYYY / YYYY-MM)"
+    )
+    p_media_query.add_argument(
+        "--until", help="Last date, YYYY-MM-DD (or YYYY / YYYY-MM)"
+    )
+    p_media_query.add_argument("--min-size", help="e.g. 500KB, 50MB")
+    p_media_query.add_argument("--max-size", help="e.g. 1G")
+    p_media_query.add_argument("--ext", help="File extension, e.g. jpg")
+    p_media_query.add_argument("--name", help="Substring of the path")
+    p_media_query.add_argument("--limit", type=int, help="Maximum rows")
+    p_media_query.add_argument(
+        "--json", action="store_true", help="Print rows as JSON"
+    )
+
+    p_media_audit = media_sub.add_parser(
+        "audit", help="Find missing and unreferenced media files"
+    )
+    p_media_audit.add_argument("--input", "-i", help="Input directory")
+    p_media_audit.add_argument(
+        "--db", help="Decrypted msgstore.db (default: <input>/msgstore.db)"
+    )
+    p_media_audit.add_argument(
+        "--hashes", action="store_true",
+        help="Refresh the media index and also match files by SHA-256"
+    )
+    p_media_audit.add_argument(
+        "--prune", action="store_true",
+        help="Delete orphan files (honours --dry-run)"
+    )
+    p_media_audit.add_argument(
+        "--json", action="store_true", help="Print the report as JSON"
+    )
+    p_media_audit.add_argument(
+        "--limit", type=int, help="List at most this many files per list"
+    )
+
+    # Thumbnails
+    p_thumbs = subparsers.add_parser(
+        "extract-thumbnails",
+        help="Save thumbnails embedded in msgstore.db as image files"
+    )
+    p_thumbs.add_argument("--input", "-i", help="Input directory")
+    p_thumbs.add_argument(
+        "--db", help="Decrypted msgstore.db (default: <input>/msgstore.db)"
+    )
+    p_thumbs.add_argument(
+        "--out-dir", help="Output directory (default: <input>/export/"
+        "thumbnails)"
+    )
+    p_thumbs.add_argument(
+        "--workers", type=int, help="Writer threads (default: 4)"
+    )
+    p_thumbs.add_argument(
+        "--full", action="store_true",
+        help="Extract everything instead of resuming"
+    )
+
+    # Stats
+    p_stats = subparsers.add_parser(
+        "stats",
+        help="Percentiles and trends of past runs per device"
+    )
+    p_stats.add_argument(
+        "--command", dest="for_command",
+        help="Only runs of this command (e.g. all, pull)"
+    )
+    p_stats.add_argument(
+        "--days", type=float, help="Only runs from the last N days"
+    )
+    p_stats.add_argument(
+        "--json", action="store_true", help="Print the statistics as JSON"
+    )
+
+    # Plan
+    p_plan = subparsers.add_parser(
+        "plan",
+        help="Show what a run would transfer, how long it should take "
+             "and whether it fits on disk"
+    )
+    p_plan.add_argument(
+        "--for", dest="for_command", choices=PLAN_COMMANDS, default="all",
+        help="Command to plan (default: all)"
+    )
+    p_plan.add_argument(
+        "--pull-device", help="Device ID specifically for pulling"
+    )
+    p_plan.add_argument(
+        "--push-device", help="Device ID specifically for pushing"
+    )
+    p_plan.add_argument(
+        "--json", action="store_true", help="Print the plan as JSON"
+    )
+
+    # Watch
+    p_watch = subparsers.add_parser(
+        "watch",
+        help="Back up devices automatically when they are plugged in"
+    )
+    p_watch.add_argument(
+        "--serial", action="append", dest="watch_serials",
+        help="Only back up this device (repeatable; default: any device)"
+    )
+    p_watch.add_argument(
+        "--cooldown", type=float,
+        help="Seconds before the same device is backed up again "
+             "(default: 600)"
+    )
+    p_watch.add_argument(
+        "--queue-size", type=int,
+        help="Backups that may wait for the running one (default: 4)"
+    )
+
+    # Check Key
+    p_check = subparsers.add_parser(
+        "check-key", help="Validate the key against a backup in milliseconds"
+    )
+    p_check.add_argument(
+        "--file", "-f", help="crypt15 file (default: pulled msgstore)"
+    )
+    p_check.add_argument("--input", "-i", help="Input directory")
+
     # All / Orchestrator
     p_all = subparsers.add_parser(
         "all", help="Run full pull->decrypt->convert->push workflow"
@@ -73,9 +400,20 @@ def main() -> None:
 
     args = parser.parse_args()
 
+    # Stage spans are always recorded; they feed the run history
+    tracing.enable()
+    if args.trace:
+        atexit.register(tracing.finish, args.trace)
+
     # Load Config
     config = load_config(args.config)
     merge_args_with_config(args, config)
+    progress.set_mode(args.progress or config.get('progress'))
+    if args.profile or args.profile_memory:
+        profile_dir = profiling.enable(
+            _output_dir(args), memory=args.profile_memory
+        )
+        print(f"Profiling into {profile_dir}")
 
     # Sync resolved CLI overrides back to Config for subcommands that use it
     config['output'] = args.output
@@ -91,6 +429,89 @@ def main() -> None:
         config['push_device'] = args.push_device
     if hasattr(args, 'dry_run'):
         config['dry_run'] = args.dry_run
+    if getattr(args, 'key_ring', None):
+        config['key_ring'] = args.key_ring
+    if getattr(args, 'key_file', None):
+        config['key_file'] = args.key_file
+    if getattr(args, 'all_files', False):
+        config['decrypt_all_files'] = True
+    if getattr(args, 'no_cache', False):
+        config['decrypt_cache'] = False
+
+    started = time.time()
+    status = 1
+    keep_history = bool(
+        not args.no_history and config.get('history', True)
+    )
+    reporter = None
+    metrics_file = args.metrics_file or config.get('metrics_file')
+    if metrics_file:
+        reporter = MetricsReporter(
+            os.path.abspath(metrics_file),
+            history.history_path(_output_dir(args)) if keep_history
+            else None,
+            args.command, started
+        )
+        reporter.start()
+    try:
+        _dispatch(parser, args, config)
+        status = 0
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else 1
+        raise
+    finally:
+        # watch records each of its backups as a run of its own
+        if keep_history and args.command not in UNRECORDED_COMMANDS:
+            _record_history(args, config, started, status)
+        if reporter is not None:
+            reporter.stop(status)
+
+
+def _output_dir(args: argparse.Namespace) -> str:
+    """The run's output directory (convert's --output is a file)."""
+    if args.command == "convert":
+        return os.path.dirname(os.path.abspath(args.output))
+    return os.path.abspath(args.output)
+
+
+def _record_history(
+    args: argparse.Namespace, config: Config, started: float, status: int
+) -> None:
+    """Appends this run to the history in the output directory."""
+    output_dir = _output_dir(args)
+    if not os.path.isdir(output_dir):
+        return
+    rows = tracing.summary()
+    device = model = None
+    if args.command in history.DEVICE_COMMANDS:
+        if args.command == "push":
+            device = config.get('push_device') or config.get('device')
+        else:
+            device = config.get('pull_device') or config.get('device')
+        device, model = history.device_identity(device)
+    try:
+        history.record_run(
+            history.history_path(output_dir), args.command, started,
+            status, rows, device, model,
+            dry_run=bool(config.get('dry_run', False)),
+            errors=tracing.errors()
+        )
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: Could not record run history: {e}")
+
+
+def _dispatch(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    config: Config
+) -> None:
+    # A dry run starts with the plan and stops if it would fill the disk
+    if (
+        config.get('dry_run') and args.command in PLAN_COMMANDS
+        and not check_plan(config, args.command)
+    ):
+        print("Aborted: The run would not fit in the output directory.")
+        sys.exit(1)
 
     # Dispatch
     if args.command == "pull":
@@ -115,10 +536,16 @@ def main() -> None:
             config.get('device')
         )
 
+        encrypt_key = config.get('key') if args.encrypt else None
+        if args.encrypt and not encrypt_key:
+            print("Error: --encrypt needs a key (via CLI or config.json).")
+            sys.exit(1)
+
         success = push_whatsapp(
             input_path,
             device_id,
-            dry_run=config.get('dry_run', False)
+            dry_run=config.get('dry_run', False),
+            encrypt_key=encrypt_key
         )
         sys.exit(0 if success else 1)
 
@@ -130,6 +557,112 @@ def main() -> None:
         # Convert has a different signature (file paths, not config object
         # primarily). But we can still support it.
         sys.exit(convert_vcf(args.input, args.output))
+    elif args.command == "encrypt":
+        sys.exit(encrypt_database(
+            config,
+            input_file=args.file,
+            output_file=args.out_file,
+            reference=args.reference
+        ))
+    elif args.command == "export":
+        sys.exit(export_chats(
+            config,
+            db_path=args.db,
+            output_dir=args.out_dir,
+            formats=[f.strip() for f in args.format.split(",") if f.strip()],
+            workers=args.workers,
+            full=args.full
+        ))
+    elif args.command == "search":
+        sys.exit(search_messages(
+            config,
+            args.query,
+            chat=args.chat,
+            sender=args.sender,
+            since=args.since,
+            until=args.until,
+            limit=args.limit,
+            as_json=args.json,
+            raw=args.raw,
+            rebuild=args.rebuild
+        ))
+    elif args.command == "merge":
+        sys.exit(merge_snapshot(
+            config,
+            db_path=args.db,
+            archive_path=args.archive,
+            source=args.source
+        ))
+    elif args.command == "diff":
+        sys.exit(diff_snapshots(
+            config,
+            args.old,
+            new=args.new,
+            old_manifest=args.old_manifest,
+            write_manifest=args.write_manifest,
+            as_json=args.json,
+            limit=args.limit if args.limit or args.json else 20,
+            messages=not args.no_messages,
+            media=not args.no_media
+        ))
+    elif args.command == "media" and args.media_command == "index":
+        sys.exit(index_media(
+            config, catalog=args.catalog, hash_files=not args.no_hash
+        ))
+    elif args.command == "media" and args.media_command == "audit":
+        sys.exit(audit_media_files(
+            config,
+            db_path=args.db,
+            use_hashes=args.hashes,
+            prune=args.prune,
+            as_json=args.json,
+            limit=args.limit if args.limit or args.json else 20
+        ))
+    elif args.command == "media":
+        sys.exit(query_media(
+            config,
+            catalog=args.catalog,
+            kind=args.kind,
+            folder=args.folder,
+            since=args.since,
+            until=args.until,
+            min_size=args.min_size,
+            max_size=args.max_size,
+            ext=args.ext,
+            name=args.name,
+            limit=args.limit,
+            as_json=args.json
+        ))
+    elif args.command == "extract-thumbnails":
+        sys.exit(extract_thumbnails(
+            config,
+            db_path=args.db,
+            output_dir=args.out_dir,
+            workers=args.workers,
+            full=args.full
+        ))
+    elif args.command == "stats":
+        sys.exit(show_stats(
+            config,
+            device=args.device,
+            command=args.for_command,
+            days=args.days,
+            as_json=args.json
+        ))
+    elif args.command == "plan":
+        sys.exit(plan_run(config, args.for_command, as_json=args.json))
+    elif args.command == "watch":
+        sys.exit(watch_devices(
+            config,
+            serials=args.watch_serials,
+            cooldown=args.cooldown,
+            queue_size=args.queue_size,
+            record_history=bool(
+                not args.no_history and config.get('history', True)
+            )
+        ))
+    elif args.command == "check-key":
+        sys.exit(check_backup_key(config, input_file=args.file))
     elif args.command == "all":
         sys.exit(run_orchestrator(config))
     else:
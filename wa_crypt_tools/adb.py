@@ -1,5 +1,18 @@
+import os
+import shlex
 import subprocess
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, NamedTuple, Sequence, Union
+
+from wa_crypt_tools import tracing
+
+# Overrides the adb executable, e.g. a path, or a command line such as
+# "python -m wa_crypt_tools.testing.fake_adb" for a fake device
+ADB_ENV = "WA_ADB"
+# adb subcommands, used to name trace spans
+ADB_VERBS = (
+    "devices", "get-state", "shell", "exec-out", "pull", "push",
+    "wait-for-device", "version"
+)
 
 
 class AdbError(Exception):
@@ -7,30 +20,50 @@ class AdbError(Exception):
     pass
 
 
+class RemoteFile(NamedTuple):
+    """A regular file on the device, as reported by a remote listing."""
+    path: str
+    size: int
+    mtime: int
+
+
 def get_adb_base(device_id: Optional[str] = None) -> List[str]:
     """Returns the base adb command list, optionally with device serial."""
-    cmd = ["adb"]
+    cmd = shlex.split(os.environ.get(ADB_ENV) or "adb")
     if device_id:
         cmd.extend(["-s", device_id])
     return cmd
 
 
+def command_name(cmd: List[str]) -> str:
+    """Trace span name of an adb command line, e.g. 'adb pull'."""
+    verb = next((a for a in cmd[1:] if a in ADB_VERBS), "")
+    if verb == "shell" and cmd[-1] != "shell":
+        # e.g. 'adb shell [' for the existence probes, which fail
+        # whenever the file is missing
+        verb += " " + cmd[cmd.index("shell") + 1].split(" ", 1)[0]
+    return f"adb {verb}".strip()
+
+
 def run_adb_command(cmd: List[str], check: bool = True) -> str:
     """Runs an ADB command and returns the output as string."""
     try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=check,
-            text=True
-        )
+        with tracing.span(command_name(cmd), tracing.SUBPROCESS):
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=check,
+                text=True
+            )
         return result.stdout.strip()
     except subprocess.CalledProcessError as e:
         error_msg = e.stderr.strip() if e.stderr else "Unknown ADB error"
         raise AdbError(
             f"ADB command failed: {' '.join(cmd)}\nError: {error_msg}"
         )
+    except FileNotFoundError:
+        raise AdbError(f"ADB executable not found: {cmd[0]}")
 
 
 def check_connection(device_id: Optional[str] = None) -> bool:
@@ -52,16 +85,66 @@ def get_product_model(device_id: str) -> str:
         return "Unknown Model"
 
 
+def list_remote_files(
+    remote_dirs: Union[str, Sequence[str]],
+    device_id: Optional[str] = None,
+    missing_ok: bool = False
+) -> List[RemoteFile]:
+    """
+    Lists every regular file below remote_dirs with its size and mtime.
+    Uses a single 'find ... -exec stat' round trip instead of one adb
+    call per file. Raises AdbError if the listing cannot be produced;
+    with missing_ok, roots that do not exist are skipped instead.
+    """
+    output = run_adb_command(
+        get_adb_base(device_id) + listing_args(remote_dirs),
+        check=not missing_ok
+    )
+    return parse_listing(output)
+
+
+def listing_args(remote_dirs: Union[str, Sequence[str]]) -> List[str]:
+    """adb arguments that list the files below remote_dirs."""
+    if isinstance(remote_dirs, str):
+        remote_dirs = [remote_dirs]
+    roots = " ".join(f"'{d}'" for d in remote_dirs)
+    return [
+        "shell",
+        f"find {roots} -type f -exec stat -c '%s %Y %n' {{}} +"
+    ]
+
+
+def parse_listing(output: str) -> List[RemoteFile]:
+    """Parses the output of the listing_args() command."""
+    files = []
+    for line in output.splitlines():
+        # "<size> <mtime> <path>", path may contain spaces
+        parts = line.split(" ", 2)
+        if len(parts) != 3:
+            continue
+        try:
+            size, mtime = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        files.append(RemoteFile(parts[2], size, mtime))
+
+    return files
+
+
 def list_devices() -> List[Dict[str, str]]:
     """
     Lists connected ADB devices with details.
     Returns a list of dicts: {'id': str, 'model': str, 'state': str}
     """
     try:
-        output = run_adb_command(["adb", "devices", "-l"])
+        output = run_adb_command(get_adb_base() + ["devices", "-l"])
     except AdbError:
         return []
+    return parse_devices(output)
+
 
+def parse_devices(output: str) -> List[Dict[str, str]]:
+    """Parses 'adb devices -l' output, see list_devices()."""
     lines = output.splitlines()
     if not lines:
         return []
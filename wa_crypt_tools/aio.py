@@ -0,0 +1,249 @@
+"""
+asyncio core: adb calls as awaitables, so one event loop can drive many
+devices and transfers at once instead of a thread per blocking call.
+
+The adb helpers mirror wa_crypt_tools.adb (same commands, parsing and
+errors). pull_files() and push_tree() run their adb calls concurrently,
+at most `transfers` at a time. The command stages are blocking code
+shared with the CLI; their awaitable forms run them in worker threads,
+so stages of different devices overlap while the CLI stays unchanged.
+"""
+import os
+import time
+import asyncio
+import functools
+import posixpath
+from pathlib import Path
+from typing import (
+    Any, Callable, Dict, List, Optional, Sequence, TypeVar, Union
+)
+
+from wa_crypt_tools import tracing
+from wa_crypt_tools.adb import (
+    AdbError, RemoteFile, command_name, get_adb_base, listing_args,
+    parse_devices, parse_listing
+)
+from wa_crypt_tools.commands import pull, push, decrypt
+from wa_crypt_tools.config import Config
+from wa_crypt_tools.scheduler import batch_by_directory
+
+# adb calls of one pull_files()/push_tree() running at the same time
+DEFAULT_TRANSFERS = 4
+# Longest output line read from adb (find listings of long paths)
+STREAM_LIMIT = 1 << 20
+
+T = TypeVar("T")
+
+
+async def run_adb_command(
+    cmd: List[str],
+    check: bool = True,
+    on_line: Optional[Callable[[str], None]] = None
+) -> str:
+    """
+    Runs an ADB command and returns its output; on_line, if given, sees
+    each line as it arrives. Cancelling the task kills the command.
+    """
+    started = time.perf_counter_ns()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT
+        )
+    except FileNotFoundError:
+        raise AdbError(f"ADB executable not found: {cmd[0]}")
+    assert proc.stdout is not None and proc.stderr is not None
+
+    lines = []
+    error: Optional[str] = None
+    stderr = asyncio.ensure_future(proc.stderr.read())
+    try:
+        async for raw in proc.stdout:
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            lines.append(line)
+            if on_line is not None:
+                on_line(line)
+        status = await proc.wait()
+        error_output = (await stderr).decode("utf-8", "replace").strip()
+        if check and status != 0:
+            error = AdbError.__name__
+            raise AdbError(
+                f"ADB command failed: {' '.join(cmd)}\n"
+                f"Error: {error_output or 'Unknown ADB error'}"
+            )
+    except asyncio.CancelledError:
+        error = asyncio.CancelledError.__name__
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        stderr.cancel()
+        raise
+    finally:
+        tracing.record(command_name(cmd), tracing.SUBPROCESS, started,
+                       time.perf_counter_ns(),
+                       **({"error": error} if error else {}))
+    return "\n".join(lines).strip()
+
+
+async def check_connection(device_id: Optional[str] = None) -> bool:
+    """Checks if a specific device (or any device) is connected."""
+    try:
+        await run_adb_command(get_adb_base(device_id) + ["get-state"])
+        return True
+    except AdbError:
+        return False
+
+
+async def get_product_model(device_id: str) -> str:
+    """Attempts to get a descriptive product model for the device."""
+    try:
+        return await run_adb_command(get_adb_base(device_id) + [
+            "shell", "getprop", "ro.product.model"
+        ])
+    except AdbError:
+        return "Unknown Model"
+
+
+async def list_devices() -> List[Dict[str, str]]:
+    """
+    Like adb.list_devices(), with the model of every online device read
+    from the device itself, all devices queried at once.
+    """
+    try:
+        output = await run_adb_command(get_adb_base() + ["devices", "-l"])
+    except AdbError:
+        return []
+    devices = parse_devices(output)
+    online = [d for d in devices if d["state"] == "device"]
+    models = await asyncio.gather(
+        *(get_product_model(d["id"]) for d in online)
+    )
+    for device, model in zip(online, models):
+        if model != "Unknown Model":
+            device["model"] = model
+    return devices
+
+
+async def list_remote_files(
+    remote_dirs: Union[str, Sequence[str]],
+    device_id: Optional[str] = None,
+    missing_ok: bool = False
+) -> List[RemoteFile]:
+    """See adb.list_remote_files()."""
+    output = await run_adb_command(
+        get_adb_base(device_id) + listing_args(remote_dirs),
+        check=not missing_ok
+    )
+    return parse_listing(output)
+
+
+async def _bounded(
+    semaphore: asyncio.Semaphore, call: Callable[[], Any]
+) -> bool:
+    """Runs one transfer; False if its adb call failed."""
+    async with semaphore:
+        try:
+            await call()
+            return True
+        except AdbError:
+            return False
+
+
+async def pull_files(
+    files: List[RemoteFile],
+    remote_root: str,
+    local_root: str,
+    device_id: Optional[str] = None,
+    transfers: int = DEFAULT_TRANSFERS
+) -> int:
+    """
+    Pulls files below remote_root into the same layout below local_root,
+    one adb call per directory batch, up to transfers at once. Batches
+    start in the given (priority) order. Returns the number of files
+    that failed to pull.
+    """
+    base = get_adb_base(device_id)
+    semaphore = asyncio.Semaphore(max(transfers, 1))
+    calls = []
+    for remote_dir, batch in batch_by_directory(files):
+        local_dir = os.path.normpath(os.path.join(
+            local_root, posixpath.relpath(remote_dir, remote_root)
+        ))
+        os.makedirs(local_dir, exist_ok=True)
+        calls.append((len(batch), functools.partial(
+            run_adb_command,
+            base + ["pull"] + [f.path for f in batch] + [local_dir]
+        )))
+
+    results = await asyncio.gather(*(
+        _bounded(semaphore, call) for _, call in calls
+    ))
+    return sum(count for (count, _), ok in zip(calls, results) if not ok)
+
+
+async def push_tree(
+    local_wa: str,
+    device_id: Optional[str] = None,
+    target_base: str = "/sdcard/Android/media/com.whatsapp",
+    transfers: int = DEFAULT_TRANSFERS
+) -> int:
+    """
+    Pushes the local WhatsApp folder into target_base, its entries (and
+    Media folders) up to transfers at once. Returns the number of
+    entries that failed to push.
+    """
+    base = get_adb_base(device_id)
+    remote_wa = posixpath.join(target_base, "WhatsApp")
+    await run_adb_command(base + ["shell", f"mkdir -p '{remote_wa}/Media'"])
+    semaphore = asyncio.Semaphore(max(transfers, 1))
+    results = await asyncio.gather(*(
+        _bounded(semaphore, functools.partial(
+            run_adb_command,
+            base + ["push", path, posixpath.join(remote_wa, parent)]
+        ))
+        for path, parent, _, _ in push._push_units(local_wa)
+    ))
+    return results.count(False)
+
+
+async def run_stage(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Awaits a blocking stage by running it in a worker thread."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def pull_data(
+    config: Config,
+    device_id: Optional[str] = None,
+    on_tier_complete: Optional[pull.TierCallback] = None,
+    cancel: Optional[pull.CancelCheck] = None
+) -> int:
+    """Awaitable commands.pull.pull_data()."""
+    return await run_stage(
+        pull.pull_data, config, device_id, on_tier_complete, cancel
+    )
+
+
+async def decrypt_database(
+    config: Config,
+    input_dir: Optional[str] = None,
+    key: Optional[str] = None
+) -> int:
+    """Awaitable commands.decrypt.decrypt_database()."""
+    return await run_stage(decrypt.decrypt_database, config, input_dir, key)
+
+
+async def push_whatsapp(
+    input_path: Path,
+    device_id: Optional[str] = None,
+    dry_run: bool = False,
+    encrypt_key: Optional[str] = None
+) -> bool:
+    """Awaitable commands.push.push_whatsapp()."""
+    return await run_stage(
+        push.push_whatsapp, input_path, device_id, dry_run, encrypt_key
+    )
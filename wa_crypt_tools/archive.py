@@ -0,0 +1,184 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple
+
+from wa_crypt_tools.msgstore import SCHEMA_LEGACY, SCHEMA_MODERN, MsgStore
+
+ARCHIVE_FILENAME = "archive.db"
+DEFAULT_SOURCE = "default"
+# Source _id range merged per statement, all within one transaction
+MERGE_BATCH_SIZE = 200000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    jid TEXT PRIMARY KEY,
+    subject TEXT,
+    sort_timestamp INTEGER
+);
+CREATE TABLE IF NOT EXISTS messages (
+    _id INTEGER PRIMARY KEY,
+    key_remote_jid TEXT NOT NULL,
+    key_id TEXT NOT NULL,
+    from_me INTEGER NOT NULL,
+    sender_jid TEXT,
+    timestamp INTEGER,
+    text TEXT,
+    media_path TEXT,
+    media_mime TEXT,
+    first_merged TEXT,
+    last_merged TEXT,
+    UNIQUE (key_remote_jid, key_id, from_me)
+);
+CREATE INDEX IF NOT EXISTS messages_chat
+    ON messages (key_remote_jid, timestamp);
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    last_id INTEGER,
+    last_key_id TEXT,
+    merged_at TEXT
+);
+"""
+
+# Per schema: the source rows with _id in (:lo, :hi]
+SOURCE_MESSAGES_SQL: Dict[str, str] = {
+    SCHEMA_MODERN: """
+        SELECT cj.raw_string, m.key_id, m.from_me, sj.raw_string,
+               m.timestamp, m.text_data, mm.file_path, mm.mime_type
+        FROM src.message AS m
+        JOIN src.chat AS c ON c._id = m.chat_row_id
+        JOIN src.jid AS cj ON cj._id = c.jid_row_id
+        LEFT JOIN src.jid AS sj ON sj._id = m.sender_jid_row_id
+        LEFT JOIN src.message_media AS mm ON mm.message_row_id = m._id
+        WHERE m._id > :lo AND m._id <= :hi AND m.key_id IS NOT NULL
+    """,
+    SCHEMA_LEGACY: """
+        SELECT m.key_remote_jid, m.key_id, m.key_from_me,
+               NULLIF(m.remote_resource, ''), m.timestamp, m.data, NULL,
+               m.media_mime_type
+        FROM src.messages AS m
+        WHERE m._id > :lo AND m._id <= :hi AND m.key_id IS NOT NULL
+          AND m.key_remote_jid IS NOT NULL
+    """,
+}
+SOURCE_CHATS_SQL: Dict[str, str] = {
+    SCHEMA_MODERN: """
+        SELECT j.raw_string, c.subject, c.sort_timestamp
+        FROM src.chat AS c JOIN src.jid AS j ON j._id = c.jid_row_id
+        WHERE j.raw_string IS NOT NULL
+    """,
+    SCHEMA_LEGACY: """
+        SELECT key_remote_jid, subject, sort_timestamp FROM src.chat_list
+        WHERE key_remote_jid IS NOT NULL
+    """,
+}
+SOURCE_LAST_SQL: Dict[str, str] = {
+    SCHEMA_MODERN: "SELECT _id, key_id FROM src.message",
+    SCHEMA_LEGACY: "SELECT _id, key_id FROM src.messages",
+}
+
+# A message seen before keeps its row; later snapshots only fill gaps
+# (e.g. a media path that was not known yet) and refresh last_merged.
+UPSERT_MESSAGES_SQL = """
+    INSERT INTO messages (key_remote_jid, key_id, from_me, sender_jid,
+                          timestamp, text, media_path, media_mime,
+                          first_merged, last_merged)
+    SELECT *, :now, :now FROM ({select})
+    WHERE true
+    ON CONFLICT (key_remote_jid, key_id, from_me) DO UPDATE SET
+        text = COALESCE(excluded.text, messages.text),
+        media_path = COALESCE(excluded.media_path, messages.media_path),
+        media_mime = COALESCE(excluded.media_mime, messages.media_mime),
+        last_merged = excluded.last_merged
+"""
+UPSERT_CHATS_SQL = """
+    INSERT INTO chats (jid, subject, sort_timestamp)
+    SELECT * FROM ({select})
+    WHERE true
+    ON CONFLICT (jid) DO UPDATE SET
+        subject = COALESCE(excluded.subject, chats.subject),
+        sort_timestamp = MAX(excluded.sort_timestamp, chats.sort_timestamp)
+"""
+
+
+class MergeResult(NamedTuple):
+    added: int
+    scanned_from: int
+    last_id: int
+    full_scan: bool
+
+
+def _sqlite_uri(path: str, mode: str) -> str:
+    return "file:" + os.path.abspath(path) + "?mode=" + mode
+
+
+def merge_into_archive(
+    archive_path: str,
+    db_path: str,
+    source: str = DEFAULT_SOURCE,
+    batch_size: int = MERGE_BATCH_SIZE
+) -> MergeResult:
+    """
+    Folds a decrypted msgstore.db into the archive at archive_path.
+
+    Messages are deduplicated on (key_remote_jid, key_id, from_me), so
+    messages deleted from later snapshots stay in the archive. Only source
+    rows past the high-water mark recorded for source are read; if the
+    message at that mark changed (restore on a new phone), the whole
+    snapshot is scanned again, which is safe thanks to the upsert.
+    """
+    with MsgStore(db_path) as store:
+        schema = store.schema
+
+    conn = sqlite3.connect(_sqlite_uri(archive_path, "rwc"), uri=True)
+    try:
+        conn.executescript(SCHEMA)
+        conn.execute(
+            "ATTACH DATABASE ? AS src", (_sqlite_uri(db_path, "ro"),)
+        )
+
+        row = conn.execute(
+            "SELECT last_id, last_key_id FROM sources WHERE source = ?",
+            (source,)
+        ).fetchone()
+        last_id = row[0] if row else 0
+        if row and last_id:
+            probe = conn.execute(
+                SOURCE_LAST_SQL[schema] + " WHERE _id = ?", (last_id,)
+            ).fetchone()
+            if probe is None or probe[1] != row[1]:
+                last_id = 0
+        full_scan = last_id == 0
+
+        newest = conn.execute(
+            SOURCE_LAST_SQL[schema] + " ORDER BY _id DESC LIMIT 1"
+        ).fetchone()
+        top = newest[0] if newest else 0
+
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        before = conn.execute(
+            "SELECT COALESCE(MAX(_id), 0) FROM messages"
+        ).fetchone()[0]
+        upsert = UPSERT_MESSAGES_SQL.format(
+            select=SOURCE_MESSAGES_SQL[schema]
+        )
+        with conn:
+            start = last_id
+            while start < top:
+                end = min(start + batch_size, top)
+                conn.execute(upsert, {"now": now, "lo": start, "hi": end})
+                start = end
+            conn.execute(
+                UPSERT_CHATS_SQL.format(select=SOURCE_CHATS_SQL[schema])
+            )
+            if newest:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                    (source, newest[0], newest[1], now)
+                )
+        added = conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE _id > ?", (before,)
+        ).fetchone()[0]
+        return MergeResult(added, last_id, top, full_scan)
+    finally:
+        conn.close()
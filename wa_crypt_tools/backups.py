@@ -0,0 +1,68 @@
+import re
+import posixpath
+from typing import Dict, List, Optional, Tuple
+
+from wa_crypt_tools.adb import RemoteFile
+
+# Number of rotated copies kept per database when not configured
+DEFAULT_KEEP_ROTATED = 1
+
+# Databases needed to decrypt and read the chats; pulled in the first tier
+PRIMARY_DATABASES = ("msgstore", "wa")
+
+# msgstore-2024-01-31.1.db.crypt15 / settings-2024-01-31.1.db.crypt15
+ROTATED_RE = re.compile(
+    r"^(?P<name>.+?)-(?P<date>\d{4}-\d{2}-\d{2})\.(?P<seq>\d+)"
+    r"\.db\.crypt\d+$"
+)
+# msgstore.db.crypt15 / wa.db.crypt14
+CURRENT_RE = re.compile(r"^(?P<name>.+?)\.db\.crypt\d+$")
+
+
+def parse_backup_name(path: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns (database name, rotation date) for a crypt backup file.
+    The date is None for the current backup, and both are None for
+    files that are not crypt databases.
+    """
+    filename = posixpath.basename(path)
+    match = ROTATED_RE.match(filename)
+    if match:
+        return match.group("name"), match.group("date")
+    match = CURRENT_RE.match(filename)
+    if match:
+        return match.group("name"), None
+    return None, None
+
+
+def select_backups(
+    files: List[RemoteFile],
+    keep_rotated: int = DEFAULT_KEEP_ROTATED
+) -> Tuple[List[RemoteFile], List[RemoteFile]]:
+    """
+    Applies the backup selection policy to a Databases/Backups listing.
+
+    Returns (primary, secondary):
+    - primary: current msgstore and wa databases.
+    - secondary: every other current backup (settings, stickers, ...),
+      plus the newest keep_rotated rotated copies of each database.
+    Older rotated copies are left on the device.
+    """
+    primary: List[RemoteFile] = []
+    secondary: List[RemoteFile] = []
+    rotated: Dict[str, List[Tuple[str, RemoteFile]]] = {}
+
+    for f in files:
+        name, date = parse_backup_name(f.path)
+        if name is not None and date is not None:
+            rotated.setdefault(name, []).append((date, f))
+        elif name in PRIMARY_DATABASES:
+            primary.append(f)
+        else:
+            secondary.append(f)
+
+    for copies in rotated.values():
+        copies.sort(key=lambda c: (c[0], c[1].mtime), reverse=True)
+        secondary.extend(f for _, f in copies[:max(keep_rotated, 0)])
+
+    return primary, secondary
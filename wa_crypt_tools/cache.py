@@ -0,0 +1,233 @@
+import os
+import json
+import shutil
+import hashlib
+from typing import Any, Dict, Optional
+
+from wa_crypt_tools import __version__
+
+CACHE_DIRNAME = ".wa_cache"
+DECRYPT_CACHE_FILENAME = "decrypt.json"
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Returns the hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def key_fingerprint(key: str) -> str:
+    """Short, non-reversible identifier for a decryption key."""
+    return hashlib.sha256(key.strip().lower().encode()).hexdigest()[:16]
+
+
+def _stat_signature(path: str) -> Dict[str, int]:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class DecryptCache:
+    """
+    Remembers which plaintext each crypt file decrypted to.
+
+    Entries are keyed by (ciphertext SHA-256, key fingerprint, engine);
+    engine defaults to the one given here and can be set per call.
+    Ciphertext hashes are cached by size+mtime so an unchanged crypt file
+    is never re-read. Plaintexts are kept as hardlinks under
+    <base>/.wa_cache/plaintext so a deleted output can be restored
+    without decrypting again.
+
+    All operations are best-effort: any I/O problem is treated as a miss.
+    """
+
+    def __init__(self, base_dir: str, engine: str = "wadecrypt") -> None:
+        self.cache_dir = os.path.join(base_dir, CACHE_DIRNAME)
+        self.index_path = os.path.join(
+            self.cache_dir, DECRYPT_CACHE_FILENAME
+        )
+        self.blob_dir = os.path.join(self.cache_dir, "plaintext")
+        self.engine = engine
+        self.data: Dict[str, Dict[str, Any]] = {"hashes": {}, "entries": {}}
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                loaded = json.load(f)
+            self.data["hashes"] = dict(loaded.get("hashes", {}))
+            self.data["entries"] = dict(loaded.get("entries", {}))
+        except (OSError, ValueError, AttributeError):
+            print("Warning: Ignoring unreadable decrypt cache.")
+
+    def _save(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _cipher_hash(self, crypt_path: str) -> str:
+        """SHA-256 of the crypt file, skipping the read if size+mtime match."""
+        crypt_abs = os.path.abspath(crypt_path)
+        signature = _stat_signature(crypt_abs)
+        known = self.data["hashes"].get(crypt_abs)
+        if known and all(known.get(k) == v for k, v in signature.items()):
+            return str(known["sha256"])
+        digest = file_sha256(crypt_abs)
+        self.data["hashes"][crypt_abs] = dict(signature, sha256=digest)
+        return digest
+
+    def _version(self, engine: Optional[str]) -> str:
+        return f"{__version__}/{engine or self.engine}"
+
+    def _entry_key(
+        self, crypt_path: str, key: str, engine: Optional[str] = None
+    ) -> str:
+        return ":".join([
+            self._cipher_hash(crypt_path), key_fingerprint(key),
+            self._version(engine)
+        ])
+
+    def _blob_path(self, plain_sha: str) -> str:
+        return os.path.join(self.blob_dir, plain_sha + ".db")
+
+    def lookup(
+        self,
+        crypt_path: str,
+        key: str,
+        output_path: str,
+        restore: bool = True,
+        engine: Optional[str] = None
+    ) -> bool:
+        """
+        Returns True if output_path holds (or, with restore, was made to
+        hold) the plaintext of crypt_path for this key.
+        """
+        try:
+            entry: Optional[Dict[str, Any]] = self.data["entries"].get(
+                self._entry_key(crypt_path, key, engine)
+            )
+            if not entry:
+                return False
+
+            # Fast path: output untouched since we recorded it
+            if os.path.exists(output_path):
+                signature = _stat_signature(output_path)
+                if entry.get("output") == signature:
+                    return True
+                if file_sha256(output_path) == entry["sha256"]:
+                    entry["output"] = signature
+                    if restore:
+                        self._save()
+                    return True
+
+            blob = self._blob_path(entry["sha256"])
+            if not os.path.exists(blob):
+                return False
+            if not restore:
+                return True
+            if file_sha256(blob) != entry["sha256"]:
+                return False
+
+            tmp_path = output_path + ".tmp"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            try:
+                os.link(blob, tmp_path)
+            except OSError:
+                shutil.copy2(blob, tmp_path)
+            os.replace(tmp_path, output_path)
+            entry["output"] = _stat_signature(output_path)
+            self._save()
+            return True
+        except (OSError, KeyError):
+            return False
+
+    def likely_hit(
+        self,
+        crypt_name: str,
+        size: int,
+        key: str,
+        engine: Optional[str] = None
+    ) -> bool:
+        """
+        True if a crypt file with this name and size was decrypted with
+        key before, for planning before the file is even pulled. Only a
+        guess: the ciphertext itself is not compared.
+        """
+        suffix = f":{key_fingerprint(key)}:{self._version(engine)}"
+        for path, known in self.data["hashes"].items():
+            if (
+                os.path.basename(path) == crypt_name
+                and known.get("size") == size
+                and str(known.get("sha256")) + suffix in self.data["entries"]
+            ):
+                return True
+        return False
+
+    def plaintext_size(self, output_path: str) -> Optional[int]:
+        """Size of the last recorded plaintext for output_path."""
+        output_abs = os.path.abspath(output_path)
+        for entry in self.data["entries"].values():
+            if entry.get("path") == output_abs:
+                return int(entry.get("output", {}).get("size", 0)) or None
+        return None
+
+    def detach(self, output_path: str) -> None:
+        """
+        Unlinks output_path if it shares its inode with a cached blob,
+        so a decrypt writing into it cannot clobber the cache.
+        """
+        try:
+            if os.stat(output_path).st_nlink > 1:
+                os.remove(output_path)
+        except OSError:
+            pass
+
+    def store(
+        self,
+        crypt_path: str,
+        key: str,
+        output_path: str,
+        engine: Optional[str] = None
+    ) -> None:
+        """Records a fresh decrypt of crypt_path into output_path."""
+        try:
+            output_abs = os.path.abspath(output_path)
+            plain_sha = file_sha256(output_abs)
+            blob = self._blob_path(plain_sha)
+            if not os.path.exists(blob):
+                os.makedirs(self.blob_dir, exist_ok=True)
+                try:
+                    os.link(output_abs, blob)
+                except OSError:
+                    shutil.copy2(output_abs, blob)
+
+            # One entry per output: older plaintexts of it are dropped
+            entries = self.data["entries"]
+            for stale in [
+                k for k, v in entries.items() if v.get("path") == output_abs
+            ]:
+                del entries[stale]
+            entries[self._entry_key(crypt_path, key, engine)] = {
+                "path": output_abs,
+                "sha256": plain_sha,
+                "output": _stat_signature(output_abs),
+            }
+            self._prune_blobs()
+            self._save()
+        except OSError as e:
+            print(f"Warning: Could not update decrypt cache: {e}")
+
+    def _prune_blobs(self) -> None:
+        referenced = {
+            e["sha256"] + ".db" for e in self.data["entries"].values()
+        }
+        for name in os.listdir(self.blob_dir):
+            if name not in referenced:
+                os.remove(os.path.join(self.blob_dir, name))
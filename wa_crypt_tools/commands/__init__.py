@@ -3,6 +3,17 @@ from .push import push_whatsapp
 from .decrypt import decrypt_database
 from .convert import convert_vcf
 from .orchestrator import run_orchestrator
+from .check_key import check_backup_key
+from .encrypt import encrypt_database
+from .export import export_chats
+from .search import search_messages
+from .merge import merge_snapshot
+from .diff import diff_snapshots
+from .media import index_media, query_media, audit_media_files
+from .thumbnails import extract_thumbnails
+from .stats import show_stats
+from .plan import plan_run
+from .watch import watch_devices
 
 __all__ = [
     "pull_data",
@@ -10,4 +21,17 @@ __all__ = [
     "decrypt_database",
     "convert_vcf",
     "run_orchestrator",
+    "check_backup_key",
+    "encrypt_database",
+    "export_chats",
+    "search_messages",
+    "merge_snapshot",
+    "diff_snapshots",
+    "index_media",
+    "query_media",
+    "audit_media_files",
+    "extract_thumbnails",
+    "show_stats",
+    "plan_run",
+    "watch_devices",
 ]
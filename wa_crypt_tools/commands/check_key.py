@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import List, Optional
+
+from wa_crypt_tools.config import Config
+from wa_crypt_tools.crypto import CryptoError, crypto_available, find_key
+from wa_crypt_tools.env_utils import get_venv_python_path
+
+
+def load_key_ring(path: str) -> List[str]:
+    """Reads candidate keys from a file: one hex key per line, '#' comments."""
+    with open(path, 'r') as f:
+        return [
+            line.strip() for line in f
+            if line.strip() and not line.lstrip().startswith('#')
+        ]
+
+
+def candidate_keys(config: Config, key: Optional[str] = None) -> List[str]:
+    """The primary key first, then any key ring entries, without repeats."""
+    keys: List[str] = []
+    primary = key or config.get('key')
+    if primary:
+        keys.append(primary)
+    ring_file = config.get('key_ring')
+    if ring_file:
+        try:
+            keys.extend(load_key_ring(ring_file))
+        except OSError:
+            print(f"Warning: Could not read key ring {ring_file}")
+    return list(dict.fromkeys(keys))
+
+
+def _internal_check_key_logic(crypt_path: str, keys: List[str]) -> None:
+    """
+    Internal key check. Needs pycryptodome, so it is run inside the venv
+    when the calling interpreter lacks it. Prints a JSON result line.
+    """
+    print(json.dumps({"match": find_key(crypt_path, keys)}))
+
+
+def find_matching_key(crypt_path: str, keys: List[str]) -> Optional[int]:
+    """
+    Returns the index of the first key that opens crypt_path, or None.
+    Raises CryptoError if the check itself cannot be performed.
+    """
+    if not keys:
+        raise CryptoError("No keys to check.")
+    if crypto_available():
+        try:
+            return find_key(crypt_path, keys)
+        except OSError as e:
+            raise CryptoError(str(e))
+
+    venv_python = get_venv_python_path()
+    cmd = [
+        venv_python,
+        "-m", "wa_crypt_tools.commands.check_key",
+        "--internal",
+        "--file", os.path.abspath(crypt_path),
+    ]
+    try:
+        # Keys go through stdin so they never show up in the process list
+        result = subprocess.run(
+            cmd,
+            input="\n".join(keys),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True
+        )
+        match = json.loads(result.stdout.strip().splitlines()[-1])["match"]
+    except (OSError, subprocess.CalledProcessError, ValueError,
+            IndexError, KeyError) as e:
+        raise CryptoError(f"Key check failed to run: {e}")
+    return None if match is None else int(match)
+
+
+def check_backup_key(
+    config: Config,
+    input_file: Optional[str] = None,
+    key: Optional[str] = None
+) -> int:
+    """
+    Validates the key (or key ring) against a crypt15 backup by decrypting
+    only its header and first block.
+    Returns 0 if a key matches, 1 otherwise.
+    """
+    print("--- WhatsApp Backup Key Check ---")
+
+    crypt_path = input_file
+    if not crypt_path:
+        base = config.get('input') or config.get('output') or os.path.join(
+            os.getcwd(), "output"
+        )
+        crypt_path = os.path.join(
+            base, "WhatsApp", "Databases", "msgstore.db.crypt15"
+        )
+
+    if not os.path.exists(crypt_path):
+        print(f"Error: Backup not found at {crypt_path}")
+        return 1
+
+    keys = candidate_keys(config, key)
+    if not keys:
+        print("Error: 'key' is required (via CLI or config.json).")
+        return 1
+
+    print(f"Checking {len(keys)} key(s) against {crypt_path}...")
+    try:
+        match = find_matching_key(crypt_path, keys)
+    except CryptoError as e:
+        print(f"Error: {e}")
+        return 1
+
+    if match is None:
+        print("Error: None of the keys can decrypt this backup.")
+        return 1
+    if match == 0:
+        print("Key OK.")
+    else:
+        print(f"Key OK: key ring entry #{match} decrypts this backup.")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check a backup key")
+    parser.add_argument(
+        "--internal", action="store_true", help="Run internal implementation"
+    )
+    parser.add_argument("--file", "-f", help="crypt15 file to check")
+    parser.add_argument("--key", "-k", help="Decryption key (64 hex)")
+    parser.add_argument(
+        "--key-ring", help="File with one candidate key per line"
+    )
+    args = parser.parse_args()
+
+    if args.internal:
+        try:
+            # One key per line, as find_matching_key writes them
+            keys = [k for k in sys.stdin.read().splitlines() if k.strip()]
+            _internal_check_key_logic(args.file, keys)
+            sys.exit(0)
+        except Exception as e:
+            print(f"Internal Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        config: Config = {'key': args.key, 'key_ring': args.key_ring}
+        sys.exit(check_backup_key(config, args.file))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import argparse
 from pathlib import Path
 from typing import List, Dict, Any
 
+from .. import profiling, tracing
 from ..env_utils import ensure_venv, get_venv_python_path
 
 
@@ -88,6 +89,8 @@ def _internal_convert_logic(input_path: str, output_path: str) -> None:
     print(f"Successfully converted to {output_path}")
 
 
+@tracing.traced("convert")
+@profiling.profiled("convert")
 def convert_vcf(input_path: str, output_path: str, dry_run: bool = False) -> int:
     """
     Converts contacts.vcf to contacts.json using the venv.
@@ -121,7 +124,8 @@ def convert_vcf(input_path: str, output_path: str, dry_run: bool = False) -> int
     ]
 
     try:
-        subprocess.check_call(cmd)
+        tracing.check_call(cmd, "venv convert", files=1,
+                           bytes=tracing.file_size(input_path))
         return 0
     except subprocess.CalledProcessError:
         print("Error during VCF conversion.")
@@ -139,8 +143,10 @@ def main() -> None:
     args = parser.parse_args()
 
     if args.internal:
+        profiling.enable_from_env()
         try:
-            _internal_convert_logic(args.input, args.output)
+            with profiling.stage("convert-child"):
+                _internal_convert_logic(args.input, args.output)
             sys.exit(0)
         except Exception as e:
             print(f"Internal Error: {e}")
@@ -2,13 +2,149 @@
 import os
 import sys
 import subprocess
+import re
 import argparse
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
+from wa_crypt_tools import profiling, tracing
+from wa_crypt_tools.cache import DecryptCache, file_sha256
+from wa_crypt_tools.commands.check_key import (
+    candidate_keys, find_matching_key
+)
 from wa_crypt_tools.config import Config, load_config, merge_args_with_config
-from wa_crypt_tools.env_utils import ensure_venv, get_venv_path
+from wa_crypt_tools.crypto import (
+    CryptoError, CryptInfo, crypto_available, decrypt_file, scan_crypt_tree,
+    sniff_crypt_file, KEY_HEX
+)
+from wa_crypt_tools.env_utils import (
+    ensure_venv, get_venv_path, get_venv_python_path
+)
 
+# Newest format first. Every format is decrypted by the in-process engine
+# in wa_crypt_tools.crypto; wadecrypt only handles crypt15 headers that
+# engine cannot parse
+CRYPT_VERSIONS = (15, 14, 12)
+# Where decrypt --all-files writes, relative to the input directory
+ARCHIVE_OUTPUT_DIRNAME = "decrypted"
+# Decrypt cache engine labels: results of different engines never mix
+ENGINE_WADECRYPT = "wadecrypt"
+ENGINE_CRYPTO = "crypto"
 
+
+def _find_crypt(folders: List[str], name: str) -> Optional[str]:
+    """First existing <name>.cryptN, newest format and first folder first."""
+    for version in CRYPT_VERSIONS:
+        for folder in folders:
+            path = os.path.join(folder, f"{name}.crypt{version}")
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def _internal_decrypt_logic(
+    crypt_path: str, output_path: str, key: str
+) -> None:
+    """
+    Internal in-process decrypt (crypt12/14/15). Needs pycryptodome, so
+    it runs inside the venv when the calling interpreter lacks it.
+    """
+    info = decrypt_file(crypt_path, output_path, key)
+    print(f"Decrypted crypt{info.version} {crypt_path} -> {output_path}")
+
+
+def decrypt_in_process(crypt_path: str, output_path: str, key: str) -> bool:
+    """
+    Decrypts any supported backup version with wa_crypt_tools.crypto.
+    key is a 64-digit hex key or a key file path.
+    Returns True on success.
+    """
+    if crypto_available():
+        try:
+            with tracing.span("decrypt file", tracing.STAGE, files=1,
+                              bytes=tracing.file_size(crypt_path)):
+                _internal_decrypt_logic(crypt_path, output_path, key)
+            return True
+        except (CryptoError, OSError) as e:
+            print(f"Error: {e}")
+            return False
+
+    cmd = [
+        get_venv_python_path(),
+        "-m", "wa_crypt_tools.commands.decrypt",
+        "--internal",
+        "--file", os.path.abspath(crypt_path),
+        "--out-file", os.path.abspath(output_path),
+    ]
+    try:
+        # The key goes through stdin so it stays out of the process list
+        with tracing.span("venv decrypt", tracing.SUBPROCESS, files=1,
+                          bytes=tracing.file_size(crypt_path)):
+            subprocess.run(cmd, input=key, text=True, check=True)
+        return True
+    except (OSError, subprocess.CalledProcessError):
+        print(f"Error: Failed to decrypt {crypt_path}.")
+        return False
+
+
+def decrypt_archive(
+    input_dir_base: str,
+    key_hex: Optional[str],
+    key_file: Optional[str],
+    dry_run: bool = False
+) -> int:
+    """
+    Decrypts every crypt file below input_dir_base, whatever its version,
+    into <input>/decrypted, mirroring the folder layout.
+    Files are classified by header first; anything that cannot be
+    decrypted is reported, never skipped silently.
+    Returns 0 if every backup was decrypted, 1 otherwise.
+    """
+    output_root = os.path.join(input_dir_base, ARCHIVE_OUTPUT_DIRNAME)
+    infos = [
+        i for i in scan_crypt_tree(input_dir_base)
+        if not i.path.startswith(output_root + os.sep)
+    ]
+    print(f"Found {len(infos)} crypt files under {input_dir_base}.")
+
+    by_version: Dict[str, int] = {}
+    for info in infos:
+        label = f"crypt{info.version}" if info.version else "unknown"
+        by_version[label] = by_version.get(label, 0) + 1
+    for label, count in sorted(by_version.items()):
+        print(f"  {label}: {count}")
+
+    problems: List[Tuple[CryptInfo, str]] = []
+    decrypted = 0
+    for info in infos:
+        if info.error:
+            problems.append((info, info.error))
+            continue
+        key = key_hex if info.key_requirement == KEY_HEX else key_file
+        if not key:
+            problems.append((info, "needs --key-file (legacy key)"
+                             if info.key_requirement != KEY_HEX
+                             else "needs --key"))
+            continue
+
+        rel = os.path.relpath(info.path, input_dir_base)
+        out = os.path.join(output_root, re.sub(r"\.crypt\d+$", "", rel))
+        if dry_run:
+            print(f"[DRY-RUN] Would decrypt crypt{info.version} {rel}")
+            continue
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        if decrypt_in_process(info.path, out, key):
+            decrypted += 1
+        else:
+            problems.append((info, "decryption failed"))
+
+    for info, reason in problems:
+        print(f"Warning: Not decrypted: {info.path} ({reason})")
+    print(f"Decrypted {decrypted} of {len(infos)} files into {output_root}")
+    return 1 if problems else 0
+
+
+@tracing.traced("decrypt")
+@profiling.profiled("decrypt")
 def decrypt_database(
     config: Config,
     input_dir: Optional[str] = None,
@@ -48,8 +184,16 @@ def decrypt_database(
     db_folder = os.path.join(input_dir_base, "WhatsApp", "Databases")
     backup_folder = os.path.join(input_dir_base, "WhatsApp", "Backups")
 
+    if config.get('decrypt_all_files'):
+        return decrypt_archive(
+            input_dir_base, key_hex, config.get('key_file'), bool(dry_run)
+        )
+
     # 1. Decrypt msgstore
-    msgstore_crypt = os.path.join(db_folder, "msgstore.db.crypt15")
+    msgstore_crypt = (
+        _find_crypt([db_folder], "msgstore.db") or
+        os.path.join(db_folder, "msgstore.db.crypt15")
+    )
     # Output to ROOT input_dir_base (matching best practice/wa_tool behavior)
     msgstore_out = os.path.join(input_dir_base, "msgstore.db")
 
@@ -70,35 +214,156 @@ def decrypt_database(
     venv_path = get_venv_path()
     wadecrypt_path = os.path.join(venv_path, "bin", "wadecrypt")
 
+    # Results are cached per (ciphertext, key, tool version), so an
+    # unchanged crypt file is not decrypted twice
+    cache = (
+        DecryptCache(input_dir_base, ENGINE_WADECRYPT)
+        if config.get('decrypt_cache', True) else None
+    )
+
+    keys = candidate_keys(config, key_hex)
+    # Backups no candidate key opens, and those that could not be tried
+    wrong_key: List[str] = []
+    not_decrypted: List[str] = []
+
+    def preflight_key(input_f: str, name: str) -> Optional[str]:
+        """Picks the key that opens input_f, None if no key does."""
+        try:
+            match = find_matching_key(input_f, keys)
+        except CryptoError as e:
+            print(f"Warning: Could not pre-check the key for {name} ({e}). "
+                  "Attempting anyway...")
+            return key_hex
+        if match is None:
+            print(f"Error: The key cannot decrypt {name}. Skipping it.")
+            return None
+        if match > 0:
+            print(f"Using key ring entry #{match} for {name}.")
+        return keys[match]
+
+    def perform_legacy_decrypt(
+        input_f: str, output_f: str, name: str
+    ) -> None:
+        """crypt12/14: needs the legacy key file, decrypted in-process."""
+        info = sniff_crypt_file(input_f)
+        print(f"{name} is a crypt{info.version} backup.")
+        key_file = config.get('key_file')
+        if info.error:
+            print(f"Error: Cannot decrypt {name}: {info.error}")
+            not_decrypted.append(name)
+            return
+        if not key_file:
+            print(f"Error: crypt{info.version} needs the legacy key file "
+                  "(--key-file).")
+            not_decrypted.append(name)
+            return
+
+        if dry_run:
+            print(f"[DRY-RUN] Would decrypt {input_f} to {output_f} "
+                  "in-process")
+            return
+
+        try:
+            key_id = file_sha256(key_file)
+        except OSError:
+            print(f"Error: Cannot read key file {key_file}")
+            not_decrypted.append(name)
+            return
+        if cache and cache.lookup(
+            input_f, key_id, output_f, engine=ENGINE_CRYPTO
+        ):
+            print(f"{name} is unchanged since the last decrypt. "
+                  f"Using cached result: {output_f}")
+            return
+
+        print(f"Decrypting {name}...")
+        if cache:
+            cache.detach(output_f)
+        if decrypt_in_process(input_f, output_f, key_file):
+            print(f"Success! {name} decrypted to: {output_f}")
+            if cache:
+                cache.store(input_f, key_id, output_f, ENGINE_CRYPTO)
+        else:
+            print(f"Error: Failed to decrypt {name}.")
+            not_decrypted.append(name)
+
     # Helper for decryption
     def perform_decrypt(input_f: str, output_f: str, name: str) -> None:
         if not os.path.exists(input_f):
             return
 
-        print(f"Decrypting {name}...")
+        if not input_f.endswith(".crypt15"):
+            perform_legacy_decrypt(input_f, output_f, name)
+            return
+
+        # wadecrypt only takes over headers the in-process engine
+        # cannot parse
+        info = sniff_crypt_file(input_f)
+        engine = (
+            ENGINE_CRYPTO if not info.error and info.version == 15
+            else ENGINE_WADECRYPT
+        )
+        if cache and cache.lookup(
+            input_f, key_hex, output_f, restore=not dry_run, engine=engine
+        ):
+            print(f"{name} is unchanged since the last decrypt. "
+                  f"Using cached result: {output_f}")
+            return
+
         if dry_run:
-            print(f"[DRY-RUN] Would run: {wadecrypt_path} <KEY> {input_f} {output_f}")
+            print(f"Decrypting {name}...")
+            if engine == ENGINE_CRYPTO:
+                print(f"[DRY-RUN] Would decrypt {input_f} to {output_f} "
+                      "in-process")
+            else:
+                print(f"[DRY-RUN] Would run: {wadecrypt_path} <KEY> "
+                      f"{input_f} {output_f}")
+            return
+
+        # Validate the key on the first block before the full decrypt
+        use_key = preflight_key(input_f, name)
+        if use_key is None:
+            wrong_key.append(name)
+            return
+        if use_key != key_hex and cache and cache.lookup(
+            input_f, use_key, output_f, engine=engine
+        ):
+            print(f"{name} is unchanged since the last decrypt. "
+                  f"Using cached result: {output_f}")
+            return
+
+        if engine == ENGINE_WADECRYPT:
+            print(f"Note: {name} has a header the in-process engine does "
+                  f"not support ({info.error or info.version}). "
+                  "Using wadecrypt.")
+        print(f"Decrypting {name}...")
+        if cache:
+            cache.detach(output_f)
+        if engine == ENGINE_CRYPTO:
+            ok = decrypt_in_process(input_f, output_f, use_key)
         else:
             try:
-                subprocess.check_call([wadecrypt_path, key_hex, input_f, output_f])
-                print(f"Success! {name} decrypted to: {output_f}")
+                tracing.check_call(
+                    [wadecrypt_path, use_key, input_f, output_f],
+                    "wadecrypt", files=1, bytes=tracing.file_size(input_f)
+                )
+                ok = True
             except subprocess.CalledProcessError:
-                print(f"Error: Failed to decrypt {name}.")
+                ok = False
+        if ok:
+            print(f"Success! {name} decrypted to: {output_f}")
+            if cache:
+                cache.store(input_f, use_key, output_f, engine)
+        else:
+            print(f"Error: Failed to decrypt {name}.")
+            not_decrypted.append(name)
 
     # Run decryptions
     perform_decrypt(msgstore_crypt, msgstore_out, "msgstore.db")
 
     # 2. Decrypt wa.db
     # Look in Databases and Backups
-    wadb_crypt_paths = [
-        os.path.join(db_folder, "wa.db.crypt15"),
-        os.path.join(backup_folder, "wa.db.crypt15")
-    ]
-    wadb_crypt = None
-    for p in wadb_crypt_paths:
-        if os.path.exists(p):
-            wadb_crypt = p
-            break
+    wadb_crypt = _find_crypt([db_folder, backup_folder], "wa.db")
 
     if wadb_crypt:
         print(f"Found wa.db at: {wadb_crypt}")
@@ -106,8 +371,15 @@ def decrypt_database(
         perform_decrypt(wadb_crypt, wadb_out, "wa.db")
     else:
         if not dry_run:
-            print("wa.db.crypt15 not found. Skipping wa.db decryption.")
+            print("wa.db.crypt15 (or older) not found. "
+                  "Skipping wa.db decryption.")
 
+    if wrong_key:
+        print(f"Error: Wrong key for: {', '.join(wrong_key)}")
+    if not_decrypted:
+        print(f"Error: Not decrypted: {', '.join(not_decrypted)}")
+    if wrong_key or not_decrypted:
+        return 1
     return 0
 
 
@@ -131,7 +403,7 @@ def run(args: argparse.Namespace) -> int:
     )
 
 
-if __name__ == "__main__":
+def main() -> None:
     parser = argparse.ArgumentParser(description="Decrypt WhatsApp database")
     parser.add_argument(
         "key", help="64-digit hex key", nargs='?', default=None
@@ -139,10 +411,31 @@ if __name__ == "__main__":
     parser.add_argument("--input", "-i", help="Base input directory")
     parser.add_argument("--config", "-c", help="Config file path")
     parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument(
+        "--internal", action="store_true", help="Run internal implementation"
+    )
+    parser.add_argument("--file", help="Crypt file (internal mode)")
+    parser.add_argument("--out-file", help="Output file (internal mode)")
 
     args = parser.parse_args()
 
+    if args.internal:
+        profiling.enable_from_env()
+        try:
+            with profiling.stage("decrypt-child"):
+                _internal_decrypt_logic(
+                    args.file, args.out_file, sys.stdin.read().strip()
+                )
+            sys.exit(0)
+        except Exception as e:
+            print(f"Internal Error: {e}")
+            sys.exit(1)
+
     config = load_config(args.config)
     merge_args_with_config(args, config)
 
     sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+from typing import Any, Dict, Optional
+
+from wa_crypt_tools.config import Config
+from wa_crypt_tools.snapshot import (
+    diff_media, diff_messages, load_media, save_manifest
+)
+from wa_crypt_tools.utils import format_size
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    messages = report.get("messages")
+    if messages:
+        history = ("continues the old one" if messages["same_history"]
+                   else "has a different history; compared by message key")
+        print(f"Messages (new snapshot {history}):")
+        for kind in ("new", "deleted", "edited"):
+            print(f"  {kind}: {messages[kind]['count']}")
+            for item in messages[kind]["items"]:
+                text = (item.get("new_text") if kind == "edited"
+                        else item["text"]) or ""
+                print(f"    #{item['id']} {item['jid']}: {text[:60]}")
+    media = report.get("media")
+    if media:
+        print("Media:")
+        for kind in ("added", "removed", "changed"):
+            entry = media[kind]
+            print(f"  {kind}: {entry['count']} "
+                  f"({format_size(entry['bytes'])})")
+            for item in entry["items"]:
+                print(f"    {item['path']}")
+
+
+def diff_snapshots(
+    config: Config,
+    old: str,
+    new: Optional[str] = None,
+    old_manifest: Optional[str] = None,
+    write_manifest: Optional[str] = None,
+    as_json: bool = False,
+    limit: Optional[int] = None,
+    messages: bool = True,
+    media: bool = True
+) -> int:
+    """
+    Compares two snapshot directories (each with msgstore.db and
+    WhatsApp/Media). new defaults to the input directory. The old media
+    list can come from a manifest instead of a scan, and the new one can
+    be saved as a manifest for the next diff.
+    Returns 0 on success, 1 on failure.
+    """
+    new = new or config.get('input') or config.get('output') or os.path.join(
+        os.getcwd(), "output"
+    )
+    report: Dict[str, Any] = {"old": old, "new": new}
+
+    if messages:
+        old_db = os.path.join(old, "msgstore.db")
+        new_db = os.path.join(new, "msgstore.db")
+        try:
+            report["messages"] = diff_messages(old_db, new_db, limit)
+        except FileNotFoundError as e:
+            print(f"Error: Decrypted database not found at {e}")
+            return 1
+        except sqlite3.Error as e:
+            print(f"Error: Could not compare databases: {e}")
+            return 1
+
+    if media:
+        try:
+            old_files = load_media(old_manifest or old)
+            new_files = load_media(new)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error: Could not read media manifest: {e}")
+            return 1
+        report["media"] = diff_media(old_files, new_files, limit)
+        if write_manifest:
+            save_manifest(write_manifest, new_files)
+
+    if as_json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        _print_report(report)
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two snapshots")
+    parser.add_argument("old", help="Older snapshot directory")
+    parser.add_argument("new", nargs="?", help="Newer snapshot directory")
+    parser.add_argument("--old-manifest")
+    parser.add_argument("--write-manifest")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--limit", type=int)
+    args = parser.parse_args()
+
+    sys.exit(diff_snapshots(
+        {}, args.old, args.new, args.old_manifest, args.write_manifest,
+        args.json, args.limit
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import subprocess
+from typing import Dict, Optional
+
+from wa_crypt_tools.cache import CACHE_DIRNAME
+from wa_crypt_tools.config import Config
+from wa_crypt_tools.crypto import (
+    CryptoError, SQLITE_MAGIC, crypto_available, encrypt_file
+)
+from wa_crypt_tools.env_utils import get_venv_python_path
+
+# Copy of the pulled backup kept before it is replaced by a re-encryption.
+# It lives in the cache, outside WhatsApp/, so push never sends it back.
+ORIGINALS_DIRNAME = "originals"
+# Next to the kept copy: size/mtime of the backup encrypt last wrote, to
+# tell our own output from a freshly pulled backup
+WRITTEN_SUFFIX = ".written.json"
+
+
+def original_path(base: str, reference_path: str) -> str:
+    """Where the untouched copy of reference_path is kept."""
+    rel = os.path.relpath(os.path.abspath(reference_path), base)
+    if rel.startswith(os.pardir):
+        rel = os.path.basename(reference_path)
+    return os.path.join(base, CACHE_DIRNAME, ORIGINALS_DIRNAME, rel)
+
+
+def _signature(path: str) -> Dict[str, int]:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _written_by_encrypt(original: str, reference_path: str) -> bool:
+    """True if reference_path is still the file the last encrypt wrote."""
+    try:
+        with open(original + WRITTEN_SUFFIX, 'r') as f:
+            return bool(json.load(f) == _signature(reference_path))
+    except (OSError, ValueError):
+        return False
+
+
+def _record_written(original: str, output_path: str) -> None:
+    tmp_path = original + WRITTEN_SUFFIX + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(_signature(output_path), f)
+    os.replace(tmp_path, original + WRITTEN_SUFFIX)
+
+
+def _internal_encrypt_logic(
+    plain_path: str, output_path: str, reference_path: str, key: str
+) -> None:
+    """
+    Internal in-process encrypt. Needs pycryptodome, so it runs inside
+    the venv when the calling interpreter lacks it.
+    """
+    encrypt_file(plain_path, output_path, key, reference_path)
+    print(f"Encrypted {plain_path} -> {output_path}")
+
+
+def encrypt_in_process(
+    plain_path: str, output_path: str, reference_path: str, key: str
+) -> bool:
+    """Runs the crypt15 encryption here or in the venv. True on success."""
+    if crypto_available():
+        try:
+            _internal_encrypt_logic(
+                plain_path, output_path, reference_path, key
+            )
+            return True
+        except (CryptoError, OSError) as e:
+            print(f"Error: {e}")
+            return False
+
+    cmd = [
+        get_venv_python_path(),
+        "-m", "wa_crypt_tools.commands.encrypt",
+        "--internal",
+        "--input", os.path.abspath(plain_path),
+        "--output", os.path.abspath(output_path),
+        "--reference", os.path.abspath(reference_path),
+    ]
+    try:
+        # The key goes through stdin so it stays out of the process list
+        subprocess.run(cmd, input=key, text=True, check=True)
+        return True
+    except (OSError, subprocess.CalledProcessError):
+        print("Error during encryption.")
+        return False
+
+
+def encrypt_database(
+    config: Config,
+    input_file: Optional[str] = None,
+    output_file: Optional[str] = None,
+    reference: Optional[str] = None,
+    key: Optional[str] = None
+) -> int:
+    """
+    Re-encrypts a (possibly edited) decrypted msgstore.db into crypt15,
+    reusing the header of the pulled backup.
+
+    Defaults: <input>/msgstore.db -> <input>/WhatsApp/Databases/
+    msgstore.db.crypt15, with that same file as reference. Before it is
+    replaced, the pulled backup is copied to <input>/.wa_cache/originals;
+    the copy is refreshed whenever a newer backup has been pulled.
+    Returns 0 on success, 1 on failure.
+    """
+    print("--- WhatsApp Database Encrypter ---")
+
+    dry_run = config.get('dry_run', False)
+    key_hex = key or config.get('key')
+    if not key_hex:
+        print("Error: 'key' is required (via CLI or config.json).")
+        return 1
+
+    base = config.get('input') or config.get('output') or os.path.join(
+        os.getcwd(), "output"
+    )
+    base = os.path.abspath(base)
+    default_crypt = os.path.join(
+        base, "WhatsApp", "Databases", "msgstore.db.crypt15"
+    )
+    plain_path = input_file or os.path.join(base, "msgstore.db")
+    reference_path = reference or default_crypt
+    output_path = output_file or reference_path
+
+    if not os.path.exists(plain_path):
+        print(f"Error: Plaintext database not found at {plain_path}")
+        return 1
+    if not os.path.exists(reference_path):
+        print(f"Error: Reference backup not found at {reference_path}")
+        return 1
+
+    with open(plain_path, 'rb') as f:
+        if f.read(len(SQLITE_MAGIC)) != SQLITE_MAGIC:
+            print(f"Error: {plain_path} is not an SQLite database.")
+            return 1
+    if os.path.exists(plain_path + "-wal"):
+        print(f"Warning: {plain_path}-wal exists. Changes still in the "
+              "WAL are not included; checkpoint the database first.")
+
+    if dry_run:
+        print(f"[DRY-RUN] Would encrypt {plain_path} to {output_path} "
+              f"(header from {reference_path})")
+        return 0
+
+    original: Optional[str] = None
+    if os.path.abspath(output_path) == os.path.abspath(reference_path):
+        original = original_path(base, reference_path)
+        if (
+            not os.path.exists(original) or
+            not _written_by_encrypt(original, reference_path)
+        ):
+            # First encrypt, or a newer backup was pulled since the last
+            os.makedirs(os.path.dirname(original), exist_ok=True)
+            shutil.copy2(reference_path, original)
+            print(f"Kept the original backup as {original}")
+        # Always take the header from the untouched backup
+        reference_path = original
+
+    print(f"Encrypting {plain_path}...")
+    if not encrypt_in_process(
+        plain_path, output_path, reference_path, key_hex
+    ):
+        return 1
+    if original:
+        _record_written(original, output_path)
+    print(f"Success! Encrypted backup written to: {output_path}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Encrypt a msgstore.db into crypt15"
+    )
+    parser.add_argument(
+        "--internal", action="store_true", help="Run internal implementation"
+    )
+    parser.add_argument("--input", "-i", required=True)
+    parser.add_argument("--output", "-o", required=True)
+    parser.add_argument("--reference", "-r", required=True)
+    parser.add_argument("--key", "-k", help="Decryption key (64 hex)")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.internal:
+        try:
+            _internal_encrypt_logic(
+                args.input, args.output, args.reference,
+                sys.stdin.read().strip()
+            )
+            sys.exit(0)
+        except Exception as e:
+            print(f"Internal Error: {e}")
+            sys.exit(1)
+    else:
+        config: Config = {'key': args.key, 'dry_run': args.dry_run}
+        sys.exit(encrypt_database(
+            config, args.input, args.output, args.reference
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+import os
+import re
+import sys
+import io
+import html
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, TextIO
+from urllib.parse import quote
+
+from wa_crypt_tools import msgstore
+from wa_crypt_tools.config import Config
+from wa_crypt_tools.msgstore import Chat, Message, MsgStore
+
+EXPORT_DIRNAME = "export"
+CHATS_DIRNAME = "chats"
+EXPORT_FORMATS = ("html", "json")
+FORMAT_EXTENSIONS = {"html": ".html", "json": ".jsonl"}
+# Last exported message per chat, so later runs only append new ones
+EXPORT_STATE_FILENAME = ".export_state.json"
+
+HTML_HEADER = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body{{font-family:sans-serif;background:#efeae2;margin:0 auto;max-width:48em}}
+.msg{{background:#fff;border-radius:6px;margin:4px 8px;padding:4px 8px}}
+.out{{background:#d9fdd3;margin-left:4em}}
+.meta{{color:#667781;font-size:.8em}}
+img,video{{max-width:20em;display:block}}
+</style></head><body>
+<h1>{title}</h1>
+"""
+# Written last; kept constant so later runs can find and move it
+HTML_FOOTER = "</body></html>\n"
+
+# Per-process state of export workers, set once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def chat_filename(jid: str) -> str:
+    """File name stem for a chat, derived from its unique jid."""
+    return re.sub(r"[^\w@.-]", "_", jid) or "unknown"
+
+
+def chat_title(chat: Chat, names: Dict[str, str]) -> str:
+    return chat.subject or names.get(chat.jid) or chat.jid.split("@")[0]
+
+
+def format_timestamp(timestamp_ms: int) -> str:
+    return datetime.fromtimestamp(timestamp_ms / 1000).strftime(
+        "%Y-%m-%d %H:%M"
+    )
+
+
+def media_href(
+    file_path: Optional[str], wa_dir: str, from_dir: str
+) -> Optional[str]:
+    """
+    Relative link from from_dir to a message's file in the pulled
+    WhatsApp tree. file_path is stored either relative to the WhatsApp
+    folder ('Media/...') or as an absolute path on the device.
+    """
+    if not file_path:
+        return None
+    index = file_path.find("Media/")
+    if index < 0:
+        return None
+    target = os.path.join(wa_dir, *file_path[index:].split("/"))
+    rel = os.path.relpath(target, from_dir)
+    return quote(rel.replace(os.sep, "/"))
+
+
+def sender_name(message: Message, chat: Chat, names: Dict[str, str]) -> str:
+    if message.from_me:
+        return "Me"
+    jid = message.sender_jid or chat.jid
+    return names.get(jid) or jid.split("@")[0]
+
+
+def render_message_html(
+    message: Message, chat: Chat, names: Dict[str, str], href: Optional[str]
+) -> str:
+    parts = [
+        f'<div class="msg {"out" if message.from_me else "in"}" '
+        f'id="m{message.id}">',
+        f'<div class="meta">{format_timestamp(message.timestamp)} '
+        f'{html.escape(sender_name(message, chat, names))}</div>',
+    ]
+    if href:
+        mime = message.media_mime or ""
+        if mime.startswith("image/"):
+            parts.append(f'<img loading="lazy" src="{href}">')
+        elif mime.startswith("video/"):
+            parts.append(f'<video controls preload="none" src="{href}">'
+                         '</video>')
+        elif mime.startswith("audio/"):
+            parts.append(f'<audio controls preload="none" src="{href}">'
+                         '</audio>')
+        else:
+            parts.append(f'<a href="{href}">{html.escape(href)}</a>')
+    if message.text:
+        parts.append(
+            "<p>" + html.escape(message.text).replace("\n", "<br>") + "</p>"
+        )
+    parts.append("</div>\n")
+    return "".join(parts)
+
+
+def message_record(
+    message: Message, chat: Chat, names: Dict[str, str], href: Optional[str]
+) -> Dict[str, Any]:
+    return {
+        "id": message.id,
+        "timestamp": message.timestamp,
+        "from_me": message.from_me,
+        "sender": sender_name(message, chat, names),
+        "text": message.text,
+        "media": href,
+        "mime": message.media_mime,
+    }
+
+
+def _init_worker(
+    db_path: str,
+    names: Dict[str, str],
+    wa_dir: str,
+    chats_dir: str,
+    formats: Sequence[str],
+    page_size: int
+) -> None:
+    """Opens one read-only store per worker process."""
+    _worker.clear()
+    _worker.update(
+        store=MsgStore(db_path, page_size=page_size),
+        names=names,
+        wa_dir=wa_dir,
+        chats_dir=chats_dir,
+        formats=tuple(formats),
+    )
+
+
+def _html_resumable(path: str) -> bool:
+    """True if path is a finished chat page that ends with HTML_FOOTER."""
+    footer = HTML_FOOTER.encode()
+    try:
+        with open(path, 'rb') as f:
+            f.seek(-len(footer), os.SEEK_END)
+            return f.read() == footer
+    except OSError:
+        return False
+
+
+def _can_resume(
+    chat: Chat, previous: Optional[Dict[str, Any]], paths: Dict[str, str]
+) -> bool:
+    """
+    A chat is resumed only if its outputs are intact and its last exported
+    message is still the same one (message _ids are not stable across a
+    reinstall or a different phone).
+    """
+    if not previous or previous.get("formats") != list(_worker["formats"]):
+        return False
+    if not all(os.path.exists(p) for p in paths.values()):
+        return False
+    if "html" in paths and not _html_resumable(paths["html"]):
+        return False
+    if not previous.get("last_id"):
+        return True
+    return _worker["store"].message_key_id(
+        chat.id, previous["last_id"]
+    ) == previous.get("last_key_id")
+
+
+def _open_outputs(
+    paths: Dict[str, str], title: str, resume: bool
+) -> Dict[str, TextIO]:
+    outputs: Dict[str, TextIO] = {}
+    for fmt, path in paths.items():
+        if not resume:
+            outputs[fmt] = open(path, 'w', encoding='utf-8')
+            if fmt == "html":
+                outputs[fmt].write(
+                    HTML_HEADER.format(title=html.escape(title))
+                )
+        elif fmt == "json":
+            outputs[fmt] = open(path, 'a', encoding='utf-8')
+        else:
+            # Drop the footer; it is written again after the new messages
+            raw = open(path, 'r+b')
+            raw.seek(-len(HTML_FOOTER.encode()), os.SEEK_END)
+            raw.truncate()
+            outputs[fmt] = io.TextIOWrapper(raw, encoding='utf-8')
+    return outputs
+
+
+def _export_chat(
+    chat: Chat, previous: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Streams one chat to <chats_dir>/<jid>.html and .jsonl.
+    With the state of a previous run, only messages past its last _id
+    are appended; files are not touched at all if there are none.
+    Only one page of messages is held in memory at a time.
+    """
+    names: Dict[str, str] = _worker["names"]
+    chats_dir: str = _worker["chats_dir"]
+    stem = chat_filename(chat.jid)
+    title = chat_title(chat, names)
+    paths = {
+        fmt: os.path.join(chats_dir, stem + FORMAT_EXTENSIONS[fmt])
+        for fmt in _worker["formats"]
+    }
+
+    resume = _can_resume(chat, previous, paths)
+    if resume and previous:
+        state = dict(previous, title=title)
+    else:
+        state = {
+            "jid": chat.jid,
+            "title": title,
+            "file": stem,
+            "formats": list(_worker["formats"]),
+            "count": 0,
+            "last_id": 0,
+            "last_key_id": None,
+            "last_timestamp": chat.sort_timestamp,
+        }
+
+    outputs: Dict[str, TextIO] = {}
+    if not resume:
+        outputs = _open_outputs(paths, title, resume=False)
+    try:
+        for message in _worker["store"].messages(
+            chat.id, after_id=state["last_id"]
+        ):
+            if not outputs:
+                outputs = _open_outputs(paths, title, resume=True)
+            href = media_href(message.media_path, _worker["wa_dir"], chats_dir)
+            if "html" in outputs:
+                outputs["html"].write(
+                    render_message_html(message, chat, names, href)
+                )
+            if "json" in outputs:
+                outputs["json"].write(json.dumps(
+                    message_record(message, chat, names, href),
+                    ensure_ascii=False
+                ) + "\n")
+            state["count"] += 1
+            state["last_id"] = message.id
+            state["last_key_id"] = message.key_id
+            state["last_timestamp"] = message.timestamp
+
+        if "html" in outputs:
+            outputs["html"].write(HTML_FOOTER)
+    finally:
+        for out in outputs.values():
+            out.close()
+
+    return state
+
+
+def load_state(output_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Per-chat export state of the previous run, keyed by jid."""
+    path = os.path.join(output_dir, EXPORT_STATE_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return dict(json.load(f).get("chats", {}))
+    except (OSError, ValueError, AttributeError):
+        print("Warning: Ignoring unreadable export state; "
+              "exporting everything.")
+        return {}
+
+
+def save_state(output_dir: str, chats: List[Dict[str, Any]]) -> None:
+    path = os.path.join(output_dir, EXPORT_STATE_FILENAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"chats": {c["jid"]: c for c in chats}}, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def write_index(
+    output_dir: str, chats: List[Dict[str, Any]], formats: Sequence[str]
+) -> None:
+    """Index page linking every exported chat, most recent first."""
+    ext = FORMAT_EXTENSIONS["html" if "html" in formats else "json"]
+    tmp_path = os.path.join(output_dir, "index.html.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(HTML_HEADER.format(title="WhatsApp Chats"))
+        f.write("<ul>\n")
+        for chat in sorted(
+            chats, key=lambda c: c["last_timestamp"], reverse=True
+        ):
+            href = quote(f"{CHATS_DIRNAME}/{chat['file']}{ext}")
+            f.write(
+                f'<li><a href="{href}">{html.escape(chat["title"])}</a> '
+                f'<span class="meta">{chat["count"]} messages, last '
+                f'{format_timestamp(chat["last_timestamp"])}</span></li>\n'
+            )
+        f.write("</ul>\n" + HTML_FOOTER)
+    os.replace(tmp_path, os.path.join(output_dir, "index.html"))
+
+
+def export_chats(
+    config: Config,
+    db_path: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    formats: Sequence[str] = EXPORT_FORMATS,
+    workers: Optional[int] = None,
+    full: bool = False
+) -> int:
+    """
+    Exports every chat of a decrypted msgstore.db to HTML and/or JSON
+    Lines, with media linked relatively into the pulled WhatsApp/Media.
+
+    Defaults: <input>/msgstore.db -> <input>/export. Chats are exported
+    in parallel, one process per core. Later runs append only messages
+    newer than the previous export, unless full is set.
+    Returns 0 on success, 1 on failure.
+    """
+    print("--- WhatsApp Chat Exporter ---")
+
+    base = config.get('input') or config.get('output') or os.path.join(
+        os.getcwd(), "output"
+    )
+    base = os.path.abspath(base)
+    db_path = db_path or os.path.join(base, "msgstore.db")
+    output_dir = os.path.abspath(
+        output_dir or os.path.join(base, EXPORT_DIRNAME)
+    )
+    unknown = [f for f in formats if f not in EXPORT_FORMATS]
+    if unknown or not formats:
+        print(f"Error: Unknown export format(s): {', '.join(unknown)}")
+        return 1
+
+    try:
+        with MsgStore(db_path) as store:
+            chats = list(store.chats())
+    except FileNotFoundError:
+        print(f"Error: Decrypted database not found at {db_path}")
+        print("       Run 'decrypt' first.")
+        return 1
+    except sqlite3.Error as e:
+        print(f"Error: Cannot read chats from {db_path}: {e}")
+        return 1
+
+    if config.get('dry_run', False):
+        print(f"[DRY-RUN] Would export {len(chats)} chats from {db_path} "
+              f"to {output_dir}")
+        return 0
+
+    names = msgstore.load_contact_names(
+        os.path.join(os.path.dirname(db_path), "wa.db")
+    )
+    wa_dir = os.path.join(base, "WhatsApp")
+    chats_dir = os.path.join(output_dir, CHATS_DIRNAME)
+    os.makedirs(chats_dir, exist_ok=True)
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    init_args = (
+        db_path, names, wa_dir, chats_dir, formats, msgstore.DEFAULT_PAGE_SIZE
+    )
+    state = {} if full else load_state(output_dir)
+    previous = [state.get(chat.jid) for chat in chats]
+    mode = "incrementally" if state else "in full"
+    print(f"Exporting {len(chats)} chats {mode} with {workers} worker(s)...")
+    try:
+        if workers == 1 or len(chats) <= 1:
+            _init_worker(*init_args)
+            results = [_export_chat(c, p) for c, p in zip(chats, previous)]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=init_args
+            ) as pool:
+                results = list(pool.map(_export_chat, chats, previous))
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: Export failed: {e}")
+        return 1
+
+    # The index is rebuilt from the state alone; no chat file is re-read
+    write_index(output_dir, results, formats)
+    save_state(output_dir, results)
+    total = sum(r["count"] for r in results)
+    new = total - sum(p["count"] for p in previous if p)
+    print(f"Success! {total} messages in {len(results)} chats "
+          f"({max(new, 0)} new) exported to: {output_dir}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export chats to HTML/JSON")
+    parser.add_argument("--input", "-i", help="Input directory")
+    parser.add_argument("--db", help="Decrypted msgstore.db")
+    parser.add_argument("--out-dir", help="Export directory")
+    parser.add_argument(
+        "--format", default="html,json", help="Comma separated: html,json"
+    )
+    parser.add_argument("--workers", type=int, help="Parallel processes")
+    parser.add_argument("--full", action="store_true", help="Re-export all")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    config: Config = {'input': args.input, 'dry_run': args.dry_run}
+    sys.exit(export_chats(
+        config, args.db, args.out_dir, args.format.split(","), args.workers,
+        args.full
+    ))
+
+
+if __name__ == "__main__":
+    main()
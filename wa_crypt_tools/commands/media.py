@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from wa_crypt_tools.config import Config
+from wa_crypt_tools.media import (
+    CATALOG_FILENAME, audit_media, query_catalog, update_catalog
+)
+from wa_crypt_tools.utils import format_size, parse_size
+
+
+def _paths(
+    config: Config, catalog: Optional[str] = None
+) -> Tuple[str, str]:
+    """Media root and catalog path for the configured input directory."""
+    base = config.get('input') or config.get('output') or os.path.join(
+        os.getcwd(), "output"
+    )
+    base = os.path.abspath(base)
+    media_root = os.path.join(base, "WhatsApp", "Media")
+    return media_root, catalog or os.path.join(base, CATALOG_FILENAME)
+
+
+def index_media(
+    config: Config,
+    catalog: Optional[str] = None,
+    hash_files: bool = True
+) -> int:
+    """
+    Builds or refreshes the media catalog (<input>/media_index.db) for
+    the pulled WhatsApp/Media tree. Only new or modified files are
+    parsed and hashed. Returns 0 on success, 1 on failure.
+    """
+    print("--- WhatsApp Media Index ---")
+    media_root, catalog_path = _paths(config, catalog)
+    if not os.path.isdir(media_root):
+        print(f"Error: Media folder not found at {media_root}")
+        return 1
+
+    if config.get('dry_run', False):
+        print(f"[DRY-RUN] Would index {media_root} into {catalog_path}")
+        return 0
+
+    started = time.monotonic()
+    try:
+        result = update_catalog(catalog_path, media_root, hash_files)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error: Could not update {catalog_path}: {e}")
+        return 1
+    print(f"Indexed {result.total} files in "
+          f"{time.monotonic() - started:.1f}s: {result.added} new, "
+          f"{result.changed} modified, {result.removed} removed.")
+    print(f"Catalog: {catalog_path}")
+    return 0
+
+
+def query_media(
+    config: Config,
+    catalog: Optional[str] = None,
+    kind: Optional[str] = None,
+    folder: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    min_size: Optional[str] = None,
+    max_size: Optional[str] = None,
+    ext: Optional[str] = None,
+    name: Optional[str] = None,
+    limit: Optional[int] = None,
+    as_json: bool = False
+) -> int:
+    """
+    Lists catalogued media matching the filters, newest first.
+    Sizes accept units (e.g. '50MB'). Returns 0 on success, 1 on failure.
+    """
+    _, catalog_path = _paths(config, catalog)
+    if not os.path.exists(catalog_path):
+        print(f"Error: Media catalog not found at {catalog_path}")
+        print("       Run 'media index' first.")
+        return 1
+    try:
+        rows = query_catalog(
+            catalog_path, kind, folder, since, until,
+            parse_size(min_size) if min_size else None,
+            parse_size(max_size) if max_size else None,
+            ext, name, limit
+        )
+    except ValueError as e:
+        print(f"Error: Invalid size: {e}")
+        return 1
+    except sqlite3.Error as e:
+        print(f"Error: Query failed: {e}")
+        return 1
+
+    if as_json:
+        print(json.dumps(rows, ensure_ascii=False))
+        return 0
+    for row in rows:
+        print(f"{row['date'] or '':10}  {format_size(row['size']):>9}  "
+              f"{row['path']}")
+    total = sum(row['size'] for row in rows)
+    print(f"{len(rows)} files, {format_size(total)}")
+    return 0
+
+
+def _print_audit(report: Dict[str, Any], limit: Optional[int]) -> None:
+    print(f"{report['referenced']} media referenced, "
+          f"{report['on_disk']} files on disk.")
+    if report["matched_by_hash"]:
+        print(f"{report['matched_by_hash']} references found under "
+              f"another name by hash.")
+    for kind in ("missing", "orphans"):
+        entry = report[kind]
+        print(f"{kind.capitalize()}: {entry['count']} "
+              f"({format_size(entry['bytes'])})")
+        for item in entry["items"][:limit]:
+            print(f"  {format_size(item['size'] or 0):>9}  {item['path']}")
+
+
+def _prune_orphans(
+    media_root: str, orphans: List[Dict[str, Any]], dry_run: bool
+) -> None:
+    total = sum(item["size"] for item in orphans)
+    if dry_run:
+        print(f"[DRY-RUN] Would delete {len(orphans)} orphan files "
+              f"({format_size(total)})")
+        return
+    freed = 0
+    for item in orphans:
+        try:
+            os.remove(os.path.join(media_root, *item["path"].split("/")))
+            freed += item["size"]
+        except OSError as e:
+            print(f"Warning: Could not delete {item['path']}: {e}")
+    print(f"Deleted orphan files, freed {format_size(freed)}.")
+
+
+def audit_media_files(
+    config: Config,
+    db_path: Optional[str] = None,
+    use_hashes: bool = False,
+    prune: bool = False,
+    as_json: bool = False,
+    limit: Optional[int] = None
+) -> int:
+    """
+    Compares the media referenced by the decrypted msgstore.db with the
+    pulled WhatsApp/Media tree and reports missing and orphan files with
+    their total sizes. use_hashes refreshes the media catalog and also
+    matches files by SHA-256; prune deletes the orphans (e.g. before a
+    push). Returns 0 on success, 1 on failure.
+    """
+    if not as_json:
+        print("--- WhatsApp Media Audit ---")
+    media_root, catalog_path = _paths(config)
+    db_path = db_path or os.path.join(
+        os.path.dirname(os.path.dirname(media_root)), "msgstore.db"
+    )
+    if not os.path.exists(db_path):
+        print(f"Error: Decrypted database not found at {db_path}")
+        print("       Run 'decrypt' first.")
+        return 1
+
+    dry_run = bool(config.get('dry_run', False))
+    catalog: Optional[str] = None
+    try:
+        if use_hashes:
+            if not dry_run:
+                update_catalog(catalog_path, media_root)
+            if os.path.exists(catalog_path):
+                catalog = catalog_path
+        report = audit_media(
+            db_path, media_root, catalog, None if prune else limit
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error: Audit failed: {e}")
+        return 1
+
+    if as_json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        _print_audit(report, limit)
+
+    if prune and report["orphans"]["count"]:
+        if not report["referenced"]:
+            print("Error: The database references no media; "
+                  "refusing to delete every file.")
+            return 1
+        _prune_orphans(media_root, report["orphans"]["items"], dry_run)
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Media catalog")
+    parser.add_argument("action", choices=["index", "query", "audit"])
+    parser.add_argument("--input", "-i", help="Input directory")
+    parser.add_argument("--catalog")
+    parser.add_argument("--no-hash", action="store_true")
+    parser.add_argument("--kind")
+    parser.add_argument("--since")
+    parser.add_argument("--until")
+    parser.add_argument("--min-size")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--hashes", action="store_true")
+    parser.add_argument("--prune", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    config: Config = {'input': args.input, 'dry_run': args.dry_run}
+    if args.action == "index":
+        sys.exit(index_media(config, args.catalog, not args.no_hash))
+    if args.action == "audit":
+        sys.exit(audit_media_files(
+            config, use_hashes=args.hashes, prune=args.prune,
+            as_json=args.json
+        ))
+    sys.exit(query_media(
+        config, args.catalog, kind=args.kind, since=args.since,
+        until=args.until, min_size=args.min_size, as_json=args.json
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from typing import Optional
+
+from wa_crypt_tools.archive import (
+    ARCHIVE_FILENAME, DEFAULT_SOURCE, merge_into_archive
+)
+from wa_crypt_tools.config import Config
+
+
+def merge_snapshot(
+    config: Config,
+    db_path: Optional[str] = None,
+    archive_path: Optional[str] = None,
+    source: Optional[str] = None
+) -> int:
+    """
+    Merges the decrypted msgstore.db into the long-lived archive database
+    (config 'archive', default <output>/archive.db), keeping messages that
+    were deleted from the phone since earlier snapshots.
+    Returns 0 on success, 1 on failure.
+    """
+    print("--- WhatsApp Archive Merge ---")
+
+    base = config.get('input') or config.get('output') or os.path.join(
+        os.getcwd(), "output"
+    )
+    base = os.path.abspath(base)
+    db_path = db_path or os.path.join(base, "msgstore.db")
+    archive_path = os.path.abspath(
+        archive_path or config.get('archive') or
+        os.path.join(config.get('output') or base, ARCHIVE_FILENAME)
+    )
+    source = source or DEFAULT_SOURCE
+
+    if not os.path.exists(db_path):
+        print(f"Error: Decrypted database not found at {db_path}")
+        print("       Run 'decrypt' first.")
+        return 1
+
+    if config.get('dry_run', False):
+        print(f"[DRY-RUN] Would merge {db_path} into {archive_path} "
+              f"(source '{source}')")
+        return 0
+
+    print(f"Merging {db_path} into {archive_path}...")
+    started = time.monotonic()
+    try:
+        result = merge_into_archive(archive_path, db_path, source)
+    except sqlite3.Error as e:
+        print(f"Error: Merge failed: {e}")
+        return 1
+
+    if result.full_scan:
+        print("Scanned the whole snapshot (first merge of this source, "
+              "or its history changed).")
+    else:
+        print(f"Scanned messages after _id {result.scanned_from}.")
+    print(f"Success! {result.added} new messages archived in "
+          f"{time.monotonic() - started:.1f}s.")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Merge a decrypted msgstore.db into an archive"
+    )
+    parser.add_argument("--input", "-i", help="Input directory")
+    parser.add_argument("--db", help="Decrypted msgstore.db")
+    parser.add_argument("--archive", help="Archive database")
+    parser.add_argument("--source", help="Name of the snapshot lineage")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    config: Config = {'input': args.input, 'dry_run': args.dry_run}
+    sys.exit(merge_snapshot(config, args.db, args.archive, args.source))
+
+
+if __name__ == "__main__":
+    main()
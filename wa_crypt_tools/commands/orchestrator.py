@@ -1,15 +1,23 @@
 import os
 import argparse
 import sys
+import threading
 
 from pathlib import Path
+from typing import List, Optional
+from wa_crypt_tools import profiling, tracing
 from wa_crypt_tools.config import Config, load_config
 from wa_crypt_tools.commands.pull import pull_data
+from wa_crypt_tools.commands.check_key import (
+    candidate_keys, find_matching_key
+)
+from wa_crypt_tools.crypto import CryptoError
 from wa_crypt_tools.commands.decrypt import decrypt_database
 from wa_crypt_tools.commands.convert import convert_vcf
 from wa_crypt_tools.commands.push import push_whatsapp
 
 
+@tracing.traced("all")
 def run_orchestrator(config: Config) -> int:
     """
     Runs the full workflow: Pull -> Decrypt -> Convert.
@@ -17,26 +25,79 @@ def run_orchestrator(config: Config) -> int:
     """
     print("=== WhatsApp Orchestrator ===")
 
-    # 1. Pull
-    print("\n>>> Step 1: Pull Data")
-    if pull_data(config) != 0:
-        print("Orchestrator aborted: Pull failed.")
-        return 1
-
     # Resolve output directory to find where data is
     output_dir = config.get('output')
     if not output_dir:
         output_dir = os.path.join(os.getcwd(), "output")
     output_dir = os.path.abspath(output_dir)
 
+    # Decryption only needs the databases tier, so it is started in the
+    # background as soon as that tier lands, while media keeps pulling
+    # (unless profiling, see on_tier_complete).
+    decrypt_thread: Optional[threading.Thread] = None
+    decrypt_results: List[int] = []
+    key_rejected = False
+
+    def key_opens_backup() -> bool:
+        """Pre-flight: check the key before pulling media."""
+        msgstore_crypt = os.path.join(
+            output_dir, "WhatsApp", "Databases", "msgstore.db.crypt15"
+        )
+        if config.get('dry_run') or not os.path.exists(msgstore_crypt):
+            return True
+        try:
+            match = find_matching_key(msgstore_crypt, candidate_keys(config))
+        except CryptoError as e:
+            print(f"Warning: Could not pre-check the key ({e}).")
+            return True
+        return match is not None
+
+    def on_tier_complete(tier: str) -> bool:
+        nonlocal decrypt_thread, key_rejected
+        if tier == "databases" and config.get('key') and not decrypt_thread:
+            if not key_opens_backup():
+                key_rejected = True
+                return False
+            # Only one stage is profiled at a time and the pull holds
+            # it, so a profiled run decrypts after the pull instead
+            if profiling.directory():
+                return True
+            print("\n>>> Step 2: Decrypt Databases (in background)")
+            decrypt_thread = threading.Thread(
+                target=lambda: decrypt_results.append(
+                    decrypt_database(config, input_dir=output_dir)
+                ),
+                daemon=True
+            )
+            decrypt_thread.start()
+        return True
+
+    # 1. Pull
+    print("\n>>> Step 1: Pull Data")
+    pull_status = pull_data(config, on_tier_complete=on_tier_complete)
+    if decrypt_thread:
+        decrypt_thread.join()
+    if key_rejected:
+        print("Orchestrator aborted: The key cannot decrypt the pulled "
+              "msgstore. Check --key / key_ring.")
+        return 1
+    if pull_status != 0:
+        print("Orchestrator aborted: Pull failed.")
+        return 1
+
     # 2. Decrypt
     print("\n>>> Step 2: Decrypt Databases")
     # Decrypt expects 'key' in config
     if not config.get('key'):
         print("Skipping decryption: No 'key' provided in config/args.")
     else:
-        # Pass the output directory as the input for decryption
-        if decrypt_database(config, input_dir=output_dir) != 0:
+        # Pass the output directory as the input for decryption, unless
+        # it already ran alongside the pull
+        if not decrypt_thread:
+            decrypt_results.append(
+                decrypt_database(config, input_dir=output_dir)
+            )
+        if not decrypt_results or decrypt_results[0] != 0:
             print("Orchestrator warning: Decryption reported errors.")
             # We might continue even if decryption fails partly;
             # decrypt_database returns 1 on critical failure
@@ -0,0 +1,116 @@
+import sys
+import json
+import argparse
+from typing import Any, Dict
+
+from wa_crypt_tools import planner
+from wa_crypt_tools.config import Config, load_config
+from wa_crypt_tools.progress import format_eta
+from wa_crypt_tools.utils import format_size
+
+
+def print_plan(plan: Dict[str, Any]) -> None:
+    """Human readable form of a build_plan() result."""
+    print(f"--- WhatsApp Plan ({plan['command']}) ---")
+    print(f"Output Directory: {plan['output']}")
+    if plan.get("device"):
+        model = f" ({plan['model']})" if plan.get("model") else ""
+        print(f"Source Device: {plan['device']}{model}")
+    if plan.get("error"):
+        print(f"Error: {plan['error']}")
+        return
+
+    print(f"  {'Stage':<10}{'Files':>8}{'Size':>12}{'Rate':>14}"
+          f"{'Time':>10}")
+    for stage in plan["stages"]:
+        rate = f"{format_size(stage['rate'])}/s"
+        if stage["rate_source"] == "default":
+            rate = "~" + rate
+        print(f"  {stage['stage']:<10}{stage['files']:>8}"
+              f"{format_size(stage['bytes']):>12}{rate:>14}"
+              f"{format_eta(stage['seconds']):>10}")
+        if stage["stage"] == "pull":
+            for tier, totals in stage["tiers"].items():
+                print(f"    {tier:<9}{totals['files']:>7}"
+                      f"{format_size(totals['bytes']):>12}")
+            if stage["skipped_backups"]:
+                print(f"    {stage['skipped_backups']} older rotated "
+                      "backups stay on the device.")
+            if stage["contacts"] is None:
+                print("    contacts.vcf not found on the device.")
+            if "budget_media_left" in stage:
+                print(f"    Time budget: {stage['budget_media_files']} "
+                      f"media files fit, {stage['budget_media_left']} "
+                      "would be left on the device.")
+        elif stage["stage"] == "decrypt" and stage["likely_cached"]:
+            print("    Likely cached: "
+                  + ", ".join(stage["likely_cached"]))
+        elif stage["stage"] == "push":
+            target = stage["device"] or "default device"
+            print(f"    {stage['changed_files']} files "
+                  f"({format_size(stage['changed_bytes'])}) differ from "
+                  f"or are missing on {target}.")
+
+    print(f"Estimated time: {format_eta(plan['seconds'])}")
+    print(f"Disk: {format_size(plan['disk_needed'])} needed, "
+          f"{format_size(plan['disk_free'])} free.")
+    if any(s["rate_source"] == "default" for s in plan["stages"]):
+        print("~ Rate assumed; measured rates are used once runs are "
+              "recorded.")
+    if not plan["fits"]:
+        print("Error: Not enough free space in the output directory.")
+
+
+def plan_run(
+    config: Config,
+    command: str = "all",
+    as_json: bool = False
+) -> int:
+    """
+    Prints what command would transfer, how long it should take and
+    whether it fits on disk, without touching any files.
+    Returns 0 if the run can go ahead, 1 otherwise.
+    """
+    plan = planner.build_plan(config, command)
+    if as_json:
+        print(json.dumps(plan))
+    else:
+        print_plan(plan)
+    return 0 if plan.get("fits") and not plan.get("error") else 1
+
+
+def check_plan(config: Config, command: str) -> bool:
+    """
+    Prints the plan ahead of a dry run. Returns False if the run would
+    not fit on disk; a plan that cannot be made does not stop the run.
+    """
+    plan = planner.build_plan(config, command)
+    if plan.get("error"):
+        print(f"Warning: Could not plan the run: {plan['error']}")
+        return True
+    print_plan(plan)
+    return bool(plan["fits"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Show what a pull/push/all run would do"
+    )
+    parser.add_argument("--config", "-c", help="Config file path")
+    parser.add_argument("--output", "-o", help="Output directory")
+    parser.add_argument("--device", help="Device serial")
+    parser.add_argument("--for", dest="for_command", default="all",
+                        choices=planner.PLAN_COMMANDS)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.output:
+        config['output'] = args.output
+    if args.device:
+        config['device'] = args.device
+    sys.exit(plan_run(config, args.for_command, args.json))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,290 @@
 import os
+import time
 import argparse
+import posixpath
 import subprocess
-from typing import Optional
+from typing import Callable, Dict, List, Optional
 from wa_crypt_tools.adb import (
-    get_adb_base, run_adb_command, check_connection, AdbError
+    get_adb_base, run_adb_command, check_connection, list_remote_files,
+    AdbError, RemoteFile
 )
+from wa_crypt_tools.backups import (
+    select_backups, parse_backup_name, DEFAULT_KEEP_ROTATED,
+    PRIMARY_DATABASES
+)
+from wa_crypt_tools import profiling, progress, tracing
 from wa_crypt_tools.config import Config, load_config, merge_args_with_config
+from wa_crypt_tools.progress import Transfer
+from wa_crypt_tools.scheduler import prioritize_media, batch_by_directory
+from wa_crypt_tools.utils import format_size, free_space
+
+# Called with the tier name ("databases", "backups", "media") as soon as
+# that tier is on disk. Returning False stops the pull early.
+TierCallback = Callable[[str], bool]
+# Polled before every adb call of a tier; returning True stops the pull
+CancelCheck = Callable[[], bool]
+
+REMOTE_WHATSAPP_DIR = "/sdcard/Android/media/com.whatsapp/WhatsApp"
+# Where contacts.vcf exports are looked for, in order
+CONTACTS_PATHS = ("/sdcard/Download/contacts.vcf", "/sdcard/contacts.vcf")
+
+
+def _pull_files(
+    adb_base: List[str],
+    files: List[RemoteFile],
+    remote_root: str,
+    local_root: str,
+    dry_run: bool = False,
+    deadline: Optional[float] = None,
+    bar: Optional[Transfer] = None,
+    cancel: Optional[CancelCheck] = None
+) -> int:
+    """
+    Pulls files in order, mirroring their layout below remote_root into
+    local_root. Consecutive files of one directory share an adb call.
+    Stops early once deadline (time.monotonic()) has passed or cancel()
+    returns True.
+    bar, if given, follows the batches (adb's own output is then hidden).
+    Returns the number of files that failed to pull.
+    """
+    batches = batch_by_directory(files)
+    failed = 0
+    for i, (remote_dir, batch) in enumerate(batches):
+        if deadline is not None and time.monotonic() >= deadline:
+            left = sum(len(b) for _, b in batches[i:])
+            print(f"Warning: Time budget reached. {left} files "
+                  "were left on the device.")
+            break
+        if cancel is not None and cancel():
+            left = sum(len(b) for _, b in batches[i:])
+            print(f"Pull cancelled. {left} files were left on the device.")
+            break
+
+        rel_dir = posixpath.relpath(remote_dir, remote_root)
+        local_dir = os.path.normpath(os.path.join(local_root, rel_dir))
+        sources = [f.path for f in batch]
+        if dry_run:
+            for source in sources:
+                print(f"[DRY-RUN] Would pull {source} to {local_dir}/")
+            continue
+
+        os.makedirs(local_dir, exist_ok=True)
+        size = sum(f.size for f in batch)
+        quiet: Dict[str, int] = {}
+        if bar is not None and bar.active:
+            quiet["stdout"] = subprocess.DEVNULL
+            bar.begin("adb", f"{rel_dir} ({len(batch)} files)", [
+                os.path.join(local_dir, posixpath.basename(f.path))
+                for f in batch
+            ])
+        try:
+            tracing.check_call(
+                adb_base + ["pull"] + sources + [local_dir], "adb pull",
+                files=len(batch), bytes=size, **quiet
+            )
+            batch_failed = 0
+        except subprocess.CalledProcessError:
+            batch_failed = len(batch)
+        failed += batch_failed
+        if bar is not None:
+            bar.advance(len(batch), size, "adb", failed=batch_failed)
+
+    return failed
+
+
+def _missing_locally(
+    files: List[RemoteFile], remote_root: str, local_root: str
+) -> List[RemoteFile]:
+    """
+    The files not yet below local_root with their remote size. WhatsApp
+    never rewrites a media file in place, so name and size identify it.
+    """
+    missing = []
+    for f in files:
+        local = os.path.join(
+            local_root, *posixpath.relpath(f.path, remote_root).split("/")
+        )
+        try:
+            if os.path.getsize(local) == f.size:
+                continue
+        except OSError:
+            pass
+        missing.append(f)
+    return missing
 
 
-def pull_data(config: Config, device_id: Optional[str] = None) -> int:
+def _pull_media(
+    adb_base: List[str],
+    device_id: Optional[str],
+    media_path: str,
+    dest_dir: str,
+    weights: Optional[Dict[str, float]] = None,
+    deadline: Optional[float] = None,
+    incremental: bool = False,
+    cancel: Optional[CancelCheck] = None
+) -> bool:
+    """
+    Pulls the Media folder newest first, in per-directory batches.
+    With incremental, files already on disk are skipped.
+    Falls back to a plain folder pull if the device cannot be listed.
+    Returns False without pulling if the media would not fit on disk.
+    """
+    try:
+        files = list_remote_files(media_path, device_id)
+    except AdbError:
+        print("Warning: Could not list Media folder. "
+              "Pulling it in device order.")
+        try:
+            subprocess.check_call(adb_base + ["pull", media_path, dest_dir])
+        except subprocess.CalledProcessError:
+            print("Warning: Failed to pull Media folder.")
+        return True
+
+    if incremental:
+        missing = _missing_locally(
+            files, media_path, os.path.join(dest_dir, "Media")
+        )
+        print(f"{len(files) - len(missing)} media files are already "
+              "on disk.")
+        files = missing
+    ordered = prioritize_media(files, media_path, weights)
+    total = sum(f.size for f in ordered)
+    free = free_space(dest_dir)
+    if total > free:
+        print(f"Error: Media needs {format_size(total)} but only "
+              f"{format_size(free)} is free in {dest_dir}.")
+        return False
+    print(f"Found {len(ordered)} media files. Pulling newest first.")
+
+    with progress.transfer("media", len(ordered), total) as bar:
+        failed = _pull_files(
+            adb_base, ordered, media_path, os.path.join(dest_dir, "Media"),
+            deadline=deadline, bar=bar, cancel=cancel
+        )
+    if failed:
+        print(f"Warning: Failed to pull {failed} media files.")
+    return True
+
+
+def _pull_databases_fallback(
+    adb_base: List[str],
+    base_path: str,
+    dest_dir: str,
+    dry_run: bool
+) -> None:
+    """
+    Pulls msgstore and wa.db by their well-known names.
+    Used when the device cannot be listed.
+    """
+    # msgstore
+    target_msgstore = "msgstore.db.crypt15"
+    target_msgstore_dest = os.path.join(dest_dir, "Databases")
+    if dry_run:
+        print(f"[DRY-RUN] Would pull {base_path}/Databases/{target_msgstore} to {target_msgstore_dest}/")
+    else:
+        try:
+            subprocess.check_call(
+                adb_base + [
+                    "pull",
+                    f"{base_path}/Databases/{target_msgstore}",
+                    os.path.join(dest_dir, "Databases/")
+                ],
+                stderr=subprocess.DEVNULL
+            )
+            print(f"Pulled {target_msgstore}")
+        except subprocess.CalledProcessError:
+            print(f"Warning: {target_msgstore} not found in Databases.")
+
+    # wa.db
+    target_wadb = "wa.db.crypt15"
+    wadb_dest = os.path.join(dest_dir, "Databases")
+    if dry_run:
+        print(f"[DRY-RUN] Would pull {target_wadb} from Databases or Backups to {wadb_dest}/")
+    else:
+        # Try Databases folder first
+        try:
+            subprocess.check_call(
+                adb_base + [
+                    "pull",
+                    f"{base_path}/Databases/{target_wadb}",
+                    os.path.join(dest_dir, "Databases/")
+                ],
+                stderr=subprocess.DEVNULL
+            )
+            print(f"Pulled {target_wadb}")
+        except subprocess.CalledProcessError:
+            # Try Backups folder if not in Databases
+            # (sometimes it's there per user)
+            try:
+                subprocess.check_call(
+                    adb_base + [
+                        "pull",
+                        f"{base_path}/Backups/{target_wadb}",
+                        os.path.join(dest_dir, "Databases/")
+                    ],
+                    stderr=subprocess.DEVNULL
+                )
+                print(f"Pulled {target_wadb} (from Backups)")
+            except subprocess.CalledProcessError:
+                print(f"Warning: {target_wadb} not found in Databases or Backups.")
+
+
+def _pull_backups_fallback(
+    adb_base: List[str],
+    base_path: str,
+    dest_dir: str,
+    dry_run: bool
+) -> None:
+    """Pulls the whole Backups folder. Used when the device cannot be listed."""
+    if dry_run:
+        print(f"[DRY-RUN] Would pull {base_path}/Backups to {dest_dir}")
+    else:
+        try:
+            subprocess.check_call(
+                adb_base + ["pull", f"{base_path}/Backups", dest_dir]
+            )
+        except subprocess.CalledProcessError:
+            print("Warning: Failed to pull Backups folder.")
+
+
+@tracing.traced("pull")
+@profiling.profiled("pull")
+def pull_data(
+    config: Config,
+    device_id: Optional[str] = None,
+    on_tier_complete: Optional[TierCallback] = None,
+    cancel: Optional[CancelCheck] = None
+) -> int:
     """
     Pulls WhatsApp data from a connected Android device.
+    Data is pulled in priority tiers (databases, backups, media) and
+    on_tier_complete is notified as each tier lands on disk. cancel, if
+    given, is checked before every adb pull; once it returns True the
+    pull stops and 1 is returned.
+    With 'pull_incremental', an earlier pull in the same output is
+    updated: databases and backups are pulled again, media only if new.
     Returns 0 on success, 1 on failure.
     """
     print("--- WhatsApp Full Folder Puller (Python) ---")
 
-    dry_run = config.get('dry_run', False)
+    dry_run = bool(config.get('dry_run', False))
+    incremental = bool(config.get('pull_incremental', False))
+
+    # Optional bounded window: stop scheduling media once it is used up
+    time_budget = config.get('pull_time_budget')
+    deadline = (
+        time.monotonic() + time_budget if time_budget else None
+    )
+
+    def tier_done(tier: str) -> bool:
+        tracing.instant(f"tier {tier}")
+        if cancel is not None and cancel():
+            print(f"Pull cancelled during the '{tier}' tier.")
+            return False
+        if on_tier_complete is None or on_tier_complete(tier):
+            return True
+        print(f"Pull stopped after the '{tier}' tier.")
+        return False
 
     # Resolving Output Directory
     # config['output'] should already be resolved by merge_args_with_config
@@ -48,7 +317,7 @@ def pull_data(config: Config, device_id: Optional[str] = None) -> int:
         return 1
 
     # Check destination
-    if os.path.isdir(dest_dir) and os.listdir(dest_dir):
+    if not incremental and os.path.isdir(dest_dir) and os.listdir(dest_dir):
         print(f"Error: Destination directory {dest_dir} is not empty. "
               "Aborting to prevent overwrite.")
         return 1
@@ -60,10 +329,9 @@ def pull_data(config: Config, device_id: Optional[str] = None) -> int:
 
     # 2. Pull Contacts
     print("[2/5] Checking for contacts.vcf...")
-    contacts_paths = ["/sdcard/Download/contacts.vcf", "/sdcard/contacts.vcf"]
     found_contact = None
 
-    for path in contacts_paths:
+    for path in CONTACTS_PATHS:
         try:
             # Check file existence via shell
             run_adb_command(adb_base + ["shell", f"[ -f {path} ]"])
@@ -96,7 +364,7 @@ def pull_data(config: Config, device_id: Optional[str] = None) -> int:
 
     # 3. Locate WhatsApp
     print("[3/5] Locating WhatsApp folder...")
-    base_path = "/sdcard/Android/media/com.whatsapp/WhatsApp"
+    base_path = REMOTE_WHATSAPP_DIR
     try:
         run_adb_command(adb_base + ["shell", f"[ -d {base_path} ]"])
         print(f"Found WhatsApp folder at: {base_path}")
@@ -104,85 +372,71 @@ def pull_data(config: Config, device_id: Optional[str] = None) -> int:
         print(f"Error: WhatsApp folder not found at {base_path}")
         return 1
 
-    # 4. Pull Databases (msgstore and wa)
+    # 4. Select databases and backups from one remote listing
     print("[4/6] Pulling Databases...")
+    keep_rotated = config.get('keep_rotated_backups')
+    if keep_rotated is None:
+        keep_rotated = DEFAULT_KEEP_ROTATED
+    try:
+        listing: Optional[List[RemoteFile]] = list_remote_files(
+            [f"{base_path}/Databases", f"{base_path}/Backups"],
+            target_device
+        )
+    except AdbError:
+        print("Warning: Could not list Databases/Backups. "
+              "Falling back to pulling them whole.")
+        listing = None
 
-    # msgstore
-    target_msgstore = "msgstore.db.crypt15"
-    target_msgstore_dest = os.path.join(dest_dir, "Databases")
-    if dry_run:
-        print(f"[DRY-RUN] Would pull {base_path}/Databases/{target_msgstore} to {target_msgstore_dest}/")
+    if listing is None:
+        _pull_databases_fallback(adb_base, base_path, dest_dir, dry_run)
     else:
-        try:
-            subprocess.check_call(
-                adb_base + [
-                    "pull",
-                    f"{base_path}/Databases/{target_msgstore}",
-                    os.path.join(dest_dir, "Databases/")
-                ],
-                stderr=subprocess.DEVNULL
-            )
-            print(f"Pulled {target_msgstore}")
-        except subprocess.CalledProcessError:
-            print(f"Warning: {target_msgstore} not found in Databases.")
+        primary, secondary = select_backups(listing, keep_rotated)
+        skipped = len(listing) - len(primary) - len(secondary)
+        _pull_files(adb_base, primary, base_path, dest_dir, dry_run,
+                    cancel=cancel)
+        found = {parse_backup_name(f.path)[0] for f in primary}
+        for name in PRIMARY_DATABASES:
+            if name not in found:
+                print(f"Warning: {name} database not found in Databases "
+                      "or Backups.")
 
-    # wa.db
-    target_wadb = "wa.db.crypt15"
-    wadb_dest = os.path.join(dest_dir, "Databases")
-    if dry_run:
-        print(f"[DRY-RUN] Would pull {target_wadb} from Databases or Backups to {wadb_dest}/")
-    else:
-        # Try Databases folder first
-        try:
-            subprocess.check_call(
-                adb_base + [
-                    "pull",
-                    f"{base_path}/Databases/{target_wadb}",
-                    os.path.join(dest_dir, "Databases/")
-                ],
-                stderr=subprocess.DEVNULL
-            )
-            print(f"Pulled {target_wadb}")
-        except subprocess.CalledProcessError:
-            # Try Backups folder if not in Databases
-            # (sometimes it's there per user)
-            try:
-                subprocess.check_call(
-                    adb_base + [
-                        "pull",
-                        f"{base_path}/Backups/{target_wadb}",
-                        os.path.join(dest_dir, "Databases/")
-                    ],
-                    stderr=subprocess.DEVNULL
-                )
-                print(f"Pulled {target_wadb} (from Backups)")
-            except subprocess.CalledProcessError:
-                print(f"Warning: {target_wadb} not found in Databases or Backups.")
+    if not tier_done("databases"):
+        return 1
 
     # 5. Pull Backups
     print("[5/6] Pulling Backups folder...")
-    if dry_run:
-        print(f"[DRY-RUN] Would pull {base_path}/Backups to {dest_dir}")
+    if listing is None:
+        _pull_backups_fallback(adb_base, base_path, dest_dir, dry_run)
     else:
-        try:
-            subprocess.check_call(
-                adb_base + ["pull", f"{base_path}/Backups", dest_dir]
-            )
-        except subprocess.CalledProcessError:
-            print("Warning: Failed to pull Backups folder.")
+        print(f"Selected {len(secondary)} backup files "
+              f"(keeping {keep_rotated} rotated per database, "
+              f"{skipped} older copies left on the device).")
+        _pull_files(adb_base, secondary, base_path, dest_dir, dry_run,
+                    cancel=cancel)
+
+    if not tier_done("backups"):
+        return 1
 
     # 6. Pull Media
     print("[6/6] Pulling Media folder...")
     media_path = f"{base_path}/Media"
     if dry_run:
-        print(f"[DRY-RUN] Would pull {media_path} to {dest_dir}")
-    else:
-        try:
-            subprocess.check_call(
-                adb_base + ["pull", media_path, dest_dir]
-            )
-        except subprocess.CalledProcessError:
-            print("Warning: Failed to pull Media folder.")
+        print(f"[DRY-RUN] Would pull {media_path} to {dest_dir} "
+              "(newest first)")
+    elif not _pull_media(
+        adb_base,
+        target_device,
+        media_path,
+        dest_dir,
+        weights=config.get('media_weights'),
+        deadline=deadline,
+        incremental=incremental,
+        cancel=cancel
+    ):
+        return 1
+
+    if not tier_done("media"):
+        return 1
 
     print("----------------------------")
     print(f"Success! WhatsApp data pulled to: {dest_dir}")
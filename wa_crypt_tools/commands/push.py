@@ -1,17 +1,80 @@
 
 import os
+import posixpath
 import subprocess
 import argparse
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
+from .. import profiling, progress, tracing
 from ..adb import get_adb_base
+from .encrypt import encrypt_database
 
 
+def _tree_size(path: str) -> Tuple[int, int]:
+    """(files, bytes) below path, or of path itself if it is a file."""
+    if os.path.isfile(path):
+        return 1, os.path.getsize(path)
+    files = total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            files += 1
+            total += os.path.getsize(os.path.join(dirpath, name))
+    return files, total
+
+
+def _push_units(local_wa: str) -> List[Tuple[str, str, int, int]]:
+    """
+    Splits the WhatsApp folder into separately pushed pieces: its
+    entries, with Media split into its folders. Returns
+    (local path, remote parent relative to WhatsApp, files, bytes).
+    """
+    units = []
+    for name in sorted(os.listdir(local_wa)):
+        path = os.path.join(local_wa, name)
+        if name == "Media" and os.path.isdir(path):
+            for child in sorted(os.listdir(path)):
+                units.append((os.path.join(path, child), "Media")
+                             + _tree_size(os.path.join(path, child)))
+        else:
+            units.append((path, "") + _tree_size(path))
+    return units
+
+
+def _push_with_progress(
+    adb_base: List[str], local_wa: str, target_base: str
+) -> None:
+    """
+    Same result as pushing local_wa into target_base, one adb call per
+    unit so the progress display can count finished bytes.
+    Raises CalledProcessError on the first failed call.
+    """
+    units = _push_units(local_wa)
+    remote_wa = posixpath.join(target_base, "WhatsApp")
+    subprocess.check_call(
+        adb_base + ["shell", f"mkdir -p '{remote_wa}/Media'"],
+        stdout=subprocess.DEVNULL
+    )
+    with progress.transfer(
+        "push", sum(u[2] for u in units), sum(u[3] for u in units)
+    ) as bar:
+        for path, parent, files, size in units:
+            bar.begin("adb", os.path.relpath(path, local_wa))
+            tracing.check_call(
+                adb_base + ["push", path, posixpath.join(remote_wa, parent)],
+                "adb push", files=files, bytes=size,
+                stdout=subprocess.DEVNULL
+            )
+            bar.advance(files, size, "adb")
+
+
+@tracing.traced("push")
+@profiling.profiled("push")
 def push_whatsapp(
     input_path: Path,
     device_id: Optional[str] = None,
-    dry_run: bool = False
+    dry_run: bool = False,
+    encrypt_key: Optional[str] = None
 ) -> bool:
     """
     Pushes local WhatsApp folder to a connected Android device.
@@ -22,6 +85,8 @@ def push_whatsapp(
                      .../output/WhatsApp)
         device_id: Optional ADB serial ID.
         dry_run: If True, simulate the push without executing actual commands.
+        encrypt_key: If set, re-encrypt input_path/msgstore.db into the
+                     crypt15 backup with this key before pushing.
 
     Returns:
         bool: True on success, False on failure.
@@ -41,6 +106,15 @@ def push_whatsapp(
 
     print(f"Source: {local_wa}")
 
+    if encrypt_key:
+        print("Re-encrypting msgstore.db before push...")
+        encrypted = encrypt_database(
+            {'input': input_str, 'dry_run': dry_run}, key=encrypt_key
+        )
+        if encrypted != 0:
+            print("Error: Re-encryption failed. Nothing was pushed.")
+            return False
+
     adb_base = get_adb_base(device_id)
     if device_id:
         print(f"Target Device: {device_id}")
@@ -87,7 +161,12 @@ def push_whatsapp(
             # if target_base exists, 'WhatsApp' folder will be created inside
             # 'target_base'.
             # resulting in /sdcard/Android/media/com.whatsapp/WhatsApp
-            subprocess.check_call(adb_base + ["push", local_wa, target_base])
+            if progress.get_mode() == "off":
+                tracing.check_call(
+                    adb_base + ["push", local_wa, target_base], "adb push"
+                )
+            else:
+                _push_with_progress(adb_base, local_wa, target_base)
             print("Push completed successfully.")
         except subprocess.CalledProcessError:
             print("Error during push.")
@@ -108,7 +187,11 @@ def run(args: argparse.Namespace) -> int:
     success = push_whatsapp(
         input_path,
         args.device,
-        dry_run=args.dry_run
+        dry_run=args.dry_run,
+        encrypt_key=(
+            getattr(args, 'key', None)
+            if getattr(args, 'encrypt', False) else None
+        )
     )
     return 0 if success else 1
 
@@ -121,6 +204,9 @@ if __name__ == "__main__":
     parser.add_argument("--input", "-i", help="Base input directory containing WhatsApp folder")
     parser.add_argument("--device", "-d", help="Specific device ID")
     parser.add_argument("--config", "-c", help="Config file path")
+    parser.add_argument("--key", "-k", help="Key used by --encrypt")
+    parser.add_argument("--encrypt", action="store_true",
+                        help="Re-encrypt msgstore.db before pushing")
     parser.add_argument("--dry-run", action="store_true")
     
     args = parser.parse_args()
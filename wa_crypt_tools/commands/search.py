@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+from typing import Optional
+
+from wa_crypt_tools.config import Config
+from wa_crypt_tools.search_index import (
+    SEARCH_INDEX_FILENAME, fts5_available, search, update_index
+)
+
+
+def search_messages(
+    config: Config,
+    query: str,
+    chat: Optional[str] = None,
+    sender: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 20,
+    as_json: bool = False,
+    raw: bool = False,
+    rebuild: bool = False
+) -> int:
+    """
+    Searches the decrypted messages through an FTS5 index kept next to
+    msgstore.db (<input>/search.db). The index is brought up to date
+    first, which only reads messages added since the last search.
+    Returns 0 if anything matched, 1 otherwise.
+    """
+    base = config.get('input') or config.get('output') or os.path.join(
+        os.getcwd(), "output"
+    )
+    base = os.path.abspath(base)
+    db_path = os.path.join(base, "msgstore.db")
+    index_path = os.path.join(base, SEARCH_INDEX_FILENAME)
+
+    if not fts5_available():
+        print("Error: This Python's SQLite was built without FTS5.")
+        return 1
+
+    for day in (since, until):
+        if day:
+            try:
+                datetime.strptime(day, "%Y-%m-%d")
+            except ValueError:
+                print(f"Error: Invalid date '{day}' (expected YYYY-MM-DD)")
+                return 1
+
+    if os.path.exists(db_path):
+        try:
+            added = update_index(
+                index_path, db_path, os.path.join(base, "wa.db"), rebuild
+            )
+        except sqlite3.Error as e:
+            print(f"Error: Could not index {db_path}: {e}")
+            return 1
+        if added and not as_json:
+            print(f"Indexed {added} new messages.")
+    elif not os.path.exists(index_path):
+        print(f"Error: Decrypted database not found at {db_path}")
+        print("       Run 'decrypt' first.")
+        return 1
+
+    try:
+        hits = search(
+            index_path, query, chat, sender, since, until, limit, raw
+        )
+    except sqlite3.Error as e:
+        print(f"Error: Search failed: {e}")
+        return 1
+
+    if as_json:
+        print(json.dumps([hit._asdict() for hit in hits], ensure_ascii=False))
+    else:
+        for hit in hits:
+            when = datetime.fromtimestamp(hit.timestamp / 1000).strftime(
+                "%Y-%m-%d %H:%M"
+            )
+            print(f"{when}  [{hit.chat_title}] {hit.sender}: {hit.snippet}")
+        if not hits:
+            print("No matches.")
+    return 0 if hits else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search decrypted messages")
+    parser.add_argument("query")
+    parser.add_argument("--input", "-i", help="Input directory")
+    parser.add_argument("--chat")
+    parser.add_argument("--sender")
+    parser.add_argument("--since", help="YYYY-MM-DD")
+    parser.add_argument("--until", help="YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--raw", action="store_true")
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    config: Config = {'input': args.input}
+    sys.exit(search_messages(
+        config, args.query, args.chat, args.sender, args.since, args.until,
+        args.limit, args.json, args.raw, args.rebuild
+    ))
+
+
+if __name__ == "__main__":
+    main()
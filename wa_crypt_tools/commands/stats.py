@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from typing import Optional
+
+from wa_crypt_tools.config import Config
+from wa_crypt_tools.history import (
+    TREND_WINDOW, history_path, run_totals, stage_stats
+)
+from wa_crypt_tools.utils import format_size
+
+
+def _format_trend(trend: Optional[float]) -> str:
+    if trend is None:
+        return "-"
+    return f"{trend * 100:+.0f}%"
+
+
+def show_stats(
+    config: Config,
+    device: Optional[str] = None,
+    command: Optional[str] = None,
+    days: Optional[float] = None,
+    as_json: bool = False
+) -> int:
+    """
+    Prints per-device stage percentiles from the run history in the
+    output directory. Returns 0 on success, 1 on failure.
+    """
+    base = os.path.abspath(config.get('output') or os.path.join(
+        os.getcwd(), "output"
+    ))
+    path = history_path(base)
+    if not os.path.exists(path):
+        print(f"Error: No run history at {path}")
+        print("       Runs are recorded once a command has run there.")
+        return 1
+
+    since = time.time() - days * 86400 if days else None
+    try:
+        stats = stage_stats(path, device, command, since)
+        runs, failed, last_ok = run_totals(path, device, command, since)
+    except sqlite3.Error as e:
+        print(f"Error: Could not read {path}: {e}")
+        return 1
+
+    if as_json:
+        print(json.dumps({
+            "history": path,
+            "runs": runs,
+            "failed": failed,
+            "last_success": last_ok,
+            "stages": [s._asdict() for s in stats],
+        }))
+        return 0
+
+    print("--- WhatsApp Run History ---")
+    print(f"History: {path} ({runs} runs, {failed} failed)")
+    if not stats:
+        print("No matching successful runs.")
+        return 0
+
+    current = None
+    for s in stats:
+        if s.device != current:
+            current = s.device
+            label = s.device or "no device"
+            print(f"\n{label}" + (f" ({s.model})" if s.model else ""))
+            if s.device in last_ok:
+                print("  Last success: " + time.strftime(
+                    "%Y-%m-%d %H:%M", time.localtime(last_ok[s.device])
+                ))
+            print(f"  {'Stage':<12}{'Runs':>6}{'Fail':>6}{'p50':>9}"
+                  f"{'p90':>9}{'p95':>9}{'Rate p50':>12}{'Rate p10':>12}"
+                  f"{'Trend':>8}")
+        rate50 = f"{format_size(s.rate_p50)}/s" if s.rate_p50 else "-"
+        rate10 = f"{format_size(s.rate_p10)}/s" if s.rate_p10 else "-"
+        print(f"  {s.stage:<12}{s.runs:>6}{s.failed:>6}"
+              f"{s.wall_p50:>8.1f}s{s.wall_p90:>8.1f}s{s.wall_p95:>8.1f}s"
+              f"{rate50:>12}{rate10:>12}{_format_trend(s.trend):>8}")
+    print(f"\nTrend: median wall time of the last {TREND_WINDOW} runs "
+          "against the runs before them (+ is slower).")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Show run history percentiles per device"
+    )
+    parser.add_argument("--output", "-o", help="Output directory")
+    parser.add_argument("--device", help="Only this device serial")
+    parser.add_argument("--command", help="Only runs of this command")
+    parser.add_argument("--days", type=float, help="Only the last N days")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    config: Config = {'output': args.output}
+    sys.exit(show_stats(
+        config, args.device, args.command, args.days, args.json
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from wa_crypt_tools import msgstore
+from wa_crypt_tools.commands.export import EXPORT_DIRNAME, chat_filename
+from wa_crypt_tools.config import Config
+from wa_crypt_tools.msgstore import SCHEMA_LEGACY, SCHEMA_MODERN, MsgStore
+
+THUMBNAILS_DIRNAME = "thumbnails"
+# Last extracted row, so later runs resume after it
+THUMBNAILS_STATE_FILENAME = ".thumbnails_state.json"
+# Thumbnails listed per batch; the state is saved after each one
+THUMBNAIL_BATCH_SIZE = 1000
+# Bytes copied per read from a BLOB
+BLOB_CHUNK_SIZE = 64 * 1024
+# Connection.blobopen (incremental BLOB I/O) exists on Python 3.11+
+HAVE_BLOBOPEN = hasattr(sqlite3.Connection, "blobopen")
+
+# Per schema: (table, BLOB column, rowid column)
+THUMBNAIL_TABLES: Dict[str, Tuple[str, str, str]] = {
+    SCHEMA_MODERN: ("message_thumbnail", "thumbnail", "message_row_id"),
+    SCHEMA_LEGACY: ("message_thumbnails", "thumbnail", "rowid"),
+}
+# Per schema: (rowid, chat jid, key_id) of the next batch after ?
+THUMBNAIL_BATCH_SQL: Dict[str, str] = {
+    SCHEMA_MODERN: """
+        SELECT t.message_row_id, j.raw_string, m.key_id
+        FROM message_thumbnail AS t
+        LEFT JOIN message AS m ON m._id = t.message_row_id
+        LEFT JOIN chat AS c ON c._id = m.chat_row_id
+        LEFT JOIN jid AS j ON j._id = c.jid_row_id
+        WHERE t.message_row_id > ? AND t.thumbnail IS NOT NULL
+        ORDER BY t.message_row_id LIMIT ?
+    """,
+    SCHEMA_LEGACY: """
+        SELECT rowid, key_remote_jid, key_id FROM message_thumbnails
+        WHERE rowid > ? AND thumbnail IS NOT NULL
+        ORDER BY rowid LIMIT ?
+    """,
+}
+THUMBNAIL_KEY_SQL: Dict[str, str] = {
+    SCHEMA_MODERN: "SELECT key_id FROM message WHERE _id = ?",
+    SCHEMA_LEGACY: "SELECT key_id FROM message_thumbnails WHERE rowid = ?",
+}
+
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG", ".png"),
+    (b"RIFF", ".webp"),
+    (b"GIF8", ".gif"),
+)
+
+
+def thumbnail_extension(head: bytes) -> str:
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return ".bin"
+
+
+def blob_chunks(
+    conn: sqlite3.Connection,
+    table: str,
+    column: str,
+    rowid: int,
+    use_blobopen: bool = HAVE_BLOBOPEN
+) -> Iterator[bytes]:
+    """
+    The BLOB in table.column at rowid, BLOB_CHUNK_SIZE bytes at a time.
+    Uses incremental BLOB I/O where available, so the value is never
+    held in memory as a whole; older Pythons read it with substr().
+    """
+    if use_blobopen:
+        with conn.blobopen(table, column, rowid, readonly=True) as blob:
+            while True:
+                chunk = blob.read(BLOB_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+    offset = 1
+    sql = f"SELECT substr({column}, ?, ?) FROM {table} WHERE rowid = ?"
+    while True:
+        row = conn.execute(sql, (offset, BLOB_CHUNK_SIZE, rowid)).fetchone()
+        if not row or not row[0]:
+            return
+        yield bytes(row[0])
+        offset += len(row[0])
+
+
+class ThumbnailWriter:
+    """
+    Copies thumbnails to <output_dir>/<chat>/<rowid>.<ext> on worker
+    threads, each with its own read-only connection to the database.
+    """
+
+    def __init__(self, db_path: str, schema: str, output_dir: str) -> None:
+        self.db_path = db_path
+        self.table, self.column, _ = THUMBNAIL_TABLES[schema]
+        self.output_dir = output_dir
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only this thread uses it; close() runs on the caller's
+            # thread once the pool is done
+            conn = msgstore.connect(self.db_path, check_same_thread=False)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def write(self, row: Tuple[int, Optional[str], Optional[str]]) -> int:
+        """Extracts one thumbnail; returns the bytes written."""
+        rowid, jid, _ = row
+        chunks = blob_chunks(self._conn(), self.table, self.column, rowid)
+        head = next(chunks, b"")
+        if not head:
+            return 0
+        folder = os.path.join(self.output_dir, chat_filename(jid or ""))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{rowid}{thumbnail_extension(head)}")
+        written = len(head)
+        with open(path + ".tmp", 'wb') as f:
+            f.write(head)
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(path + ".tmp", path)
+        return written
+
+    def close(self) -> None:
+        for conn in self._connections:
+            conn.close()
+
+
+def load_state(output_dir: str) -> Dict[str, Any]:
+    path = os.path.join(output_dir, THUMBNAILS_STATE_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return dict(json.load(f))
+    except (OSError, ValueError, TypeError):
+        print("Warning: Ignoring unreadable thumbnail state; "
+              "extracting everything.")
+        return {}
+
+
+def save_state(output_dir: str, state: Dict[str, Any]) -> None:
+    path = os.path.join(output_dir, THUMBNAILS_STATE_FILENAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _resume_from(
+    conn: sqlite3.Connection, schema: str, state: Dict[str, Any]
+) -> int:
+    """Rowid to resume after, or 0 if the database is not the same one."""
+    last_id = int(state.get("last_id") or 0)
+    if not last_id or state.get("schema") != schema:
+        return 0
+    row = conn.execute(THUMBNAIL_KEY_SQL[schema], (last_id,)).fetchone()
+    if row is None or row[0] != state.get("last_key_id"):
+        return 0
+    return last_id
+
+
+def extract_thumbnails(
+    config: Config,
+    db_path: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    full: bool = False
+) -> int:
+    """
+    Writes the thumbnails embedded in msgstore.db to files under
+    <input>/export/thumbnails, one folder per chat. A later run resumes
+    after the last extracted row unless full is set.
+    Returns 0 on success, 1 on failure.
+    """
+    print("--- WhatsApp Thumbnail Extraction ---")
+
+    base = config.get('input') or config.get('output') or os.path.join(
+        os.getcwd(), "output"
+    )
+    base = os.path.abspath(base)
+    db_path = db_path or os.path.join(base, "msgstore.db")
+    output_dir = os.path.abspath(
+        output_dir or os.path.join(base, EXPORT_DIRNAME, THUMBNAILS_DIRNAME)
+    )
+
+    if not os.path.exists(db_path):
+        print(f"Error: Decrypted database not found at {db_path}")
+        print("       Run 'decrypt' first.")
+        return 1
+
+    try:
+        with MsgStore(db_path) as store:
+            schema = store.schema
+            table = THUMBNAIL_TABLES[schema][0]
+            if not store.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = ?", (table,)
+            ).fetchone():
+                print(f"Error: {db_path} has no {table} table.")
+                return 1
+            after_id = 0 if full else _resume_from(
+                store.conn, schema, load_state(output_dir)
+            )
+            if config.get('dry_run', False):
+                pending = store.conn.execute(
+                    f"SELECT COUNT(*) FROM {table} WHERE "
+                    f"{THUMBNAIL_TABLES[schema][2]} > ? "
+                    f"AND thumbnail IS NOT NULL", (after_id,)
+                ).fetchone()[0]
+                print(f"[DRY-RUN] Would extract {pending} thumbnails "
+                      f"to {output_dir}")
+                return 0
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Error: Could not read {db_path}: {e}")
+        return 1
+
+    if after_id:
+        print(f"Resuming after row {after_id}.")
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.monotonic()
+    count = total = 0
+    writer = ThumbnailWriter(db_path, schema, output_dir)
+    conn = msgstore.connect(db_path)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers or 4)) as pool:
+            while True:
+                rows = conn.execute(
+                    THUMBNAIL_BATCH_SQL[schema],
+                    (after_id, THUMBNAIL_BATCH_SIZE)
+                ).fetchall()
+                if not rows:
+                    break
+                sizes = list(pool.map(writer.write, rows))
+                count += sum(1 for size in sizes if size)
+                total += sum(sizes)
+                after_id = rows[-1][0]
+                save_state(output_dir, {
+                    "schema": schema,
+                    "last_id": after_id,
+                    "last_key_id": rows[-1][2],
+                })
+                if len(rows) < THUMBNAIL_BATCH_SIZE:
+                    break
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: Extraction stopped after row {after_id}: {e}")
+        return 1
+    finally:
+        writer.close()
+        conn.close()
+
+    print(f"Success! Extracted {count} thumbnails "
+          f"({total / 1024:.0f} KiB) in {time.monotonic() - started:.1f}s.")
+    print(f"Output: {output_dir}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Extract embedded thumbnails from msgstore.db"
+    )
+    parser.add_argument("--input", "-i", help="Input directory")
+    parser.add_argument("--db", help="Decrypted msgstore.db")
+    parser.add_argument("--out-dir", help="Output directory")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--full", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    config: Config = {'input': args.input, 'dry_run': args.dry_run}
+    sys.exit(extract_thumbnails(
+        config, args.db, args.out_dir, args.workers, args.full
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from typing import List, Optional
+
+from wa_crypt_tools import history, tracing
+from wa_crypt_tools.adb import AdbError, get_adb_base, get_product_model
+from wa_crypt_tools.config import Config, load_config
+from wa_crypt_tools.commands.decrypt import decrypt_database
+from wa_crypt_tools.commands.pull import pull_data
+from wa_crypt_tools.watcher import (
+    DEFAULT_COOLDOWN, DEFAULT_QUEUE_SIZE, DeviceWatcher
+)
+
+
+def backup_device(
+    config: Config,
+    serial: str,
+    cancel: threading.Event,
+    record_history: bool = True
+) -> int:
+    """
+    One watch job: updates <output>/<serial> with the device's data and
+    decrypts it if a key is configured. The folder is kept between jobs,
+    so only new media is pulled and unchanged databases are taken from
+    the decrypt cache. Stops after the current adb call once cancel is set.
+    Returns 0 on success, 1 on failure.
+    """
+    base = os.path.abspath(config.get('output') or os.path.join(
+        os.getcwd(), "output"
+    ))
+    job_config = config.copy()
+    job_config['output'] = os.path.join(base, serial)
+    job_config['pull_device'] = serial
+    job_config['pull_incremental'] = True
+
+    # Each job is recorded as its own run
+    tracing.enable()
+    started = time.time()
+    status = 1
+    try:
+        with tracing.span("watch", device=serial):
+            status = pull_data(
+                job_config, device_id=serial, cancel=cancel.is_set
+            )
+            if status == 0 and job_config.get('key') and not cancel.is_set():
+                status = decrypt_database(
+                    job_config, input_dir=job_config['output']
+                )
+    finally:
+        if record_history and os.path.isdir(base):
+            try:
+                history.record_run(
+                    history.history_path(base), "watch", started, status,
+                    tracing.summary(), serial, get_product_model(serial),
+                    dry_run=bool(config.get('dry_run', False)),
+                    errors=tracing.errors()
+                )
+            except (OSError, sqlite3.Error) as e:
+                print(f"Warning: Could not record run history: {e}")
+    return status
+
+
+def watch_devices(
+    config: Config,
+    serials: Optional[List[str]] = None,
+    cooldown: Optional[float] = None,
+    queue_size: Optional[int] = None,
+    record_history: bool = True
+) -> int:
+    """
+    Backs up devices as they are plugged in, until interrupted.
+    serials limits it to those devices (default: any device).
+    Returns 0 when stopped with Ctrl+C, 1 if adb cannot be run.
+    """
+    print("--- WhatsApp Device Watcher ---")
+    serials = serials or config.get('watch_serials') or []
+    if cooldown is None:
+        cooldown = config.get('watch_cooldown')
+    if queue_size is None:
+        queue_size = config.get('watch_queue_size')
+
+    watcher = DeviceWatcher(
+        lambda serial, cancel: backup_device(
+            config, serial, cancel, record_history
+        ),
+        serials=serials,
+        cooldown=DEFAULT_COOLDOWN if cooldown is None else cooldown,
+        queue_size=queue_size or DEFAULT_QUEUE_SIZE
+    )
+    print("Watching for " + (", ".join(serials) if serials else
+                             "any device") +
+          f" (cooldown {watcher.cooldown:.0f}s). Press Ctrl+C to stop.")
+    watcher.start()
+    try:
+        watcher.watch(get_adb_base())
+    except KeyboardInterrupt:
+        print("\nStopping. Cancelling running backups...")
+    except AdbError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        watcher.stop()
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Back up devices as they are plugged in"
+    )
+    parser.add_argument("--config", "-c", help="Config file path")
+    parser.add_argument("--output", "-o", help="Output directory")
+    parser.add_argument("--serial", action="append", dest="serials")
+    parser.add_argument("--cooldown", type=float)
+    parser.add_argument("--queue-size", type=int)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.output:
+        config['output'] = args.output
+    sys.exit(watch_devices(
+        config, args.serials, args.cooldown, args.queue_size
+    ))
+
+
+if __name__ == "__main__":
+    main()
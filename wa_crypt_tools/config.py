@@ -2,7 +2,7 @@ import os
 import json
 import sys
 import argparse
-from typing import TypedDict, Optional
+from typing import TypedDict, Optional, Dict, List
 
 
 class Config(TypedDict, total=False):
@@ -13,6 +13,35 @@ class Config(TypedDict, total=False):
     pull_device: Optional[str]
     push_device: Optional[str]
     dry_run: Optional[bool]
+    # Pull scheduling: per Media folder weights and a time budget (seconds)
+    media_weights: Optional[Dict[str, float]]
+    pull_time_budget: Optional[float]
+    # Pull into a non-empty output, skipping media already there
+    pull_incremental: Optional[bool]
+    # Rotated copies (msgstore-YYYY-MM-DD.1.db.crypt15) kept per database
+    keep_rotated_backups: Optional[int]
+    # Reuse previous decrypt results for unchanged crypt files
+    decrypt_cache: Optional[bool]
+    # File with extra candidate keys (one 64-digit hex key per line)
+    key_ring: Optional[str]
+    # Legacy 'key' file for crypt12/14 backups
+    key_file: Optional[str]
+    # Decrypt every crypt file under the input directory (any version)
+    decrypt_all_files: Optional[bool]
+    # Consolidated archive database that 'merge' folds snapshots into
+    archive: Optional[str]
+    # Transfer progress display: "text", "json" or "off"
+    progress: Optional[str]
+    # Record every run in <output>/.wa_history.db (default true)
+    history: Optional[bool]
+    # Prometheus textfile-collector output, e.g. /var/lib/node_exporter/
+    # textfile/wa_backup.prom
+    metrics_file: Optional[str]
+    # 'watch': devices to back up when plugged in (default: any), seconds
+    # before the same device is backed up again, and pending job limit
+    watch_serials: Optional[List[str]]
+    watch_cooldown: Optional[float]
+    watch_queue_size: Optional[int]
 
 
 CONFIG_FILENAME = "config.json"
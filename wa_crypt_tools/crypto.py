@@ -1 +1,559 @@
-# Crypto module
+"""
+WhatsApp backup (crypt12/14/15) primitives.
+
+Header parsing, format sniffing and key derivation only need the
+standard library. AES itself comes from pycryptodome(x), which is
+installed in the 'wa-crypt-tools' venv alongside wadecrypt and imported
+lazily.
+"""
+import os
+import re
+import hmac
+import mmap
+import zlib
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any, BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+)
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+# The header is a one-byte length plus a protobuf well below this size
+HEADER_READ_SIZE = 512
+# Ciphertext decrypted by a key check: enough for the zlib stream
+# to produce the SQLite header
+PROBE_SIZE = 4096
+# Streaming decrypt/encrypt chunk size
+CHUNK_SIZE = 1 << 20
+
+# crypt12: fixed 67-byte header, 16-byte tag plus 4-byte jid suffix
+CRYPT12_HEADER_SIZE = 67
+CRYPT12_TRAILER_SIZE = 20
+# Legacy 'key' file (crypt12/14): 158 bytes, AES key in the last 32
+LEGACY_KEY_FILE_SIZE = 158
+
+CRYPT_EXT_RE = re.compile(r"\.crypt(\d+)$")
+
+KEY_HEX = "hex_key"        # 64-digit key or encrypted_backup.key (crypt15)
+KEY_FILE = "key_file"      # legacy /data/data/com.whatsapp/files/key
+
+
+class CryptoError(Exception):
+    """Base exception for backup crypto errors."""
+    pass
+
+
+class Crypt15Header(NamedTuple):
+    """Parsed crypt15 header. Ciphertext starts at 'size'."""
+    iv: bytes
+    size: int
+    key_type: int
+    has_features: bool
+
+
+class CryptInfo(NamedTuple):
+    """What a crypt file is, learned from its name and header only."""
+    path: str
+    version: Optional[int]
+    backup_type: str
+    key_requirement: Optional[str]
+    size: int
+    iv: Optional[bytes] = None
+    header_size: int = 0
+    error: Optional[str] = None
+
+
+class BackupKey(NamedTuple):
+    """Key material: a crypt15 root key or a legacy crypt12/14 AES key."""
+    kind: str
+    key: bytes
+
+
+def _aes() -> Any:
+    """Returns the pycryptodome AES module, whichever flavour is installed."""
+    try:
+        from Cryptodome.Cipher import AES
+    except ImportError:
+        try:
+            from Crypto.Cipher import AES  # type: ignore[no-redef]
+        except ImportError:
+            raise CryptoError("pycryptodome is not installed")
+    return AES
+
+
+def crypto_available() -> bool:
+    """True if AES is importable in this interpreter."""
+    try:
+        _aes()
+        return True
+    except CryptoError:
+        return False
+
+
+def parse_hex_key(key: str) -> bytes:
+    """Parses a 64-digit hex backup key into its 32 raw bytes."""
+    key = key.strip()
+    if len(key) != 64:
+        raise CryptoError("Key must be a 64-digit hex string.")
+    try:
+        return bytes.fromhex(key)
+    except ValueError:
+        raise CryptoError("Key contains non-hex characters.")
+
+
+def derive_crypt15_key(root_key: bytes) -> bytes:
+    """
+    Derives the AES-256 backup key from the 32-byte root key
+    (HKDF-SHA256 with a zero salt and info "backup encryption").
+    """
+    prk = hmac.new(b"\x00" * 32, root_key, hashlib.sha256).digest()
+    return hmac.new(
+        prk, b"backup encryption\x01", hashlib.sha256
+    ).digest()
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise CryptoError("Truncated protobuf varint.")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def parse_protobuf(data: bytes) -> Dict[int, List[Union[int, bytes]]]:
+    """
+    Minimal protobuf decoder: maps field numbers to their raw values
+    (ints for varints, bytes for everything else). Enough for backup
+    headers without depending on the protobuf package.
+    """
+    fields: Dict[int, List[Union[int, bytes]]] = {}
+    pos = 0
+    while pos < len(data):
+        tag, pos = _read_varint(data, pos)
+        field, wire_type = tag >> 3, tag & 0x07
+        value: Union[int, bytes]
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        elif wire_type == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise CryptoError(f"Unsupported protobuf wire type {wire_type}.")
+        if pos > len(data):
+            raise CryptoError("Truncated protobuf field.")
+        fields.setdefault(field, []).append(value)
+    return fields
+
+
+def _first_bytes(
+    fields: Dict[int, List[Union[int, bytes]]], number: int
+) -> Optional[bytes]:
+    for value in fields.get(number, []):
+        if isinstance(value, bytes):
+            return value
+    return None
+
+
+def read_crypt15_header(data: bytes) -> Crypt15Header:
+    """
+    Parses the header at the start of a crypt15 file:
+    [protobuf size][optional 0x01 feature flag][BackupPrefix protobuf]
+    """
+    if len(data) < 2:
+        raise CryptoError("File is too short to be a crypt15 backup.")
+    proto_size = data[0]
+    has_features = data[1] == 0x01
+    start = 2 if has_features else 1
+    proto = data[start:start + proto_size]
+    if len(proto) != proto_size:
+        raise CryptoError("Truncated crypt15 header.")
+
+    fields = parse_protobuf(proto)
+    c15_iv = _first_bytes(fields, 3)
+    iv = _first_bytes(parse_protobuf(c15_iv), 1) if c15_iv else None
+    if not iv:
+        raise CryptoError("No crypt15 IV found in header.")
+
+    key_types = [v for v in fields.get(1, []) if isinstance(v, int)]
+    return Crypt15Header(
+        iv=iv,
+        size=start + proto_size,
+        key_type=key_types[0] if key_types else 0,
+        has_features=has_features
+    )
+
+
+def check_key(crypt_path: str, key: Union[str, BackupKey]) -> bool:
+    """
+    Checks a key against a crypt15 SQLite backup in milliseconds.
+    key is anything load_backup_key() accepts.
+
+    Only the header and the first PROBE_SIZE bytes are read. GCM's tag
+    covers the whole file, so instead of authenticating, the first chunk
+    is decrypted and must inflate to the SQLite header: a wrong key
+    yields noise that is not a valid zlib stream.
+    """
+    with open(crypt_path, 'rb') as f:
+        head = f.read(HEADER_READ_SIZE + PROBE_SIZE)
+    header = read_crypt15_header(head)
+    backup_key = key if isinstance(key, BackupKey) else load_backup_key(key)
+    if backup_key.kind != "root":
+        raise CryptoError("crypt15 needs the 64-digit key "
+                          "or encrypted_backup.key.")
+    aes_key = derive_crypt15_key(backup_key.key)
+
+    aes = _aes()
+    cipher = aes.new(aes_key, aes.MODE_GCM, nonce=header.iv)
+    chunk = head[header.size:header.size + PROBE_SIZE]
+    plain = cipher.decrypt(chunk)
+    try:
+        inflated = zlib.decompressobj().decompress(plain, len(SQLITE_MAGIC))
+    except zlib.error:
+        return False
+    return inflated == SQLITE_MAGIC
+
+
+def find_key(
+    crypt_path: str,
+    keys: List[str],
+    max_workers: Optional[int] = None
+) -> Optional[int]:
+    """
+    Tries several candidate keys in parallel.
+    Returns the index of the first key that opens crypt_path, or None.
+    Raises CryptoError if no key matched but some could not be checked
+    (unreadable key file, not a crypt15 key), so the caller can still
+    attempt the decrypt rather than reject the backup.
+    """
+    def try_key(key: str) -> Optional[bool]:
+        try:
+            return check_key(crypt_path, key)
+        except CryptoError:
+            return None
+
+    # Fail fast on an unreadable or non-crypt15 file
+    with open(crypt_path, 'rb') as f:
+        read_crypt15_header(f.read(HEADER_READ_SIZE))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(try_key, keys))
+    for i, ok in enumerate(results):
+        if ok:
+            return i
+    if None in results:
+        raise CryptoError("Some keys could not be checked.")
+    return None
+
+
+def _parse_prefix(head: bytes) -> Tuple[int, bytes, int]:
+    """
+    Parses the protobuf prefix shared by crypt14 and crypt15.
+    Returns (version, iv, header size).
+    """
+    if len(head) < 2:
+        raise CryptoError("File is too short to be a backup.")
+    proto_size = head[0]
+    start = 2 if head[1] == 0x01 else 1
+    proto = head[start:start + proto_size]
+    if len(proto) != proto_size:
+        raise CryptoError("Truncated backup header.")
+    fields = parse_protobuf(proto)
+
+    c15_iv = _first_bytes(fields, 3)
+    if c15_iv:
+        iv = _first_bytes(parse_protobuf(c15_iv), 1)
+        if iv:
+            return 15, iv, start + proto_size
+
+    c14_cipher = _first_bytes(fields, 2)
+    if c14_cipher:
+        c14 = parse_protobuf(c14_cipher)
+        iv = _first_bytes(c14, 5)
+        if not iv:
+            # Fall back to the last 16-byte field of the cipher message
+            candidates = [
+                v for values in c14.values() for v in values
+                if isinstance(v, bytes) and len(v) == 16
+            ]
+            iv = candidates[-1] if candidates else None
+        if iv:
+            return 14, iv, start + proto_size
+
+    raise CryptoError("No IV found in backup header.")
+
+
+def _backup_type(path: str) -> str:
+    """'msgstore' for msgstore-2024-01-01.1.db.crypt14, and so on."""
+    name = os.path.basename(path)
+    return re.split(r"[.-]", name, maxsplit=1)[0]
+
+
+def sniff_crypt_file(path: str) -> CryptInfo:
+    """
+    Classifies a crypt file by version, backup type and key requirement.
+    The file is mapped, not read: only the header pages are touched, so
+    sniffing costs the same for a 10 KB and a 10 GB backup.
+    """
+    ext = CRYPT_EXT_RE.search(path)
+    ext_version = int(ext.group(1)) if ext else None
+    backup_type = _backup_type(path)
+    try:
+        size = os.path.getsize(path)
+        if size == 0:
+            raise CryptoError("Empty file.")
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                head = mm[:HEADER_READ_SIZE]
+    except (OSError, ValueError, CryptoError) as e:
+        return CryptInfo(
+            path, ext_version, backup_type, None, 0, error=str(e)
+        )
+
+    if ext_version == 12:
+        if size < CRYPT12_HEADER_SIZE + CRYPT12_TRAILER_SIZE:
+            return CryptInfo(
+                path, 12, backup_type, KEY_FILE, size,
+                error="Too short for crypt12."
+            )
+        return CryptInfo(
+            path, 12, backup_type, KEY_FILE, size,
+            iv=head[51:67], header_size=CRYPT12_HEADER_SIZE
+        )
+
+    try:
+        version, iv, header_size = _parse_prefix(head)
+    except CryptoError as e:
+        return CryptInfo(
+            path, ext_version, backup_type, None, size, error=str(e)
+        )
+
+    error = None
+    if ext_version is not None and ext_version != version:
+        error = (f"Named .crypt{ext_version} but the header "
+                 f"is crypt{version}.")
+    return CryptInfo(
+        path, version, backup_type,
+        KEY_HEX if version == 15 else KEY_FILE,
+        size, iv=iv, header_size=header_size, error=error
+    )
+
+
+def _walk_crypt_files(root: str) -> Iterator[str]:
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif CRYPT_EXT_RE.search(entry.name):
+                        yield entry.path
+        except OSError:
+            continue
+
+
+def scan_crypt_tree(
+    root: str, max_workers: Optional[int] = None
+) -> List[CryptInfo]:
+    """
+    Sniffs every *.cryptN file below root, in parallel.
+    Bodies are never read, so thousands of files take milliseconds.
+    """
+    paths = sorted(_walk_crypt_files(root))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(sniff_crypt_file, paths))
+
+
+def load_backup_key(key: str) -> BackupKey:
+    """
+    Accepts a 64-digit hex key, an encrypted_backup.key file (crypt15)
+    or a legacy 158-byte 'key' file (crypt12/14).
+    """
+    key = key.strip()
+    if len(key) == 64 and not os.path.isfile(key):
+        return BackupKey("root", parse_hex_key(key))
+    try:
+        with open(key, 'rb') as f:
+            data = f.read()
+    except OSError:
+        raise CryptoError(
+            "Key is neither a 64-digit hex string nor a readable key file."
+        )
+    if len(data) == LEGACY_KEY_FILE_SIZE:
+        return BackupKey("legacy", data[126:158])
+    if len(data) >= 32:
+        # Java-serialized byte array, the root key is its last 32 bytes
+        return BackupKey("root", data[-32:])
+    raise CryptoError(f"Unrecognised key file: {key}")
+
+
+def aes_key_for(info: CryptInfo, backup_key: BackupKey) -> bytes:
+    """Returns the AES-256 key that opens a backup of this version."""
+    if info.version == 15:
+        if backup_key.kind != "root":
+            raise CryptoError("crypt15 needs the 64-digit key "
+                              "or encrypted_backup.key.")
+        return derive_crypt15_key(backup_key.key)
+    if info.version in (12, 14):
+        if backup_key.kind != "legacy":
+            raise CryptoError(f"crypt{info.version} needs the legacy "
+                              "'key' file from the device.")
+        return backup_key.key
+    raise CryptoError(f"Unsupported backup version: {info.version}")
+
+
+def _decrypt_stream(
+    src: BinaryIO,
+    dst: BinaryIO,
+    key: bytes,
+    info: CryptInfo,
+    chunk_size: int = CHUNK_SIZE
+) -> None:
+    """
+    Decrypts and inflates a backup body in constant memory.
+
+    crypt12 ends with tag + 4 bytes. crypt14/15 end with the tag,
+    optionally followed by an MD5 of everything before it; whether the
+    MD5 is there is only known at the end, so it is computed on the fly.
+    """
+    aes = _aes()
+    cipher = aes.new(key, aes.MODE_GCM, nonce=info.iv)
+    inflater = zlib.decompressobj()
+    md5 = hashlib.md5() if info.version != 12 else None
+
+    trailer = CRYPT12_TRAILER_SIZE if info.version == 12 else 32
+    remaining = info.size - info.header_size - trailer
+    if remaining < 0:
+        raise CryptoError("Backup is truncated.")
+
+    head = src.read(info.header_size)
+    if md5:
+        md5.update(head)
+
+    try:
+        while remaining > 0:
+            chunk = src.read(min(chunk_size, remaining))
+            if not chunk:
+                raise CryptoError("Backup is truncated.")
+            remaining -= len(chunk)
+            if md5:
+                md5.update(chunk)
+            dst.write(inflater.decompress(cipher.decrypt(chunk)))
+
+        tail = src.read()
+        if md5 is None:
+            tag = tail[:16]
+        else:
+            md5.update(tail[:16])
+            if md5.digest() == tail[16:32]:
+                tag = tail[:16]
+            else:
+                # No checksum: those 16 bytes were still ciphertext
+                dst.write(inflater.decompress(cipher.decrypt(tail[:16])))
+                tag = tail[16:32]
+        dst.write(inflater.flush())
+    except zlib.error:
+        raise CryptoError("Wrong key or corrupted backup.")
+
+    try:
+        cipher.verify(tag)
+    except ValueError:
+        raise CryptoError("Authentication failed: wrong key or "
+                          "corrupted backup.")
+    if not inflater.eof:
+        raise CryptoError("Backup ended before the end of its zlib stream.")
+
+
+def decrypt_file(
+    crypt_path: str,
+    output_path: str,
+    key: Union[str, BackupKey],
+    info: Optional[CryptInfo] = None
+) -> CryptInfo:
+    """
+    Decrypts a crypt12, crypt14 or crypt15 backup to output_path.
+    The output only replaces output_path once the GCM tag verified.
+    """
+    info = info or sniff_crypt_file(crypt_path)
+    if info.error or info.version is None:
+        raise CryptoError(info.error or "Not a WhatsApp backup.")
+    backup_key = key if isinstance(key, BackupKey) else load_backup_key(key)
+    aes_key = aes_key_for(info, backup_key)
+
+    tmp_path = output_path + ".part"
+    try:
+        with open(crypt_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            _decrypt_stream(src, dst, aes_key, info)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return info
+
+
+def encrypt_file(
+    plain_path: str,
+    output_path: str,
+    key: Union[str, BackupKey],
+    reference_path: str,
+    chunk_size: int = CHUNK_SIZE
+) -> None:
+    """
+    Streams a plaintext database into a crypt15 container.
+
+    The header (protobuf prefix, feature flag, key type) is copied from a
+    reference crypt15 backup so WhatsApp accepts the result, but the IV is
+    replaced with a fresh random one: reusing an IV under the same GCM key
+    would leak the plaintext. Memory use is bounded by chunk_size.
+    """
+    info = sniff_crypt_file(reference_path)
+    if info.version != 15 or info.error or not info.iv:
+        raise CryptoError(
+            info.error or "The reference backup must be a crypt15 file."
+        )
+    backup_key = key if isinstance(key, BackupKey) else load_backup_key(key)
+    aes_key = aes_key_for(info, backup_key)
+
+    with open(reference_path, 'rb') as f:
+        header = f.read(info.header_size)
+    iv_field = b"\x0a" + bytes([len(info.iv)]) + info.iv
+    if header.count(iv_field) != 1:
+        raise CryptoError("Cannot locate the IV in the reference header.")
+    new_iv = os.urandom(len(info.iv))
+    header = header.replace(
+        iv_field, b"\x0a" + bytes([len(new_iv)]) + new_iv
+    )
+
+    aes = _aes()
+    cipher = aes.new(aes_key, aes.MODE_GCM, nonce=new_iv)
+    deflater = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION)
+    md5 = hashlib.md5(header)
+
+    tmp_path = output_path + ".part"
+    try:
+        with open(plain_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            dst.write(header)
+            for chunk in iter(lambda: src.read(chunk_size), b''):
+                data = cipher.encrypt(deflater.compress(chunk))
+                md5.update(data)
+                dst.write(data)
+            data = cipher.encrypt(deflater.flush()) + cipher.digest()
+            md5.update(data)
+            dst.write(data)
+            dst.write(md5.digest())
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
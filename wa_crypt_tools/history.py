@@ -0,0 +1,255 @@
+"""
+Run history: one compact record per CLI command in a SQLite file in the
+output directory, with the per-stage timings collected by tracing.
+`stats` summarises it per device, and estimated_rate() gives measured
+throughput for predicting how long a transfer will take.
+"""
+import os
+import time
+import sqlite3
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from wa_crypt_tools import __version__
+from wa_crypt_tools.adb import get_product_model, list_devices
+
+HISTORY_FILENAME = ".wa_history.db"
+# Commands that talk to a device; only these look up its serial/model
+DEVICE_COMMANDS = ("pull", "push", "all")
+# Runs per device compared by the trend column (latest vs the ones before)
+TREND_WINDOW = 5
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL,
+    command TEXT,
+    device TEXT,
+    model TEXT,
+    status INTEGER,
+    dry_run INTEGER,
+    wall_s REAL,
+    version TEXT
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER REFERENCES runs (id) ON DELETE CASCADE,
+    stage TEXT,
+    wall_s REAL,
+    subprocess_s REAL,
+    files INTEGER,
+    bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS errors (
+    run_id INTEGER REFERENCES runs (id) ON DELETE CASCADE,
+    call TEXT,
+    error TEXT,
+    count INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_device ON runs (device, started);
+CREATE INDEX IF NOT EXISTS stages_run ON stages (run_id);
+"""
+
+
+class StageStats(NamedTuple):
+    device: str
+    model: str
+    stage: str
+    runs: int
+    failed: int
+    wall_p50: float
+    wall_p90: float
+    wall_p95: float
+    rate_p50: Optional[float]
+    rate_p10: Optional[float]
+    # Median wall time of the latest TREND_WINDOW runs relative to the
+    # runs before them (0.2 = 20% slower); None without enough history
+    trend: Optional[float]
+    last_run: float
+
+
+class RunTotals(NamedTuple):
+    runs: int
+    failed: int
+    # Device serial ('' for none) -> start time of its last successful run
+    last_success: Dict[str, float]
+
+
+def history_path(output_dir: str) -> str:
+    return os.path.join(output_dir, HISTORY_FILENAME)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript(HISTORY_SCHEMA)
+    return conn
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile (pct in 0..100) of non-empty values."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def device_identity(
+    device: Optional[str] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (serial, model) of device, or of the only attached device if none is
+    given; (None, None) if that is ambiguous or nothing is attached.
+    """
+    if not device:
+        attached = [d for d in list_devices() if d["state"] == "device"]
+        if len(attached) != 1:
+            return None, None
+        device = attached[0]["id"]
+    return device, get_product_model(device)
+
+
+def record_run(
+    path: str,
+    command: str,
+    started: float,
+    status: int,
+    stages: List[Dict[str, Any]],
+    device: Optional[str] = None,
+    model: Optional[str] = None,
+    dry_run: bool = False,
+    errors: Optional[Dict[Tuple[str, str], int]] = None
+) -> int:
+    """
+    Appends one run. stages are tracing.summary() rows; nested rows
+    (e.g. a pull inside 'all') are stored alongside their parent.
+    errors are tracing.errors(): failed adb and subprocess calls.
+    Returns the run id.
+    """
+    conn = connect(path)
+    try:
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO runs (started, command, device, model, status, "
+                "dry_run, wall_s, version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (started, command, device, model, status, int(dry_run),
+                 round(time.time() - started, 3), __version__)
+            )
+            run_id = int(cur.lastrowid or 0)
+            conn.executemany(
+                "INSERT INTO stages (run_id, stage, wall_s, subprocess_s, "
+                "files, bytes) VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, row["stage"], round(row["wall_s"], 3),
+                  round(row["subprocess_s"], 3), row["files"], row["bytes"])
+                 for row in stages]
+            )
+            conn.executemany(
+                "INSERT INTO errors (run_id, call, error, count) "
+                "VALUES (?, ?, ?, ?)",
+                [(run_id, call, error, count)
+                 for (call, error), count in (errors or {}).items()]
+            )
+        return run_id
+    finally:
+        conn.close()
+
+
+# Filters shared by the stats queries: device, command, since (each
+# parameter passed twice)
+RUNS_WHERE_SQL = """
+WHERE r.dry_run = 0
+  AND (? IS NULL OR r.device = ?)
+  AND (? IS NULL OR r.command = ?)
+  AND (? IS NULL OR r.started >= ?)
+"""
+STAGE_ROWS_SQL = """
+SELECT r.device, r.model, s.stage, r.status, r.started, s.wall_s, s.bytes
+FROM stages AS s JOIN runs AS r ON r.id = s.run_id
+""" + RUNS_WHERE_SQL + "ORDER BY r.started"
+RUN_TOTALS_SQL = """
+SELECT COUNT(*), COALESCE(SUM(r.status != 0), 0) FROM runs AS r
+""" + RUNS_WHERE_SQL
+LAST_SUCCESS_SQL = """
+SELECT COALESCE(r.device, ''), MAX(r.started) FROM runs AS r
+""" + RUNS_WHERE_SQL + "AND r.status = 0 GROUP BY r.device"
+
+
+def run_totals(
+    path: str,
+    device: Optional[str] = None,
+    command: Optional[str] = None,
+    since: Optional[float] = None
+) -> RunTotals:
+    """Run and failure counts and the last success per device."""
+    params = (device, device, command, command, since, since)
+    conn = connect(path)
+    try:
+        runs, failed = conn.execute(RUN_TOTALS_SQL, params).fetchone()
+        last_ok = dict(conn.execute(LAST_SUCCESS_SQL, params).fetchall())
+    finally:
+        conn.close()
+    return RunTotals(runs, failed, last_ok)
+
+
+def stage_stats(
+    path: str,
+    device: Optional[str] = None,
+    command: Optional[str] = None,
+    since: Optional[float] = None
+) -> List[StageStats]:
+    """Percentiles and trend per (device, stage) over successful runs."""
+    conn = connect(path)
+    try:
+        rows = conn.execute(
+            STAGE_ROWS_SQL,
+            (device, device, command, command, since, since)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    groups: Dict[Tuple[str, str], List[Tuple[Any, ...]]] = {}
+    for row in rows:
+        groups.setdefault((row[0] or "", row[2]), []).append(row)
+
+    result = []
+    for (serial, stage), group in sorted(groups.items()):
+        ok = [r for r in group if r[3] == 0]
+        if not ok:
+            continue
+        walls = [r[5] for r in ok]
+        rates = [r[6] / r[5] for r in ok if r[6] and r[5]]
+        trend = None
+        if len(walls) >= 2 * TREND_WINDOW:
+            before = percentile(walls[:-TREND_WINDOW], 50)
+            if before:
+                trend = percentile(walls[-TREND_WINDOW:], 50) / before - 1
+        result.append(StageStats(
+            device=serial,
+            model=next((r[1] for r in reversed(group) if r[1]), ""),
+            stage=stage,
+            runs=len(ok),
+            failed=len(group) - len(ok),
+            wall_p50=percentile(walls, 50),
+            wall_p90=percentile(walls, 90),
+            wall_p95=percentile(walls, 95),
+            rate_p50=percentile(rates, 50) if rates else None,
+            rate_p10=percentile(rates, 10) if rates else None,
+            trend=trend,
+            last_run=ok[-1][4],
+        ))
+    return result
+
+
+def estimated_rate(
+    path: str, stage: str, device: Optional[str] = None
+) -> Optional[float]:
+    """
+    Median measured throughput (bytes/s) of stage on device, falling
+    back to all devices; None without history.
+    """
+    if not os.path.exists(path):
+        return None
+    for serial in ([device, None] if device else [None]):
+        rates = [
+            s.rate_p50 for s in stage_stats(path, serial)
+            if s.stage == stage and s.rate_p50
+        ]
+        if rates:
+            return percentile(rates, 50)
+    return None
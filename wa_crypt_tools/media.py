@@ -0,0 +1,421 @@
+import os
+import re
+import time
+import base64
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from wa_crypt_tools.cache import file_sha256
+from wa_crypt_tools.msgstore import SCHEMA_LEGACY, SCHEMA_MODERN, MsgStore
+
+# Threads used to walk the Media tree; directory listing is I/O bound
+SCAN_WORKERS = 8
+
+
+class LocalFile(NamedTuple):
+    path: str  # relative to the scanned root, '/' separated
+    size: int
+    mtime_ns: int
+
+
+def _scan_dir(root: str, rel_dir: str) -> Tuple[List[LocalFile], List[str]]:
+    """Lists one directory: its files and its subdirectories."""
+    files: List[LocalFile] = []
+    subdirs: List[str] = []
+    try:
+        with os.scandir(os.path.join(root, rel_dir)) as it:
+            for entry in it:
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(rel)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    files.append(LocalFile(rel, st.st_size, st.st_mtime_ns))
+    except OSError:
+        pass
+    return files, subdirs
+
+
+def scan_tree(root: str, workers: int = SCAN_WORKERS) -> List[LocalFile]:
+    """
+    Every file under root, listed with os.scandir on a thread pool: each
+    directory level is listed in parallel, and the stat data comes from
+    the directory entries. Returns [] if root does not exist.
+    """
+    if not os.path.isdir(root):
+        return []
+    files: List[LocalFile] = []
+    pending = [""]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while pending:
+            results = pool.map(lambda d: _scan_dir(root, d), pending)
+            pending = []
+            for dir_files, subdirs in results:
+                files.extend(dir_files)
+                pending.extend(subdirs)
+    return files
+
+
+def scan_sizes(root: str) -> Dict[str, int]:
+    """Relative path -> size for every file under root."""
+    return {f.path: f.size for f in scan_tree(root)}
+
+
+CATALOG_FILENAME = "media_index.db"
+
+# IMG-20240101-WA0001.jpg, PTT-20240101-WA0003.opus, STK-...webp
+MEDIA_NAME_RE = re.compile(
+    r"^(?P<prefix>IMG|VID|AUD|PTT|DOC|STK)-(?P<date>\d{8})-WA(?P<seq>\d+)",
+    re.IGNORECASE
+)
+PREFIX_KINDS = {
+    "IMG": "image", "VID": "video", "AUD": "audio", "PTT": "voice",
+    "DOC": "document", "STK": "sticker",
+}
+FOLDER_KINDS = {
+    "WhatsApp Images": "image", "WhatsApp Video": "video",
+    "WhatsApp Animated Gifs": "video", "WhatsApp Audio": "audio",
+    "WhatsApp Voice Notes": "voice", "WhatsApp Documents": "document",
+    "WhatsApp Stickers": "sticker", "WhatsApp Profile Photos": "image",
+}
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    folder TEXT,
+    kind TEXT,
+    date TEXT,
+    seq INTEGER,
+    ext TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS files_kind_date ON files (kind, date);
+CREATE INDEX IF NOT EXISTS files_date ON files (date);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+"""
+
+
+class MediaInfo(NamedTuple):
+    folder: str
+    kind: str
+    date: Optional[str]
+    seq: Optional[int]
+    ext: str
+
+
+class CatalogUpdate(NamedTuple):
+    total: int
+    added: int
+    changed: int
+    removed: int
+
+
+def parse_media_path(path: str, mtime_ns: int = 0) -> MediaInfo:
+    """
+    Folder, kind, date (YYYY-MM-DD), WA sequence and extension of a
+    Media-relative path. The date falls back to the file's mtime when
+    the name carries none.
+    """
+    folder = path.split("/", 1)[0] if "/" in path else ""
+    name = path.rsplit("/", 1)[-1]
+    ext = os.path.splitext(name)[1].lower().lstrip(".")
+    match = MEDIA_NAME_RE.match(name)
+    if match:
+        raw = match.group("date")
+        date: Optional[str] = f"{raw[:4]}-{raw[4:6]}-{raw[6:]}"
+        seq: Optional[int] = int(match.group("seq"))
+        kind = PREFIX_KINDS[match.group("prefix").upper()]
+    else:
+        date = time.strftime(
+            "%Y-%m-%d", time.gmtime(mtime_ns / 1e9)
+        ) if mtime_ns else None
+        seq = None
+        kind = FOLDER_KINDS.get(folder, "other")
+    return MediaInfo(folder, kind, date, seq, ext)
+
+
+def update_catalog(
+    catalog_path: str,
+    media_root: str,
+    hash_files: bool = True,
+    workers: int = SCAN_WORKERS
+) -> CatalogUpdate:
+    """
+    Brings the catalog at catalog_path in line with media_root.
+
+    The tree is scanned in parallel and compared with the catalog in SQL;
+    only new files and files whose size or mtime changed are parsed and
+    hashed (on a thread pool), and vanished files are dropped.
+    """
+    scanned = scan_tree(media_root, workers)
+    conn = sqlite3.connect(catalog_path)
+    try:
+        conn.executescript(CATALOG_SCHEMA)
+        conn.execute(
+            "CREATE TEMP TABLE scan (path TEXT PRIMARY KEY, size INTEGER, "
+            "mtime_ns INTEGER) WITHOUT ROWID"
+        )
+        conn.executemany("INSERT INTO scan VALUES (?, ?, ?)", scanned)
+        stale = conn.execute(
+            "SELECT s.path, s.size, s.mtime_ns, f.path IS NULL "
+            "FROM scan AS s LEFT JOIN files AS f USING (path) "
+            "WHERE f.path IS NULL OR f.size != s.size "
+            "OR f.mtime_ns != s.mtime_ns"
+        ).fetchall()
+
+        def describe(row: Tuple[str, int, int, int]) -> Tuple[Any, ...]:
+            path, size, mtime_ns, _ = row
+            digest = None
+            if hash_files:
+                try:
+                    digest = file_sha256(
+                        os.path.join(media_root, *path.split("/"))
+                    )
+                except OSError:
+                    pass
+            return (path,) + tuple(parse_media_path(path, mtime_ns)) + (
+                size, mtime_ns, digest
+            )
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            rows = list(pool.map(describe, stale))
+
+        with conn:
+            removed = conn.execute(
+                "DELETE FROM files WHERE path NOT IN (SELECT path FROM scan)"
+            ).rowcount
+            conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        added = sum(1 for row in stale if row[3])
+        return CatalogUpdate(
+            len(scanned), added, len(stale) - added, max(removed, 0)
+        )
+    finally:
+        conn.close()
+
+
+def query_catalog(
+    catalog_path: str,
+    kind: Optional[str] = None,
+    folder: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    min_size: Optional[int] = None,
+    max_size: Optional[int] = None,
+    ext: Optional[str] = None,
+    name: Optional[str] = None,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Catalog rows matching every given filter, newest first.
+    since/until are YYYY-MM-DD (or a YYYY / YYYY-MM prefix), inclusive.
+    """
+    where: List[str] = []
+    params: List[Any] = []
+    for column, value in (("kind", kind), ("folder", folder)):
+        if value:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if ext:
+        where.append("ext = ?")
+        params.append(ext.lower().lstrip("."))
+    if since:
+        where.append("date >= ?")
+        params.append(since)
+    if until:
+        # '2023' or '2023-06' cover the whole year or month
+        where.append("date < ?")
+        params.append(until + "\uffff")
+    if min_size is not None:
+        where.append("size >= ?")
+        params.append(min_size)
+    if max_size is not None:
+        where.append("size <= ?")
+        params.append(max_size)
+    if name:
+        where.append("path LIKE ?")
+        params.append(f"%{name}%")
+
+    sql = "SELECT * FROM files"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY date DESC, seq DESC"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+
+    uri = "file:" + os.path.abspath(catalog_path) + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
+    try:
+        cursor = conn.execute(sql, params)
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+    finally:
+        conn.close()
+
+
+# Per schema: (Media-relative path, size, base64 SHA-256) of every media
+# reference in the database attached as src. Stored paths look like
+# "Media/WhatsApp Images/x.jpg" or carry a full /sdcard/... prefix.
+AUDIT_REFS_SQL: Dict[str, str] = {
+    SCHEMA_MODERN: """
+        SELECT CASE WHEN instr(file_path, 'Media/') > 0
+                    THEN substr(file_path, instr(file_path, 'Media/') + 6)
+                    ELSE file_path END,
+               file_size, file_hash
+        FROM src.message_media
+        WHERE file_path IS NOT NULL OR file_hash IS NOT NULL
+    """,
+    SCHEMA_LEGACY: """
+        SELECT NULL, media_size, media_hash FROM src.messages
+        WHERE media_hash IS NOT NULL
+    """,
+}
+AUDIT_SCHEMA = """
+CREATE TEMP TABLE refs (path TEXT, size INTEGER, hash TEXT);
+CREATE TEMP TABLE disk (path TEXT PRIMARY KEY, size INTEGER, hash TEXT);
+"""
+AUDIT_INDEXES = """
+CREATE INDEX temp.refs_path ON refs (path);
+CREATE INDEX temp.refs_hash ON refs (hash);
+CREATE INDEX temp.disk_hash ON disk (hash);
+"""
+# Files no message is expected to reference: hidden entries (.nomedia,
+# .Statuses, .trash) and per-contact or app folders
+AUDIT_IGNORED_SQL = """
+DELETE FROM disk WHERE path LIKE '.%' OR path LIKE '%/.%'
+    OR path LIKE 'WhatsApp Profile Photos/%' OR path LIKE 'WallPaper/%'
+"""
+# Refs not on disk under their path. Hash-only refs (every legacy ref)
+# are listed as "sha256:<base64>" and only checked against hashes.
+AUDIT_MISSING_SQL = """
+    SELECT COALESCE(r.path, 'sha256:' || r.hash) AS path,
+           MAX(r.size) AS size FROM refs AS r
+    WHERE NOT (r.path IS NOT NULL AND EXISTS (
+          SELECT 1 FROM disk AS d WHERE d.path = r.path))
+      {by_hash}
+    GROUP BY COALESCE(r.path, 'sha256:' || r.hash)
+"""
+AUDIT_ORPHANS_SQL = """
+    SELECT d.path AS path, d.size AS size FROM disk AS d
+    WHERE NOT EXISTS (SELECT 1 FROM refs AS r WHERE r.path = d.path)
+      {by_hash}
+"""
+# Without hashes, refs that have no path cannot be checked
+AUDIT_MISSING_BY_PATH = """
+      AND r.path IS NOT NULL
+"""
+# With catalog hashes, content that exists under another name counts
+AUDIT_MISSING_BY_HASH = """
+      AND NOT (r.hash IS NOT NULL AND EXISTS (
+          SELECT 1 FROM disk AS d WHERE d.hash = r.hash))
+"""
+AUDIT_ORPHANS_BY_HASH = """
+      AND NOT (d.hash IS NOT NULL AND EXISTS (
+          SELECT 1 FROM refs AS r WHERE r.hash = d.hash))
+"""
+
+
+def _hex_to_b64(digest: Optional[str]) -> Optional[str]:
+    """Catalog hex SHA-256 -> the base64 form WhatsApp stores."""
+    if not digest:
+        return None
+    return base64.b64encode(bytes.fromhex(digest)).decode("ascii")
+
+
+def _summarise(
+    conn: sqlite3.Connection, sql: str, limit: Optional[int]
+) -> Dict[str, Any]:
+    """Count and total size of a (path, size) result, plus its items."""
+    count, total = conn.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ({sql})"
+    ).fetchone()
+    listed = sql + " ORDER BY path" + (
+        f" LIMIT {int(limit)}" if limit else ""
+    )
+    items = [{"path": path, "size": size}
+             for path, size in conn.execute(listed)]
+    return {"count": count, "bytes": total, "items": items}
+
+
+def audit_media(
+    db_path: str,
+    media_root: str,
+    catalog_path: Optional[str] = None,
+    limit: Optional[int] = None,
+    workers: int = SCAN_WORKERS
+) -> Dict[str, Any]:
+    """
+    Media referenced by msgstore.db but absent from media_root (missing)
+    and files under media_root no message references (orphans).
+
+    Both sides are loaded into one SQLite connection and matched with
+    indexed joins on the Media-relative path. Given a refreshed catalog,
+    files are also matched by SHA-256, so renamed or moved copies count
+    as present. Legacy databases store no paths and need the catalog.
+    """
+    with MsgStore(db_path) as store:
+        schema = store.schema
+    if schema == SCHEMA_LEGACY and not catalog_path:
+        raise ValueError(
+            "legacy databases store no media paths; audit with hashes"
+        )
+
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.executescript(AUDIT_SCHEMA)
+        conn.execute(
+            "ATTACH DATABASE ? AS src",
+            ("file:" + os.path.abspath(db_path) + "?mode=ro",)
+        )
+        conn.execute(f"INSERT INTO refs {AUDIT_REFS_SQL[schema]}")
+        if catalog_path:
+            conn.create_function(
+                "hex_to_b64", 1, _hex_to_b64, deterministic=True
+            )
+            conn.execute(
+                "ATTACH DATABASE ? AS cat",
+                ("file:" + os.path.abspath(catalog_path) + "?mode=ro",)
+            )
+            conn.execute(
+                "INSERT INTO disk "
+                "SELECT path, size, hex_to_b64(sha256) FROM cat.files"
+            )
+        else:
+            conn.executemany(
+                "INSERT INTO disk VALUES (?, ?, NULL)",
+                ((f.path, f.size) for f in scan_tree(media_root, workers))
+            )
+        conn.execute(AUDIT_IGNORED_SQL)
+        conn.executescript(AUDIT_INDEXES)
+
+        by_path = AUDIT_MISSING_SQL.format(
+            by_hash="" if catalog_path else AUDIT_MISSING_BY_PATH
+        )
+        missing_sql = AUDIT_MISSING_SQL.format(
+            by_hash=AUDIT_MISSING_BY_HASH if catalog_path
+            else AUDIT_MISSING_BY_PATH
+        )
+        orphans_sql = AUDIT_ORPHANS_SQL.format(
+            by_hash=AUDIT_ORPHANS_BY_HASH if catalog_path else ""
+        )
+        referenced, on_disk, path_missing = conn.execute(
+            "SELECT (SELECT COUNT(DISTINCT COALESCE(path, hash)) FROM refs),"
+            " (SELECT COUNT(*) FROM disk),"
+            f" (SELECT COUNT(*) FROM ({by_path}))"
+        ).fetchone()
+        missing = _summarise(conn, missing_sql, limit)
+        return {
+            "referenced": referenced,
+            "on_disk": on_disk,
+            "matched_by_hash": path_missing - missing["count"],
+            "missing": missing,
+            "orphans": _summarise(conn, orphans_sql, limit),
+        }
+    finally:
+        conn.close()
@@ -0,0 +1,253 @@
+"""
+Prometheus textfile-collector output (--metrics-file).
+
+Counters and histograms are rebuilt from the run history on every
+write, so they survive restarts and cron runs; the current run adds
+in-progress gauges. The file is replaced atomically, and during a run
+it is rewritten every METRICS_INTERVAL seconds, so node_exporter
+(--collector.textfile.directory) always scrapes a complete file.
+"""
+import os
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from wa_crypt_tools import tracing
+
+METRICS_INTERVAL = 30.0
+PREFIX = "wa_backup"
+# Stage duration histogram buckets, seconds
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+Labels = Dict[str, Any]
+
+
+def _escape(value: Any) -> str:
+    return (str(value).replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def _sample(name: str, labels: Labels, value: float) -> str:
+    label_text = ",".join(
+        f'{key}="{_escape(val)}"' for key, val in labels.items()
+    )
+    number = repr(float(value)) if value != int(value) else str(int(value))
+    return f"{name}{{{label_text}}} {number}" if label_text else (
+        f"{name} {number}"
+    )
+
+
+class MetricsText:
+    """Collects metric families and renders the exposition format."""
+
+    def __init__(self) -> None:
+        self.families: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def add(
+        self, name: str, kind: str, help_text: str,
+        labels: Labels, value: float
+    ) -> None:
+        name = f"{PREFIX}_{name}"
+        family = self.families.setdefault(name, (kind, help_text, []))
+        family[2].append(_sample(name, labels, value))
+
+    def histogram(
+        self, name: str, help_text: str, labels: Labels,
+        values: Iterable[float], buckets: Iterable[float] = DURATION_BUCKETS
+    ) -> None:
+        values = list(values)
+        full = f"{PREFIX}_{name}"
+        family = self.families.setdefault(full, ("histogram", help_text, []))
+        for bound in buckets:
+            family[2].append(_sample(
+                f"{full}_bucket", {**labels, "le": bound},
+                sum(1 for v in values if v <= bound)
+            ))
+        family[2].append(_sample(
+            f"{full}_bucket", {**labels, "le": "+Inf"}, len(values)
+        ))
+        family[2].append(_sample(f"{full}_sum", labels, round(sum(values), 3)))
+        family[2].append(_sample(f"{full}_count", labels, len(values)))
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help_text, samples) in self.families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def _history_metrics(out: MetricsText, history_file: str) -> None:
+    conn = sqlite3.connect(f"file:{os.path.abspath(history_file)}?mode=ro",
+                           uri=True)
+    try:
+        for command, device, ok, count in conn.execute(
+            "SELECT command, COALESCE(device, ''), status = 0, COUNT(*) "
+            "FROM runs WHERE dry_run = 0 GROUP BY 1, 2, 3"
+        ):
+            out.add("runs_total", "counter", "Recorded runs by outcome.",
+                    {"command": command, "device": device,
+                     "result": "success" if ok else "failure"}, count)
+
+        durations: Dict[Tuple[str, str], List[float]] = {}
+        for stage, device, wall in conn.execute(
+            "SELECT s.stage, COALESCE(r.device, ''), s.wall_s "
+            "FROM stages AS s JOIN runs AS r ON r.id = s.run_id "
+            "WHERE r.status = 0 AND r.dry_run = 0"
+        ):
+            durations.setdefault((stage, device), []).append(wall)
+        for (stage, device), walls in sorted(durations.items()):
+            out.histogram("stage_duration_seconds",
+                          "Wall time of successful stages.",
+                          {"stage": stage, "device": device}, walls)
+
+        for stage, device, size, files in conn.execute(
+            "SELECT s.stage, COALESCE(r.device, ''), SUM(s.bytes), "
+            "SUM(s.files) FROM stages AS s JOIN runs AS r "
+            "ON r.id = s.run_id WHERE r.dry_run = 0 GROUP BY 1, 2"
+        ):
+            labels = {"stage": stage, "device": device}
+            out.add("stage_bytes_total", "counter",
+                    "Bytes moved by stage (pull: pulled, push: pushed, "
+                    "decrypt: ciphertext read).", labels, size or 0)
+            out.add("stage_files_total", "counter", "Files moved by stage.",
+                    labels, files or 0)
+
+        for stage, device, size, wall in conn.execute(
+            "SELECT s.stage, COALESCE(r.device, ''), s.bytes, s.wall_s "
+            "FROM stages AS s JOIN runs AS r ON r.id = s.run_id "
+            "WHERE r.status = 0 AND r.dry_run = 0 AND s.bytes > 0 "
+            "AND s.wall_s > 0 AND r.id = (SELECT MAX(r2.id) FROM runs AS r2 "
+            "JOIN stages AS s2 ON s2.run_id = r2.id WHERE r2.status = 0 "
+            "AND r2.dry_run = 0 AND s2.stage = s.stage "
+            "AND COALESCE(r2.device, '') = COALESCE(r.device, ''))"
+        ):
+            out.add("stage_throughput_bytes_per_second", "gauge",
+                    "Throughput of the latest successful run of the stage.",
+                    {"stage": stage, "device": device},
+                    round(size / wall, 1))
+
+        for device, command, finished in conn.execute(
+            "SELECT COALESCE(device, ''), command, MAX(started + wall_s) "
+            "FROM runs WHERE status = 0 AND dry_run = 0 GROUP BY 1, 2"
+        ):
+            out.add("last_success_timestamp_seconds", "gauge",
+                    "End of the latest successful run.",
+                    {"device": device, "command": command},
+                    round(finished, 3))
+
+        for call, error, count in conn.execute(
+            "SELECT call, error, SUM(count) FROM errors GROUP BY 1, 2"
+        ):
+            out.add("errors_total", "counter",
+                    "Failed adb and subprocess calls (AdbError, "
+                    "CalledProcessError, ...).",
+                    {"call": call, "error": error}, count)
+    finally:
+        conn.close()
+
+
+def _current_run_metrics(
+    out: MetricsText, command: str, started: float,
+    status: Optional[int]
+) -> None:
+    labels = {"command": command}
+    out.add("run_in_progress", "gauge", "1 while a run is going on.",
+            labels, 0 if status is not None else 1)
+    out.add("run_started_timestamp_seconds", "gauge",
+            "Start of the current or latest run.", labels, round(started, 3))
+    if status is not None:
+        out.add("run_exit_status", "gauge",
+                "Exit status of the latest run (0 is success).",
+                labels, status)
+
+    moved: Dict[str, List[int]] = {}
+    for event in tracing.events():
+        if event["ph"] == "X" and event["cat"] == tracing.SUBPROCESS:
+            totals = moved.setdefault(event["name"], [0, 0])
+            totals[0] += event["args"].get("bytes", 0)
+            totals[1] += event["args"].get("files", 0)
+    for call, (size, files) in sorted(moved.items()):
+        if size or files:
+            out.add("run_bytes", "gauge",
+                    "Bytes moved so far in the current or latest run.",
+                    {**labels, "call": call}, size)
+            out.add("run_files", "gauge",
+                    "Files moved so far in the current or latest run.",
+                    {**labels, "call": call}, files)
+    for (call, error), count in sorted(tracing.errors().items()):
+        out.add("run_errors", "gauge",
+                "Failed calls so far in the current or latest run.",
+                {**labels, "call": call, "error": error}, count)
+
+
+def render(
+    history_file: Optional[str],
+    command: str,
+    started: float,
+    status: Optional[int] = None
+) -> str:
+    """The whole file: history-based metrics plus the current run."""
+    out = MetricsText()
+    if history_file and os.path.exists(history_file):
+        try:
+            _history_metrics(out, history_file)
+        except sqlite3.Error:
+            pass
+    _current_run_metrics(out, command, started, status)
+    return out.render()
+
+
+def write_atomic(path: str, text: str) -> None:
+    # node_exporter only reads *.prom, so the temporary name is ignored
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class MetricsReporter:
+    """Rewrites the metrics file periodically until stop()."""
+
+    def __init__(
+        self,
+        path: str,
+        history_file: Optional[str],
+        command: str,
+        started: Optional[float] = None,
+        interval: float = METRICS_INTERVAL
+    ) -> None:
+        self.path = path
+        self.history_file = history_file
+        self.command = command
+        self.started = time.time() if started is None else started
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self, status: Optional[int] = None) -> None:
+        try:
+            write_atomic(self.path, render(
+                self.history_file, self.command, self.started, status
+            ))
+        except OSError as e:
+            print(f"Warning: Could not write metrics to {self.path}: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self) -> None:
+        self.write()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, status: int) -> None:
+        """Stops the periodic writes and writes the final file."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write(status)
@@ -0,0 +1,347 @@
+"""
+Read-only access to a decrypted msgstore.db (and wa.db).
+
+Everything is lazy: iterators page through the tables by _id (keyset
+pagination), so memory stays constant however many rows are read, and
+rows come back as small __slots__ records rather than dicts.
+
+Two layouts are supported and detected per database:
+- "modern": message / chat / jid / message_media tables (2022+).
+- "legacy": a single messages table keyed by key_remote_jid, with
+  chat_list for chats. Legacy rows carry no local media path.
+"""
+import os
+import sqlite3
+from typing import Any, Dict, Iterator, Optional, Tuple, Type, TypeVar
+
+# Rows fetched per query when paging
+DEFAULT_PAGE_SIZE = 2000
+# Memory-mapped I/O window; reads skip the page cache copy
+MMAP_SIZE = 1 << 30
+
+SCHEMA_MODERN = "modern"
+SCHEMA_LEGACY = "legacy"
+
+R = TypeVar("R", bound="Record")
+
+
+class Record:
+    """Base for row records: fixed attributes, no per-instance dict."""
+    __slots__: Tuple[str, ...] = ()
+
+    def __init__(self, *values: Any) -> None:
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_row(cls: Type[R], row: Tuple[Any, ...]) -> R:
+        return cls(*row)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other: object) -> bool:
+        return type(self) is type(other) and all(
+            getattr(self, n) == getattr(other, n) for n in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{n}={getattr(self, n)!r}" for n in self.__slots__
+        )
+        return f"{type(self).__name__}({fields})"
+
+
+class Chat(Record):
+    __slots__ = ("id", "jid", "subject", "sort_timestamp")
+    id: int
+    jid: str
+    subject: Optional[str]
+    sort_timestamp: int
+
+    @classmethod
+    def from_row(cls, row: Tuple[Any, ...]) -> "Chat":
+        return cls(row[0], row[1] or "", row[2], row[3] or 0)
+
+
+class Message(Record):
+    __slots__ = (
+        "id", "chat_id", "key_id", "from_me", "sender_jid", "timestamp",
+        "text", "media_path", "media_mime"
+    )
+    id: int
+    chat_id: int
+    key_id: Optional[str]
+    from_me: bool
+    sender_jid: Optional[str]
+    timestamp: int
+    text: Optional[str]
+    media_path: Optional[str]
+    media_mime: Optional[str]
+
+    @classmethod
+    def from_row(cls, row: Tuple[Any, ...]) -> "Message":
+        return cls(
+            row[0], row[1], row[2], bool(row[3]), row[4] or None,
+            row[5] or 0, row[6], row[7], row[8]
+        )
+
+
+class MediaRef(Record):
+    __slots__ = (
+        "message_id", "chat_id", "file_path", "file_size", "mime_type",
+        "media_name", "file_hash", "timestamp"
+    )
+    message_id: int
+    chat_id: int
+    file_path: Optional[str]
+    file_size: Optional[int]
+    mime_type: Optional[str]
+    media_name: Optional[str]
+    file_hash: Optional[str]
+    timestamp: int
+
+
+class Contact(Record):
+    __slots__ = ("jid", "display_name", "wa_name")
+    jid: str
+    display_name: Optional[str]
+    wa_name: Optional[str]
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.display_name or self.wa_name
+
+
+# Per schema. Paged queries take (after_id, [chat_id,] limit) and must
+# return the paging _id as their first column.
+QUERIES: Dict[str, Dict[str, str]] = {
+    SCHEMA_MODERN: {
+        "chats": """
+            SELECT chat._id, jid.raw_string, chat.subject,
+                   chat.sort_timestamp
+            FROM chat JOIN jid ON jid._id = chat.jid_row_id
+            ORDER BY chat.sort_timestamp DESC
+        """,
+        "messages": """
+            SELECT message._id, message.chat_row_id, message.key_id,
+                   message.from_me, sender.raw_string, message.timestamp,
+                   message.text_data, message_media.file_path,
+                   message_media.mime_type
+            FROM message
+            LEFT JOIN jid AS sender
+                ON sender._id = message.sender_jid_row_id
+            LEFT JOIN message_media
+                ON message_media.message_row_id = message._id
+            WHERE message._id > ? {chat_filter}
+            ORDER BY message._id
+            LIMIT ?
+        """,
+        "chat_filter": "AND message.chat_row_id = ?",
+        "media": """
+            SELECT mm.message_row_id, mm.chat_row_id, mm.file_path,
+                   mm.file_size, mm.mime_type, mm.media_name, mm.file_hash,
+                   message.timestamp
+            FROM message_media AS mm
+            JOIN message ON message._id = mm.message_row_id
+            WHERE mm.message_row_id > ?
+            ORDER BY mm.message_row_id
+            LIMIT ?
+        """,
+        "key_id": """
+            SELECT key_id FROM message WHERE _id = ? AND chat_row_id = ?
+        """,
+    },
+    SCHEMA_LEGACY: {
+        "chats": """
+            SELECT _id, key_remote_jid, subject, sort_timestamp
+            FROM chat_list
+            ORDER BY sort_timestamp DESC
+        """,
+        "messages": """
+            SELECT m._id, c._id, m.key_id, m.key_from_me,
+                   m.remote_resource, m.timestamp, m.data, NULL,
+                   m.media_mime_type
+            FROM messages AS m
+            JOIN chat_list AS c ON c.key_remote_jid = m.key_remote_jid
+            WHERE m._id > ? {chat_filter}
+            ORDER BY m._id
+            LIMIT ?
+        """,
+        "chat_filter": "AND c._id = ?",
+        "media": """
+            SELECT m._id, c._id, NULL, m.media_size, m.media_mime_type,
+                   m.media_name, m.media_hash, m.timestamp
+            FROM messages AS m
+            JOIN chat_list AS c ON c.key_remote_jid = m.key_remote_jid
+            WHERE m._id > ? AND m.media_mime_type IS NOT NULL
+            ORDER BY m._id
+            LIMIT ?
+        """,
+        "key_id": """
+            SELECT m.key_id FROM messages AS m
+            JOIN chat_list AS c ON c.key_remote_jid = m.key_remote_jid
+            WHERE m._id = ? AND c._id = ?
+        """,
+    },
+}
+
+
+def connect(
+    path: str,
+    immutable: Optional[bool] = None,
+    check_same_thread: bool = True
+) -> sqlite3.Connection:
+    """
+    Opens a database read-only with a large mmap window.
+    immutable (default: unless a -wal file is present) also skips all
+    locking; only safe while nothing else writes to the file.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    if immutable is None:
+        immutable = not os.path.exists(path + "-wal")
+    uri = "file:" + os.path.abspath(path) + "?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+    conn = sqlite3.connect(
+        uri, uri=True, check_same_thread=check_same_thread
+    )
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    return conn
+
+
+def detect_schema(conn: sqlite3.Connection) -> str:
+    """Returns SCHEMA_MODERN or SCHEMA_LEGACY; raises if neither fits."""
+    tables = {
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )
+    }
+    if {"message", "chat", "jid"} <= tables:
+        return SCHEMA_MODERN
+    if {"messages", "chat_list"} <= tables:
+        return SCHEMA_LEGACY
+    raise sqlite3.DatabaseError("Not a WhatsApp msgstore database")
+
+
+def _paged(
+    conn: sqlite3.Connection,
+    sql: str,
+    params: Tuple[Any, ...],
+    after_id: int,
+    page_size: int
+) -> Iterator[Tuple[Any, ...]]:
+    """
+    Runs sql page by page. Pages are selected by _id rather than OFFSET,
+    so each one costs the same however deep into the table it is. The
+    statement text never changes, so sqlite3 reuses the prepared one.
+    """
+    while True:
+        rows = conn.execute(
+            sql, (after_id,) + params + (page_size,)
+        ).fetchall()
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1][0]
+
+
+class MsgStore:
+    """
+    Lazy typed view of a msgstore.db.
+
+        with MsgStore("output/msgstore.db") as store:
+            for chat in store.chats():
+                for message in store.messages(chat.id):
+                    ...
+    """
+
+    def __init__(
+        self,
+        path: str,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        immutable: Optional[bool] = None
+    ) -> None:
+        self.path = path
+        self.page_size = page_size
+        self.conn = connect(path, immutable)
+        try:
+            self.schema = detect_schema(self.conn)
+        except sqlite3.Error:
+            self.conn.close()
+            raise
+        self._sql = QUERIES[self.schema]
+        self._messages_sql = self._sql["messages"].format(chat_filter="")
+        self._chat_messages_sql = self._sql["messages"].format(
+            chat_filter=self._sql["chat_filter"]
+        )
+
+    def __enter__(self) -> "MsgStore":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def chats(self) -> Iterator[Chat]:
+        """Chats, most recently active first."""
+        for row in self.conn.execute(self._sql["chats"]):
+            yield Chat.from_row(row)
+
+    def messages(
+        self, chat_id: Optional[int] = None, after_id: int = 0
+    ) -> Iterator[Message]:
+        """Messages in _id order: of one chat, or of every chat."""
+        if chat_id is None:
+            rows = _paged(
+                self.conn, self._messages_sql, (), after_id, self.page_size
+            )
+        else:
+            rows = _paged(
+                self.conn, self._chat_messages_sql, (chat_id,), after_id,
+                self.page_size
+            )
+        for row in rows:
+            yield Message.from_row(row)
+
+    def media(self, after_id: int = 0) -> Iterator[MediaRef]:
+        """Media attached to messages, in message _id order."""
+        for row in _paged(
+            self.conn, self._sql["media"], (), after_id, self.page_size
+        ):
+            yield MediaRef.from_row(row)
+
+    def message_key_id(self, chat_id: int, message_id: int) -> Optional[str]:
+        """key_id of a message, or None if the chat has no such _id."""
+        row = self.conn.execute(
+            self._sql["key_id"], (message_id, chat_id)
+        ).fetchone()
+        return row[0] if row else None
+
+
+def iter_contacts(wa_db_path: str) -> Iterator[Contact]:
+    """Contacts from wa.db."""
+    conn = connect(wa_db_path)
+    try:
+        for row in conn.execute(
+            "SELECT jid, display_name, wa_name FROM wa_contacts "
+            "WHERE jid IS NOT NULL"
+        ):
+            yield Contact.from_row(row)
+    finally:
+        conn.close()
+
+
+def load_contact_names(wa_db_path: str) -> Dict[str, str]:
+    """Maps jid -> display name from wa.db. Empty if it is unavailable."""
+    names: Dict[str, str] = {}
+    try:
+        for contact in iter_contacts(wa_db_path):
+            if contact.name:
+                names[contact.jid] = contact.name
+    except (FileNotFoundError, sqlite3.Error):
+        return {}
+    return names
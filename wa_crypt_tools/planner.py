@@ -0,0 +1,252 @@
+"""
+Execution plan for pull/push/all: what would move, how long it should
+take and whether it fits on disk, from one remote listing per device.
+
+Times use the throughput measured in earlier runs (the run history),
+falling back to DEFAULT_RATES when there is none.
+"""
+import os
+import posixpath
+from typing import Any, Dict, List, Optional, Tuple
+
+from wa_crypt_tools.adb import (
+    AdbError, RemoteFile, check_connection, list_remote_files
+)
+from wa_crypt_tools.backups import (
+    DEFAULT_KEEP_ROTATED, PRIMARY_DATABASES, parse_backup_name,
+    select_backups
+)
+from wa_crypt_tools.cache import DecryptCache
+from wa_crypt_tools.commands.decrypt import CRYPT_VERSIONS, ENGINE_CRYPTO
+from wa_crypt_tools.commands.pull import CONTACTS_PATHS, REMOTE_WHATSAPP_DIR
+from wa_crypt_tools.config import Config
+from wa_crypt_tools.history import (
+    device_identity, estimated_rate, history_path
+)
+from wa_crypt_tools.scheduler import prioritize_media
+from wa_crypt_tools.utils import free_space
+
+# Bytes per second when the history has no measurement yet
+DEFAULT_RATES = {"pull": 20e6, "push": 20e6, "decrypt": 150e6}
+# A plaintext msgstore.db is about this many times its crypt15 size
+# (the backup is zlib-compressed); used when the cache has no real size
+DECRYPT_SIZE_RATIO = 2.0
+PLAN_COMMANDS = ("pull", "push", "all")
+# Folders decrypt looks in for each primary database, in order
+DECRYPT_FOLDERS = {
+    "msgstore": ("Databases",),
+    "wa": ("Databases", "Backups"),
+}
+
+
+def _stage(
+    stage: str, files: int, size: int, rate: Optional[float],
+    source: str, **extra: Any
+) -> Dict[str, Any]:
+    plan = {
+        "stage": stage,
+        "files": files,
+        "bytes": size,
+        "rate": rate,
+        "rate_source": source,
+        "seconds": round(size / rate, 1) if rate and size else 0.0,
+    }
+    plan.update(extra)
+    return plan
+
+
+def _rate(
+    history_file: str, stage: str, device: Optional[str]
+) -> Tuple[float, str]:
+    measured = estimated_rate(history_file, stage, device)
+    if measured:
+        return measured, "history"
+    return DEFAULT_RATES[stage], "default"
+
+
+def _current_crypt(
+    files: List[RemoteFile], name: str
+) -> Optional[RemoteFile]:
+    """The crypt file decrypt would pick for name (see _find_crypt)."""
+    for version in CRYPT_VERSIONS:
+        for folder in DECRYPT_FOLDERS[name]:
+            for f in files:
+                if f.path.endswith(f"/{folder}/{name}.db.crypt{version}"):
+                    return f
+    return None
+
+
+def _rel(path: str, root: str = REMOTE_WHATSAPP_DIR) -> str:
+    return posixpath.relpath(path, root)
+
+
+def _local_tree(root: str) -> Dict[str, int]:
+    sizes = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            sizes[rel] = os.path.getsize(path)
+    return sizes
+
+
+def _plan_pull(
+    config: Config, device: Optional[str], serial: Optional[str],
+    output_dir: str, history_file: str, plan: Dict[str, Any]
+) -> Dict[str, int]:
+    """
+    Adds the pull and decrypt stages; returns relpath -> size pulled.
+    serial is the resolved device, under which its runs are recorded.
+    """
+    listing = list_remote_files(
+        list(CONTACTS_PATHS) + [
+            f"{REMOTE_WHATSAPP_DIR}/{folder}"
+            for folder in ("Databases", "Backups", "Media")
+        ],
+        device, missing_ok=True
+    )
+    contacts = next((f for p in CONTACTS_PATHS for f in listing
+                     if f.path == p), None)
+    media_root = f"{REMOTE_WHATSAPP_DIR}/Media"
+    databases = [f for f in listing
+                 if not f.path.startswith(media_root + "/")
+                 and f.path.startswith(REMOTE_WHATSAPP_DIR + "/")]
+    keep_rotated = config.get('keep_rotated_backups')
+    if keep_rotated is None:
+        keep_rotated = DEFAULT_KEEP_ROTATED
+    primary, secondary = select_backups(databases, keep_rotated)
+    media = prioritize_media(
+        [f for f in listing if f.path.startswith(media_root + "/")],
+        media_root, config.get('media_weights')
+    )
+
+    rate, source = _rate(history_file, "pull", serial)
+    tiers = {
+        "databases": primary, "backups": secondary, "media": media,
+    }
+    pulled = {_rel(f.path): f.size for files in tiers.values()
+              for f in files}
+    total = sum(pulled.values()) + (contacts.size if contacts else 0)
+    stage = _stage(
+        "pull", len(pulled) + (1 if contacts else 0), total, rate, source,
+        tiers={name: {"files": len(files),
+                      "bytes": sum(f.size for f in files)}
+               for name, files in tiers.items()},
+        skipped_backups=len(databases) - len(primary) - len(secondary),
+        contacts=contacts.size if contacts else None,
+    )
+    budget = config.get('pull_time_budget')
+    if budget:
+        # Media is pulled newest first until the budget runs out
+        left = budget * rate - sum(f.size for f in primary + secondary)
+        fitting = 0
+        for f in media:
+            if left < f.size:
+                break
+            left -= f.size
+            fitting += 1
+        stage["budget_media_files"] = fitting
+        stage["budget_media_left"] = len(media) - fitting
+    plan["stages"].append(stage)
+    plan["disk_needed"] += total
+
+    if not config.get('key'):
+        return pulled
+    cache = (
+        DecryptCache(output_dir, ENGINE_CRYPTO)
+        if config.get('decrypt_cache', True) else None
+    )
+    rate, source = _rate(history_file, "decrypt", serial)
+    crypts = [f for f in (_current_crypt(primary, name)
+                          for name in PRIMARY_DATABASES) if f]
+    cached = [f for f in crypts if cache and cache.likely_hit(
+        posixpath.basename(f.path), f.size, str(config.get('key'))
+    )]
+    for f in crypts:
+        name = parse_backup_name(f.path)[0]
+        known = cache.plaintext_size(
+            os.path.join(output_dir, f"{name}.db")
+        ) if cache else None
+        if f not in cached:
+            plan["disk_needed"] += known or int(f.size * DECRYPT_SIZE_RATIO)
+    plan["stages"].append(_stage(
+        "decrypt", len(crypts) - len(cached),
+        sum(f.size for f in crypts if f not in cached), rate, source,
+        likely_cached=[posixpath.basename(f.path) for f in cached],
+    ))
+    return pulled
+
+
+def _plan_push(
+    device: Optional[str], source: Dict[str, int], history_file: str,
+    plan: Dict[str, Any]
+) -> None:
+    """Adds the push stage, comparing source with the target device."""
+    try:
+        target = {
+            _rel(f.path): f.size
+            for f in list_remote_files(
+                [REMOTE_WHATSAPP_DIR], device, missing_ok=True
+            )
+        }
+    except AdbError:
+        target = {}
+    changed = {rel: size for rel, size in source.items()
+               if target.get(rel) != size}
+    rate, rate_source = _rate(
+        history_file, "push", device_identity(device)[0] or device
+    )
+    plan["stages"].append(_stage(
+        "push", len(source), sum(source.values()), rate, rate_source,
+        device=device,
+        changed_files=len(changed),
+        changed_bytes=sum(changed.values()),
+    ))
+
+
+def build_plan(config: Config, command: str = "all") -> Dict[str, Any]:
+    """
+    The plan for command (pull, push or all) as a JSON-ready dict:
+    stages with files, bytes, rates and seconds, disk space needed and
+    free, and whether it fits. 'error' is set if no plan could be made.
+    """
+    output_dir = os.path.abspath(config.get('output') or os.path.join(
+        os.getcwd(), "output"
+    ))
+    pull_device = config.get('pull_device') or config.get('device')
+    push_device = config.get('push_device') or config.get('device')
+    history_file = history_path(output_dir)
+    plan: Dict[str, Any] = {
+        "command": command,
+        "output": output_dir,
+        "stages": [],
+        "disk_needed": 0,
+        "disk_free": free_space(output_dir),
+    }
+
+    pulled: Dict[str, int] = {}
+    if command in ("pull", "all"):
+        if not check_connection(pull_device):
+            plan["error"] = "No device connected via ADB."
+            return plan
+        serial, plan["model"] = device_identity(pull_device)
+        plan["device"] = serial or pull_device
+        try:
+            pulled = _plan_pull(
+                config, pull_device, serial, output_dir, history_file, plan
+            )
+        except AdbError as e:
+            plan["error"] = str(e)
+            return plan
+
+    if command in ("push", "all"):
+        if command == "push":
+            pulled = _local_tree(os.path.join(output_dir, "WhatsApp"))
+        if not check_connection(push_device):
+            plan["error"] = "No push target connected via ADB."
+            return plan
+        _plan_push(push_device, pulled, history_file, plan)
+
+    plan["seconds"] = round(sum(s["seconds"] for s in plan["stages"]), 1)
+    plan["fits"] = plan["disk_needed"] <= plan["disk_free"]
+    return plan
@@ -0,0 +1,188 @@
+"""
+cProfile (and optionally tracemalloc) around command stages.
+
+Off unless enable() is called (the CLI's --profile option). Each
+profiled stage writes two files into the run's profile directory:
+<stage>.prof (pstats data, for snakeviz or `python -m pstats`) and
+<stage>.txt (the top functions by cumulative time and, with memory
+tracing, the peak and the top allocating lines).
+
+enable() also exports the settings through the environment, so the
+venv child processes (`--internal` decrypt and convert) profile
+themselves into the same directory once they call enable_from_env().
+"""
+import os
+import io
+import time
+import pstats
+import cProfile
+import functools
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypeVar, cast
+
+from wa_crypt_tools.utils import format_size
+
+PROFILE_DIRNAME = "profile"
+DEFAULT_TOP = 25
+# Settings inherited by child processes
+PROFILE_DIR_ENV = "WA_PROFILE_DIR"
+PROFILE_MEMORY_ENV = "WA_PROFILE_MEMORY"
+PROFILE_TOP_ENV = "WA_PROFILE_TOP"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_directory: Optional[str] = None
+_memory = False
+_top = DEFAULT_TOP
+# cProfile cannot run two profilers at once (Python 3.12+ refuses), so
+# a stage that overlaps another, e.g. the background decrypt during the
+# media pull, runs unprofiled
+_busy = threading.Lock()
+
+
+def enable(
+    output_dir: str, memory: bool = False, top: int = DEFAULT_TOP
+) -> str:
+    """
+    Profiles stages from now on, into a fresh directory below
+    <output_dir>/profile. Returns that directory.
+    """
+    global _directory, _memory, _top
+    base = os.path.join(output_dir, PROFILE_DIRNAME)
+    directory = os.path.join(base, time.strftime("%Y%m%d-%H%M%S"))
+    suffix = 1
+    while os.path.exists(directory):
+        suffix += 1
+        directory = os.path.join(
+            base, f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+        )
+    os.makedirs(directory)
+    _directory, _memory, _top = directory, memory, top
+    os.environ[PROFILE_DIR_ENV] = directory
+    os.environ[PROFILE_MEMORY_ENV] = "1" if memory else ""
+    os.environ[PROFILE_TOP_ENV] = str(top)
+    return directory
+
+
+def enable_from_env() -> None:
+    """Picks up a parent's enable() in a child process."""
+    global _directory, _memory, _top
+    directory = os.environ.get(PROFILE_DIR_ENV)
+    if not directory or not os.path.isdir(directory):
+        return
+    _directory = directory
+    _memory = bool(os.environ.get(PROFILE_MEMORY_ENV))
+    _top = int(os.environ.get(PROFILE_TOP_ENV) or DEFAULT_TOP)
+
+
+def disable() -> None:
+    global _directory
+    _directory = None
+    for name in (PROFILE_DIR_ENV, PROFILE_MEMORY_ENV, PROFILE_TOP_ENV):
+        os.environ.pop(name, None)
+
+
+def directory() -> Optional[str]:
+    return _directory
+
+
+def _claim(directory: str, stage: str) -> str:
+    """A path prefix for stage no other process or run has taken."""
+    n = 1
+    while True:
+        prefix = os.path.join(
+            directory, stage if n == 1 else f"{stage}-{n}"
+        )
+        try:
+            os.close(os.open(
+                prefix + ".prof", os.O_CREAT | os.O_EXCL | os.O_WRONLY
+            ))
+            return prefix
+        except FileExistsError:
+            n += 1
+
+
+def _report(
+    profiler: cProfile.Profile,
+    stage: str,
+    wall: float,
+    memory: Optional[str]
+) -> str:
+    out = io.StringIO()
+    out.write(f"Stage: {stage} (pid {os.getpid()})\n")
+    out.write(f"Wall time: {wall:.3f}s\n")
+    if memory:
+        out.write(memory)
+    out.write("\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(_top)
+    return out.getvalue()
+
+
+def _memory_report(
+    before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, peak: int
+) -> str:
+    lines = [f"Peak traced memory: {format_size(peak)}",
+             f"Top {_top} allocating lines (growth during the stage):"]
+    for stat in after.compare_to(before, "lineno")[:_top]:
+        frame = stat.traceback[0]
+        lines.append(f"  {format_size(stat.size_diff):>10}  "
+                     f"{frame.filename}:{frame.lineno}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Profiles the enclosed block as one stage (no-op when disabled)."""
+    directory = _directory
+    if directory is None:
+        yield
+        return
+    if not _busy.acquire(blocking=False):
+        print(f"Note: Not profiling {name}; another stage is being "
+              "profiled.")
+        yield
+        return
+    try:
+        started_memory = _memory and not tracemalloc.is_tracing()
+        if started_memory:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot() if _memory else None
+        if _memory:
+            tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            wall = time.perf_counter() - started
+            memory = None
+            if before is not None:
+                peak = tracemalloc.get_traced_memory()[1]
+                memory = _memory_report(
+                    before, tracemalloc.take_snapshot(), peak
+                )
+                if started_memory:
+                    tracemalloc.stop()
+            prefix = _claim(directory, name)
+            profiler.dump_stats(prefix + ".prof")
+            with open(prefix + ".txt", 'w') as f:
+                f.write(_report(profiler, name, wall, memory))
+            print(f"Profile: {name} ({wall:.2f}s) -> {prefix}.txt")
+    finally:
+        _busy.release()
+
+
+def profiled(name: str) -> Callable[[F], F]:
+    """Decorator: runs the function as a profiled stage."""
+    def decorate(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return func(*args, **kwargs)
+        return cast(F, wrapper)
+    return decorate
@@ -0,0 +1,248 @@
+"""
+Live progress for long transfers (the media pull and the push).
+
+The totals come from the listing taken before the transfer starts. A
+ticker thread renders the display, so the transfer loop only updates
+counters. While an adb call runs, the bytes already written to its
+local target files count as done, which shows a stalled USB link even
+while a single large batch is in flight.
+
+The mode is set once by the CLI (--progress):
+    text  one status line on stderr, redrawn in place on a terminal
+    json  one JSON object per line on stderr, for dashboards
+    off   nothing (the default for library callers)
+"""
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, TextIO, Tuple
+
+from wa_crypt_tools.utils import format_size
+
+MODES = ("text", "json", "off")
+# Seconds between redraws (terminal, JSON events, plain log lines)
+TTY_INTERVAL = 0.5
+JSON_INTERVAL = 1.0
+LOG_INTERVAL = 10.0
+# Throughput is averaged over this many seconds
+RATE_WINDOW = 5.0
+# No byte progress for this long while a transfer is watched is a stall
+STALL_SECONDS = 15.0
+
+_mode = "off"
+
+
+def set_mode(mode: Optional[str]) -> None:
+    """Selects the display; None means text on a terminal, else off."""
+    global _mode
+    if mode is None:
+        mode = "text" if sys.stderr.isatty() else "off"
+    if mode not in MODES:
+        raise ValueError(f"Unknown progress mode: {mode}")
+    _mode = mode
+
+
+def get_mode() -> str:
+    return _mode
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class Transfer:
+    """
+    Progress of one transfer of known size. begin() announces what a
+    worker is about to move (and which local files to watch grow),
+    advance() records what finished.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        total_files: int,
+        total_bytes: int,
+        mode: Optional[str] = None,
+        stream: Optional[TextIO] = None
+    ) -> None:
+        self.label = label
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.mode = mode or _mode
+        self.stream = stream or sys.stderr
+        self.tty = self.mode == "text" and self.stream.isatty()
+        self.interval = (
+            JSON_INTERVAL if self.mode == "json"
+            else TTY_INTERVAL if self.tty else LOG_INTERVAL
+        )
+        self.done_files = 0
+        self.done_bytes = 0
+        self.failed_files = 0
+        self.workers: Dict[str, str] = {}
+        self._watch: Dict[str, List[str]] = {}
+        self._samples: Deque[Tuple[float, int]] = deque()
+        self._last_change = time.monotonic()
+        self._started = self._last_change
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def active(self) -> bool:
+        return self.mode != "off"
+
+    def __enter__(self) -> "Transfer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.finish()
+
+    def start(self) -> None:
+        if not self.active:
+            return
+        self._started = self._last_change = time.monotonic()
+        self._samples.append((self._started, 0))
+        self._emit({"event": "start"})
+        self._thread = threading.Thread(target=self._tick, daemon=True)
+        self._thread.start()
+
+    def begin(
+        self, worker: str, status: str, watch: Optional[List[str]] = None
+    ) -> None:
+        """worker starts on status; watch lists local files it writes."""
+        with self._lock:
+            self.workers[worker] = status
+            if watch is not None:
+                self._watch[worker] = watch
+
+    def advance(
+        self, files: int, size: int, worker: Optional[str] = None,
+        failed: int = 0
+    ) -> None:
+        """Records finished files (failed ones count as done too)."""
+        with self._lock:
+            self.done_files += files
+            self.done_bytes += size
+            self.failed_files += failed
+            if worker is not None:
+                self.workers[worker] = "idle"
+                self._watch.pop(worker, None)
+
+    def finish(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self.active:
+            self._render(final=True)
+
+    def _sample_in_flight(self) -> int:
+        with self._lock:
+            paths = [p for watch in self._watch.values() for p in watch]
+        total = 0
+        for path in paths:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current counters, throughput (bytes/s) and ETA (seconds)."""
+        now = time.monotonic()
+        in_flight = self._sample_in_flight()
+        with self._lock:
+            done = min(self.done_bytes + in_flight, self.total_bytes)
+            samples = self._samples
+            if not samples or done != samples[-1][1]:
+                self._last_change = now
+            samples.append((now, done))
+            while len(samples) > 2 and now - samples[0][0] > RATE_WINDOW:
+                samples.popleft()
+            span = now - samples[0][0]
+            rate = (done - samples[0][1]) / span if span > 0 else 0.0
+            watched = bool(self._watch)
+            snap = {
+                "label": self.label,
+                "files": self.done_files,
+                "total_files": self.total_files,
+                "bytes": done,
+                "total_bytes": self.total_bytes,
+                "failed": self.failed_files,
+                "rate": round(rate),
+                "eta_s": (
+                    round((self.total_bytes - done) / rate, 1)
+                    if rate > 0 else None
+                ),
+                "elapsed_s": round(now - self._started, 1),
+                "stalled_s": (
+                    round(now - self._last_change, 1)
+                    if watched and now - self._last_change >= STALL_SECONDS
+                    else 0
+                ),
+                "workers": dict(self.workers),
+            }
+        return snap
+
+    def _tick(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._render()
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        if self.mode == "json":
+            event.setdefault("label", self.label)
+            event.setdefault("total_files", self.total_files)
+            event.setdefault("total_bytes", self.total_bytes)
+            self.stream.write(json.dumps(event) + "\n")
+            self.stream.flush()
+
+    def _render(self, final: bool = False) -> None:
+        snap = self.snapshot()
+        if self.mode == "json":
+            snap["event"] = "finish" if final else "progress"
+            self._emit(snap)
+            return
+        line = format_line(snap)
+        if self.tty:
+            end = "\n" if final else ""
+            self.stream.write("\r\033[K" + line + end)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+
+def format_line(snap: Dict[str, Any]) -> str:
+    """One status line, e.g. for a terminal or a log."""
+    percent = (
+        100 * snap["bytes"] / snap["total_bytes"]
+        if snap["total_bytes"] else 100.0
+    )
+    line = (
+        f"[{snap['label']}] {snap['files']}/{snap['total_files']} files  "
+        f"{format_size(snap['bytes'])}/{format_size(snap['total_bytes'])} "
+        f"({percent:.0f}%)  {format_size(snap['rate'])}/s  "
+        f"ETA {format_eta(snap['eta_s'])}"
+    )
+    if snap["failed"]:
+        line += f"  {snap['failed']} failed"
+    if snap["stalled_s"]:
+        line += f"  STALLED {snap['stalled_s']:.0f}s"
+    busy = [f"{name}: {status}" for name, status in snap["workers"].items()
+            if status != "idle"]
+    if busy:
+        line += "  | " + "; ".join(busy)
+    return line
+
+
+def transfer(label: str, total_files: int, total_bytes: int) -> Transfer:
+    """A Transfer in the mode chosen with set_mode()."""
+    return Transfer(label, total_files, total_bytes)
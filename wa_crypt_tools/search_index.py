@@ -0,0 +1,277 @@
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from wa_crypt_tools.msgstore import SCHEMA_LEGACY, SCHEMA_MODERN, MsgStore
+
+SEARCH_INDEX_FILENAME = "search.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS chats (jid TEXT PRIMARY KEY, title TEXT);
+CREATE TABLE IF NOT EXISTS contacts (jid TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE IF NOT EXISTS message_meta (
+    _id INTEGER PRIMARY KEY,
+    chat_jid TEXT,
+    sender_jid TEXT,
+    from_me INTEGER,
+    timestamp INTEGER
+);
+CREATE INDEX IF NOT EXISTS message_meta_chat
+    ON message_meta (chat_jid, timestamp);
+CREATE INDEX IF NOT EXISTS message_meta_timestamp
+    ON message_meta (timestamp);
+CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+    text, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Per msgstore schema. Only rows past the stored high-water mark are
+# copied on each update; chats are small and copied whole.
+INDEX_SQL: Dict[str, Dict[str, str]] = {
+    SCHEMA_MODERN: {
+        "meta": """
+            INSERT INTO message_meta
+                (_id, chat_jid, sender_jid, from_me, timestamp)
+            SELECT m._id, cj.raw_string,
+                   CASE WHEN m.from_me THEN NULL
+                        ELSE COALESCE(sj.raw_string, cj.raw_string) END,
+                   m.from_me, m.timestamp
+            FROM src.message AS m
+            JOIN src.chat AS c ON c._id = m.chat_row_id
+            JOIN src.jid AS cj ON cj._id = c.jid_row_id
+            LEFT JOIN src.jid AS sj ON sj._id = m.sender_jid_row_id
+            WHERE m._id > ? AND m.text_data IS NOT NULL
+              AND m.text_data != ''
+        """,
+        "text": """
+            INSERT INTO message_fts (rowid, text)
+            SELECT _id, text_data FROM src.message
+            WHERE _id > ? AND text_data IS NOT NULL AND text_data != ''
+        """,
+        "chats": """
+            INSERT INTO chats SELECT j.raw_string, c.subject
+            FROM src.chat AS c JOIN src.jid AS j ON j._id = c.jid_row_id
+        """,
+        "key_id": "SELECT key_id FROM src.message WHERE _id = ?",
+        "last": """
+            SELECT _id, key_id FROM src.message ORDER BY _id DESC LIMIT 1
+        """,
+    },
+    SCHEMA_LEGACY: {
+        "meta": """
+            INSERT INTO message_meta
+                (_id, chat_jid, sender_jid, from_me, timestamp)
+            SELECT _id, key_remote_jid,
+                   CASE WHEN key_from_me THEN NULL
+                        ELSE COALESCE(NULLIF(remote_resource, ''),
+                                      key_remote_jid) END,
+                   key_from_me, timestamp
+            FROM src.messages
+            WHERE _id > ? AND data IS NOT NULL AND data != ''
+        """,
+        "text": """
+            INSERT INTO message_fts (rowid, text)
+            SELECT _id, data FROM src.messages
+            WHERE _id > ? AND data IS NOT NULL AND data != ''
+        """,
+        "chats": """
+            INSERT INTO chats
+            SELECT key_remote_jid, subject FROM src.chat_list
+        """,
+        "key_id": "SELECT key_id FROM src.messages WHERE _id = ?",
+        "last": """
+            SELECT _id, key_id FROM src.messages ORDER BY _id DESC LIMIT 1
+        """,
+    },
+}
+
+
+class SearchHit(NamedTuple):
+    id: int
+    chat_jid: str
+    chat_title: str
+    sender: str
+    timestamp: int
+    snippet: str
+
+
+def _sqlite_uri(path: str, mode: str) -> str:
+    return "file:" + os.path.abspath(path) + "?mode=" + mode
+
+
+def _get_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,))
+    value = row.fetchone()
+    return None if value is None else value[0]
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value: object) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+        (key, value)
+    )
+
+
+def fts5_available() -> bool:
+    try:
+        sqlite3.connect(":memory:").execute(
+            "CREATE VIRTUAL TABLE t USING fts5(x)"
+        )
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def update_index(
+    index_path: str,
+    db_path: str,
+    wa_db_path: Optional[str] = None,
+    rebuild: bool = False
+) -> int:
+    """
+    Adds every message past the last indexed _id to the FTS5 index at
+    index_path, creating it if needed. The index is rebuilt from scratch
+    when the last indexed message no longer matches (a different or
+    restored msgstore.db). Returns the number of messages added.
+    """
+    with MsgStore(db_path) as store:
+        sql = INDEX_SQL[store.schema]
+
+    conn = sqlite3.connect(_sqlite_uri(index_path, "rwc"), uri=True)
+    try:
+        conn.executescript(SCHEMA)
+        conn.execute(
+            "ATTACH DATABASE ? AS src", (_sqlite_uri(db_path, "ro"),)
+        )
+        has_contacts = bool(wa_db_path and os.path.exists(wa_db_path))
+        if wa_db_path and has_contacts:
+            conn.execute(
+                "ATTACH DATABASE ? AS wa", (_sqlite_uri(wa_db_path, "ro"),)
+            )
+        last_id = int(_get_meta(conn, "last_id") or 0)
+        if last_id and not rebuild:
+            row = conn.execute(sql["key_id"], (last_id,)).fetchone()
+            rebuild = row is None or row[0] != _get_meta(conn, "last_key_id")
+
+        with conn:
+            if rebuild:
+                for table in ("message_meta", "message_fts"):
+                    conn.execute(f"DELETE FROM {table}")
+                last_id = 0
+            conn.execute(sql["meta"], (last_id,))
+            added = conn.execute(sql["text"], (last_id,)).rowcount
+
+            # Small tables: refreshed whole so renames show up
+            conn.execute("DELETE FROM chats")
+            conn.execute(sql["chats"])
+            if has_contacts:
+                _copy_contacts(conn)
+
+            row = conn.execute(sql["last"]).fetchone()
+            if row:
+                _set_meta(conn, "last_id", row[0])
+                _set_meta(conn, "last_key_id", row[1])
+        return max(added, 0)
+    finally:
+        conn.close()
+
+
+def _copy_contacts(conn: sqlite3.Connection) -> None:
+    """Copies contact names from the attached wa.db."""
+    conn.execute("DELETE FROM contacts")
+    try:
+        conn.execute(
+            "INSERT OR IGNORE INTO contacts "
+            "SELECT jid, COALESCE(display_name, wa_name) FROM wa.wa_contacts "
+            "WHERE jid IS NOT NULL AND COALESCE(display_name, wa_name) "
+            "IS NOT NULL"
+        )
+    except sqlite3.Error:
+        print("Warning: Could not read contact names from wa.db.")
+
+
+def quote_query(text: str) -> str:
+    """Turns free text into an FTS5 query matching all of its words."""
+    terms = [t.replace('"', '""') for t in text.split()]
+    return " ".join(f'"{t}"' for t in terms if t)
+
+
+def _day_start_ms(day: str) -> int:
+    return int(datetime.strptime(day, "%Y-%m-%d").timestamp() * 1000)
+
+
+def search(
+    index_path: str,
+    query: str,
+    chat: Optional[str] = None,
+    sender: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 20,
+    raw: bool = False
+) -> List[SearchHit]:
+    """
+    Ranked (bm25) matches for query, best first.
+    chat and sender match a jid, a phone number prefix or a name; sender
+    'me' selects own messages. since/until are YYYY-MM-DD, both inclusive.
+    raw passes query as FTS5 syntax instead of plain words.
+    """
+    conn = sqlite3.connect(_sqlite_uri(index_path, "ro"), uri=True)
+    try:
+        where = ["message_fts MATCH ?"]
+        params: List[object] = [query if raw else quote_query(query)]
+        if chat:
+            where.append(
+                "m.chat_jid IN (SELECT jid FROM chats WHERE jid LIKE ? "
+                "OR title LIKE ? OR jid IN (SELECT jid FROM contacts "
+                "WHERE name LIKE ?))"
+            )
+            params += [chat + "%", f"%{chat}%", f"%{chat}%"]
+        if sender and sender.lower() == "me":
+            where.append("m.from_me = 1")
+        elif sender:
+            where.append(
+                "(m.sender_jid LIKE ? OR m.sender_jid IN "
+                "(SELECT jid FROM contacts WHERE name LIKE ?))"
+            )
+            params += [sender + "%", f"%{sender}%"]
+        if since:
+            where.append("m.timestamp >= ?")
+            params.append(_day_start_ms(since))
+        if until:
+            where.append("m.timestamp < ?")
+            params.append(_day_start_ms(until) + 86400000)
+        params.append(limit)
+
+        rows = conn.execute(
+            "SELECT m._id, m.chat_jid, "
+            "COALESCE(ch.title, cc.name, m.chat_jid), "
+            "CASE WHEN m.from_me THEN 'Me' "
+            "ELSE COALESCE(sc.name, m.sender_jid) END, m.timestamp, "
+            "snippet(message_fts, 0, '[', ']', '...', 12) "
+            "FROM message_fts JOIN message_meta AS m "
+            "ON m._id = message_fts.rowid "
+            "LEFT JOIN chats AS ch ON ch.jid = m.chat_jid "
+            "LEFT JOIN contacts AS cc ON cc.jid = m.chat_jid "
+            "LEFT JOIN contacts AS sc ON sc.jid = m.sender_jid "
+            "WHERE " + " AND ".join(where) + " "
+            "ORDER BY bm25(message_fts) LIMIT ?",
+            params
+        ).fetchall()
+    finally:
+        conn.close()
+    return [SearchHit(*row) for row in rows]
+
+
+def index_stats(index_path: str) -> Dict[str, int]:
+    conn = sqlite3.connect(_sqlite_uri(index_path, "ro"), uri=True)
+    try:
+        count = conn.execute("SELECT COUNT(*) FROM message_meta").fetchone()
+        return {
+            "messages": count[0],
+            "last_id": int(_get_meta(conn, "last_id") or 0),
+        }
+    finally:
+        conn.close()
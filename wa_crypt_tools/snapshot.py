@@ -0,0 +1,195 @@
+import os
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from wa_crypt_tools.media import scan_sizes
+from wa_crypt_tools.msgstore import SCHEMA_LEGACY, SCHEMA_MODERN, MsgStore
+
+# Per schema: every keyed message of the database attached as {db}
+KEYED_MESSAGES_SQL: Dict[str, str] = {
+    SCHEMA_MODERN: """
+        SELECT m._id AS id, cj.raw_string AS jid, m.key_id AS key_id,
+               m.from_me AS from_me, m.timestamp AS timestamp,
+               m.text_data AS text
+        FROM {db}.message AS m
+        JOIN {db}.chat AS c ON c._id = m.chat_row_id
+        JOIN {db}.jid AS cj ON cj._id = c.jid_row_id
+        WHERE m.key_id IS NOT NULL
+    """,
+    SCHEMA_LEGACY: """
+        SELECT _id AS id, key_remote_jid AS jid, key_id,
+               key_from_me AS from_me, timestamp, data AS text
+        FROM {db}.messages
+        WHERE key_id IS NOT NULL AND key_remote_jid IS NOT NULL
+    """,
+}
+
+KEYED_TABLE = """
+    CREATE TEMP TABLE {name} (
+        jid TEXT, key_id TEXT, from_me INTEGER, id INTEGER,
+        timestamp INTEGER, text TEXT,
+        PRIMARY KEY (jid, key_id, from_me)
+    ) WITHOUT ROWID
+"""
+
+# Same history: rows line up by _id, so comparisons are rowid lookups
+SAME_HISTORY_SQL = {
+    "new": "SELECT * FROM new_msgs WHERE id > :old_max",
+    "deleted": """
+        SELECT * FROM old_msgs AS o WHERE NOT EXISTS (
+            SELECT 1 FROM new_msgs AS n
+            WHERE n.id = o.id AND n.key_id = o.key_id
+        )
+    """,
+    "edited": """
+        SELECT o.*, n.text AS new_text FROM old_msgs AS o
+        JOIN new_msgs AS n ON n.id = o.id AND n.key_id = o.key_id
+        WHERE o.text IS NOT n.text
+    """,
+}
+# Different history (_ids renumbered): compare on the message key
+KEYED_SQL = {
+    "new": """
+        SELECT n.* FROM new_k AS n LEFT JOIN old_k AS o
+        USING (jid, key_id, from_me) WHERE o.id IS NULL
+    """,
+    "deleted": """
+        SELECT o.* FROM old_k AS o LEFT JOIN new_k AS n
+        USING (jid, key_id, from_me) WHERE n.id IS NULL
+    """,
+    "edited": """
+        SELECT o.*, n.text AS new_text FROM old_k AS o JOIN new_k AS n
+        USING (jid, key_id, from_me) WHERE o.text IS NOT n.text
+    """,
+}
+
+
+def _sqlite_uri(path: str) -> str:
+    return "file:" + os.path.abspath(path) + "?mode=ro"
+
+
+def _collect(
+    conn: sqlite3.Connection,
+    sql: str,
+    params: Dict[str, Any],
+    limit: Optional[int]
+) -> Dict[str, Any]:
+    """Count of a result set (in SQL) and its first `limit` rows."""
+    count = conn.execute(
+        f"SELECT COUNT(*) FROM ({sql})", params
+    ).fetchone()[0]
+    listed = sql + " ORDER BY id" + (f" LIMIT {int(limit)}" if limit else "")
+    cursor = conn.execute(listed, params)
+    columns = [d[0] for d in cursor.description]
+    items = [dict(zip(columns, row)) for row in cursor]
+    for item in items:
+        item["from_me"] = bool(item["from_me"])
+    return {"count": count, "items": items}
+
+
+def diff_messages(
+    old_db: str, new_db: str, limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    New, deleted and edited messages between two msgstore databases.
+
+    Both are ATTACHed to one in-memory connection and compared in SQL.
+    If the new snapshot continues the old one's history (the old newest
+    _id still holds the same message), new messages are simply the _id
+    range past it and the rest is joined on _id. Otherwise both sides are
+    keyed on (jid, key_id, from_me) and compared with joins.
+    """
+    schemas = []
+    for path in (old_db, new_db):
+        with MsgStore(path) as store:
+            schemas.append(store.schema)
+
+    conn = sqlite3.connect(":memory:", uri=True)
+    try:
+        for alias, path, schema in (
+            ("a", old_db, schemas[0]), ("b", new_db, schemas[1])
+        ):
+            conn.execute(
+                f"ATTACH DATABASE ? AS {alias}", (_sqlite_uri(path),)
+            )
+            view = "old_msgs" if alias == "a" else "new_msgs"
+            conn.execute(
+                f"CREATE TEMP VIEW {view} AS "
+                + KEYED_MESSAGES_SQL[schema].format(db=alias)
+            )
+
+        newest = conn.execute(
+            "SELECT id, jid, key_id FROM old_msgs ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        same_history = False
+        if newest and schemas[0] == schemas[1]:
+            probe = conn.execute(
+                "SELECT jid, key_id FROM new_msgs WHERE id = ?",
+                (newest[0],)
+            ).fetchone()
+            same_history = probe == (newest[1], newest[2])
+
+        if same_history:
+            queries = SAME_HISTORY_SQL
+        else:
+            queries = KEYED_SQL
+            for name, view in (("old_k", "old_msgs"), ("new_k", "new_msgs")):
+                conn.execute(KEYED_TABLE.format(name=name))
+                conn.execute(
+                    f"INSERT OR IGNORE INTO {name} "
+                    f"SELECT jid, key_id, from_me, id, timestamp, text "
+                    f"FROM {view}"
+                )
+
+        params = {"old_max": newest[0] if newest else 0}
+        result: Dict[str, Any] = {"same_history": same_history}
+        for kind, sql in queries.items():
+            result[kind] = _collect(conn, sql, params, limit)
+        return result
+    finally:
+        conn.close()
+
+
+def load_media(path: str) -> Dict[str, int]:
+    """
+    Media of a snapshot as relative path -> size: from a manifest file
+    written by save_manifest, or by scanning <path>/WhatsApp/Media.
+    """
+    if os.path.isfile(path):
+        with open(path, 'r') as f:
+            return {str(k): int(v) for k, v in json.load(f)["files"].items()}
+    return scan_sizes(os.path.join(path, "WhatsApp", "Media"))
+
+
+def save_manifest(path: str, files: Dict[str, int]) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"files": files}, f)
+    os.replace(tmp_path, path)
+
+
+def diff_media(
+    old: Dict[str, int], new: Dict[str, int], limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """Added, removed and resized media between two path -> size maps."""
+    changes = {
+        "added": sorted(new.keys() - old.keys()),
+        "removed": sorted(old.keys() - new.keys()),
+        "changed": sorted(
+            p for p in old.keys() & new.keys() if old[p] != new[p]
+        ),
+    }
+    result: Dict[str, Any] = {}
+    for kind, paths in changes.items():
+        sizes = new if kind != "removed" else old
+        items: List[Dict[str, Any]] = [
+            {"path": p, "size": sizes[p]}
+            for p in (paths[:limit] if limit else paths)
+        ]
+        result[kind] = {
+            "count": len(paths),
+            "bytes": sum(sizes[p] for p in paths),
+            "items": items,
+        }
+    return result
@@ -0,0 +1 @@
+"""Test doubles for running the tools without a phone."""
@@ -0,0 +1,340 @@
+"""
+A directory-backed fake adb, for running pull/push/all without a phone.
+
+It understands the adb command lines this package issues and serves a
+local directory as the device's shared storage (/sdcard and
+/storage/emulated/0). Point the tools at it with:
+
+    export FAKE_ADB_ROOT=./fake-phone
+    export WA_ADB="python -m wa_crypt_tools.testing.fake_adb"
+    python -m wa_crypt_tools all
+
+Environment:
+    FAKE_ADB_ROOT       directory served as /sdcard (required)
+    FAKE_ADB_SERIAL     device serial (default FAKE0001)
+    FAKE_ADB_MODEL      ro.product.model (default Fake_Phone)
+    FAKE_ADB_LATENCY    seconds added to every command (default 0)
+    FAKE_ADB_BANDWIDTH  transfer rate for pull/push/exec-out, e.g. 40MB
+                        (bytes per second; default unlimited)
+    FAKE_ADB_OFFLINE    set to 1 to behave as if no device is attached
+
+A FAKE_ADB_ROOT directory that does not exist also counts as no device,
+so renaming it away and back simulates unplugging the phone for
+`track-devices` (which keeps running and reports every change).
+"""
+import os
+import sys
+import time
+import shlex
+import shutil
+import posixpath
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from wa_crypt_tools.utils import parse_size
+
+STORAGE_PREFIXES = ("/sdcard", "/storage/emulated/0", "/storage/self/primary")
+DEFAULT_SERIAL = "FAKE0001"
+DEFAULT_MODEL = "Fake_Phone"
+COPY_CHUNK_SIZE = 64 * 1024
+# Seconds between checks of FAKE_ADB_ROOT while serving track-devices
+TRACK_INTERVAL = 0.2
+
+
+class FakeAdbError(Exception):
+    """A command failure: message for stderr and the exit status."""
+
+    def __init__(self, message: str, status: int = 1) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class FakeDevice:
+    """The device state for one invocation, read from the environment."""
+
+    def __init__(self, env: Optional[Dict[str, str]] = None) -> None:
+        env = dict(os.environ if env is None else env)
+        root = env.get("FAKE_ADB_ROOT")
+        if not root:
+            raise FakeAdbError("fake adb: FAKE_ADB_ROOT is not set")
+        self.root = os.path.abspath(root)
+        self.serial = env.get("FAKE_ADB_SERIAL") or DEFAULT_SERIAL
+        self.model = env.get("FAKE_ADB_MODEL") or DEFAULT_MODEL
+        self.latency = float(env.get("FAKE_ADB_LATENCY") or 0)
+        bandwidth = env.get("FAKE_ADB_BANDWIDTH")
+        self.bandwidth = parse_size(bandwidth) if bandwidth else 0
+        self.offline = env.get("FAKE_ADB_OFFLINE", "") not in ("", "0")
+
+    @property
+    def online(self) -> bool:
+        return not self.offline and os.path.isdir(self.root)
+
+    def local(self, remote: str) -> str:
+        """Local path backing a device path; refuses paths outside it."""
+        path = posixpath.normpath(remote)
+        for prefix in STORAGE_PREFIXES:
+            if path == prefix or path.startswith(prefix + "/"):
+                rel = path[len(prefix):].lstrip("/")
+                if not rel:
+                    return self.root
+                return os.path.join(self.root, *rel.split("/"))
+        raise FakeAdbError(f"{remote}: Permission denied")
+
+    def copy(self, src: BinaryIO, dst: BinaryIO) -> int:
+        """Copies a stream at the configured bandwidth."""
+        started = time.monotonic()
+        copied = 0
+        for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b""):
+            dst.write(chunk)
+            copied += len(chunk)
+            if self.bandwidth:
+                ahead = copied / self.bandwidth - (
+                    time.monotonic() - started
+                )
+                if ahead > 0:
+                    time.sleep(ahead)
+        return copied
+
+
+def _walk_files(path: str) -> Iterator[str]:
+    if os.path.isfile(path):
+        yield path
+        return
+    for dirpath, _, filenames in os.walk(path):
+        for name in sorted(filenames):
+            yield os.path.join(dirpath, name)
+
+
+def _transfer_tree(
+    device: FakeDevice, src: str, dst: str
+) -> Tuple[int, int]:
+    """Copies a file or directory to dst; returns (files, bytes)."""
+    files = total = 0
+    for path in _walk_files(src):
+        rel = os.path.relpath(path, src) if os.path.isdir(src) else ""
+        target = os.path.join(dst, rel) if rel else dst
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        with open(path, 'rb') as fin, open(target, 'wb') as fout:
+            total += device.copy(fin, fout)
+        shutil.copystat(path, target)
+        files += 1
+    return files, total
+
+
+def _target(src: str, dst: str, many: bool) -> str:
+    """Where adb puts src: inside dst if it is a directory."""
+    if many or os.path.isdir(dst):
+        return os.path.join(dst, os.path.basename(src.rstrip("/\\")))
+    return dst
+
+
+def _report(
+    name: str, verb: str, files: int, size: int, seconds: float
+) -> None:
+    """adb's transfer summary line."""
+    rate = size / seconds / 1e6 if seconds else 0.0
+    print(f"{name}: {files} file{'s' if files != 1 else ''} {verb}, "
+          f"0 skipped. {rate:.1f} MB/s ({size} bytes in {seconds:.3f}s)")
+
+
+def cmd_pull(device: FakeDevice, args: List[str]) -> int:
+    args = [a for a in args if not a.startswith("-")]
+    if len(args) < 2:
+        raise FakeAdbError("adb: error: pull requires an argument")
+    sources, dst = args[:-1], args[-1]
+    if len(sources) > 1 and not os.path.isdir(dst):
+        raise FakeAdbError(
+            f"adb: error: target '{dst}' is not a directory"
+        )
+    started = time.monotonic()
+    files = total = 0
+    for source in sources:
+        local = device.local(source)
+        if not os.path.exists(local):
+            raise FakeAdbError(
+                f"adb: error: failed to stat remote object '{source}': "
+                "No such file or directory"
+            )
+        count, size = _transfer_tree(
+            device, local, _target(source, dst, len(sources) > 1)
+        )
+        files += count
+        total += size
+    _report(sources[0] if len(sources) == 1 else dst, "pulled",
+            files, total, time.monotonic() - started)
+    return 0
+
+
+def cmd_push(device: FakeDevice, args: List[str]) -> int:
+    args = [a for a in args if not a.startswith("-")]
+    if len(args) < 2:
+        raise FakeAdbError("adb: error: push requires an argument")
+    sources, remote_dst = args[:-1], args[-1]
+    dst = device.local(remote_dst)
+    started = time.monotonic()
+    files = total = 0
+    for source in sources:
+        if not os.path.exists(source):
+            raise FakeAdbError(
+                f"adb: error: cannot stat '{source}': "
+                "No such file or directory"
+            )
+        count, size = _transfer_tree(
+            device, source, _target(source, dst, len(sources) > 1)
+        )
+        files += count
+        total += size
+    _report(sources[0] if len(sources) == 1 else remote_dst, "pushed",
+            files, total, time.monotonic() - started)
+    return 0
+
+
+def _find(device: FakeDevice, argv: List[str], out: BinaryIO) -> int:
+    """find ROOT... -type f [-exec stat -c '%s %Y %n' {} +]"""
+    roots = []
+    for arg in argv[1:]:
+        if arg.startswith("-"):
+            break
+        roots.append(arg)
+    with_stat = "-exec" in argv
+    status = 0
+    for root in roots:
+        local = device.local(root)
+        if not os.path.exists(local):
+            sys.stderr.write(
+                f"find: '{root}': No such file or directory\n"
+            )
+            status = 1
+            continue
+        for path in _walk_files(local):
+            rel = os.path.relpath(path, local).replace(os.sep, "/")
+            remote = root.rstrip("/") + ("/" + rel if rel != "." else "")
+            if with_stat:
+                st = os.stat(path)
+                line = f"{st.st_size} {int(st.st_mtime)} {remote}"
+            else:
+                line = remote
+            out.write(line.encode("utf-8") + b"\n")
+    return status
+
+
+def run_shell(device: FakeDevice, command: str, out: BinaryIO) -> int:
+    """Runs the small subset of toybox sh used by the tools."""
+    argv = shlex.split(command)
+    if not argv:
+        return 0
+    name = argv[0]
+    if name == "[" and len(argv) == 4 and argv[3] == "]":
+        local = device.local(argv[2])
+        check = {"-f": os.path.isfile, "-d": os.path.isdir,
+                 "-e": os.path.exists}.get(argv[1])
+        return 0 if check and check(local) else 1
+    if name == "getprop":
+        props = {"ro.product.model": device.model,
+                 "ro.serialno": device.serial}
+        out.write((props.get(argv[1], "") if len(argv) > 1 else "")
+                  .encode() + b"\n")
+        return 0
+    if name == "mkdir":
+        for path in argv[1:]:
+            if not path.startswith("-"):
+                os.makedirs(device.local(path), exist_ok=True)
+        return 0
+    if name == "find":
+        return _find(device, argv, out)
+    if name == "cat":
+        for path in argv[1:]:
+            local = device.local(path)
+            if not os.path.isfile(local):
+                sys.stderr.write(f"cat: {path}: No such file or directory\n")
+                return 1
+            with open(local, 'rb') as f:
+                device.copy(f, out)
+        return 0
+    if name == "ls":
+        for path in [a for a in argv[1:] if not a.startswith("-")]:
+            local = device.local(path)
+            if not os.path.exists(local):
+                sys.stderr.write(f"ls: {path}: No such file or directory\n")
+                return 1
+            if os.path.isdir(local):
+                names = sorted(os.listdir(local))
+            else:
+                names = [path]
+            out.write("".join(n + "\n" for n in names).encode("utf-8"))
+        return 0
+    sys.stderr.write(f"/system/bin/sh: {name}: inaccessible or not found\n")
+    return 127
+
+
+def track_devices(device: FakeDevice, out: BinaryIO) -> int:
+    """Streams the device list whenever it changes, as the adb server."""
+    last = None
+    try:
+        while True:
+            online = device.online
+            if online != last:
+                payload = (f"{device.serial}\tdevice\n" if online
+                           else "").encode()
+                out.write(b"%04x" % len(payload) + payload)
+                out.flush()
+                last = online
+            time.sleep(TRACK_INTERVAL)
+    except (BrokenPipeError, KeyboardInterrupt):
+        return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    try:
+        device = FakeDevice()
+        if device.latency:
+            time.sleep(device.latency)
+
+        serial = None
+        if len(args) >= 2 and args[0] == "-s":
+            serial, args = args[1], args[2:]
+        if not args:
+            raise FakeAdbError("adb: usage: no command specified")
+        command, rest = args[0], args[1:]
+
+        if command == "version":
+            print("Android Debug Bridge version 1.0.41 (fake)")
+            return 0
+        if command == "devices":
+            print("List of devices attached")
+            if device.online:
+                extra = (f" product:fake model:{device.model} device:fake "
+                         "transport_id:1") if "-l" in rest else ""
+                print(f"{device.serial}\tdevice{extra}")
+            print()
+            return 0
+        if command == "track-devices":
+            return track_devices(device, sys.stdout.buffer)
+
+        if not device.online:
+            raise FakeAdbError("adb: no devices/emulators found")
+        if serial and serial != device.serial:
+            raise FakeAdbError(f"adb: device '{serial}' not found")
+
+        if command == "get-state":
+            print("device")
+            return 0
+        if command == "wait-for-device":
+            return 0
+        if command in ("shell", "exec-out"):
+            out = sys.stdout.buffer
+            status = run_shell(device, " ".join(rest), out)
+            out.flush()
+            return status
+        if command == "pull":
+            return cmd_pull(device, rest)
+        if command == "push":
+            return cmd_push(device, rest)
+        raise FakeAdbError(f"adb: unknown command {command}")
+    except FakeAdbError as e:
+        sys.stderr.write(f"{e}\n")
+        return e.status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+"""
+Span-based timing for commands and their stages.
+
+Tracing is off unless enable() is called (the CLI does for every
+command, as the spans feed the run history); spans then cost a couple
+of clock reads and one list append. Each
+finished span becomes a Chrome trace "complete" event (open the JSON in
+chrome://tracing or https://ui.perfetto.dev), and summary() condenses
+the stages into wall time, time spent waiting on subprocesses (adb,
+wadecrypt, venv helpers), files and bytes.
+
+    @tracing.traced("pull")
+    def pull_data(...): ...
+
+    with tracing.span("adb pull", cat=tracing.SUBPROCESS, files=3) as s:
+        ...
+        s.add(bytes=size)
+"""
+import os
+import json
+import time
+import threading
+import functools
+import subprocess
+from contextlib import contextmanager
+from typing import (
+    Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar, cast
+)
+
+STAGE = "stage"
+SUBPROCESS = "subprocess"
+# Span args summed into the stage totals
+COUNTERS = ("files", "bytes")
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_lock = threading.Lock()
+_local = threading.local()
+_events: List[Dict[str, Any]] = []
+_enabled = False
+_origin_ns = 0
+
+
+class Span:
+    """An open span; add() accumulates counters such as bytes or files."""
+    __slots__ = ("name", "cat", "args")
+
+    def __init__(self, name: str, cat: str, args: Dict[str, Any]) -> None:
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def add(self, **counters: int) -> None:
+        for key, value in counters.items():
+            self.args[key] = self.args.get(key, 0) + value
+
+
+class _NullSpan(Span):
+    def add(self, **counters: int) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan("", "", {})
+
+
+def enable() -> None:
+    """Starts recording; clears anything recorded before."""
+    global _enabled, _origin_ns
+    with _lock:
+        _events.clear()
+        _origin_ns = time.perf_counter_ns()
+        _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _depth() -> int:
+    return int(getattr(_local, "depth", 0))
+
+
+@contextmanager
+def span(name: str, cat: str = STAGE, **args: Any) -> Iterator[Span]:
+    """Times the enclosed block as one span (nested spans are fine)."""
+    if not _enabled:
+        yield _NULL_SPAN
+        return
+    current = Span(name, cat, dict(args))
+    depth = _depth()
+    _local.depth = depth + 1
+    cpu = os.times()
+    start = time.perf_counter_ns()
+    try:
+        yield current
+    except BaseException as e:
+        current.args["error"] = type(e).__name__
+        raise
+    finally:
+        end = time.perf_counter_ns()
+        cpu_end = os.times()
+        _local.depth = depth
+        current.args["cpu_s"] = round(
+            cpu_end.user + cpu_end.system - cpu.user - cpu.system, 3
+        )
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": (start - _origin_ns) / 1000,
+            "dur": (end - start) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": current.args,
+            "depth": depth,
+        }
+        with _lock:
+            _events.append(event)
+
+
+def record(
+    name: str, cat: str, start_ns: int, end_ns: int, **args: Any
+) -> None:
+    """
+    Adds a span timed by the caller (perf_counter_ns), for work that
+    overlaps on one thread, such as asyncio tasks, where span() would
+    mix up the nesting.
+    """
+    if not _enabled:
+        return
+    event = {
+        "name": name, "cat": cat, "ph": "X",
+        "ts": (start_ns - _origin_ns) / 1000,
+        "dur": (end_ns - start_ns) / 1000,
+        "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+        "depth": _depth(),
+    }
+    with _lock:
+        _events.append(event)
+
+
+def instant(name: str, **args: Any) -> None:
+    """A point-in-time marker, e.g. a pull tier landing on disk."""
+    if not _enabled:
+        return
+    event = {
+        "name": name, "cat": "mark", "ph": "i", "s": "p",
+        "ts": (time.perf_counter_ns() - _origin_ns) / 1000,
+        "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+    }
+    with _lock:
+        _events.append(event)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator: runs the function inside a stage span."""
+    def decorate(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+        return cast(F, wrapper)
+    return decorate
+
+
+def check_call(cmd: List[str], name: Optional[str] = None,
+               files: int = 0, bytes: int = 0, **kwargs: Any) -> int:
+    """subprocess.check_call inside a subprocess span."""
+    args: Dict[str, Any] = {"cmd": " ".join(cmd[:3])}
+    if files:
+        args["files"] = files
+    if bytes:
+        args["bytes"] = bytes
+    with span(name or os.path.basename(cmd[0]), SUBPROCESS, **args):
+        return subprocess.check_call(cmd, **kwargs)
+
+
+def file_size(path: str) -> int:
+    """Size of path, or 0 if it cannot be read."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def events() -> List[Dict[str, Any]]:
+    with _lock:
+        return list(_events)
+
+
+def errors() -> Dict[Tuple[str, str], int]:
+    """(span name, exception type) -> count of spans that raised."""
+    counts: Dict[Tuple[str, str], int] = {}
+    for event in events():
+        error = event.get("args", {}).get("error")
+        if error and event["ph"] == "X":
+            key = (event["name"], error)
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _end(event: Dict[str, Any]) -> float:
+    return float(event["ts"] + event["dur"])
+
+
+def summary() -> List[Dict[str, Any]]:
+    """
+    One row per stage span, in start order: wall time, time in
+    subprocesses (outermost child spans of category 'subprocess' on the
+    same thread), the rest as Python time, and files/bytes summed over
+    the spans inside it.
+
+    Each thread's spans are swept once in start order with a stack of
+    the open spans, so the cost stays linear in the number of spans
+    times the nesting depth. Spans of another thread count towards a
+    stage (files/bytes only) when their outermost span lies within it.
+    """
+    recorded = sorted(
+        (e for e in events() if e["ph"] == "X"), key=lambda e: e["ts"]
+    )
+    by_thread: Dict[int, List[Dict[str, Any]]] = {}
+    for event in recorded:
+        by_thread.setdefault(event["tid"], []).append(event)
+
+    # id(span) -> counters of the span and everything nested in it
+    counts: Dict[int, Dict[str, int]] = {}
+    sub: Dict[int, float] = {}
+    roots: List[Dict[str, Any]] = []
+    for thread_events in by_thread.values():
+        thread_events.sort(key=lambda e: (e["ts"], -e["dur"]))
+        stack: List[Dict[str, Any]] = []
+        for event in thread_events:
+            while stack and _end(event) > _end(stack[-1]):
+                stack.pop()
+            if not stack:
+                roots.append(event)
+            own = {c: event["args"].get(c, 0) for c in COUNTERS}
+            counts[id(event)] = dict(own)
+            outermost = event["cat"] == SUBPROCESS and not any(
+                parent["cat"] == SUBPROCESS for parent in stack
+            )
+            for parent in stack:
+                totals = counts[id(parent)]
+                for counter in COUNTERS:
+                    totals[counter] += own[counter]
+                if outermost and parent["cat"] == STAGE:
+                    sub[id(parent)] = sub.get(id(parent), 0) + event["dur"]
+            stack.append(event)
+
+    stages = [e for e in recorded if e["cat"] == STAGE]
+    foreign = {id(stage): {c: 0 for c in COUNTERS} for stage in stages}
+    for root in roots:
+        for stage in stages:
+            if stage["ts"] > root["ts"]:
+                break
+            if stage["tid"] != root["tid"] and _end(root) <= _end(stage):
+                for counter in COUNTERS:
+                    foreign[id(stage)][counter] += counts[id(root)][counter]
+
+    rows = []
+    for stage in stages:
+        sub_us = sub.get(id(stage), 0)
+        row: Dict[str, Any] = {
+            "stage": stage["name"],
+            "depth": stage["depth"],
+            "wall_s": stage["dur"] / 1e6,
+            "subprocess_s": sub_us / 1e6,
+            "python_s": max(stage["dur"] - sub_us, 0) / 1e6,
+            "cpu_s": stage["args"].get("cpu_s", 0),
+        }
+        for counter in COUNTERS:
+            row[counter] = (counts[id(stage)][counter]
+                            + foreign[id(stage)][counter])
+        rows.append(row)
+    return rows
+
+
+def format_summary(rows: List[Dict[str, Any]]) -> str:
+    from wa_crypt_tools.utils import format_size
+
+    lines = [f"{'Stage':<18}{'Wall':>9}{'Subproc':>9}{'Python':>9}"
+             f"{'Files':>8}{'Bytes':>11}{'Rate':>12}"]
+    for row in rows:
+        rate = (f"{format_size(int(row['bytes'] / row['wall_s']))}/s"
+                if row["bytes"] and row["wall_s"] else "")
+        name = "  " * row["depth"] + row["stage"]
+        lines.append(
+            f"{name:<18}{row['wall_s']:>8.2f}s{row['subprocess_s']:>8.2f}s"
+            f"{row['python_s']:>8.2f}s{row['files'] or '':>8}"
+            f"{format_size(row['bytes']) if row['bytes'] else '':>11}"
+            f"{rate:>12}"
+        )
+    return "\n".join(lines)
+
+
+def write_trace(path: str) -> None:
+    """Writes the Chrome trace JSON (atomically) to path."""
+    trace_events = [
+        {k: v for k, v in e.items() if k != "depth"} for e in events()
+    ]
+    trace_events.append({
+        "name": "process_name", "ph": "M", "pid": os.getpid(),
+        "args": {"name": "wa_crypt_tools"},
+    })
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"traceEvents": trace_events,
+                   "displayTimeUnit": "ms"}, f)
+    os.replace(tmp_path, path)
+
+
+def finish(path: str) -> None:
+    """Writes the trace and prints the stage summary (CLI --trace)."""
+    rows = summary()
+    write_trace(path)
+    print("--- Timing ---")
+    print(format_summary(rows))
+    print(f"Trace written to {path}")
@@ -1,5 +1,6 @@
 import os
 import sys
+import shutil
 
 
 def get_script_dir() -> str:
@@ -9,3 +10,28 @@ def get_script_dir() -> str:
     if getattr(sys, 'frozen', False):
         return os.path.dirname(sys.executable)
     return os.getcwd()
+
+
+def format_size(size: float) -> str:
+    """Human readable byte count, e.g. '1.5 GB'."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            break
+        size /= 1024
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def free_space(path: str) -> int:
+    """Free bytes on the filesystem path is (or would be) created on."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+
+def parse_size(text: str) -> int:
+    """Byte count from '500', '50MB', '1.5G' or '200 kb'."""
+    units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = text.strip().upper().rstrip("B").strip()
+    unit = value[-1:] if value[-1:] in "KMG" else ""
+    return int(float(value[:len(value) - len(unit)]) * units[unit])
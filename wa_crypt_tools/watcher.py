@@ -0,0 +1,217 @@
+"""
+Device watcher for the `watch` daemon.
+
+Follows `adb track-devices`, a stream on which the adb server pushes the
+full device list whenever it changes, so nothing is polled while idle.
+A device that comes online gets a job in a bounded queue; a worker runs
+the jobs one at a time. Unplugging a device cancels its job, and a
+device is not backed up again until its cooldown has passed.
+"""
+import time
+import queue
+import threading
+import subprocess
+from typing import IO, Callable, Dict, Iterator, List, Optional
+
+from wa_crypt_tools.adb import AdbError
+
+# Seconds after a finished job before the same device is backed up again
+DEFAULT_COOLDOWN = 600.0
+# Jobs waiting for the worker; further devices are skipped until one ends
+DEFAULT_QUEUE_SIZE = 4
+# Seconds before reconnecting when the track-devices stream ends
+TRACK_RETRY_DELAY = 2.0
+
+# Runs one backup of a serial; the event is set when the device goes
+# away and the job should stop. Returns an exit status.
+JobRunner = Callable[[str, threading.Event], int]
+
+
+def _read_exact(stream: IO[bytes], size: int) -> Optional[bytes]:
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def read_device_lists(stream: IO[bytes]) -> Iterator[Dict[str, str]]:
+    """
+    Parses a track-devices stream into {serial: state} snapshots. Each
+    message is a 4-digit hex length followed by that many bytes of
+    'serial<TAB>state' lines. Stops at the end of the stream.
+    """
+    while True:
+        header = _read_exact(stream, 4)
+        if header is None:
+            return
+        try:
+            length = int(header, 16)
+        except ValueError:
+            raise AdbError(f"Unexpected track-devices output: {header!r}")
+        payload = _read_exact(stream, length) if length else b""
+        if payload is None:
+            return
+        devices = {}
+        for line in payload.decode("utf-8", "replace").splitlines():
+            fields = line.split()
+            if len(fields) >= 2:
+                devices[fields[0]] = fields[1]
+        yield devices
+
+
+class Job:
+    """A queued or running backup of one device."""
+
+    def __init__(self, serial: str) -> None:
+        self.serial = serial
+        self.cancel = threading.Event()
+
+
+class DeviceWatcher:
+    """
+    Turns device list snapshots into jobs. update() is fed by watch()
+    (or directly, in tests); the worker thread runs the jobs.
+    """
+
+    def __init__(
+        self,
+        run_job: JobRunner,
+        serials: Optional[List[str]] = None,
+        cooldown: float = DEFAULT_COOLDOWN,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.run_job = run_job
+        self.serials = set(serials or [])
+        self.cooldown = cooldown
+        self.clock = clock
+        self.queue: "queue.Queue[Optional[Job]]" = queue.Queue(
+            max(queue_size, 1)
+        )
+        self.jobs: Dict[str, Job] = {}
+        self.finished_at: Dict[str, float] = {}
+        self.states: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._proc: Optional["subprocess.Popen[bytes]"] = None
+        self._worker: Optional[threading.Thread] = None
+
+    def update(self, devices: Dict[str, str]) -> None:
+        """Handles a new device list: queues or cancels jobs."""
+        for serial, state in devices.items():
+            if state == "device" and self.states.get(serial) != "device":
+                self._connected(serial)
+        for serial, state in self.states.items():
+            if state == "device" and devices.get(serial) != "device":
+                self._disconnected(serial)
+        self.states = dict(devices)
+
+    def _connected(self, serial: str) -> None:
+        if self.serials and serial not in self.serials:
+            print(f"{serial} connected (not configured, ignored).")
+            return
+        with self._lock:
+            if serial in self.jobs:
+                return
+            last = self.finished_at.get(serial)
+            if last is not None and self.clock() - last < self.cooldown:
+                left = self.cooldown - (self.clock() - last)
+                print(f"{serial} connected. Backed up recently; next "
+                      f"backup allowed in {left:.0f}s.")
+                return
+            job = Job(serial)
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                print(f"Warning: Job queue full. Not backing up {serial}.")
+                return
+            self.jobs[serial] = job
+        print(f"{serial} connected. Backup queued.")
+
+    def _disconnected(self, serial: str) -> None:
+        with self._lock:
+            job = self.jobs.get(serial)
+        if job is not None and not job.cancel.is_set():
+            print(f"{serial} disconnected. Cancelling its backup.")
+            job.cancel.set()
+
+    def _run(self, job: Job) -> None:
+        status = 1
+        if not job.cancel.is_set():
+            try:
+                status = self.run_job(job.serial, job.cancel)
+            except Exception as e:
+                print(f"Error: Backup of {job.serial} failed: {e}")
+        with self._lock:
+            del self.jobs[job.serial]
+            # A cancelled job is retried as soon as the device is back
+            if not job.cancel.is_set():
+                self.finished_at[job.serial] = self.clock()
+        outcome = "cancelled" if job.cancel.is_set() else (
+            "done" if status == 0 else f"failed ({status})"
+        )
+        print(f"Backup of {job.serial} {outcome}.")
+        if (
+            job.cancel.is_set() and not self._stop.is_set()
+            and self.states.get(job.serial) == "device"
+        ):
+            # Plugged back in while the cancelled job was winding down
+            self._connected(job.serial)
+
+    def _work(self) -> None:
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            self._run(job)
+
+    def start(self) -> None:
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def watch(self, adb_base: List[str]) -> None:
+        """
+        Follows track-devices until stop(), reconnecting whenever the
+        stream ends (e.g. the adb server was restarted).
+        """
+        while not self._stop.is_set():
+            try:
+                self._proc = subprocess.Popen(
+                    adb_base + ["track-devices"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+            except FileNotFoundError:
+                raise AdbError(f"ADB executable not found: {adb_base[0]}")
+            assert self._proc.stdout is not None
+            for devices in read_device_lists(self._proc.stdout):
+                self.update(devices)
+            self._proc.wait()
+            if self._stop.is_set():
+                break
+            # Without the server no device is reachable
+            self.update({})
+            print("Warning: Lost the adb device stream. Reconnecting...")
+            self._stop.wait(TRACK_RETRY_DELAY)
+
+    def stop(self) -> None:
+        """Cancels every job, ends watch() and waits for the worker."""
+        self._stop.set()
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.terminate()
+        with self._lock:
+            for job in self.jobs.values():
+                job.cancel.set()
+        if self._worker is not None:
+            # Drop the jobs that have not started
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put(None)
+            self._worker.join()
+            self._worker = None